@@ -0,0 +1 @@
+# Benchmark suite: load tests and micro-benchmarks run against fake X and LLM backends.
\ No newline at end of file
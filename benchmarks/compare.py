@@ -0,0 +1,74 @@
+"""
+Compares two benchmark result files and flags regressions.
+
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json --threshold 10
+
+Exits with status 1 if any latency percentile got slower, or throughput dropped,
+by more than the threshold (percent).
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+
+def _change(old: float, new: float) -> float:
+    """Relative change in percent (positive means the value grew)."""
+    if not old:
+        return 0.0
+    return (new - old) / old * 100
+
+
+def compare_results(old: Dict[str, Any], new: Dict[str, Any], threshold: float) -> Tuple[List[str], bool]:
+    """
+    Builds a report comparing two results.
+
+    Args:
+        old: Baseline result document
+        new: Candidate result document
+        threshold: Allowed slowdown in percent before a metric counts as a regression
+
+    Returns:
+        A tuple of (report lines, whether any regression was found)
+    """
+    lines = [f"{'metric':<28}{'old':>12}{'new':>12}{'change':>10}"]
+    regressed = False
+
+    for key in ("p50", "p95", "p99", "mean"):
+        before, after = old["latency_ms"].get(key, 0.0), new["latency_ms"].get(key, 0.0)
+        change = _change(before, after)
+        flag = " !" if change > threshold else ""
+        regressed |= bool(flag)
+        lines.append(f"{'latency_ms.' + key:<28}{before:>12.2f}{after:>12.2f}{change:>9.1f}%{flag}")
+
+    before, after = old.get("throughput_rps", 0.0), new.get("throughput_rps", 0.0)
+    change = _change(before, after)
+    flag = " !" if change < -threshold else ""
+    regressed |= bool(flag)
+    lines.append(f"{'throughput_rps':<28}{before:>12.2f}{after:>12.2f}{change:>9.1f}%{flag}")
+
+    for node in sorted(set(old.get("nodes", {})) | set(new.get("nodes", {}))):
+        before = old.get("nodes", {}).get(node, {}).get("mean_ms", 0.0)
+        after = new.get("nodes", {}).get(node, {}).get("mean_ms", 0.0)
+        lines.append(f"{'node.' + node:<28}{before:>12.2f}{after:>12.2f}{_change(before, after):>9.1f}%")
+
+    return lines, regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("old", type=Path)
+    parser.add_argument("new", type=Path)
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed regression in percent")
+    args = parser.parse_args()
+
+    old, new = json.loads(args.old.read_text()), json.loads(args.new.read_text())
+    lines, regressed = compare_results(old, new, args.threshold)
+    print(f"old: {old.get('git_commit')} ({old.get('label')})  new: {new.get('git_commit')} ({new.get('label')})")
+    print("\n".join(lines))
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Output-token cost of category evidence: quoted text versus tweet numbers.
+
+For synthetic profiles, the category scorer's tool-call arguments are rendered in both
+evidence modes, citing the same tweets, and counted with the model's tokenizer. The
+arguments are the tokens the model has to generate, so their count drives both the
+completion cost and the generation latency of the node. Counting uses tiktoken's
+o200k_base encoding when it can be loaded, and the pipeline's character estimate
+otherwise; the result records which.
+
+    python -m benchmarks.evidence_tokens
+"""
+import argparse
+import json
+import random
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.fake_twscrape import _SUFFIXES, _TOPICS
+from benchmarks.load_test import RESULTS_DIR, _git_commit
+from src.pipeline.constants import CATEGORIES
+from src.pipeline.utils import estimate_tokens
+
+PROFILES = ({"tweets": 20, "categories": 5, "evidence": 2}, {"tweets": 50, "categories": 8, "evidence": 3})
+
+
+def _token_counter() -> Tuple[str, Callable[[str], int]]:
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # tiktoken missing, or its encoding file could not be downloaded
+        return "estimate", estimate_tokens
+    return "o200k_base", lambda text: len(encoding.encode(text))
+
+
+def tool_arguments(tweet_count: int, categories: int, evidence: int, seed: int = 0) -> Dict[str, str]:
+    """Renders the category scorer's arguments for one profile in both evidence modes."""
+    rng = random.Random(seed)
+    tweets = [f"Thinking about {rng.choice(_TOPICS)}.{rng.choice(_SUFFIXES)}" for _ in range(tweet_count)]
+    scores: List[Dict[str, Any]] = []
+    for category in rng.sample(CATEGORIES, categories):
+        cited = sorted(rng.sample(range(1, tweet_count + 1), evidence))
+        scores.append({"category": category, "score": round(rng.uniform(40, 95), 1), "cited": cited})
+    quotes = {"scores": [
+        {"category": s["category"], "score": s["score"], "evidence": [tweets[i - 1] for i in s["cited"]]} for s in scores
+    ]}
+    indices = {"scores": [{"category": s["category"], "score": s["score"], "evidence": s["cited"]} for s in scores]}
+    return {"quotes": json.dumps(quotes), "indices": json.dumps(indices)}
+
+
+def run_evidence_benchmark() -> Dict[str, Any]:
+    """Counts the output tokens of each evidence mode for every synthetic profile."""
+    tokenizer, count_tokens = _token_counter()
+    profiles = []
+    for profile in PROFILES:
+        arguments = tool_arguments(profile["tweets"], profile["categories"], profile["evidence"])
+        tokens = {mode: count_tokens(text) for mode, text in arguments.items()}
+        profiles.append({**profile, "output_tokens": tokens, "reduction": round(1 - tokens["indices"] / tokens["quotes"], 3)})
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "tokenizer": tokenizer,
+        "profiles": profiles
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare category evidence output tokens by evidence mode.")
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    result = run_evidence_benchmark()
+    output = args.output
+    if output is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = RESULTS_DIR / f"evidence_{stamp}_{result['git_commit'] or 'nogit'}.json"
+    output.write_text(json.dumps(result, indent=2))
+
+    for profile in result["profiles"]:
+        tokens = profile["output_tokens"]
+        print(
+            f"{profile['tweets']} tweets, {profile['categories']} categories x {profile['evidence']} evidence: "
+            f"quotes={tokens['quotes']} indices={tokens['indices']} output tokens ({profile['reduction']:.0%} fewer)"
+        )
+    print(f"Tokenizer: {result['tokenizer']}")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
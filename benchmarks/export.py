@@ -0,0 +1,116 @@
+"""
+Write throughput of the Parquet export and scan time of analytics queries over it,
+compared to the same results kept as JSON lines (the batch runner's `results.jsonl`).
+
+Synthetic results shaped like real ones are appended in batches. The benchmark then
+times reading one category column (the average `tech` score) and every column of the
+whole range.
+
+    python -m benchmarks.export --rows 100000
+"""
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from benchmarks.load_test import RESULTS_DIR, _git_commit
+from benchmarks.payload import synthetic_response
+from src.export.reader import scan_results
+from src.export.writer import ResultExporter
+from src.pipeline.constants import CATEGORIES
+
+APPEND_BATCH = 100  # Results per append, as a batch run hands them over
+
+
+def synthetic_results(rows: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Results with random scores for 8 of the categories, without the tweets."""
+    rng = random.Random(seed)
+    template = synthetic_response(20, seed).model_dump()
+    template["recent_tweets"] = None
+    results = []
+    for i in range(rows):
+        scores = {category: {"score": round(rng.uniform(0, 100), 1), "evidence": []} for category in rng.sample(CATEGORIES, 8)}
+        results.append({**template, "username": f"user{i}", "category_scores": scores})
+    return results
+
+
+def _timed(function) -> float:
+    started = time.perf_counter()
+    function()
+    return time.perf_counter() - started
+
+
+def run_export_benchmark(rows: int) -> Dict[str, Any]:
+    """Writes `rows` results both ways and times the writes and scans."""
+    results = synthetic_results(rows)
+    today = datetime.now(timezone.utc).date()
+    with tempfile.TemporaryDirectory() as root:
+        export_dir = Path(root) / "export"
+        jsonl = Path(root) / "results.jsonl"
+
+        exporter = ResultExporter(export_dir)
+        parquet_write = _timed(lambda: (
+            [exporter.append(results[i:i + APPEND_BATCH]) for i in range(0, rows, APPEND_BATCH)], exporter.close()
+        ))
+        jsonl_write = _timed(lambda: jsonl.write_text("".join(json.dumps(result) + "\n" for result in results)))
+
+        def parquet_column() -> float:
+            batches = scan_results(export_dir, today, today, columns=["score_tech"])
+            return pc.mean(pa.chunked_array([batch.column(0) for batch in batches], type=pa.float32())).as_py()
+
+        def jsonl_column() -> float:
+            scores = []
+            with jsonl.open() as lines:
+                for line in lines:
+                    score = json.loads(line)["category_scores"].get("tech")
+                    if score is not None:
+                        scores.append(score["score"])
+            return sum(scores) / len(scores)
+
+        parquet_bytes = sum(path.stat().st_size for path in export_dir.rglob("*.parquet"))
+        return {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "rows": rows,
+            "bytes": {"parquet": parquet_bytes, "jsonl": jsonl.stat().st_size},
+            "write_seconds": {"parquet": round(parquet_write, 3), "jsonl": round(jsonl_write, 3)},
+            "category_mean_seconds": {"parquet": round(_timed(parquet_column), 4), "jsonl": round(_timed(jsonl_column), 4)},
+            "full_scan_seconds": {
+                "parquet": round(_timed(lambda: sum(batch.num_rows for batch in scan_results(export_dir, date.min, today))), 4),
+                "jsonl": round(_timed(lambda: [json.loads(line) for line in jsonl.open()]), 4)
+            }
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure the Parquet result export against JSON lines.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    result = run_export_benchmark(args.rows)
+    output = args.output
+    if output is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = RESULTS_DIR / f"export_{stamp}_{result['git_commit'] or 'nogit'}.json"
+    output.write_text(json.dumps(result, indent=2))
+
+    print(f"{result['rows']:,d} results")
+    for metric in ("bytes", "write_seconds", "category_mean_seconds", "full_scan_seconds"):
+        values = result[metric]
+        print(f"    {metric:<22} parquet={values['parquet']:<12,} jsonl={values['jsonl']:<12,} ({values['parquet'] / values['jsonl']:.1%})")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,410 @@
+"""
+Fake OpenAI-compatible chat completions server for benchmarks and tests.
+
+Answers `/v1/chat/completions` with schema-conforming structured output (both the
+`tools` and the `response_format: json_schema` styles used by LangChain) after a
+configurable latency, jitter, latency-spike and error profile. Like the real API, it
+reports `prompt_tokens_details.cached_tokens` when a request repeats a prefix (tools,
+response format and system messages) of at least `cache_min_tokens` tokens. With
+`rpm_limit`/`tpm_limit` set it enforces per-minute limits, sends `x-ratelimit-*`
+headers and answers 429 with Retry-After once a limit is exhausted.
+
+It also stands in for the batch API: `/v1/files` stores uploaded batch input files and
+`/v1/batches` answers every line of an uploaded file after `batch_delay_ms`. Error injection applies
+per line, so failed requests appear in the batch's error file. Packed requests (several
+profiles in one call, see src.batch.packing) get one result per profile_id in the prompt.
+
+Run standalone:
+    python -m benchmarks.fake_openai --port 9100 --latency-ms 400 --jitter-ms 100
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response
+
+# Plausible values for well-known fields so the pipeline's validation passes
+_FIELD_EXAMPLES = {
+    "category": "tech",
+    "mbti_code": "INTJ",
+    "mbti_name": "Architect",
+    "scaled_sentiment_score": 62.5,
+    "score": 72.0
+}
+
+
+@dataclass
+class FakeLLMConfig:
+    """Latency and failure profile of the fake server."""
+    latency_ms: float = 300.0
+    jitter_ms: float = 50.0
+    spike_rate: float = 0.0  # Probability that a response is delayed by spike_ms
+    spike_ms: float = 3000.0
+    error_rate: float = 0.0  # Probability of answering with error_status
+    error_status: int = 500
+    cache_min_tokens: int = 1024  # Shortest prefix eligible for prompt caching
+    rpm_limit: float = 0.0  # Requests per minute (0 = unlimited)
+    tpm_limit: float = 0.0  # Tokens per minute (0 = unlimited)
+    batch_delay_ms: float = 1000.0  # Time a batch takes to complete
+    seed: int | None = None
+
+
+def _resolve(schema: Dict[str, Any], root: Dict[str, Any]) -> Dict[str, Any]:
+    """Follows a local `$ref` inside the root schema."""
+    ref = schema.get("$ref")
+    if not ref:
+        return schema
+    node: Any = root
+    for part in ref.lstrip("#/").split("/"):
+        node = node[part]
+    return node
+
+
+def example_from_schema(schema: Dict[str, Any], root: Dict[str, Any] | None = None, field: str | None = None) -> Any:
+    """
+    Generates a small value that conforms to a JSON schema.
+
+    Args:
+        schema: JSON schema (or sub-schema) to satisfy
+        root: Root schema used to resolve `$ref`s
+        field: Name of the property being generated, used for plausible examples
+
+    Returns:
+        A JSON-serializable value
+    """
+    root = root or schema
+    schema = _resolve(schema, root)
+    if field in _FIELD_EXAMPLES:
+        return _FIELD_EXAMPLES[field]
+    if "enum" in schema:
+        return schema["enum"][0]
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in schema:
+            return example_from_schema(schema[key][0], root, field)
+
+    kind = schema.get("type", "object")
+    if kind == "object":
+        return {
+            name: example_from_schema(prop, root, name)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        items = schema.get("items", {})
+        return [example_from_schema(items, root, field) for _ in range(2)]
+    if kind == "integer":
+        return 1
+    if kind == "number":
+        return 50.0
+    if kind == "boolean":
+        return True
+    return f"example {field or 'text'}"
+
+
+_PROFILE_ID_RE = re.compile(r"=== profile_id: (.+?) ===")
+
+
+def _fill_packed_results(output: Any, body: Dict[str, Any]) -> Any:
+    """Answers a packed request (see src.batch.packing) with one result per profile_id in the prompt."""
+    results = output.get("results") if isinstance(output, dict) else None
+    if not results or not isinstance(results[0], dict) or "profile_id" not in results[0]:
+        return output
+    prompt = " ".join(str(message.get("content")) for message in body.get("messages", []))
+    output["results"] = [{**results[0], "profile_id": profile_id} for profile_id in _PROFILE_ID_RE.findall(prompt)]
+    return output
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _static_prefix(body: Dict[str, Any]) -> str:
+    """Returns the cacheable prefix of a request: tools, response format and leading system messages."""
+    system_messages = []
+    for message in body.get("messages", []):
+        if message.get("role") not in ("system", "developer"):
+            break
+        system_messages.append(message)
+    return json.dumps([body.get("tools"), body.get("response_format"), system_messages], sort_keys=True)
+
+
+class _PerMinuteBucket:
+    """Per-minute limit with continuous refill, mirroring how the real API meters usage."""
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.per_minute, self.level + (now - self.updated) * self.per_minute / 60)
+        self.updated = now
+
+    def seconds_until(self, amount: float) -> float:
+        return max(0.0, (amount - self.level) * 60 / self.per_minute)
+
+
+def _rate_limit_headers(requests: _PerMinuteBucket | None, tokens: _PerMinuteBucket | None) -> Dict[str, str]:
+    headers = {}
+    for bucket, kind, amount in ((requests, "requests", 1), (tokens, "tokens", 1)):
+        if bucket is not None:
+            headers[f"x-ratelimit-limit-{kind}"] = str(int(bucket.per_minute))
+            headers[f"x-ratelimit-remaining-{kind}"] = str(max(0, int(bucket.level)))
+            headers[f"x-ratelimit-reset-{kind}"] = f"{(bucket.per_minute - bucket.level) * 60 / bucket.per_minute:.3f}s"
+    return headers
+
+
+def create_fake_openai_app(config: FakeLLMConfig | None = None) -> FastAPI:
+    """
+    Builds the fake OpenAI-compatible application.
+
+    Args:
+        config: Latency and failure profile (defaults to FakeLLMConfig())
+
+    Returns:
+        A FastAPI application
+    """
+    config = config or FakeLLMConfig()
+    rng = random.Random(config.seed)
+    app = FastAPI(title="Fake OpenAI")
+    app.state.config = config
+    app.state.requests_served = 0
+    app.state.seen_prefixes = set()
+    app.state.rate_limited = 0
+    request_bucket = _PerMinuteBucket(config.rpm_limit) if config.rpm_limit > 0 else None
+    token_bucket = _PerMinuteBucket(config.tpm_limit) if config.tpm_limit > 0 else None
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests_served += 1
+
+        # Requests are metered on arrival, by prompt size, like the real API
+        request_tokens = _estimate_tokens(json.dumps(body.get("messages", [])))
+        for bucket in (request_bucket, token_bucket):
+            if bucket is not None:
+                bucket.refill()
+        retry_after = max(
+            request_bucket.seconds_until(1) if request_bucket else 0.0,
+            token_bucket.seconds_until(request_tokens) if token_bucket else 0.0
+        )
+        if retry_after > 0:
+            app.state.rate_limited += 1
+            return JSONResponse(
+                status_code=429,
+                content={"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                headers={"retry-after": f"{retry_after:.3f}", **_rate_limit_headers(request_bucket, token_bucket)}
+            )
+        if request_bucket:
+            request_bucket.level -= 1
+        if token_bucket:
+            token_bucket.level -= request_tokens
+
+        delay_ms = max(0.0, rng.gauss(config.latency_ms, config.jitter_ms))
+        if rng.random() < config.spike_rate:
+            delay_ms += config.spike_ms
+        await asyncio.sleep(delay_ms / 1000)
+
+        if rng.random() < config.error_rate:
+            return JSONResponse(
+                status_code=config.error_status,
+                content={"error": {"message": "Injected failure", "type": "server_error"}}
+            )
+
+        return JSONResponse(
+            build_chat_completion(body, app.state.seen_prefixes, config.cache_min_tokens),
+            headers=_rate_limit_headers(request_bucket, token_bucket)
+        )
+
+    # --- Batch API ---
+    app.state.files = {}
+    app.state.batches = {}
+
+    def store_file(content: bytes, filename: str, purpose: str) -> Dict[str, Any]:
+        file_id = f"file-{uuid.uuid4().hex[:24]}"
+        app.state.files[file_id] = content
+        return {
+            "id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+            "filename": filename, "purpose": purpose, "status": "processed"
+        }
+
+    async def process_batch(batch: Dict[str, Any]) -> None:
+        batch["status"] = "in_progress"
+        batch["in_progress_at"] = int(time.time())
+        lines = [json.loads(line) for line in app.state.files[batch["input_file_id"]].decode().splitlines() if line.strip()]
+        batch["request_counts"]["total"] = len(lines)
+        await asyncio.sleep(config.batch_delay_ms / 1000)
+
+        outputs, errors = [], []
+        for line in lines:
+            app.state.requests_served += 1
+            if rng.random() < config.error_rate:
+                status, body = config.error_status, {"error": {"message": "Injected failure", "type": "server_error"}}
+            else:
+                status, body = 200, build_chat_completion(line["body"], app.state.seen_prefixes, config.cache_min_tokens)
+            output = {
+                "id": f"batch_req_{uuid.uuid4().hex[:24]}",
+                "custom_id": line["custom_id"],
+                "response": {"status_code": status, "request_id": uuid.uuid4().hex, "body": body},
+                "error": None
+            }
+            (outputs if status == 200 else errors).append(output)
+
+        for key, rows in (("output_file_id", outputs), ("error_file_id", errors)):
+            if rows:
+                content = "".join(json.dumps(row) + "\n" for row in rows).encode()
+                batch[key] = store_file(content, f"{batch['id']}_{key}.jsonl", "batch_output")["id"]
+        batch["request_counts"].update(completed=len(outputs), failed=len(errors))
+        batch["status"] = "completed"
+        batch["completed_at"] = int(time.time())
+
+    @app.post("/v1/files")
+    async def upload_file(request: Request):
+        form = await request.form()
+        upload = form["file"]
+        return store_file(await upload.read(), upload.filename, form.get("purpose", "batch"))
+
+    @app.get("/v1/files/{file_id}/content")
+    async def file_content(file_id: str):
+        if file_id not in app.state.files:
+            raise HTTPException(status_code=404, detail="No such file")
+        return Response(app.state.files[file_id], media_type="application/octet-stream")
+
+    @app.post("/v1/batches")
+    async def create_batch(request: Request):
+        body = await request.json()
+        if body.get("input_file_id") not in app.state.files:
+            raise HTTPException(status_code=400, detail="Unknown input file")
+        batch = {
+            "id": f"batch_{uuid.uuid4().hex[:24]}",
+            "object": "batch",
+            "endpoint": body["endpoint"],
+            "input_file_id": body["input_file_id"],
+            "completion_window": body.get("completion_window", "24h"),
+            "status": "validating",
+            "output_file_id": None,
+            "error_file_id": None,
+            "created_at": int(time.time()),
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            "metadata": body.get("metadata")
+        }
+        app.state.batches[batch["id"]] = batch
+        batch["_task"] = asyncio.create_task(process_batch(batch))
+        return {k: v for k, v in batch.items() if not k.startswith("_")}
+
+    @app.get("/v1/batches/{batch_id}")
+    async def get_batch(batch_id: str):
+        if batch_id not in app.state.batches:
+            raise HTTPException(status_code=404, detail="No such batch")
+        return {k: v for k, v in app.state.batches[batch_id].items() if not k.startswith("_")}
+
+    return app
+
+
+def build_chat_completion(body: Dict[str, Any], seen_prefixes: set | None = None, cache_min_tokens: int = 1024) -> Dict[str, Any]:
+    """
+    Builds a chat completion response whose output satisfies the requested schema.
+
+    Args:
+        body: The chat completions request body
+        seen_prefixes: Hashes of prefixes seen so far, used to simulate prompt caching
+        cache_min_tokens: Shortest prefix eligible for caching
+
+    Returns:
+        An OpenAI chat completion object
+    """
+    prompt_text = json.dumps(body.get("messages", []))
+    message: Dict[str, Any] = {"role": "assistant", "content": None}
+
+    if body.get("tools"):
+        function = body["tools"][0]["function"]
+        arguments = json.dumps(_fill_packed_results(example_from_schema(function.get("parameters", {})), body))
+        message["tool_calls"] = [{
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {"name": function["name"], "arguments": arguments}
+        }]
+        completion_text = arguments
+    elif (body.get("response_format") or {}).get("type") == "json_schema":
+        schema = body["response_format"]["json_schema"].get("schema", {})
+        message["content"] = completion_text = json.dumps(example_from_schema(schema))
+    else:
+        message["content"] = completion_text = "This is a fake completion."
+
+    prompt_tokens = _estimate_tokens(prompt_text)
+    completion_tokens = _estimate_tokens(completion_text)
+
+    # Cache hits are reported in 128-token increments, as the real API does
+    cached_tokens = 0
+    if seen_prefixes is not None:
+        prefix = _static_prefix(body)
+        prefix_tokens = _estimate_tokens(prefix)
+        digest = hashlib.sha256(prefix.encode()).hexdigest()
+        if prefix_tokens >= cache_min_tokens and digest in seen_prefixes:
+            cached_tokens = min(prompt_tokens, prefix_tokens // 128 * 128)
+        seen_prefixes.add(digest)
+
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake-model"),
+        "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if body.get("tools") else "stop"}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens}
+        }
+    }
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run a fake OpenAI-compatible server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--spike-rate", type=float, default=0.0)
+    parser.add_argument("--spike-ms", type=float, default=3000.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--cache-min-tokens", type=int, default=1024)
+    parser.add_argument("--rpm-limit", type=float, default=0.0)
+    parser.add_argument("--tpm-limit", type=float, default=0.0)
+    parser.add_argument("--batch-delay-ms", type=float, default=1000.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = FakeLLMConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        spike_rate=args.spike_rate,
+        spike_ms=args.spike_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        cache_min_tokens=args.cache_min_tokens,
+        rpm_limit=args.rpm_limit,
+        tpm_limit=args.tpm_limit,
+        batch_delay_ms=args.batch_delay_ms,
+        seed=args.seed
+    )
+    uvicorn.run(create_fake_openai_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Fake Redis-protocol server for tests and local runs of the worker mode.
+
+Implements, in memory, the subset of commands the Redis task queue uses (strings with
+NX/XX and expiry, hashes and sorted sets) over real RESP on a TCP socket, so the queue is
+exercised through the same client code it uses against Redis.
+
+Run standalone:
+    python -m benchmarks.fake_redis --port 6380
+    TASK_QUEUE_URL=redis://127.0.0.1:6380/0 python -m src.worker
+"""
+import argparse
+import asyncio
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from src.worker.resp import RespError
+
+
+class FakeRedisStore:
+    """The keyspace: one dict per type, plus lazily applied expiry times."""
+
+    def __init__(self):
+        self.strings: Dict[str, str] = {}
+        self.hashes: Dict[str, Dict[str, str]] = {}
+        self.zsets: Dict[str, Dict[str, float]] = {}
+        self.expires: Dict[str, float] = {}
+        self.commands_served = 0
+
+    def _expire_if_due(self, key: str) -> None:
+        if key in self.expires and self.expires[key] <= time.time():
+            self._delete(key)
+
+    def _delete(self, key: str) -> int:
+        self.expires.pop(key, None)
+        return sum(1 for space in (self.strings, self.hashes, self.zsets) if space.pop(key, None) is not None)
+
+    def execute(self, args: List[str]) -> Any:
+        self.commands_served += 1
+        command, args = args[0].upper(), args[1:]
+        handler = getattr(self, f"cmd_{command.lower()}", None)
+        if handler is None:
+            raise RespError(f"ERR unknown command '{command}'")
+        for key in args[:1]:
+            self._expire_if_due(key)
+        return handler(*args)
+
+    # --- Connection ---
+    def cmd_ping(self, *args):
+        return args[0] if args else "PONG"
+
+    def cmd_auth(self, *args):
+        return "OK"
+
+    def cmd_select(self, db):
+        return "OK"
+
+    def cmd_flushall(self):
+        self.__init__()
+        return "OK"
+
+    # --- Keys and strings ---
+    def cmd_get(self, key):
+        return self.strings.get(key)
+
+    def cmd_set(self, key, value, *options):
+        options = [option.upper() for option in options]
+        exists = key in self.strings
+        if ("NX" in options and exists) or ("XX" in options and not exists):
+            return None
+        self.strings[key] = value
+        self.expires.pop(key, None)
+        for unit, scale in (("PX", 0.001), ("EX", 1.0)):
+            if unit in options:
+                self.expires[key] = time.time() + float(options[options.index(unit) + 1]) * scale
+        return "OK"
+
+    def cmd_del(self, *keys):
+        return sum(self._delete(key) for key in keys)
+
+    def cmd_expire(self, key, seconds):
+        if not any(key in space for space in (self.strings, self.hashes, self.zsets)):
+            return 0
+        self.expires[key] = time.time() + float(seconds)
+        return 1
+
+    # --- Hashes ---
+    def cmd_hset(self, key, *pairs):
+        fields = self.hashes.setdefault(key, {})
+        added = sum(1 for field in pairs[::2] if field not in fields)
+        fields.update(zip(pairs[::2], pairs[1::2]))
+        return added
+
+    def cmd_hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    def cmd_hgetall(self, key):
+        return [item for pair in self.hashes.get(key, {}).items() for item in pair]
+
+    def cmd_hincrby(self, key, field, amount):
+        fields = self.hashes.setdefault(key, {})
+        value = int(fields.get(field, 0)) + int(amount)
+        fields[field] = str(value)
+        return value
+
+    # --- Sorted sets ---
+    def cmd_zadd(self, key, *pairs):
+        members = self.zsets.setdefault(key, {})
+        added = sum(1 for member in pairs[1::2] if member not in members)
+        for score, member in zip(pairs[::2], pairs[1::2]):
+            members[member] = float(score)
+        return added
+
+    def cmd_zrem(self, key, *members):
+        zset = self.zsets.get(key, {})
+        return sum(1 for member in members if zset.pop(member, None) is not None)
+
+    def cmd_zcard(self, key):
+        return len(self.zsets.get(key, {}))
+
+    def cmd_zrangebyscore(self, key, low, high, *options):
+        low, high = float(low), float(high)
+        items = sorted((score, member) for member, score in self.zsets.get(key, {}).items() if low <= score <= high)
+        members = [member for _, member in items]
+        if options and options[0].upper() == "LIMIT":
+            offset, count = int(options[1]), int(options[2])
+            members = members[offset:offset + count]
+        return members
+
+
+def encode_reply(value: Any) -> bytes:
+    if isinstance(value, RespError):
+        return f"-{value}\r\n".encode()
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, int):
+        return f":{value}\r\n".encode()
+    if isinstance(value, list):
+        return f"*{len(value)}\r\n".encode() + b"".join(encode_reply(item) for item in value)
+    if value == "OK" or value == "PONG":
+        return f"+{value}\r\n".encode()
+    data = str(value).encode()
+    return b"$%d\r\n%s\r\n" % (len(data), data)
+
+
+async def _read_command(reader: asyncio.StreamReader) -> Optional[List[str]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    count = int(line[1:-2])
+    args = []
+    for _ in range(count):
+        length = int((await reader.readline())[1:-2])
+        args.append((await reader.readexactly(length + 2))[:-2].decode())
+    return args
+
+
+class FakeRedisServer:
+    """
+    Serves a `FakeRedisStore` over TCP. `start()` runs it on a background thread, for
+    synchronous tests; `serve()` runs it on the current event loop.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.store = FakeRedisStore()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while (args := await _read_command(reader)) is not None:
+                try:
+                    reply = self.store.execute(args)
+                except RespError as e:
+                    reply = e
+                except (TypeError, ValueError) as e:
+                    reply = RespError(f"ERR {e}")
+                writer.write(encode_reply(reply))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _start_server(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve(self) -> None:
+        await self._start_server()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start(self) -> "FakeRedisServer":
+        ready = threading.Event()
+
+        def run() -> None:
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self._start_server())
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="fake-redis", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+    @property
+    def url(self) -> str:
+        return f"redis://{self.host}:{self.port}/0"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a fake Redis-protocol server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6380)
+    args = parser.parse_args()
+    asyncio.run(FakeRedisServer(args.host, args.port).serve())
+
+
+if __name__ == "__main__":
+    main()
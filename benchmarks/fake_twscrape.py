@@ -0,0 +1,73 @@
+"""
+Fake twscrape backend that serves synthetic users and tweets with configurable latency.
+"""
+import asyncio
+import random
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import AsyncIterator
+
+_TOPICS = [
+    "shipping a new release of our python library",
+    "training for the city marathon this spring",
+    "the best sourdough recipe I have tried so far",
+    "why interest rates matter for startups",
+    "a great documentary about deep sea creatures",
+    "our team retro and lessons on remote work",
+    "weekend hiking trip in the mountains",
+    "the new album everyone keeps talking about"
+]
+_SUFFIXES = ["", " Thoughts?", " \U0001F680\U0001F680\U0001F680\U0001F680", " https://t.co/abc123", " #buildinpublic"]
+
+
+@dataclass
+class FakeTwscrapeConfig:
+    """Latency profile of the fake twscrape backend."""
+    latency_ms: float = 150.0
+    jitter_ms: float = 30.0
+    per_tweet_ms: float = 2.0
+
+
+class FakeTwscrapeAPI:
+    """
+    Drop-in stand-in for `twscrape.API` covering the calls made by the data fetcher.
+
+    Users and tweets are generated deterministically from the username, and include
+    duplicates, links and emoji runs like real timelines.
+    """
+
+    def __init__(self, config: FakeTwscrapeConfig | None = None):
+        self.config = config or FakeTwscrapeConfig()
+
+    async def _delay(self, extra_ms: float = 0.0) -> None:
+        delay_ms = max(0.0, random.gauss(self.config.latency_ms, self.config.jitter_ms)) + extra_ms
+        await asyncio.sleep(delay_ms / 1000)
+
+    async def user_by_login(self, username: str):
+        await self._delay()
+        return SimpleNamespace(
+            id=zlib.crc32(username.encode()),
+            username=username,
+            rawDescription=f"{username} writes about tech, running and food.",
+            profileImageUrl=f"https://pbs.twimg.com/profile_images/{username}_normal.jpg",
+            displayname=username.title()
+        )
+
+    async def user_tweets(self, user_id: int, limit: int = 20) -> AsyncIterator[SimpleNamespace]:
+        await self._delay(self.config.per_tweet_ms * limit)
+        rng = random.Random(user_id)
+        now = datetime.now(timezone.utc)
+        for i in range(limit):
+            text = f"Thinking about {rng.choice(_TOPICS)}.{rng.choice(_SUFFIXES)}"
+            yield SimpleNamespace(
+                id=user_id * 1000 + i,
+                rawContent=text,
+                date=now - timedelta(hours=6 * i)
+            )
+
+    async def followers(self, user_id: int, limit: int = 20) -> AsyncIterator[SimpleNamespace]:
+        await self._delay(self.config.per_tweet_ms * limit)
+        for i in range(limit):
+            yield SimpleNamespace(id=user_id * 1000 + i, username=f"follower_{user_id % 10000}_{i}")
\ No newline at end of file
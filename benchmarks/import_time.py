@@ -0,0 +1,107 @@
+"""
+Cold-start import benchmark for the API and the Streamlit frontend.
+
+Each target is imported in a fresh interpreter several times; the median wall time
+and the slowest modules (from `python -X importtime`) are reported and written to
+benchmarks/results/ like the load test results.
+
+    python -m benchmarks.import_time --runs 5
+    python -m benchmarks.import_time --max-seconds 1.5   # exit 1 if a target is slower
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+from benchmarks.load_test import PROJECT_ROOT, RESULTS_DIR, _git_commit, percentile
+
+# The Streamlit page renders on import, so its modules are imported instead of app.py itself
+TARGETS = {
+    "api": ["src.api.main"],
+    "frontend": ["streamlit", "src.frontend.api", "src.frontend.components", "src.frontend.visualizations"]
+}
+
+_TIMER = "import time as _t; _s = _t.perf_counter(); {imports}; print(_t.perf_counter() - _s)"
+
+
+def _clean_env() -> Dict[str, str]:
+    """Environment without credentials, to check that imports need no configuration."""
+    return {k: v for k, v in os.environ.items() if k not in ("OPENAI_API_KEY", "LANGFUSE_PUBLIC_KEY", "LANGFUSE_SECRET_KEY")}
+
+
+def time_import(modules: List[str]) -> float:
+    """Imports the modules in a fresh interpreter and returns the elapsed seconds."""
+    code = _TIMER.format(imports="; ".join(f"import {module}" for module in modules))
+    output = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", code],
+        cwd=PROJECT_ROOT, env=_clean_env(), capture_output=True, text=True, check=True
+    )
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def slowest_modules(modules: List[str], top: int = 10) -> List[Dict[str, Any]]:
+    """Returns the modules with the largest self import time, from `-X importtime`."""
+    output = subprocess.run(
+        [sys.executable, "-W", "ignore", "-X", "importtime", "-c", "; ".join(f"import {m}" for m in modules)],
+        cwd=PROJECT_ROOT, env=_clean_env(), capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in output.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append({"module": name, "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+    return sorted(rows, key=lambda row: -row["self_ms"])[:top]
+
+
+def run_import_benchmark(runs: int) -> Dict[str, Any]:
+    """Measures every target and returns the result document."""
+    targets = {}
+    for name, modules in TARGETS.items():
+        samples = [time_import(modules) * 1000 for _ in range(runs)]
+        targets[name] = {
+            "modules": modules,
+            "median_ms": round(percentile(samples, 50), 2),
+            "max_ms": round(max(samples), 2),
+            "slowest_modules": slowest_modules(modules)
+        }
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "runs": runs,
+        "targets": targets
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure cold-start import time.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=None, help="Fail if a target's median exceeds this")
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    result = run_import_benchmark(args.runs)
+    output = args.output
+    if output is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = RESULTS_DIR / f"import_{stamp}_{result['git_commit'] or 'nogit'}.json"
+    output.write_text(json.dumps(result, indent=2))
+
+    too_slow = False
+    for name, target in result["targets"].items():
+        print(f"{name:<10} median={target['median_ms']:.0f} ms  max={target['max_ms']:.0f} ms")
+        for row in target["slowest_modules"][:5]:
+            print(f"    {row['module']:<50} {row['self_ms']:>8.1f} ms self")
+        too_slow |= args.max_seconds is not None and target["median_ms"] > args.max_seconds * 1000
+    print(f"Results written to {output}")
+    sys.exit(1 if too_slow else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+End-to-end load test of the analysis API against fake X and LLM backends.
+
+Starts the fake OpenAI server and the API (with a fake twscrape backend) as
+subprocesses, drives `/analyze` at a fixed concurrency and records latency
+percentiles, throughput and the per-node time breakdown scraped from `/metrics`.
+Results are written as JSON to benchmarks/results/ so runs can be compared across
+commits with `python -m benchmarks.compare`.
+
+    python -m benchmarks.load_test --requests 200 --concurrency 16 --llm-latency-ms 300
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+import httpx
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+_METRIC_LINE_RE = re.compile(r'^graph_node_duration_seconds_(sum|count)\{node="([^"]+)"\} (\S+)$')
+_COUNTER_LINE_RE = re.compile(r'^(llm_\w+_total)(?:\{[^}]*\})? (\S+)$')
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """
+    Returns the q-th percentile (0-100) using linear interpolation between closest ranks.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def parse_node_metrics(metrics_text: str) -> Dict[str, Dict[str, float]]:
+    """Extracts per-node duration sums and counts from a /metrics scrape."""
+    nodes: Dict[str, Dict[str, float]] = {}
+    for line in metrics_text.splitlines():
+        match = _METRIC_LINE_RE.match(line)
+        if match:
+            kind, node, value = match.groups()
+            nodes.setdefault(node, {"sum": 0.0, "count": 0.0})[kind] = float(value)
+    return nodes
+
+
+def parse_llm_counters(metrics_text: str) -> Dict[str, float]:
+    """Sums the LLM counters (retries, hedges, 429s, ...) over all labels."""
+    counters: Dict[str, float] = {}
+    for line in metrics_text.splitlines():
+        match = _COUNTER_LINE_RE.match(line)
+        if match:
+            counters[match.group(1)] = counters.get(match.group(1), 0.0) + float(match.group(2))
+    return counters
+
+
+def _format_counter(value: float) -> str:
+    """Formats a counter: counts as integers, amounts such as the USD cost with decimals."""
+    return f"{value:.0f}" if value.is_integer() else f"{value:.4f}"
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _wait_until_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Service at {url} did not become ready within {timeout}s")
+
+
+def _start_process(args: List[str], env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", *args], cwd=PROJECT_ROOT, env=env)
+
+
+async def _drive_load(base_url: str, total_requests: int, concurrency: int, tweet_count: int) -> Dict[str, Any]:
+    """Sends `total_requests` analyses with at most `concurrency` in flight."""
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(total_requests):
+        queue.put_nowait(f"bench_user_{i % 50}")
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        while True:
+            try:
+                username = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            try:
+                response = await client.post("/analyze", json={"username": username, "tweet_count": tweet_count})
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=300.0, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {"latencies_ms": latencies, "statuses": statuses, "elapsed_s": elapsed}
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Runs one benchmark and returns the result document.
+    """
+    llm_url = f"http://127.0.0.1:{args.llm_port}"
+    api_url = f"http://127.0.0.1:{args.api_port}"
+
+    env = {k: v for k, v in os.environ.items() if not k.startswith("LANGFUSE_")}
+    env.update({
+        "OPENAI_API_KEY": "fake-key",
+        "OPENAI_BASE_URL": f"{llm_url}/v1",
+        "OPENAI_API_BASE": f"{llm_url}/v1",
+        "LOG_LEVEL": "WARNING",
+        **dict(item.split("=", 1) for item in args.api_env)
+    })
+
+    processes = [
+        _start_process([
+            "benchmarks.fake_openai", "--port", str(args.llm_port),
+            "--latency-ms", str(args.llm_latency_ms), "--jitter-ms", str(args.llm_jitter_ms),
+            "--spike-rate", str(args.llm_spike_rate), "--spike-ms", str(args.llm_spike_ms),
+            "--error-rate", str(args.llm_error_rate), "--seed", str(args.seed),
+            "--rpm-limit", str(args.llm_rpm_limit), "--tpm-limit", str(args.llm_tpm_limit)
+        ], env),
+        _start_process([
+            "benchmarks.serve", "--port", str(args.api_port),
+            "--twscrape-latency-ms", str(args.twscrape_latency_ms),
+            *(["--client-rate-limit"] if args.client_rate_limit else [])
+        ], env)
+    ]
+    try:
+        _wait_until_ready(f"{llm_url}/health")
+        _wait_until_ready(f"{api_url}/metrics")
+
+        metrics_before = httpx.get(f"{api_url}/metrics").text
+        load = asyncio.run(_drive_load(api_url, args.requests, args.concurrency, args.tweet_count))
+        metrics_after = httpx.get(f"{api_url}/metrics").text
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+    before, after = parse_node_metrics(metrics_before), parse_node_metrics(metrics_after)
+    nodes = {}
+    for node, totals in after.items():
+        count = totals["count"] - before.get(node, {}).get("count", 0)
+        total = totals["sum"] - before.get(node, {}).get("sum", 0)
+        if count:
+            nodes[node] = {"count": int(count), "mean_ms": round(total / count * 1000, 2)}
+
+    counters_before = parse_llm_counters(metrics_before)
+    counters = {
+        name: value - counters_before.get(name, 0.0)
+        for name, value in parse_llm_counters(metrics_after).items()
+    }
+
+    latencies = load["latencies_ms"]
+    successes = load["statuses"].get("200", 0)
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "label": args.label,
+        "config": {
+            key: value for key, value in vars(args).items()
+            if key not in ("output", "label")
+        },
+        "requests": len(latencies),
+        "statuses": load["statuses"],
+        "error_rate": round(1 - successes / len(latencies), 4) if latencies else 0.0,
+        "throughput_rps": round(len(latencies) / load["elapsed_s"], 3),
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "max": round(max(latencies), 2) if latencies else 0.0
+        },
+        "nodes": nodes,
+        "llm_counters": counters
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Load test the analysis API against fake backends.")
+    parser.add_argument("--requests", type=int, default=100, help="Total /analyze requests to send")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at once")
+    parser.add_argument("--tweet-count", type=int, default=20)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50.0)
+    parser.add_argument("--llm-spike-rate", type=float, default=0.0)
+    parser.add_argument("--llm-spike-ms", type=float, default=3000.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-rpm-limit", type=float, default=0.0, help="Requests/minute enforced by the fake LLM")
+    parser.add_argument("--llm-tpm-limit", type=float, default=0.0, help="Tokens/minute enforced by the fake LLM")
+    parser.add_argument("--twscrape-latency-ms", type=float, default=150.0)
+    parser.add_argument("--client-rate-limit", action="store_true",
+                        help="Keep the API's own LLM_RPM_LIMIT/LLM_TPM_LIMIT limiter on (off by default)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--llm-port", type=int, default=9100)
+    parser.add_argument("--api-port", type=int, default=8100)
+    parser.add_argument("--api-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment variable for the API process (repeatable)")
+    parser.add_argument("--label", default=None, help="Free-form label stored with the result")
+    parser.add_argument("--output", type=Path, default=None, help="Result file (default: benchmarks/results/<time>_<commit>.json)")
+    return parser
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    result = run_benchmark(args)
+
+    output = args.output
+    if output is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = RESULTS_DIR / f"{stamp}_{result['git_commit'] or 'nogit'}.json"
+    output.write_text(json.dumps(result, indent=2))
+
+    latency = result["latency_ms"]
+    print(f"{result['requests']} requests, {result['throughput_rps']} req/s, errors={result['error_rate']:.2%}")
+    print(f"latency ms: p50={latency['p50']} p95={latency['p95']} p99={latency['p99']} max={latency['max']}")
+    for node, stats in sorted(result["nodes"].items(), key=lambda item: -item[1]["mean_ms"]):
+        print(f"  {node:<22} {stats['mean_ms']:>9.2f} ms  (n={stats['count']})")
+    for name, value in sorted(result["llm_counters"].items()):
+        if value:
+            print(f"  {name:<40} {_format_counter(value):>12}")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
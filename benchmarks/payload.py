@@ -0,0 +1,134 @@
+"""
+Payload size and serialization time of `/analyze` responses.
+
+Synthetic responses are built for profiles of 50 and 1,000 tweets. Like real ones, they
+quote tweets as category evidence. Each is encoded every way the API can answer:
+
+- the previous FastAPI default (jsonable_encoder + json.dumps),
+- orjson,
+- msgpack,
+- orjson with a `fields` selection,
+- orjson compressed with gzip or brotli.
+
+The size and the median encode time of each are reported and written to
+benchmarks/results/.
+
+    python -m benchmarks.payload --repeat 50
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+
+from benchmarks.fake_twscrape import _SUFFIXES, _TOPICS
+from benchmarks.load_test import RESULTS_DIR, _git_commit, percentile
+from src.api import encoding
+from src.api.models import AnalysisResponse
+from src.pipeline.constants import CATEGORIES
+
+TWEET_COUNTS = (50, 1000)
+SELECTED_FIELDS = {"username", "category_scores", "mbti_result", "top_keywords", "sentiment_scaled_score"}
+
+
+def synthetic_response(tweet_count: int, seed: int = 0) -> AnalysisResponse:
+    """Builds a response shaped like a real analysis of `tweet_count` tweets."""
+    rng = random.Random(seed)
+    tweets = [f"Thinking about {rng.choice(_TOPICS)}.{rng.choice(_SUFFIXES)} #{i}" for i in range(tweet_count)]
+    category_scores = {
+        category: {"score": round(rng.uniform(0, 100), 1), "evidence": rng.sample(tweets, min(5, len(tweets)))}
+        for category in rng.sample(CATEGORIES, 8)
+    }
+    return AnalysisResponse(
+        username="benchmark_user",
+        user_bio="Writes about tech, running and food.",
+        user_display_name="Benchmark User",
+        user_profile_image_url="https://pbs.twimg.com/profile_images/benchmark_user_normal.jpg",
+        recent_tweets=tweets,
+        category_scores=category_scores,
+        mbti_result={"mbti_code": "INTJ", "mbti_name": "Architect", "explanation": "Plans ahead and ships."},
+        top_keywords=["python", "marathon", "sourdough", "startups", "hiking"],
+        sentiment_scaled_score=62.5,
+        preprocessing_stats={"input": tweet_count, "kept": tweet_count},
+        sampling_stats={"candidates": tweet_count, "selected": min(tweet_count, 40)},
+        usage={"total": {"llm_calls": 4, "prompt_tokens": 6000, "completion_tokens": 900, "total_tokens": 6900, "cost_usd": 0.02}}
+    )
+
+
+def _encoders(response: AnalysisResponse) -> Dict[str, Callable[[], bytes]]:
+    def default() -> bytes:
+        return json.dumps(jsonable_encoder(response)).encode()
+
+    def orjson_body() -> bytes:
+        return encoding.serialize(response.model_dump(), encoding.JSON_MEDIA_TYPE)
+
+    def selected() -> bytes:
+        payload = {key: value for key, value in response.model_dump().items() if key in SELECTED_FIELDS}
+        return encoding.serialize(payload, encoding.JSON_MEDIA_TYPE)
+
+    encoders = {"default_json": default, "orjson": orjson_body, "orjson_fields": selected}
+    if encoding.ormsgpack is not None:
+        encoders["msgpack"] = lambda: encoding.serialize(response.model_dump(), encoding.MSGPACK_MEDIA_TYPE)
+    encoders["orjson_gzip"] = lambda: encoding.compress(orjson_body(), "gzip")
+    if encoding.brotli is not None:
+        encoders["orjson_br"] = lambda: encoding.compress(orjson_body(), "br")
+    return encoders
+
+
+def measure(encode: Callable[[], bytes], repeat: int) -> Dict[str, Any]:
+    """Encodes `repeat` times and returns the body size and median encode time."""
+    samples: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = encode()
+        samples.append((time.perf_counter() - started) * 1e6)
+    return {"bytes": len(body), "median_us": round(percentile(samples, 50), 1)}
+
+
+def run_payload_benchmark(repeat: int, tweet_counts=TWEET_COUNTS) -> Dict[str, Any]:
+    """Measures every encoding for every profile size and returns the result document."""
+    profiles = {}
+    for tweet_count in tweet_counts:
+        response = synthetic_response(tweet_count)
+        profiles[str(tweet_count)] = {name: measure(encode, repeat) for name, encode in _encoders(response).items()}
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "repeat": repeat,
+        "profiles": profiles
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure response payload sizes and serialization time.")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    result = run_payload_benchmark(args.repeat)
+    output = args.output
+    if output is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = RESULTS_DIR / f"payload_{stamp}_{result['git_commit'] or 'nogit'}.json"
+    output.write_text(json.dumps(result, indent=2))
+
+    for tweet_count, encodings in result["profiles"].items():
+        baseline = encodings["default_json"]
+        print(f"{tweet_count} tweets")
+        for name, row in encodings.items():
+            print(
+                f"    {name:<14} {row['bytes']:>9,d} B ({row['bytes'] / baseline['bytes']:>6.1%})"
+                f"  {row['median_us']:>9.1f} us ({row['median_us'] / baseline['median_us']:>6.1%})"
+            )
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
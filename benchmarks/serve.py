@@ -0,0 +1,55 @@
+"""
+Runs `src.api.main:app` with the twscrape client replaced by `FakeTwscrapeAPI`.
+
+Point the OpenAI client at a fake server through OPENAI_BASE_URL before starting, e.g.
+    OPENAI_API_KEY=fake OPENAI_BASE_URL=http://127.0.0.1:9100/v1 \
+        python -m benchmarks.serve --port 8100
+
+The API's client-side LLM rate limiter is turned off unless `--client-rate-limit` is
+given: its production limits (LLM_TPM_LIMIT) would otherwise throttle the benchmark
+instead of the fake backend's `--rpm-limit`/`--tpm-limit`.
+"""
+import argparse
+import os
+
+import uvicorn
+
+from benchmarks.fake_twscrape import FakeTwscrapeAPI, FakeTwscrapeConfig
+
+
+def install_fake_twscrape(config: FakeTwscrapeConfig) -> None:
+    """Replaces the data fetcher's twscrape client factory with the fake backend."""
+    from src.data_fetcher import fetcher
+
+    fake_api = FakeTwscrapeAPI(config)
+
+    async def get_fake_api_client():
+        return fake_api
+
+    fetcher.get_api_client = get_fake_api_client
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the API against a fake twscrape backend.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--twscrape-latency-ms", type=float, default=150.0)
+    parser.add_argument("--twscrape-jitter-ms", type=float, default=30.0)
+    parser.add_argument("--client-rate-limit", action="store_true",
+                        help="Keep the LLM_RPM_LIMIT/LLM_TPM_LIMIT limiter on")
+    args = parser.parse_args()
+
+    if not args.client_rate_limit:
+        # Read when src.pipeline is imported, so this must come first
+        os.environ["LLM_RPM_LIMIT"] = "0"
+        os.environ["LLM_TPM_LIMIT"] = "0"
+
+    install_fake_twscrape(FakeTwscrapeConfig(latency_ms=args.twscrape_latency_ms, jitter_ms=args.twscrape_jitter_ms))
+
+    from src.api.main import app
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Search latency of the similar-profile index at scale.
+
+Synthetic profiles with a few random category scores, a sentiment and an MBTI type are
+inserted into a fresh index. The benchmark then reports insert throughput, the latency
+of single inserts into the full index and the latency percentiles of top-k searches.
+
+    python -m benchmarks.similarity --profiles 1000000
+"""
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+from benchmarks.load_test import RESULTS_DIR, _git_commit, percentile
+from src.pipeline.constants import CATEGORIES, MBTI_TYPES
+from src.similarity.index import SimilarityIndex, profile_vector
+
+INSERT_CHUNK = 10_000
+
+
+def synthetic_profile(rng: random.Random, username: str) -> Dict[str, Any]:
+    return {
+        "username": username,
+        "category_scores": {category: {"score": rng.uniform(20, 100)} for category in rng.sample(CATEGORIES, 6)},
+        "sentiment_scaled_score": rng.uniform(0, 100),
+        "mbti_result": {"mbti_code": rng.choice(sorted(MBTI_TYPES))}
+    }
+
+
+def run_similarity_benchmark(profiles: int, queries: int = 50, k: int = 10, seed: int = 0) -> Dict[str, Any]:
+    """Fills an index with `profiles` profiles and times inserts and searches."""
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as root:
+        index = SimilarityIndex(root)
+        started = time.perf_counter()
+        for offset in range(0, profiles, INSERT_CHUNK):
+            chunk = [synthetic_profile(rng, f"user{i}") for i in range(offset, min(offset + INSERT_CHUNK, profiles))]
+            index.add((profile["username"], profile_vector(profile)) for profile in chunk)
+        bulk_seconds = time.perf_counter() - started
+
+        insert_ms: List[float] = []
+        for i in range(queries):
+            profile = synthetic_profile(rng, f"extra{i}")
+            started = time.perf_counter()
+            index.add([(profile["username"], profile_vector(profile))])
+            insert_ms.append((time.perf_counter() - started) * 1000)
+
+        search_ms: List[float] = []
+        for _ in range(queries):
+            username = f"user{rng.randrange(profiles)}"
+            started = time.perf_counter()
+            index.search(username, k)
+            search_ms.append((time.perf_counter() - started) * 1000)
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "profiles": profiles,
+        "k": k,
+        "bulk_insert_per_second": round(profiles / bulk_seconds),
+        "insert_ms": {"p50": round(percentile(insert_ms, 50), 3), "p99": round(percentile(insert_ms, 99), 3)},
+        "search_ms": {"p50": round(percentile(search_ms, 50), 3), "p99": round(percentile(search_ms, 99), 3)}
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure similar-profile search latency.")
+    parser.add_argument("--profiles", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    result = run_similarity_benchmark(args.profiles, args.queries)
+    output = args.output
+    if output is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = RESULTS_DIR / f"similarity_{stamp}_{result['git_commit'] or 'nogit'}.json"
+    output.write_text(json.dumps(result, indent=2))
+
+    print(f"{result['profiles']:,d} profiles, bulk insert {result['bulk_insert_per_second']:,d}/s")
+    print(f"    insert p50={result['insert_ms']['p50']} ms p99={result['insert_ms']['p99']} ms")
+    print(f"    top-{result['k']} search p50={result['search_ms']['p50']} ms p99={result['search_ms']['p99']} ms")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,165 @@
+"""
+Response encoding for the analysis endpoints: field selection, content negotiation and
+compression.
+
+- `fields=username,mbti_result` returns only the listed top-level fields of the
+  response. `username` is always kept.
+- `Accept: application/msgpack` returns MessagePack instead of JSON. This needs the
+  `ormsgpack` package (in requirements.txt). Without it, clients that also accept JSON
+  get JSON, and clients that accept only msgpack get 406.
+- JSON is serialized with `orjson` when it is installed, and with the standard library
+  otherwise.
+- Bodies of at least COMPRESSION_MIN_BYTES are compressed with brotli or gzip, whichever
+  the client accepts and prefers. brotli needs the `brotli` package (in requirements.txt);
+  without it only gzip is offered.
+
+`available_encodings()` reports which of these are active in the running process.
+"""
+import gzip
+import json
+from typing import Any, Dict, Iterable, Optional, Set
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+
+from src.pipeline.constants import BROTLI_QUALITY, COMPRESSION_MIN_BYTES, GZIP_LEVEL
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ormsgpack
+except ImportError:
+    ormsgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+_MSGPACK_ALIASES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+
+
+def _accepted(header: Optional[str]) -> Dict[str, float]:
+    """Parses an Accept or Accept-Encoding header into {value: q}."""
+    accepted = {}
+    for part in (header or "").split(","):
+        value, *params = (piece.strip() for piece in part.split(";"))
+        if not value:
+            continue
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        accepted[value.lower()] = quality
+    return accepted
+
+
+def parse_fields(fields: Optional[str], allowed: Iterable[str]) -> Optional[Set[str]]:
+    """
+    Parses a comma-separated field selector.
+
+    Returns:
+        The selected fields (always including "username"), or None to return every field
+
+    Raises:
+        HTTPException: 422 if a field does not exist
+    """
+    if not fields:
+        return None
+    selected = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = selected - set(allowed)
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return selected | {"username"}
+
+
+def available_encodings() -> Dict[str, list]:
+    """Returns the response media types and content encodings this process can produce."""
+    return {
+        "media_types": [JSON_MEDIA_TYPE] + ([MSGPACK_MEDIA_TYPE] if ormsgpack is not None else []),
+        "content_encodings": (["br"] if brotli is not None else []) + ["gzip"]
+    }
+
+
+def negotiate_media_type(accept: Optional[str]) -> str:
+    """
+    Returns msgpack if the client prefers it (and ormsgpack is installed), otherwise JSON.
+
+    Raises:
+        HTTPException: 406 if the client accepts only msgpack and ormsgpack is not installed
+    """
+    accepted = _accepted(accept)
+    msgpack_quality = max((accepted.get(alias, 0.0) for alias in _MSGPACK_ALIASES), default=0.0)
+    json_quality = max(accepted.get(JSON_MEDIA_TYPE, 0.0), accepted.get("*/*", 0.0), 0.0 if accepted else 1.0)
+    if msgpack_quality > 0 and msgpack_quality >= json_quality:
+        if ormsgpack is not None:
+            return MSGPACK_MEDIA_TYPE
+        if json_quality <= 0:
+            raise HTTPException(status_code=406, detail="MessagePack responses are not available: ormsgpack is not installed.")
+    return JSON_MEDIA_TYPE
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Returns "br", "gzip" or None, by the client's preference (brotli wins ties)."""
+    accepted = _accepted(accept_encoding)
+    supported = ("br", "gzip") if brotli is not None else ("gzip",)
+    qualities = {encoding: accepted.get(encoding, accepted.get("*", 0.0)) for encoding in supported}
+    best = max(supported, key=qualities.get)
+    return best if qualities[best] > 0 else None
+
+
+def serialize(payload: Any, media_type: str) -> bytes:
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return ormsgpack.packb(payload)
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def encode_response(
+    request: Request,
+    payload: Dict[str, Any],
+    fields: Optional[Set[str]] = None,
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None,
+    media_type: Optional[str] = None
+) -> Response:
+    """
+    Encodes a response body as the client asked for.
+
+    Args:
+        request: The request, for its Accept and Accept-Encoding headers
+        payload: JSON-compatible response body
+        fields: Top-level fields to keep (None keeps all)
+        status_code: Response status
+        headers: Extra response headers
+        media_type: The negotiated media type, if the caller already negotiated it
+
+    Returns:
+        The encoded response
+    """
+    if fields is not None:
+        payload = {key: value for key, value in payload.items() if key in fields}
+    media_type = media_type or negotiate_media_type(request.headers.get("accept"))
+    body = serialize(payload, media_type)
+
+    headers = {**(headers or {}), "Vary": "Accept, Accept-Encoding"}
+    encoding = negotiate_encoding(request.headers.get("accept-encoding")) if len(body) >= COMPRESSION_MIN_BYTES else None
+    if encoding is not None:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(body, status_code=status_code, media_type=media_type, headers=headers)
@@ -0,0 +1,297 @@
+"""
+Profile image proxy: avatars are fetched once, resized to the size the frontend shows
+and kept as thumbnails in a bounded on-disk LRU cache.
+
+- Only https URLs on IMAGE_ALLOWED_HOSTS are fetched, redirects are not followed and
+  originals larger than IMAGE_MAX_SOURCE_BYTES or IMAGE_MAX_SOURCE_PIXELS are refused,
+  so the proxy cannot be used to reach other hosts or to exhaust memory.
+- X serves every avatar in several sizes, picked by a suffix of the URL (`_normal` is
+  48px). The smallest variant at least as large as the thumbnail is fetched, which keeps
+  downloads small and avoids upscaling a 48px image.
+- Thumbnails are stored under the SHA-256 of their source URL and size. They are served
+  with the SHA-256 of their content as ETag and a long-lived immutable Cache-Control, as
+  a changed avatar gets a new URL.
+- The cache is bounded by IMAGE_CACHE_MAX_BYTES. Hits refresh a file's mtime and
+  eviction removes the least recently used files first, so API workers sharing the
+  directory also share one LRU order.
+- Concurrent requests for the same thumbnail wait for a single fetch.
+- Requests without a URL, or whose image cannot be fetched, get a generated placeholder
+  with a short cache lifetime.
+"""
+import asyncio
+import hashlib
+import io
+import os
+import re
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+from urllib.parse import urlparse
+
+import httpx
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+from PIL import Image, ImageDraw, ImageOps
+
+from src.observability.log import get_logger
+from src.observability.metrics import CACHE_REQUESTS
+from src.pipeline.constants import (
+    IMAGE_ALLOWED_HOSTS,
+    IMAGE_CACHE_DIR,
+    IMAGE_CACHE_MAX_AGE_SECONDS,
+    IMAGE_CACHE_MAX_BYTES,
+    IMAGE_FETCH_TIMEOUT_SECONDS,
+    IMAGE_JPEG_QUALITY,
+    IMAGE_MAX_SOURCE_BYTES,
+    IMAGE_MAX_SOURCE_PIXELS,
+)
+
+logger = get_logger(__name__)
+
+# Pillow refuses to open images above twice this before decoding them
+Image.MAX_IMAGE_PIXELS = IMAGE_MAX_SOURCE_PIXELS
+
+PLACEHOLDER_MAX_AGE_SECONDS = 300  # Failed fetches are retried after this long
+PLACEHOLDER_COLOR = (0, 122, 204)
+EVICTION_TARGET = 0.9  # Eviction frees space down to this fraction of the limit
+
+_X_AVATAR_VARIANTS = ((48, "_normal"), (73, "_bigger"), (200, "_200x200"), (400, "_400x400"))
+_X_AVATAR_SUFFIX = re.compile(r"_(?:mini|normal|bigger|200x200|400x400)(\.\w+)$")
+
+
+class Thumbnail(NamedTuple):
+    """A JPEG thumbnail and how long clients may cache it."""
+    content: bytes
+    max_age: int
+
+
+def validate_image_url(url: str) -> None:
+    """
+    Checks a URL may be fetched by the proxy.
+
+    Raises:
+        HTTPException: 400 if the URL is not https or its host is not allowed
+    """
+    parsed = urlparse(url)
+    if parsed.scheme != "https" or (parsed.hostname or "").lower() not in IMAGE_ALLOWED_HOSTS:
+        raise HTTPException(status_code=400, detail="Image URL is not on an allowed host.")
+
+
+def source_url(url: str, size: int) -> str:
+    """Rewrites an X avatar URL to the smallest variant that covers `size` pixels."""
+    match = _X_AVATAR_SUFFIX.search(url)
+    if match is None or urlparse(url).hostname != "pbs.twimg.com":
+        return url
+    suffix = next((suffix for edge, suffix in _X_AVATAR_VARIANTS if edge >= size), _X_AVATAR_VARIANTS[-1][1])
+    return url[:match.start()] + suffix + match.group(1)
+
+
+def render_thumbnail(source: bytes, size: int) -> bytes:
+    """
+    Crops an image to a centred square and resizes it to `size` pixels.
+
+    Args:
+        source: Encoded original image
+        size: Edge of the thumbnail in pixels
+
+    Returns:
+        The thumbnail as JPEG
+
+    Raises:
+        OSError: If the image cannot be decoded
+        Image.DecompressionBombError: If the image has more than IMAGE_MAX_SOURCE_PIXELS pixels
+    """
+    with Image.open(io.BytesIO(source)) as image:
+        # Pillow only warns between MAX_IMAGE_PIXELS and twice that
+        if image.width * image.height > IMAGE_MAX_SOURCE_PIXELS:
+            raise Image.DecompressionBombError(f"{image.width}x{image.height} pixels exceeds the limit")
+        # JPEGs decode straight to a reduced scale, much cheaper than a full decode
+        image.draft("RGB", (size, size))
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        thumbnail = ImageOps.fit(image.convert("RGB"), (size, size), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    thumbnail.save(buffer, "JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+@lru_cache(maxsize=16)
+def render_placeholder(size: int) -> bytes:
+    """Draws the generic avatar shown when there is no profile image."""
+    image = Image.new("RGB", (size, size), PLACEHOLDER_COLOR)
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((size * 0.34, size * 0.18, size * 0.66, size * 0.50), fill="white")
+    draw.ellipse((size * 0.18, size * 0.56, size * 0.82, size * 1.10), fill="white")
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=IMAGE_JPEG_QUALITY)
+    return buffer.getvalue()
+
+
+class ThumbnailCache:
+    """
+    Bounded on-disk LRU cache of thumbnails.
+
+    Args:
+        directory: Cache directory (created if missing)
+        max_bytes: Total size the thumbnails may occupy
+    """
+
+    def __init__(self, directory: Path | str, max_bytes: int = IMAGE_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+
+    @staticmethod
+    def key(url: str, size: int) -> str:
+        return hashlib.sha256(f"{url}\n{size}".encode()).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.jpg"
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Returns a cached thumbnail and marks it as recently used."""
+        path = self._path(key)
+        try:
+            content = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return content
+
+    def put(self, key: str, content: bytes) -> None:
+        """Stores a thumbnail, evicting the least recently used ones if the cache is full."""
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        # Written aside and renamed, so readers never see a partial file
+        temporary = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        temporary.write_bytes(content)
+        os.replace(temporary, path)
+        with self._lock:
+            self._size = self._scan()[1] if self._size is None else self._size + len(content)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _scan(self):
+        entries = []
+        for path in self.directory.glob("*/*.jpg"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries, sum(size for _, size, _ in entries)
+
+    def _evict(self) -> None:
+        # Rescanning also picks up what other processes sharing the directory have written
+        entries, total = self._scan()
+        evicted = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes * EVICTION_TARGET:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        self._size = total
+        logger.info("Evicted %d thumbnails", evicted, extra={"cache_bytes": total})
+
+
+async def fetch_image(url: str) -> bytes:
+    """
+    Downloads an image without following redirects.
+
+    Raises:
+        httpx.HTTPError: If the request fails or is not answered with 200
+        ValueError: If the image exceeds IMAGE_MAX_SOURCE_BYTES
+    """
+    async with httpx.AsyncClient(timeout=IMAGE_FETCH_TIMEOUT_SECONDS) as client:
+        async with client.stream("GET", url) as response:
+            if response.status_code != 200:
+                raise httpx.HTTPStatusError(f"HTTP {response.status_code}", request=response.request, response=response)
+            chunks = []
+            received = 0
+            async for chunk in response.aiter_bytes():
+                received += len(chunk)
+                if received > IMAGE_MAX_SOURCE_BYTES:
+                    raise ValueError(f"Image exceeds {IMAGE_MAX_SOURCE_BYTES} bytes")
+                chunks.append(chunk)
+    return b"".join(chunks)
+
+
+_pending: Dict[str, asyncio.Task] = {}
+
+
+async def _fetch_thumbnail(cache: ThumbnailCache, key: str, url: str, size: int) -> Thumbnail:
+    try:
+        source = await fetch_image(source_url(url, size))
+        content = await asyncio.to_thread(render_thumbnail, source, size)
+    except (httpx.HTTPError, ValueError, OSError, Image.DecompressionBombError) as e:
+        logger.warning("Could not fetch image %s: %s - %s", url, type(e).__name__, e)
+        return Thumbnail(render_placeholder(size), PLACEHOLDER_MAX_AGE_SECONDS)
+    await asyncio.to_thread(cache.put, key, content)
+    return Thumbnail(content, IMAGE_CACHE_MAX_AGE_SECONDS)
+
+
+async def get_thumbnail(url: Optional[str], size: int) -> Thumbnail:
+    """
+    Returns the thumbnail of an image, from the cache or freshly fetched.
+
+    Args:
+        url: Image URL, or None for the placeholder
+        size: Edge of the thumbnail in pixels
+
+    Raises:
+        HTTPException: 400 if the URL may not be fetched
+    """
+    if not url:
+        return Thumbnail(render_placeholder(size), IMAGE_CACHE_MAX_AGE_SECONDS)
+    validate_image_url(url)
+
+    cache = get_thumbnail_cache()
+    key = cache.key(url, size)
+    content = await asyncio.to_thread(cache.get, key)
+    CACHE_REQUESTS.inc("thumbnail", "hit" if content is not None else "miss")
+    if content is not None:
+        return Thumbnail(content, IMAGE_CACHE_MAX_AGE_SECONDS)
+
+    fetch = _pending.get(key)
+    if fetch is None:
+        fetch = asyncio.ensure_future(_fetch_thumbnail(cache, key, url, size))
+        _pending[key] = fetch
+        fetch.add_done_callback(lambda _: _pending.pop(key, None))
+    # Shielded so a client disconnecting does not cancel the fetch others are waiting on
+    return await asyncio.shield(fetch)
+
+
+def thumbnail_response(request: Request, thumbnail: Thumbnail) -> Response:
+    """Serves a thumbnail with caching headers, or 304 if the client's copy is current."""
+    etag = f'"{hashlib.sha256(thumbnail.content).hexdigest()[:32]}"'
+    cache_control = f"public, max-age={thumbnail.max_age}"
+    if thumbnail.max_age == IMAGE_CACHE_MAX_AGE_SECONDS:
+        cache_control += ", immutable"
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag in (request.headers.get("if-none-match") or ""):
+        return Response(status_code=304, headers=headers)
+    return Response(thumbnail.content, media_type="image/jpeg", headers=headers)
+
+
+_cache: Optional[ThumbnailCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_thumbnail_cache() -> ThumbnailCache:
+    """Returns the process-wide thumbnail cache in IMAGE_CACHE_DIR."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ThumbnailCache(IMAGE_CACHE_DIR)
+        return _cache
@@ -1,17 +1,39 @@
+import asyncio
+import os
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
+from src.observability.log import configure_logging, get_logger
+from src.pipeline import validate_config
+from src.pipeline.constants import WATCHLIST_RUN_IN_API
+from src.watchlist import WatchlistScheduler, get_watchlist_store
+from .encoding import available_encodings
+from .middleware import MetricsMiddleware, RequestContextMiddleware
 from .routes import router
-from .services import initialize_graph
+from .runtime import start_analysis_runtime, stop_analysis_runtime
+
+logger = get_logger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager for FastAPI app startup and shutdown events."""
-    print("Initializing SocialProfiler API...")
-    initialize_graph()
+    configure_logging()
+    logger.info("Initializing SocialProfiler API")
+    validate_config()
+    logger.info("Response encodings available", extra=available_encodings())
+    start_analysis_runtime()
+    # Each API process runs a scheduler; they share the watchlist's due entries between them
+    store = get_watchlist_store() if WATCHLIST_RUN_IN_API else None
+    stop_watchlist = asyncio.Event()
+    watchlist = asyncio.create_task(WatchlistScheduler(store).run(stop_watchlist)) if store is not None else None
     yield
+    if watchlist is not None:
+        stop_watchlist.set()
+        await watchlist
+    stop_analysis_runtime()
 
 app = FastAPI(
     title="SocialProfiler API",
@@ -29,8 +51,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(RequestContextMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(router)
 
 if __name__ == "__main__":
-    uvicorn.run("src.api.main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
+    # uvicorn loads .env before importing the app, which reads its settings on import
+    uvicorn.run(
+        "src.api.main:app", host="0.0.0.0", port=8000, reload=True,
+        env_file=".env" if os.path.exists(".env") else None
+    ) 
\ No newline at end of file
@@ -0,0 +1,80 @@
+import re
+import time
+import uuid
+
+from src.observability.log import request_id_var
+from src.observability.metrics import HTTP_IN_FLIGHT, HTTP_REQUESTS, HTTP_REQUEST_DURATION
+
+REQUEST_ID_HEADER = "x-request-id"
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request counts, in-flight requests and latency.
+
+    Requests are labelled with the matched route template (e.g. `/analyze`) rather than
+    the raw path to keep label cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            HTTP_REQUESTS.inc(method, path, str(status_code))
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, method, path)
+
+
+class RequestContextMiddleware:
+    """
+    Pure ASGI middleware assigning each request a correlation id.
+
+    A well-formed incoming `X-Request-ID` header is reused, otherwise a new id is
+    generated. The id is stored in the logging context for the duration of the
+    request and echoed back in the response headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope.get("headers") or []).get(REQUEST_ID_HEADER.encode(), b"").decode("latin-1")
+        request_id = incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER.encode(), request_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
@@ -1,10 +1,58 @@
+from datetime import datetime
 from pydantic import BaseModel, Field
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Literal, Optional
+
+from src.pipeline.constants import (
+    AUDIENCE_MAX_SAMPLE_SIZE,
+    AUDIENCE_SAMPLE_SIZE,
+    WATCHLIST_DEFAULT_INTERVAL_SECONDS,
+    WATCHLIST_MIN_INTERVAL_SECONDS
+)
 
 class AnalyzeRequest(BaseModel):
     """Request model for profile analysis."""
     username: str
     tweet_count: int = Field(10, ge=1, le=50, description="Number of tweets to analyze (1-50)")
+    priority: Literal["interactive", "batch", "background"] = Field(
+        "interactive",
+        description="Scheduling class: interactive (a user is waiting), batch (bulk jobs) or background (refreshes)"
+    )
+
+class TokenUsage(BaseModel):
+    """Token, latency and cost accounting for a set of LLM calls."""
+    llm_calls: int = 0
+    llm_errors: int = 0
+    prompt_tokens: int = 0
+    cached_prompt_tokens: int = 0  # Prompt tokens served from the provider's prefix cache
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    latency_ms: float = 0.0
+    cost_usd: float = 0.0
+
+class UsageSummary(BaseModel):
+    """Per-request LLM usage, in total and broken down by graph node."""
+    total: TokenUsage
+    nodes: Dict[str, TokenUsage] = Field(default_factory=dict)
+
+class TweetSentiment(BaseModel):
+    """Sentiment score of one tweet."""
+    id: Optional[str] = None
+    date: Optional[str] = None  # ISO 8601, UTC
+    score: float
+
+class SentimentWindow(BaseModel):
+    """Aggregate of the tweet scores in the trailing window ending at `date`."""
+    date: str
+    mean: float
+    min: float
+    max: float
+    count: int
+
+class SentimentTimeSeries(BaseModel):
+    """Per-tweet sentiment, oldest first, with rolling-window aggregates."""
+    window_days: float
+    points: List[TweetSentiment]
+    rolling: List[SentimentWindow]
 
 class AnalysisResponse(BaseModel):
     """Response model for profile analysis results."""
@@ -17,4 +65,66 @@ class AnalysisResponse(BaseModel):
     mbti_result: Optional[Dict[str, str]] = None
     top_keywords: Optional[List[str]] = None
     sentiment_scaled_score: Optional[float] = None
-    error: Optional[str] = None 
\ No newline at end of file
+    sentiment_timeseries: Optional[SentimentTimeSeries] = None  # Only with SENTIMENT_MODE=per_tweet
+    preprocessing_stats: Optional[Dict[str, int]] = None
+    sampling_stats: Optional[Dict[str, int]] = None
+    usage: Optional[UsageSummary] = None
+    error: Optional[str] = None
+
+class AnalysisTask(BaseModel):
+    """Response model for an analysis submitted to the worker queue."""
+    task_id: str
+    status: str
+
+class AnalysisTaskStatus(BaseModel):
+    """Response model for the status of a queued analysis."""
+    task_id: str
+    status: Literal["queued", "running", "done", "failed"]
+    attempts: int = 0
+    result: Optional[AnalysisResponse] = None
+    error: Optional[str] = None
+    status_code: Optional[int] = None
+
+class SimilarProfile(BaseModel):
+    """A profile found by similarity search."""
+    username: str
+    similarity: float
+
+class SimilarProfiles(BaseModel):
+    """Response model for the profiles most similar to an analyzed one."""
+    username: str
+    similar: List[SimilarProfile]
+
+class AudienceRequest(BaseModel):
+    """Request model for an audience analysis."""
+    username: str
+    sample_size: int = Field(
+        AUDIENCE_SAMPLE_SIZE, ge=1, le=AUDIENCE_MAX_SAMPLE_SIZE, description="Followers to sample and analyze"
+    )
+    tweet_count: int = Field(10, ge=1, le=50, description="Number of tweets to analyze per follower (1-50)")
+    seed: Optional[int] = Field(None, description="Seed for a reproducible sample")
+
+class WatchlistEntryRequest(BaseModel):
+    """Request model for adding an account to the watchlist or changing its schedule."""
+    interval_seconds: float = Field(
+        WATCHLIST_DEFAULT_INTERVAL_SECONDS, ge=WATCHLIST_MIN_INTERVAL_SECONDS, description="Seconds between refreshes"
+    )
+    tweet_count: int = Field(10, ge=1, le=50, description="Number of tweets to analyze (1-50)")
+
+class WatchlistEntryResponse(BaseModel):
+    """A watchlist entry and the outcome of its last refresh."""
+    username: str
+    interval_seconds: float
+    tweet_count: int
+    due_at: datetime
+    added_at: datetime
+    last_checked_at: Optional[datetime] = None
+    last_analyzed_at: Optional[datetime] = None
+    last_tweet_id: Optional[str] = None
+    last_status: Optional[Literal["analyzed", "unchanged", "failed"]] = None
+    last_error: Optional[str] = None
+
+class WatchlistPage(BaseModel):
+    """Response model for a page of the watchlist, in the order entries fall due."""
+    total: int
+    entries: List[WatchlistEntryResponse]
\ No newline at end of file
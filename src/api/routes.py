@@ -1,36 +1,288 @@
-from fastapi import APIRouter, Depends
+import asyncio
+import json
+import os
+import tempfile
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Optional
 
-from .models import AnalyzeRequest, AnalysisResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
+
+from src.observability.metrics import render_metrics
+from src.observability.profiling import load_profile, profiling_enabled
+from src.worker.queue import get_task_queue
+
+from src.audience import sample_followers, stream_audience
+from src.export import reader as export_reader
+from src.export.writer import pyarrow_available
+from src.pipeline.constants import EXPORT_DIR, IMAGE_MAX_SIZE, SIMILARITY_MAX_RESULTS
+from src.similarity.index import get_similarity_index
+from src.watchlist import WatchlistEntry, get_watchlist_store
+
+from .encoding import encode_response, negotiate_media_type, parse_fields
+from .images import get_thumbnail, thumbnail_response
+from .models import (
+    AnalyzeRequest,
+    AnalysisResponse,
+    AnalysisTask,
+    AnalysisTaskStatus,
+    AudienceRequest,
+    SimilarProfile,
+    SimilarProfiles,
+    WatchlistEntryRequest,
+    WatchlistEntryResponse,
+    WatchlistPage
+)
 from .services import analyze_profile_service
 
 router = APIRouter(tags=["analysis"])
 
+FIELDS_QUERY = Query(
+    None,
+    description="Comma-separated response fields to return, e.g. `mbti_result,top_keywords` (default: all)"
+)
+
 @router.post("/analyze", response_model=AnalysisResponse)
-async def analyze_profile(request: AnalyzeRequest):
+async def analyze_profile(
+    request: AnalyzeRequest,
+    http_request: Request,
+    profile: bool = Query(False, description="Capture a profile of this request (requires ENABLE_REQUEST_PROFILING)"),
+    fields: Optional[str] = FIELDS_QUERY,
+    x_profile: Optional[str] = Header(None)
+):
     """
     Analyzes an X profile by fetching bio and recent tweets, then processing them through a LangGraph pipeline.
     
     Returns a JSON object with persona insights, category scores, MBTI classification, keywords, 
-    and sentiment analysis.
+    and sentiment analysis. When profiling is requested and enabled, the response carries an
+    `X-Profile-ID` header that can be fetched from `/debug/profiles/{profile_id}`.
+
+    `fields` trims the response to the listed fields. `Accept: application/msgpack` returns
+    MessagePack, and large bodies are compressed with br or gzip per `Accept-Encoding`.
     """
+    selected_fields = parse_fields(fields, AnalysisResponse.model_fields)
+    # Negotiated up front so an unacceptable Accept header fails before the analysis runs
+    media_type = negotiate_media_type(http_request.headers.get("accept"))
+    profile_requested = profile or (x_profile or "").lower() in ("1", "true", "yes")
+
     # Call the service function to perform the analysis
     final_state = await analyze_profile_service(
         username=request.username,
-        tweet_count=request.tweet_count
+        tweet_count=request.tweet_count,
+        profile=profile_requested and profiling_enabled(),
+        priority=request.priority
     )
-    
+    headers = {"X-Profile-ID": final_state["profile_id"]} if final_state.get("profile_id") else None
+
     # Construct the response from the final state
-    response_data = AnalysisResponse(
-        username=final_state.get("username", request.username),
-        user_bio=final_state.get("user_bio"),
-        user_display_name=final_state.get("user_display_name"),
-        user_profile_image_url=final_state.get("user_profile_image_url"),
-        recent_tweets=final_state.get("recent_tweets"),
-        category_scores=final_state.get("category_scores"),
-        mbti_result=final_state.get("mbti_result"),
-        top_keywords=final_state.get("top_keywords"),
-        sentiment_scaled_score=final_state.get("sentiment_scaled_score"),
-        error=final_state.get("error")
+    response_data = _analysis_response(final_state, request.username)
+    return encode_response(http_request, response_data.model_dump(), selected_fields, headers=headers, media_type=media_type)
+
+def _analysis_response(final_state: Dict[str, Any], username: str) -> AnalysisResponse:
+    """Validates the response fields of a final state."""
+    values = {name: final_state.get(name) for name in AnalysisResponse.model_fields}
+    return AnalysisResponse(**{**values, "username": final_state.get("username", username)})
+
+@router.post("/analyze/tasks", response_model=AnalysisTask, status_code=202)
+async def submit_analysis_task(request: AnalyzeRequest):
+    """
+    Queues an analysis for the worker processes (`python -m src.worker`) instead of running
+    it in this request. Poll `/analyze/tasks/{task_id}` for the result. Nobody waits on a
+    queued analysis, so it runs at `batch` priority unless the request sets one.
+    """
+    payload = request.model_dump()
+    if "priority" not in request.model_fields_set:
+        payload["priority"] = "batch"
+    task_id = await asyncio.to_thread(get_task_queue().enqueue, payload)
+    return AnalysisTask(task_id=task_id, status="queued")
+
+@router.get("/analyze/tasks/{task_id}", response_model=AnalysisTaskStatus)
+async def get_analysis_task(task_id: str, http_request: Request, fields: Optional[str] = FIELDS_QUERY):
+    """
+    Returns a queued analysis's status, and its result once it is done. A failed task
+    carries the error and the status code `/analyze` would have answered with.
+    `fields` trims the result as on `/analyze`.
+    """
+    selected_fields = parse_fields(fields, AnalysisResponse.model_fields)
+    task = await asyncio.to_thread(get_task_queue().get, task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail=f"Task {task_id} not found.")
+    if task["result"] is not None:
+        task["result"] = _analysis_response(task["result"], task["result"].get("username", ""))
+    payload = AnalysisTaskStatus(**task).model_dump()
+    if payload["result"] is not None and selected_fields is not None:
+        payload["result"] = {key: value for key, value in payload["result"].items() if key in selected_fields}
+    return encode_response(http_request, payload)
+
+@router.get("/profiles/{username}/similar", response_model=SimilarProfiles, tags=["profiles"])
+async def get_similar_profiles(username: str, k: int = Query(10, ge=1, le=SIMILARITY_MAX_RESULTS)):
+    """
+    Returns the `k` analyzed profiles most similar to an analyzed one, by cosine similarity
+    of their category scores, sentiment and MBTI type.
+    """
+    index = get_similarity_index()
+    if index is None:
+        raise HTTPException(status_code=404, detail="Similar-profile search is disabled.")
+    matches = await asyncio.to_thread(index.search, username, k)
+    if matches is None:
+        raise HTTPException(status_code=404, detail=f"Profile {username} has not been analyzed yet.")
+    return SimilarProfiles(
+        username=username,
+        similar=[SimilarProfile(username=match, similarity=round(similarity, 4)) for match, similarity in matches]
     )
-    
-    return response_data 
\ No newline at end of file
+
+@router.post("/audience", response_class=StreamingResponse, tags=["audience"])
+async def analyze_audience(request: AudienceRequest):
+    """
+    Analyzes a random sample of an account's followers and streams the aggregate as the
+    analyses complete, as newline-delimited JSON events:
+
+    - `sample`: the number of followers fetched and the sampled usernames,
+    - `result`: one per sampled follower, with the aggregate so far (category score
+      distributions, MBTI histogram and sentiment distribution, with confidence intervals),
+    - `done`: the final aggregate.
+    """
+    sampled = await sample_followers(request.username, request.sample_size, seed=request.seed)
+    if sampled is None:
+        raise HTTPException(status_code=404, detail=f"Could not retrieve followers of {request.username}.")
+    population, sample = sampled
+
+    async def events():
+        yield json.dumps({"event": "sample", "username": request.username, "population": population, "sample": sample}) + "\n"
+        async for event in stream_audience(sample, population, request.tweet_count):
+            yield json.dumps(event) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+def _watchlist_store():
+    store = get_watchlist_store()
+    if store is None:
+        raise HTTPException(status_code=404, detail="Watchlist is disabled.")
+    return store
+
+def _watchlist_entry(entry: WatchlistEntry) -> WatchlistEntryResponse:
+    values = entry._asdict()
+    for key in ("due_at", "added_at", "last_checked_at", "last_analyzed_at"):
+        if values[key] is not None:
+            values[key] = datetime.fromtimestamp(values[key], tz=timezone.utc)
+    return WatchlistEntryResponse(**values)
+
+@router.put("/watchlist/{username}", response_model=WatchlistEntryResponse, tags=["watchlist"])
+async def put_watchlist_entry(username: str, request: WatchlistEntryRequest, response: Response):
+    """
+    Adds an account to the watchlist, to be re-analyzed in the background every
+    `interval_seconds` (+- WATCHLIST_JITTER) while it posts new tweets. For an account
+    already listed, changes its interval and tweet count.
+    """
+    store = _watchlist_store()
+    added = await asyncio.to_thread(store.add, [username], request.interval_seconds, request.tweet_count)
+    if added:
+        response.status_code = 201
+    return _watchlist_entry(await asyncio.to_thread(store.get, username))
+
+@router.get("/watchlist", response_model=WatchlistPage, tags=["watchlist"])
+async def list_watchlist(offset: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000)):
+    """Returns watchlist entries in the order they fall due."""
+    store = _watchlist_store()
+    total = await asyncio.to_thread(len, store)
+    entries = await asyncio.to_thread(store.entries, offset, limit)
+    return WatchlistPage(total=total, entries=[_watchlist_entry(entry) for entry in entries])
+
+@router.get("/watchlist/{username}", response_model=WatchlistEntryResponse, tags=["watchlist"])
+async def get_watchlist_entry(username: str):
+    store = _watchlist_store()
+    entry = await asyncio.to_thread(store.get, username)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"{username} is not on the watchlist.")
+    return _watchlist_entry(entry)
+
+@router.delete("/watchlist/{username}", status_code=204, tags=["watchlist"])
+async def delete_watchlist_entry(username: str):
+    store = _watchlist_store()
+    if not await asyncio.to_thread(store.remove, username):
+        raise HTTPException(status_code=404, detail=f"{username} is not on the watchlist.")
+    return Response(status_code=204)
+
+@router.get("/images/avatar", response_class=Response, tags=["images"])
+async def get_avatar(
+    http_request: Request,
+    url: Optional[str] = Query(None, description="Profile image URL (default: a placeholder)"),
+    size: int = Query(80, ge=16, le=IMAGE_MAX_SIZE, description="Edge of the square thumbnail in pixels")
+):
+    """
+    Serves a profile image as a square JPEG thumbnail of `size` pixels. The image is fetched
+    once and the thumbnail is cached on disk; responses may be cached by clients for long.
+    Only images on IMAGE_ALLOWED_HOSTS are proxied.
+    """
+    thumbnail = await get_thumbnail(url, size)
+    return thumbnail_response(http_request, thumbnail)
+
+@router.get("/export/results", response_class=Response, tags=["export"])
+async def export_results_range(
+    start: date = Query(..., description="First day, YYYY-MM-DD"),
+    end: date = Query(..., description="Last day, YYYY-MM-DD (inclusive)"),
+    format: str = Query("parquet", pattern="^(parquet|arrow)$"),
+    columns: Optional[str] = Query(None, description="Comma-separated columns, e.g. `username,mbti_code,score_tech` (default: all)")
+):
+    """
+    Exports the results analyzed between two days, read from the Parquet export in
+    EXPORT_DIR. `format=parquet` returns one Parquet file; `format=arrow` streams an
+    Arrow IPC stream batch by batch.
+    """
+    if not EXPORT_DIR or not pyarrow_available():
+        raise HTTPException(status_code=404, detail="Result export is disabled.")
+    if start > end:
+        raise HTTPException(status_code=422, detail="start must not be after end.")
+    selected = [column.strip() for column in columns.split(",") if column.strip()] if columns else None
+    try:
+        export_reader.check_columns(selected)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    filename = f"results_{start}_{end}"
+    if format == "arrow":
+        return StreamingResponse(
+            export_reader.stream_arrow(EXPORT_DIR, start, end, selected),
+            media_type="application/vnd.apache.arrow.stream",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.arrows"'}
+        )
+    # Parquet puts its footer last, so the file is assembled on disk before it is sent
+    descriptor, path = tempfile.mkstemp(suffix=".parquet")
+    os.close(descriptor)
+    try:
+        await asyncio.to_thread(export_reader.export_range, EXPORT_DIR, start, end, path, "parquet", selected)
+    except BaseException:
+        os.remove(path)
+        raise
+    return FileResponse(
+        path,
+        media_type="application/vnd.apache.parquet",
+        filename=f"{filename}.parquet",
+        background=BackgroundTask(os.remove, path)
+    )
+
+@router.get("/metrics", response_class=PlainTextResponse, tags=["monitoring"])
+async def metrics():
+    """
+    Exposes process metrics (request rate, in-flight requests, per-node and fetch latency
+    histograms, LLM errors/retries/tokens and cache hit ratios) in the Prometheus text format.
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@router.get("/debug/profiles/{profile_id}", tags=["monitoring"])
+async def get_profile(profile_id: str, format: str = Query("json", pattern="^(json|collapsed)$")):
+    """
+    Downloads a captured request profile: the per-node timeline (`format=json`) or the
+    sampled stacks in the collapsed flamegraph format (`format=collapsed`).
+    """
+    if not profiling_enabled():
+        raise HTTPException(status_code=404, detail="Request profiling is disabled.")
+
+    content = load_profile(profile_id, format)
+    if content is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found.")
+
+    if format == "collapsed":
+        return PlainTextResponse(content)
+    return Response(content, media_type="application/json")
\ No newline at end of file
@@ -0,0 +1,60 @@
+"""
+Startup and shutdown shared by the processes that run analyses: the API, the task queue
+workers (`python -m src.worker`) and the watchlist scheduler (`python -m src.watchlist`).
+"""
+import asyncio
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable
+
+from src.export.writer import close_result_exporter
+from src.observability.log import configure_logging, shutdown_logging
+from src.observability.tracing import shutdown_tracing
+from src.pipeline import validate_config
+from src.pipeline.constants import GRAPH_EXECUTOR_THREADS
+from src.pipeline.llm import warm_up_llms
+from .services import initialize_graph
+
+
+def start_analysis_runtime() -> None:
+    """
+    Prepares the running event loop for graph runs: sizes its default executor, compiles
+    the graph and builds the LLM clients ahead of the first request.
+    """
+    # LangGraph runs sync nodes in the loop's default executor; size it for I/O-bound LLM calls
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=GRAPH_EXECUTOR_THREADS, thread_name_prefix="graph-node")
+    )
+    initialize_graph()
+    warm_up_llms()
+
+
+def stop_analysis_runtime() -> None:
+    """Flushes the result export, traces and logs."""
+    close_result_exporter()
+    shutdown_tracing()
+    shutdown_logging()
+
+
+def run_service(serve: Callable[[asyncio.Event], Awaitable[None]]) -> None:
+    """
+    Runs a long-lived command line service until SIGINT or SIGTERM.
+
+    Args:
+        serve: Coroutine function that runs the service until the event it is given is set
+    """
+    configure_logging()
+    validate_config()
+
+    async def main() -> None:
+        start_analysis_runtime()
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+        await serve(stop)
+
+    try:
+        asyncio.run(main())
+    finally:
+        stop_analysis_runtime()
\ No newline at end of file
@@ -0,0 +1,258 @@
+"""
+Priority scheduling of the shared fetch and LLM resources.
+
+Interactive users and bulk jobs call the same `/analyze`, and every run needs twscrape
+fetches and LLM calls. Each request therefore carries a priority class:
+
+- `interactive`: a person is waiting (the Streamlit UI). This is the default.
+- `batch`: backfills and bulk scripts.
+- `background`: periodic refreshes that nobody is waiting on.
+
+The resources are the twscrape fetches ("fetch"), the LLM calls ("llm") and whole graph
+runs ("graph"). A graph run holds an executor thread while its sync nodes wait for an LLM
+slot, so admitting runs by class keeps a backlog of batch runs from taking every thread
+(GRAPH_EXECUTOR_THREADS) that interactive runs need.
+
+Each resource has a fixed number of concurrent slots. When a slot frees up, the waiting
+classes share it by weighted fair queuing (stride scheduling): every grant advances the
+class's virtual time by 1/weight, and the backlogged class with the lowest virtual time
+goes next. A class returning from idle starts at the current virtual time, so it does not
+get a burst of saved-up credit. Per-class caps bound the fraction of slots a class may
+hold at once, so a backfill can never occupy every fetch slot even while the UI is idle.
+
+The scheduler is handed to the graph run in `configurable.scheduler`, together with the
+request's `configurable.priority`. Pipeline code only needs the duck-typed `slot` and
+`slot_async` context managers (see `src.pipeline.resilience.resource_slot`).
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Callable, Deque, Dict, Iterator, List, Mapping, Optional
+
+from src.observability.metrics import SCHEDULER_ACTIVE, SCHEDULER_QUEUE_WAIT, SCHEDULER_QUEUED
+from src.pipeline.constants import (
+    DEFAULT_PRIORITY,
+    FETCH_CONCURRENCY,
+    GRAPH_EXECUTOR_THREADS,
+    LLM_CONCURRENCY,
+    PRIORITY_CAPS,
+    PRIORITY_WEIGHTS
+)
+
+
+class SchedulerTimeout(TimeoutError):
+    """Raised when no slot frees up for a request within its timeout."""
+
+
+class _Waiter:
+    __slots__ = ("priority", "grant", "granted")
+
+    def __init__(self, priority: str, grant: Callable[[], None]):
+        self.priority = priority
+        self.grant = grant
+        self.granted = False
+
+
+class FairShareResource:
+    """
+    A pool of concurrent slots shared by the priority classes through weighted fair queuing.
+
+    Args:
+        name: Resource name used in metrics (e.g. "fetch", "llm")
+        capacity: Concurrent slots
+        weights: Share of contended slots per class
+        caps: Largest fraction of the slots each class may hold at once
+    """
+
+    def __init__(self, name: str, capacity: int, weights: Mapping[str, float], caps: Mapping[str, float]):
+        self.name = name
+        self.capacity = max(1, capacity)
+        self._weights = {cls: max(weight, 1e-6) for cls, weight in weights.items()}
+        self._limits = {cls: max(1, int(self.capacity * caps.get(cls, 1.0))) for cls in weights}
+        self._queues: Dict[str, Deque[_Waiter]] = {cls: deque() for cls in weights}
+        self._active = {cls: 0 for cls in weights}
+        self._pass = {cls: 0.0 for cls in weights}
+        self._virtual_time = 0.0
+        self._lock = threading.Lock()
+
+    def active(self, priority: str) -> int:
+        return self._active[priority]
+
+    def queued(self, priority: str) -> int:
+        return len(self._queues[priority])
+
+    # --- Dispatch ---
+    def _dispatch(self) -> List[_Waiter]:
+        """Hands free slots to waiting classes in virtual-time order. Call with the lock held."""
+        granted = []
+        while sum(self._active.values()) < self.capacity:
+            eligible = [
+                cls for cls, queue in self._queues.items()
+                if queue and self._active[cls] < self._limits[cls]
+            ]
+            if not eligible:
+                break
+            cls = min(eligible, key=lambda c: (self._pass[c], -self._weights[c]))
+            waiter = self._queues[cls].popleft()
+            self._virtual_time = self._pass[cls]
+            self._pass[cls] += 1.0 / self._weights[cls]
+            self._active[cls] += 1
+            waiter.granted = True
+            granted.append(waiter)
+            SCHEDULER_QUEUED.dec(self.name, cls)
+            SCHEDULER_ACTIVE.inc(self.name, cls)
+        return granted
+
+    def _enqueue(self, waiter: _Waiter) -> None:
+        cls = waiter.priority
+        with self._lock:
+            if not self._queues[cls] and not self._active[cls]:
+                # Returning from idle: no credit for the time spent away
+                self._pass[cls] = max(self._pass[cls], self._virtual_time)
+            self._queues[cls].append(waiter)
+            SCHEDULER_QUEUED.inc(self.name, cls)
+            granted = self._dispatch()
+        for ready in granted:
+            ready.grant()
+
+    def _withdraw(self, waiter: _Waiter) -> bool:
+        """Removes a waiter that gave up. Returns False if it was granted a slot meanwhile."""
+        with self._lock:
+            if waiter.granted:
+                return False
+            self._queues[waiter.priority].remove(waiter)
+            SCHEDULER_QUEUED.dec(self.name, waiter.priority)
+            return True
+
+    def release(self, priority: str) -> None:
+        """Frees a slot held by `priority` and hands it to the next waiter."""
+        with self._lock:
+            self._active[priority] -= 1
+            SCHEDULER_ACTIVE.dec(self.name, priority)
+            granted = self._dispatch()
+        for ready in granted:
+            ready.grant()
+
+    # --- Acquisition ---
+    def acquire(self, priority: str, timeout: Optional[float] = None) -> float:
+        """
+        Blocks until a slot is granted to `priority`.
+
+        Args:
+            priority: Priority class of the caller
+            timeout: Longest acceptable wait in seconds (None waits indefinitely)
+
+        Returns:
+            Seconds spent queued
+
+        Raises:
+            SchedulerTimeout: If no slot was granted within `timeout`
+        """
+        started = time.monotonic()
+        event = threading.Event()
+        waiter = _Waiter(priority, event.set)
+        self._enqueue(waiter)
+        if not event.wait(timeout) and self._withdraw(waiter):
+            SCHEDULER_QUEUE_WAIT.observe(time.monotonic() - started, self.name, priority)
+            raise SchedulerTimeout(f"No {self.name} slot for {priority} request within {timeout:.1f}s")
+        waited = time.monotonic() - started
+        SCHEDULER_QUEUE_WAIT.observe(waited, self.name, priority)
+        return waited
+
+    async def acquire_async(self, priority: str, timeout: Optional[float] = None) -> float:
+        """Awaitable `acquire`; waiting does not hold a thread."""
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def grant() -> None:
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        waiter = _Waiter(priority, grant)
+        self._enqueue(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if self._withdraw(waiter):
+                SCHEDULER_QUEUE_WAIT.observe(time.monotonic() - started, self.name, priority)
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                raise SchedulerTimeout(f"No {self.name} slot for {priority} request within {timeout:.1f}s") from None
+            if isinstance(e, asyncio.CancelledError):
+                # Granted while being cancelled: hand the slot straight back
+                self.release(priority)
+                raise
+        waited = time.monotonic() - started
+        SCHEDULER_QUEUE_WAIT.observe(waited, self.name, priority)
+        return waited
+
+
+class PriorityScheduler:
+    """
+    The set of scheduled resources, addressed by name.
+
+    Args:
+        capacities: Concurrent slots per resource name
+        weights: Share of contended slots per priority class
+        caps: Largest fraction of a resource's slots each class may hold
+    """
+
+    def __init__(
+        self,
+        capacities: Mapping[str, int],
+        weights: Mapping[str, float] = PRIORITY_WEIGHTS,
+        caps: Mapping[str, float] = PRIORITY_CAPS
+    ):
+        self._resources = {
+            name: FairShareResource(name, capacity, weights, caps)
+            for name, capacity in capacities.items()
+        }
+
+    def resource(self, name: str) -> FairShareResource:
+        return self._resources[name]
+
+    @contextmanager
+    def slot(self, resource: str, priority: Optional[str] = None, timeout: Optional[float] = None) -> Iterator[float]:
+        """
+        Holds a slot of `resource` for the block, waiting for it in fair order.
+
+        Yields:
+            Seconds spent queued
+        """
+        priority = priority or DEFAULT_PRIORITY
+        pool = self._resources[resource]
+        waited = pool.acquire(priority, timeout)
+        try:
+            yield waited
+        finally:
+            pool.release(priority)
+
+    @asynccontextmanager
+    async def slot_async(
+        self, resource: str, priority: Optional[str] = None, timeout: Optional[float] = None
+    ) -> AsyncIterator[float]:
+        """Async variant of `slot` for the async graph nodes."""
+        priority = priority or DEFAULT_PRIORITY
+        pool = self._resources[resource]
+        waited = await pool.acquire_async(priority, timeout)
+        try:
+            yield waited
+        finally:
+            pool.release(priority)
+
+
+_scheduler: Optional[PriorityScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> PriorityScheduler:
+    """Returns the process-wide scheduler for the fetch and LLM resources."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = PriorityScheduler(
+                {"graph": GRAPH_EXECUTOR_THREADS, "fetch": FETCH_CONCURRENCY, "llm": LLM_CONCURRENCY}
+            )
+        return _scheduler
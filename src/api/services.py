@@ -1,19 +1,24 @@
-import os
-import sys
-from typing import Dict, Any
+import asyncio
+import time
+from typing import Dict, Any, Optional
 from fastapi import HTTPException
 
-# --- PATH MODIFICATION FOR SIBLING MODULE IMPORT ---
-PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
-if PROJECT_ROOT not in sys.path:
-    sys.path.append(PROJECT_ROOT)
-
 # Import from pipeline
 from src.pipeline import create_profiling_graph
-from src.pipeline.models import ProfileAnalysisState
+from src.pipeline.constants import ANALYSIS_CACHE_TTL_SECONDS, DEFAULT_PRIORITY, REQUEST_DEADLINE_SECONDS
+from src.pipeline.models import ProfileAnalysisState, initial_state
+from src.pipeline.usage import UsageTracker
+
+from src.observability.log import get_logger, request_id_var
+from src.observability.metrics import CACHE_REQUESTS
+from src.observability.profiling import capture_profile
+from src.observability.tracing import get_trace_callbacks
+from src.export.writer import export_results
+from src.shared.store import SharedStore, get_shared_store
+from src.similarity.index import index_profiles
+from .scheduler import SchedulerTimeout, get_scheduler
 
-# Import Langfuse callback handler
-from langfuse.callback import CallbackHandler
+logger = get_logger(__name__)
 
 # Global variable to store the compiled graph
 profiling_graph_app = None
@@ -24,10 +29,10 @@ def initialize_graph():
     
     try:
         profiling_graph_app = create_profiling_graph().compile()
-        print("LangGraph application compiled successfully.")
+        logger.info("LangGraph application compiled successfully")
         return True
     except Exception as e:
-        print(f"Error initializing LangGraph: {e}")
+        logger.error("Error initializing LangGraph: %s", e)
         return False
 
 def get_graph_app():
@@ -39,13 +44,31 @@ def get_graph_app():
     
     return profiling_graph_app
 
-async def analyze_profile_service(username: str, tweet_count: int) -> Dict[str, Any]:
+def _analysis_cache() -> Optional[SharedStore]:
+    """Returns the shared store if completed analyses are cached across workers."""
+    return get_shared_store() if ANALYSIS_CACHE_TTL_SECONDS > 0 else None
+
+def _analysis_cache_key(username: str, tweet_count: int) -> str:
+    return f"{username.lower()}:{tweet_count}"
+
+async def analyze_profile_service(
+    username: str,
+    tweet_count: int,
+    profile: bool = False,
+    deadline_seconds: Optional[float] = None,
+    priority: str = DEFAULT_PRIORITY,
+    refresh: bool = False
+) -> Dict[str, Any]:
     """
     Service function to analyze a profile using the LangGraph pipeline.
     
     Args:
         username: The Twitter/X username to analyze
         tweet_count: Number of tweets to fetch for analysis
+        profile: Whether to capture a profile of this run (the caller checks it is enabled)
+        deadline_seconds: Time budget for the whole run (defaults to REQUEST_DEADLINE_SECONDS)
+        priority: Scheduling class for the run's fetches and LLM calls
+        refresh: Analyze again even if the shared cache holds a recent result (which is replaced)
         
     Returns:
         The final state from the graph execution
@@ -61,50 +84,56 @@ async def analyze_profile_service(username: str, tweet_count: int) -> Dict[str,
             detail="Graph application is not available due to initialization error."
         )
 
-    print(f"Starting analysis for username: {username}")
+    # Any worker's recent analysis of the same profile is reused; profiled runs and refreshes
+    # always execute
+    cache = None if profile else _analysis_cache()
+    if cache is not None and not refresh:
+        cached_state = await asyncio.to_thread(cache.get, "analysis", _analysis_cache_key(username, tweet_count))
+        CACHE_REQUESTS.inc("analysis", "hit" if cached_state is not None else "miss")
+        if cached_state is not None:
+            logger.info("Serving cached analysis for username: %s", username)
+            # The stored usage belongs to the original run; serving it made no LLM calls
+            return {**cached_state, "usage": UsageTracker().summary()}
+
+    logger.info("Starting analysis for username: %s", username, extra={"priority": priority})
 
     # Prepare initial state
-    initial_state: ProfileAnalysisState = {
-        "username": username,
-        "user_bio": None, 
-        "user_display_name": None,
-        "user_profile_image_url": None,
-        "recent_tweets": None,
-        "tweet_count_requested": tweet_count,
-        "category_scores": None,
-        "mbti_result": None,
-        "top_keywords": None,
-        "sentiment_scaled_score": None,
-        "error": None
-    }
+    state: ProfileAnalysisState = initial_state(username, tweet_count)
 
     try:
-        # Configure Langfuse callback
-        langfuse_public_key = os.getenv("LANGFUSE_PUBLIC_KEY")
-        langfuse_secret_key = os.getenv("LANGFUSE_SECRET_KEY")
-        langfuse_host = os.getenv("LANGFUSE_HOST", "https://cloud.langfuse.com")  # Use default if not set
-        langfuse_handler = None
-        callbacks = []
+        request_id = request_id_var.get()
+        usage_tracker = UsageTracker()
+        # Langfuse tracing is sampled and shares one long-lived client across requests
+        callbacks = [
+            usage_tracker,
+            *get_trace_callbacks(session_id=f"profile-analysis-{username}", request_id=request_id)
+        ]
         
-        if langfuse_public_key and langfuse_secret_key:
-            try:
-                langfuse_handler = CallbackHandler(
-                    public_key=langfuse_public_key,
-                    secret_key=langfuse_secret_key,
-                    host=langfuse_host,
-                    session_id=f"profile-analysis-{username}"  # Create a session per user analysis
-                )
-                callbacks.append(langfuse_handler)
-                print(f"Langfuse callback configured for session: profile-analysis-{username}")
-            except Exception as e:
-                print(f"Warning: Failed to initialize Langfuse callback: {e}")
-        else:
-            print("Langfuse credentials not found in environment variables. Running without Langfuse tracking.")
-        
-        # Invoke the graph asynchronously with callbacks
-        config = {"callbacks": callbacks} if callbacks else {}
-        final_state = await graph_app.ainvoke(initial_state, config=config)
-        print(f"Graph invocation complete for user: {username}")
+        # Invoke the graph asynchronously with callbacks; the request id and deadline travel
+        # in the graph config so nodes (and traces) can be correlated with this request and
+        # LLM calls can size their timeouts to the time left; the scheduler and priority
+        # decide the order in which the shared fetch and LLM slots are granted
+        deadline = time.monotonic() + (deadline_seconds or REQUEST_DEADLINE_SECONDS)
+        config = {
+            "callbacks": callbacks,
+            "configurable": {
+                "request_id": request_id,
+                "deadline": deadline,
+                "scheduler": get_scheduler(),
+                "priority": priority
+            },
+            "metadata": {"request_id": request_id, "priority": priority}
+        }
+        # Runs are admitted by priority, so queued batch runs cannot hold every executor thread
+        async with get_scheduler().slot_async("graph", priority, timeout=max(0.0, deadline - time.monotonic())):
+            if profile:
+                async with capture_profile(request_id) as request_profile:
+                    final_state = await graph_app.ainvoke(state, config=config)
+                final_state = {**final_state, "profile_id": request_profile.profile_id}
+            else:
+                final_state = await graph_app.ainvoke(state, config=config)
+        final_state = {**final_state, "usage": usage_tracker.summary()}
+        logger.info("Graph invocation complete for user: %s", username, extra={"usage_total": final_state["usage"]["total"]})
 
         # Check for errors in the final state
         if final_state.get("error"):
@@ -113,19 +142,32 @@ async def analyze_profile_service(username: str, tweet_count: int) -> Dict[str,
                     status_code=404, 
                     detail=f"Could not retrieve data for user {username}: {final_state['error']}"
                 )
+            elif "deadline exceeded" in final_state["error"]:
+                raise HTTPException(
+                    status_code=504,
+                    detail=f"Analysis did not finish in time: {final_state['error']}"
+                )
             else:
                 raise HTTPException(
                     status_code=500, 
                     detail=f"Analysis pipeline error: {final_state['error']}"
                 )
 
+        if cache is not None:
+            await asyncio.to_thread(
+                cache.set, "analysis", _analysis_cache_key(username, tweet_count), final_state, ttl=ANALYSIS_CACHE_TTL_SECONDS
+            )
+        await asyncio.to_thread(export_results, [final_state])
+        await asyncio.to_thread(index_profiles, [final_state])
         return final_state
         
     except HTTPException:
         # Re-raise HTTP exceptions directly
         raise
+    except SchedulerTimeout as e:
+        raise HTTPException(status_code=504, detail=f"Analysis did not finish in time: {e}")
     except Exception as e:
-        print(f"Unhandled error during analysis for {username}: {type(e).__name__} - {e}")
+        logger.exception("Unhandled error during analysis for %s: %s - %s", username, type(e).__name__, e)
         raise HTTPException(
             status_code=500, 
             detail=f"An unexpected error occurred: {str(e)}"
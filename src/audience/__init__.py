@@ -0,0 +1,6 @@
+"""
+Audience analysis: aggregate profiling over a random sample of an account's followers
+(see `runner`, and `aggregate` for the estimates).
+"""
+from .aggregate import AudienceAggregate
+from .runner import sample_followers, stream_audience
\ No newline at end of file
@@ -0,0 +1,146 @@
+"""
+Running aggregate of the analyses of an audience sample.
+
+The sample is a simple random sample drawn without replacement from the fetched followers,
+so every estimate carries a confidence interval with the finite population correction:
+when the sample covers a large share of the followers, the intervals shrink accordingly.
+
+- Categories: the share of followers the category was scored for (prevalence, with a
+  Wilson interval), the mean score over all followers counting unscored ones as 0 (with
+  a normal interval) and the quartiles among the followers it was scored for.
+- MBTI: counts and shares per type, with Wilson intervals.
+- Sentiment: mean and standard deviation with a normal interval, and a 10-bin histogram
+  of the 0-100 scaled score.
+
+Followers whose analysis failed (protected or suspended accounts, errors) are counted but
+left out of every estimate.
+"""
+import math
+import statistics
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from src.pipeline.constants import AUDIENCE_CONFIDENCE, CATEGORIES, MBTI_TYPES
+
+SENTIMENT_BINS = 10
+
+_Z = statistics.NormalDist().inv_cdf(0.5 + AUDIENCE_CONFIDENCE / 2)
+
+
+def _interval(low: float, high: float, lower_bound: float, upper_bound: float) -> List[float]:
+    return [round(max(lower_bound, low), 4), round(min(upper_bound, high), 4)]
+
+
+class AudienceAggregate:
+    """
+    Category, MBTI and sentiment distributions of the analyzed followers so far.
+
+    Args:
+        population: Number of followers the sample was drawn from
+        sample_size: Number of followers sampled
+    """
+
+    def __init__(self, population: int, sample_size: int):
+        self.population = population
+        self.sample_size = sample_size
+        self.analyzed = 0
+        self.failed = 0
+        self._category_scores: Dict[str, List[float]] = {category: [] for category in CATEGORIES}
+        self._mbti_codes: List[str] = []
+        self._sentiments: List[float] = []
+
+    def add(self, result: Mapping[str, Any]) -> None:
+        """Adds one completed analysis (a final state or AnalysisResponse dict)."""
+        self.analyzed += 1
+        for category, score in (result.get("category_scores") or {}).items():
+            if category in self._category_scores and score and score.get("score") is not None:
+                self._category_scores[category].append(float(score["score"]))
+        mbti_code = (result.get("mbti_result") or {}).get("mbti_code")
+        if mbti_code in MBTI_TYPES:
+            self._mbti_codes.append(mbti_code)
+        sentiment = result.get("sentiment_scaled_score")
+        if sentiment is not None:
+            self._sentiments.append(float(sentiment))
+
+    def add_failure(self) -> None:
+        """Counts a sampled follower that could not be analyzed."""
+        self.failed += 1
+
+    def _correction(self, n: int) -> float:
+        """Finite population correction of the standard error for a sample of n."""
+        if n >= self.population:
+            return 0.0
+        return math.sqrt((self.population - n) / (self.population - 1))
+
+    def _proportion(self, count: int, n: int) -> Dict[str, Any]:
+        """Share `count / n` with its Wilson score interval."""
+        share = count / n
+        z = _Z * self._correction(n)
+        denominator = 1 + z * z / n
+        center = (share + z * z / (2 * n)) / denominator
+        margin = z * math.sqrt(share * (1 - share) / n + z * z / (4 * n * n)) / denominator
+        return {"share": round(share, 4), "ci": _interval(center - margin, center + margin, 0.0, 1.0)}
+
+    def _mean(self, values: List[float], n: int, upper_bound: float) -> Tuple[float, float, List[float]]:
+        """Mean, standard deviation and normal interval of `values` padded with zeros to n."""
+        mean = sum(values) / n
+        if n < 2:
+            return mean, 0.0, _interval(0.0, upper_bound, 0.0, upper_bound)
+        variance = (sum(value * value for value in values) - n * mean * mean) / (n - 1)
+        std = math.sqrt(max(variance, 0.0))
+        margin = _Z * std / math.sqrt(n) * self._correction(n)
+        return mean, std, _interval(mean - margin, mean + margin, 0.0, upper_bound)
+
+    def _categories(self, n: int) -> Dict[str, Dict[str, Any]]:
+        categories = {}
+        for category, scores in self._category_scores.items():
+            if not scores:
+                continue
+            mean, _, ci = self._mean(scores, n, 100.0)
+            quartiles = statistics.quantiles(scores, n=4) if len(scores) > 1 else scores * 3
+            categories[category] = {
+                "scored": len(scores),
+                "prevalence": self._proportion(len(scores), n),
+                "mean_score": round(mean, 2),
+                "mean_score_ci": [round(bound, 2) for bound in ci],
+                "score_quartiles": [round(quartile, 2) for quartile in quartiles]
+            }
+        return dict(sorted(categories.items(), key=lambda item: item[1]["mean_score"], reverse=True))
+
+    def _mbti(self) -> Dict[str, Any]:
+        n = len(self._mbti_codes)
+        counts = {code: self._mbti_codes.count(code) for code in sorted(set(self._mbti_codes))}
+        return {
+            "classified": n,
+            "counts": dict(sorted(counts.items(), key=lambda item: item[1], reverse=True)),
+            "shares": {code: self._proportion(count, n) for code, count in counts.items()} if n else {}
+        }
+
+    def _sentiment(self) -> Optional[Dict[str, Any]]:
+        n = len(self._sentiments)
+        if not n:
+            return None
+        mean, std, ci = self._mean(self._sentiments, n, 100.0)
+        histogram = [0] * SENTIMENT_BINS
+        for sentiment in self._sentiments:
+            histogram[min(int(sentiment * SENTIMENT_BINS / 100), SENTIMENT_BINS - 1)] += 1
+        return {
+            "scored": n,
+            "mean": round(mean, 2),
+            "std": round(std, 2),
+            "mean_ci": [round(bound, 2) for bound in ci],
+            "histogram": histogram
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """The current estimates as a JSON-serializable dict."""
+        n = self.analyzed
+        return {
+            "population": self.population,
+            "sample_size": self.sample_size,
+            "analyzed": n,
+            "failed": self.failed,
+            "confidence": AUDIENCE_CONFIDENCE,
+            "categories": self._categories(n) if n else {},
+            "mbti": self._mbti(),
+            "sentiment": self._sentiment()
+        }
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""
+Audience analysis: profiles a random sample of an account's followers and streams the
+aggregate as the analyses complete.
+
+Up to AUDIENCE_MAX_FOLLOWERS followers are fetched (X returns the most recent first, so
+for large accounts the population is the recent audience), a simple random sample is
+drawn from them, and each sampled follower is analyzed through the same service path as
+`/analyze` at `batch` priority, AUDIENCE_CONCURRENCY at a time. The shared analysis
+cache means followers analyzed recently, for this or another audience, are not analyzed
+again.
+"""
+import asyncio
+import random
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+from src.api.scheduler import get_scheduler
+from src.api.services import analyze_profile_service
+from src.data_fetcher.fetcher import fetch_followers
+from src.observability.log import get_logger
+from src.pipeline.constants import AUDIENCE_CONCURRENCY, AUDIENCE_MAX_FOLLOWERS
+from .aggregate import AudienceAggregate
+
+logger = get_logger(__name__)
+
+PRIORITY = "batch"
+
+
+async def sample_followers(
+    username: str,
+    sample_size: int,
+    max_followers: int = AUDIENCE_MAX_FOLLOWERS,
+    seed: Optional[int] = None
+) -> Optional[Tuple[int, List[str]]]:
+    """
+    Fetches followers and draws a simple random sample without replacement.
+
+    Args:
+        username: Account whose audience is analyzed
+        sample_size: Followers to sample; all of them if there are fewer
+        max_followers: Followers fetched to sample from
+        seed: Seed for a reproducible sample
+
+    Returns:
+        (number of followers fetched, sampled usernames), or None if the account could not
+        be found or has no followers
+    """
+    async with get_scheduler().slot_async("fetch", PRIORITY):
+        followers = await fetch_followers(username, limit=max_followers)
+    if not followers:
+        return None
+    followers = list(dict.fromkeys(followers))
+    return len(followers), random.Random(seed).sample(followers, min(sample_size, len(followers)))
+
+
+async def stream_audience(
+    sample: Sequence[str],
+    population: int,
+    tweet_count: int = 10,
+    concurrency: int = AUDIENCE_CONCURRENCY
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Analyzes the sampled followers and yields an event as each one completes.
+
+    Events:
+        `{"event": "result", "username", "ok", "error", "aggregate"}` per follower, in
+        completion order, with the aggregate so far, then `{"event": "done", "aggregate"}`.
+
+    Analyses still running when the consumer stops iterating are cancelled.
+    """
+    aggregate = AudienceAggregate(population, len(sample))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def analyze(follower: str) -> Tuple[str, Optional[Dict[str, Any]], Optional[str]]:
+        async with semaphore:
+            try:
+                final_state = await analyze_profile_service(follower, tweet_count, priority=PRIORITY)
+                return follower, final_state, None
+            except HTTPException as e:
+                return follower, None, str(e.detail)
+            except Exception as e:
+                logger.warning("Audience analysis of %s raised: %s - %s", follower, type(e).__name__, e)
+                return follower, None, f"{type(e).__name__}: {e}"
+
+    tasks = [asyncio.create_task(analyze(follower)) for follower in sample]
+    try:
+        for completed in asyncio.as_completed(tasks):
+            follower, final_state, error = await completed
+            if final_state is not None:
+                aggregate.add(final_state)
+            else:
+                aggregate.add_failure()
+            yield {
+                "event": "result",
+                "username": follower,
+                "ok": final_state is not None,
+                "error": error,
+                "aggregate": aggregate.snapshot()
+            }
+        yield {"event": "done", "aggregate": aggregate.snapshot()}
+    finally:
+        for task in tasks:
+            task.cancel()
\ No newline at end of file
@@ -0,0 +1,5 @@
+"""
+Offline bulk mode: analyzes many profiles through the provider's batch API instead of
+synchronous LLM calls (see `runner`).
+"""
+from .runner import collect_bulk_analysis, run_bulk_analysis
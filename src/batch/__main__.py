@@ -0,0 +1,49 @@
+"""
+Command line entry point for bulk analysis.
+
+    python -m src.batch usernames.txt --tweet-count 20 --work-dir batch_runs/nightly
+    python -m src.batch usernames.txt --pack           # share calls between small profiles
+    python -m src.batch --resume batch_runs/nightly   # collect an interrupted run
+"""
+import argparse
+import asyncio
+from pathlib import Path
+
+from src.export.writer import close_result_exporter
+from src.observability.log import configure_logging
+from src.pipeline import validate_config
+from src.pipeline.constants import BATCH_POLL_INTERVAL_SECONDS
+from .runner import RESULTS_FILE, collect_bulk_analysis, run_bulk_analysis
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Analyze many profiles through the batch API.")
+    parser.add_argument("usernames", nargs="?", type=Path, help="File with one username per line")
+    parser.add_argument("--tweet-count", type=int, default=10)
+    parser.add_argument("--work-dir", type=Path, default=None)
+    parser.add_argument("--resume", type=Path, default=None, help="Work directory of a submitted run to collect")
+    parser.add_argument("--pack", action="store_true", help="Pack small profiles into shared LLM calls")
+    parser.add_argument("--poll-interval", type=float, default=BATCH_POLL_INTERVAL_SECONDS)
+    args = parser.parse_args()
+
+    configure_logging()
+    validate_config()
+    if args.resume is not None:
+        work_dir = args.resume
+        responses = asyncio.run(collect_bulk_analysis(work_dir, poll_interval=args.poll_interval))
+    else:
+        if args.usernames is None:
+            parser.error("a usernames file is required unless --resume is given")
+        usernames = [line.strip().lstrip("@") for line in args.usernames.read_text().splitlines() if line.strip()]
+        work_dir = args.work_dir or Path("batch_runs") / args.usernames.stem
+        responses = asyncio.run(run_bulk_analysis(
+            usernames, args.tweet_count, work_dir, poll_interval=args.poll_interval, pack=args.pack
+        ))
+
+    close_result_exporter()
+    failed = sum(1 for response in responses if response.error)
+    print(f"{len(responses)} profiles analyzed, {failed} with errors; results in {work_dir / RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Thin async wrapper over an OpenAI-style batch API: upload an input file, create a batch,
+poll it until it ends and download its output and error files.
+"""
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from src.observability.log import get_logger
+from src.pipeline.constants import BATCH_COMPLETION_WINDOW, BATCH_POLL_INTERVAL_SECONDS, OPENAI_API_KEY
+from .render import BATCH_ENDPOINT
+
+logger = get_logger(__name__)
+
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+class BatchFailed(RuntimeError):
+    """Raised when a batch ends without an output file."""
+
+
+def _parse_jsonl(text: str) -> List[Dict[str, Any]]:
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+class BatchClient:
+    """
+    Submits and collects batches.
+
+    Args:
+        client: An `openai.AsyncOpenAI` client. By default one is built from OPENAI_API_KEY
+            (and OPENAI_BASE_URL, which the SDK reads itself)
+    """
+
+    def __init__(self, client: Optional[Any] = None):
+        if client is None:
+            from openai import AsyncOpenAI
+
+            client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+        self._client = client
+
+    async def submit(self, input_path: Path, metadata: Optional[Dict[str, str]] = None) -> str:
+        """
+        Uploads a batch input file and starts a batch over it.
+
+        Returns:
+            The batch id
+        """
+        with open(input_path, "rb") as f:
+            uploaded = await self._client.files.create(file=f, purpose="batch")
+        batch = await self._client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=BATCH_COMPLETION_WINDOW,
+            metadata=metadata
+        )
+        logger.info("Submitted batch %s from %s", batch.id, input_path)
+        return batch.id
+
+    async def wait(self, batch_id: str, poll_interval: float = BATCH_POLL_INTERVAL_SECONDS, timeout: Optional[float] = None):
+        """
+        Polls a batch until it reaches a terminal status.
+
+        Returns:
+            The final batch object
+
+        Raises:
+            TimeoutError: If the batch is still running after `timeout` seconds
+        """
+        started = time.monotonic()
+        while True:
+            batch = await self._client.batches.retrieve(batch_id)
+            if batch.status in TERMINAL_STATUSES:
+                logger.info("Batch %s ended with status %s", batch_id, batch.status, extra={"request_counts": str(batch.request_counts)})
+                return batch
+            if timeout is not None and time.monotonic() - started > timeout:
+                raise TimeoutError(f"Batch {batch_id} still {batch.status} after {timeout:.0f}s")
+            await asyncio.sleep(poll_interval)
+
+    async def results(self, batch) -> List[Dict[str, Any]]:
+        """
+        Downloads the output and error lines of a finished batch.
+
+        Raises:
+            BatchFailed: If the batch produced neither
+        """
+        lines = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                content = await self._client.files.content(file_id)
+                lines.extend(_parse_jsonl(content.text))
+        if not lines and batch.status != "completed":
+            raise BatchFailed(f"Batch {batch.id} {batch.status}: {getattr(batch, 'errors', None)}")
+        return lines
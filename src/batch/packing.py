@@ -0,0 +1,168 @@
+"""
+Cross-profile request packing for bulk runs.
+
+Most of the tokens sent for a small profile (a short bio and a few tweets) are the
+node's system prompt and output schema. Packing groups small profiles and analyzes each
+group with one structured-output call per node. The call's schema is the node's usual
+output model with a `profile_id` added, wrapped in a `results` list. The system prompt and
+the round-trip are paid once per pack instead of once per profile.
+
+Packs are planned deterministically from the prepared states, so the results can be
+unpacked later (even by a resumed run with the same PACK_* settings) without storing the
+pack layout.
+"""
+import functools
+from typing import Any, Dict, List, Tuple
+
+from langchain_core.messages import HumanMessage
+from pydantic.v1 import Field, create_model
+
+from src.pipeline.constants import PACK_MAX_PROFILES, PACK_SMALL_PROFILE_TOKENS, PACK_TOKEN_BUDGET
+from src.pipeline.models import ProfileAnalysisState
+from src.pipeline.prompts import PACKED_PROFILE_TEXT, PACKED_PROFILES_INSTRUCTION
+from src.pipeline.utils import _prepare_prompt_inputs, _select_prompt_tweets, estimate_tokens, has_prompt_text
+from .render import (
+    BATCH_ENDPOINT,
+    BatchNode,
+    build_request_body,
+    custom_id,
+    failed_result_detail,
+    parse_tool_output
+)
+
+PACK_PREFIX = "pack-"
+
+
+def profile_text_tokens(state: ProfileAnalysisState) -> int:
+    """Estimated tokens of a profile's bio and tweets as rendered in a prompt."""
+    prompt_inputs = _prepare_prompt_inputs(state.get("user_bio"), _select_prompt_tweets(state))
+    return estimate_tokens(PACKED_PROFILE_TEXT.format(profile_id=_profile_id(0), **prompt_inputs))
+
+
+def plan_packs(
+    states: List[ProfileAnalysisState],
+    small_profile_tokens: int = PACK_SMALL_PROFILE_TOKENS,
+    token_budget: int = PACK_TOKEN_BUDGET,
+    max_profiles: int = PACK_MAX_PROFILES
+) -> Tuple[List[List[ProfileAnalysisState]], List[ProfileAnalysisState]]:
+    """
+    Groups the small profiles into packs.
+
+    Profiles are taken in order and a pack is closed once the next profile would exceed
+    the token budget or the profile limit. A pack of one is sent as a normal request.
+
+    Returns:
+        (packs, singles): the packs of at least two profiles, and the profiles analyzed alone
+    """
+    packs: List[List[ProfileAnalysisState]] = []
+    singles: List[ProfileAnalysisState] = []
+    current: List[ProfileAnalysisState] = []
+    current_tokens = 0
+
+    def close() -> None:
+        if len(current) > 1:
+            packs.append(list(current))
+        else:
+            singles.extend(current)
+        current.clear()
+
+    for state in states:
+        if state.get("error") or not has_prompt_text(state):
+            singles.append(state)
+            continue
+        tokens = profile_text_tokens(state)
+        if tokens > small_profile_tokens:
+            singles.append(state)
+            continue
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_profiles):
+            close()
+            current_tokens = 0
+        current.append(state)
+        current_tokens += tokens
+    close()
+    return packs, singles
+
+
+def pack_id(index: int) -> str:
+    return f"{PACK_PREFIX}{index:06d}"
+
+
+@functools.lru_cache(maxsize=None)
+def packed_output_model(model: type) -> type:
+    """Wraps a node's output model as `results: List[<model> + profile_id]`."""
+    item = create_model(
+        f"Profile{model.__name__}",
+        __base__=model,
+        profile_id=(str, Field(description="The profile_id of the profile this result is for."))
+    )
+    return create_model(
+        f"Packed{model.__name__}",
+        results=(List[item], Field(description="One result per profile, each tagged with its profile_id."))
+    )
+
+
+def _profile_id(position: int) -> str:
+    # Profiles are tagged by their position in the pack, so a username listed twice cannot collide
+    return str(position + 1)
+
+
+def render_pack_request(index: int, pack: List[ProfileAnalysisState], batch_node: BatchNode) -> Dict[str, Any]:
+    """Builds the batch input line analyzing every profile of a pack for one node."""
+    profiles = "\n\n".join(
+        PACKED_PROFILE_TEXT.format(
+            profile_id=_profile_id(position),
+            **_prepare_prompt_inputs(state.get("user_bio"), _select_prompt_tweets(state))
+        )
+        for position, state in enumerate(pack)
+    )
+    messages = [
+        batch_node.template.messages[0],
+        HumanMessage(content=PACKED_PROFILES_INSTRUCTION.format(count=len(pack)) + "\n\n" + profiles)
+    ]
+    body = build_request_body(batch_node, packed_output_model(batch_node.output_model()), messages)
+    return {"custom_id": custom_id(pack_id(index), batch_node.name), "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+
+
+def _parse_packed_body(batch_node: BatchNode, body: Dict[str, Any]) -> Dict[str, Any]:
+    """Parses a packed chat completion into the node's output models, by profile_id."""
+    output_model = batch_node.output_model()
+    packed = parse_tool_output(body, packed_output_model(output_model))
+    return {item.profile_id: output_model(**item.dict(exclude={"profile_id"})) for item in packed.results}
+
+
+def unpack_result(
+    pack: List[ProfileAnalysisState],
+    batch_node: BatchNode,
+    result: Dict[str, Any] | None
+) -> List[ProfileAnalysisState]:
+    """
+    Applies a packed result to every profile of the pack.
+
+    Returns:
+        The updated state of each profile, in pack order
+    """
+    response = (result or {}).get("response") or {}
+    error = None
+    outputs: Dict[str, Any] = {}
+    if result is None:
+        error = f"{batch_node.name}: no batch result"
+    elif result.get("error") or response.get("status_code") != 200:
+        error = f"{batch_node.name} batch request failed: {failed_result_detail(result)}"
+    else:
+        try:
+            outputs = _parse_packed_body(batch_node, response["body"])
+        except Exception as e:
+            error = f"{batch_node.name} packed output could not be parsed: {e}"
+
+    updated = []
+    for position, state in enumerate(pack):
+        output = outputs.get(_profile_id(position))
+        if output is not None:
+            updated.append({**state, **batch_node.update(output, state)})
+        else:
+            updated.append({
+                **state,
+                batch_node.field: None,
+                "error": error or f"{batch_node.name}: profile missing from packed result"
+            })
+    return updated
@@ -0,0 +1,204 @@
+"""
+Renders the LLM node prompts of a profile into batch API request lines, and turns the
+batch results back into node state updates.
+
+Request bodies are built with LangChain's public converters from the clients and output
+models the graph uses, so a batch request is byte-for-byte the request `/analyze` would
+send: same model, temperature, forced tool call, tool schema and prompt. Results are parsed
+into the node's output model by LangChain's tool-call parser and then handled by the
+nodes' own update functions. Packed requests (see `packing`) are built and parsed the same way.
+"""
+import json
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, convert_to_openai_messages
+from langchain_core.output_parsers.openai_tools import PydanticToolsParser, parse_tool_call
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from src.pipeline.llm import (
+    category_output_model,
+    get_category_scorer_llm,
+    get_keywords_extractor_llm,
+    get_mbti_classifier_llm,
+    get_sentiment_analyzer_llm
+)
+from src.pipeline.models import MBTIResult, ProfileAnalysisState, SentimentDirectScaledScore, TopKeywords
+from src.pipeline.nodes import (
+    category_scorer_node,
+    category_scores_update,
+    keywords_extractor_node,
+    mbti_classifier_node,
+    mbti_result_update,
+    sentiment_analyzer_node,
+    sentiment_score_update,
+    top_keywords_update
+)
+from src.pipeline.prompts import (
+    CATEGORY_SCORING_PROMPT_TEMPLATE,
+    KEYWORD_EXTRACTION_PROMPT_TEMPLATE,
+    MBTI_CLASSIFICATION_PROMPT_TEMPLATE,
+    SENTIMENT_ANALYSIS_PROMPT_TEMPLATE
+)
+from src.pipeline.utils import _prepare_prompt_inputs, _select_prompt_tweets, has_prompt_text
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+_ID_SEPARATOR = "::"
+
+
+class BatchNode(NamedTuple):
+    """An LLM node of the graph as seen by the bulk mode."""
+    name: str
+    field: str  # State key the node writes
+    template: Any
+    get_llm: Callable[[], Any]
+    output_model: Callable[[], type]  # The structured output model `get_llm` is bound to
+    update: Callable[[Any, ProfileAnalysisState], Dict[str, Any]]  # (parsed output, state) -> state update
+    node: Callable[[ProfileAnalysisState], ProfileAnalysisState]
+
+
+def _ignoring_state(update: Callable[[Any], Dict[str, Any]]) -> Callable[[Any, ProfileAnalysisState], Dict[str, Any]]:
+    return lambda response, state: update(response)
+
+
+# In graph order: results are applied in this order so errors resolve as in `/analyze`
+BATCH_NODES: Tuple[BatchNode, ...] = (
+    BatchNode("category_scorer", "category_scores", CATEGORY_SCORING_PROMPT_TEMPLATE,
+              get_category_scorer_llm, category_output_model, category_scores_update, category_scorer_node),
+    BatchNode("mbti_classifier", "mbti_result", MBTI_CLASSIFICATION_PROMPT_TEMPLATE,
+              get_mbti_classifier_llm, lambda: MBTIResult, _ignoring_state(mbti_result_update), mbti_classifier_node),
+    BatchNode("keywords_extractor", "top_keywords", KEYWORD_EXTRACTION_PROMPT_TEMPLATE,
+              get_keywords_extractor_llm, lambda: TopKeywords, _ignoring_state(top_keywords_update), keywords_extractor_node),
+    BatchNode("sentiment_analyzer", "sentiment_scaled_score", SENTIMENT_ANALYSIS_PROMPT_TEMPLATE,
+              get_sentiment_analyzer_llm, lambda: SentimentDirectScaledScore, _ignoring_state(sentiment_score_update), sentiment_analyzer_node)
+)
+
+
+def custom_id(username: str, node: str) -> str:
+    """Returns the batch request id of one node's call for one profile."""
+    return f"{username}{_ID_SEPARATOR}{node}"
+
+
+def split_custom_id(value: str) -> Tuple[str, str]:
+    """Inverse of `custom_id`: returns (username, node)."""
+    username, _, node = value.rpartition(_ID_SEPARATOR)
+    return username, node
+
+
+def _chat_model(batch_node: BatchNode) -> Any:
+    # `with_structured_output` returns RunnableBinding(model, tools=...) | parser
+    return batch_node.get_llm().first.bound
+
+
+def build_request_body(batch_node: BatchNode, output_model: type, messages: List[BaseMessage]) -> Dict[str, Any]:
+    """
+    Builds a chat completions body that forces a call of `output_model`'s tool, as the
+    node's structured-output client does.
+    """
+    model = _chat_model(batch_node)
+    tool = convert_to_openai_tool(output_model)
+    return {
+        "model": model.model_name,
+        "temperature": model.temperature,
+        "tools": [tool],
+        "parallel_tool_calls": False,
+        "tool_choice": {"type": "function", "function": {"name": tool["function"]["name"]}},
+        "messages": convert_to_openai_messages(messages)
+    }
+
+
+def parse_tool_output(body: Dict[str, Any], output_model: type) -> Any:
+    """
+    Parses the forced tool call of a chat completion into `output_model`.
+
+    Raises:
+        ValueError: If the response has no tool call
+        OutputParserException: If the arguments do not validate
+    """
+    reply = body["choices"][0]["message"]
+    message = AIMessage(
+        content=reply.get("content") or "",
+        tool_calls=[parse_tool_call(tool_call, return_id=True) for tool_call in reply.get("tool_calls") or []]
+    )
+    parsed = PydanticToolsParser(tools=[output_model], first_tool_only=True).invoke(message)
+    if parsed is None:
+        raise ValueError("no tool call in the response")
+    return parsed
+
+
+def render_request_body(batch_node: BatchNode, state: ProfileAnalysisState) -> Dict[str, Any]:
+    """
+    Builds the chat completions body one node would send for a profile.
+
+    Args:
+        batch_node: The LLM node
+        state: Profile state after fetching, preprocessing and sampling
+
+    Returns:
+        The request body
+    """
+    prompt_inputs = _prepare_prompt_inputs(state.get("user_bio"), _select_prompt_tweets(state))
+    messages = batch_node.template.format_messages(bio=prompt_inputs["bio"], tweets_text=prompt_inputs["tweets_text"])
+    return build_request_body(batch_node, batch_node.output_model(), messages)
+
+
+def render_profile_requests(state: ProfileAnalysisState) -> List[Dict[str, Any]]:
+    """
+    Returns the batch input lines for every LLM node of a profile. Profiles without text
+    (or whose fetch failed) need no LLM calls and get no lines.
+    """
+    if state.get("error") or not has_prompt_text(state):
+        return []
+    return [
+        {
+            "custom_id": custom_id(state["username"], batch_node.name),
+            "method": "POST",
+            "url": BATCH_ENDPOINT,
+            "body": render_request_body(batch_node, state)
+        }
+        for batch_node in BATCH_NODES
+    ]
+
+
+def parse_response_body(batch_node: BatchNode, body: Dict[str, Any]) -> Any:
+    """Parses a chat completion into the node's structured output model."""
+    return parse_tool_output(body, batch_node.output_model())
+
+
+def failed_result_detail(result: Dict[str, Any]) -> str:
+    """Describes why a batch output line failed."""
+    response = result.get("response") or {}
+    detail = result.get("error") or (response.get("body") or {}).get("error") or response.get("status_code")
+    return json.dumps(detail)
+
+
+def apply_result(
+    state: ProfileAnalysisState,
+    batch_node: BatchNode,
+    result: Optional[Dict[str, Any]]
+) -> ProfileAnalysisState:
+    """
+    Applies one node's batch result (a line of the batch output file) to a profile's state.
+
+    Args:
+        state: The profile state so far
+        batch_node: The node the result belongs to
+        result: The output line, or None if the batch returned nothing for this call
+
+    Returns:
+        The updated state
+    """
+    if result is None:
+        if not has_prompt_text(state):
+            # Nothing was submitted; the node reports the missing text without calling the LLM
+            return batch_node.node(state)
+        return {**state, batch_node.field: None, "error": f"{batch_node.name}: no batch result"}
+
+    response = result.get("response") or {}
+    if result.get("error") or response.get("status_code") != 200:
+        return {**state, batch_node.field: None, "error": f"{batch_node.name} batch request failed: {failed_result_detail(result)}"}
+
+    try:
+        parsed = parse_response_body(batch_node, response["body"])
+    except Exception as e:
+        return {**state, batch_node.field: None, "error": f"{batch_node.name} output could not be parsed: {e}"}
+    return {**state, **batch_node.update(parsed, state)}
@@ -0,0 +1,285 @@
+"""
+Offline bulk analysis through the provider's batch API.
+
+A bulk run goes through these steps:
+
+1. Fetch, preprocess and sample every profile, as the graph's first nodes do.
+2. Render each profile's four LLM requests into batch input JSONL files. A file holds at
+   most BATCH_MAX_REQUESTS lines.
+3. Submit the files as batches and poll them until they end.
+4. Apply the results per profile, in graph order, and write one AnalysisResponse per line.
+   The successful ones are also appended to the Parquet export and the similarity index,
+   if they are enabled.
+
+With packing, small profiles share one call per node (see `packing`).
+
+All state needed after submission is kept in the work directory: `profiles.jsonl` holds
+the prepared states and `manifest.json` the input files and the id of each batch. The
+manifest is written before the first submission and updated as each batch is created, so
+an interrupted run can be resumed without fetching or paying for anything twice: resuming
+submits only the files that have no batch yet.
+"""
+import asyncio
+import json
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.api.models import AnalysisResponse
+from src.export.writer import export_results
+from src.observability.log import get_logger
+from src.pipeline.constants import (
+    BATCH_COST_MULTIPLIER,
+    BATCH_MAX_REQUESTS,
+    BATCH_POLL_INTERVAL_SECONDS,
+    FETCH_CONCURRENCY
+)
+from src.pipeline.models import ProfileAnalysisState, initial_state
+from src.pipeline.nodes import data_fetcher_node, tweet_preprocessor_node, tweet_sampler_node
+from src.pipeline.usage import summarize_usage, usage_from_completion
+from src.similarity.index import index_profiles
+from .client import BatchClient
+from .packing import pack_id, plan_packs, render_pack_request, unpack_result
+from .render import BATCH_NODES, apply_result, custom_id, render_profile_requests
+
+logger = get_logger(__name__)
+
+PROFILES_FILE = "profiles.jsonl"
+MANIFEST_FILE = "manifest.json"
+RESULTS_FILE = "results.jsonl"
+
+
+# --- Preparation ---
+async def prepare_profile(username: str, tweet_count: int) -> ProfileAnalysisState:
+    """Runs the non-LLM part of the pipeline (fetch, preprocess, sample) for one profile."""
+    state = await data_fetcher_node(initial_state(username, tweet_count))
+    if state.get("error"):
+        return state
+    return tweet_sampler_node(tweet_preprocessor_node(state))
+
+
+async def prepare_profiles(
+    usernames: Iterable[str],
+    tweet_count: int,
+    concurrency: int = FETCH_CONCURRENCY
+) -> List[ProfileAnalysisState]:
+    """Prepares profiles with at most `concurrency` fetches in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def prepare(username: str) -> ProfileAnalysisState:
+        async with semaphore:
+            return await prepare_profile(username, tweet_count)
+
+    return await asyncio.gather(*(prepare(username) for username in dict.fromkeys(usernames)))
+
+
+def write_batch_inputs(
+    states: List[ProfileAnalysisState],
+    work_dir: Path,
+    max_requests: int = BATCH_MAX_REQUESTS,
+    pack: bool = False
+) -> List[Path]:
+    """
+    Writes the batch input files for all profiles. A profile's (or pack's) requests never
+    straddle two files.
+
+    Args:
+        states: Prepared profile states
+        work_dir: Directory to write the files to
+        max_requests: Most request lines per file
+        pack: Whether to pack small profiles into shared calls (see `packing`)
+
+    Returns:
+        Paths of the written files
+    """
+    paths: List[Path] = []
+    chunk: List[Dict[str, Any]] = []
+
+    def flush() -> None:
+        if chunk:
+            path = work_dir / f"batch_input_{len(paths):03d}.jsonl"
+            path.write_text("".join(json.dumps(line) + "\n" for line in chunk))
+            paths.append(path)
+            chunk.clear()
+
+    def add(lines: List[Dict[str, Any]]) -> None:
+        if chunk and len(chunk) + len(lines) > max_requests:
+            flush()
+        chunk.extend(lines)
+
+    packs, singles = plan_packs(states) if pack else ([], states)
+    for index, members in enumerate(packs):
+        add([render_pack_request(index, members, batch_node) for batch_node in BATCH_NODES])
+    for state in singles:
+        add(render_profile_requests(state))
+    flush()
+    return paths
+
+
+# --- Assembly ---
+def _usage_share(usage: Dict[str, float], members: int) -> Dict[str, float]:
+    """Splits a packed call's usage evenly between the profiles it analyzed."""
+    share = {key: round(value / members) for key, value in usage.items() if key.endswith("tokens")}
+    return {**usage, **share, "cost_usd": usage["cost_usd"] / members}
+
+
+def assemble_results(
+    states: List[ProfileAnalysisState],
+    result_lines: List[Dict[str, Any]],
+    cost_multiplier: float = BATCH_COST_MULTIPLIER,
+    pack: bool = False
+) -> List[AnalysisResponse]:
+    """
+    Applies the batch results to each prepared profile.
+
+    Args:
+        states: Prepared profile states
+        result_lines: Lines of the batches' output and error files
+        cost_multiplier: Batch price relative to synchronous calls, for the usage summary
+        pack: Whether the inputs were written with packing (the packs are planned again)
+
+    Returns:
+        One AnalysisResponse per profile, in the order of `states`
+    """
+    results = {line["custom_id"]: line for line in result_lines}
+    packs, singles = plan_packs(states) if pack else ([], states)
+    current = {state["username"]: state for state in states}
+    usage: Dict[str, Dict[str, Dict[str, float]]] = defaultdict(dict)
+
+    def record_usage(result: Optional[Dict[str, Any]], usernames: List[str], node: str) -> None:
+        body = ((result or {}).get("response") or {}).get("body") or {}
+        if body.get("usage"):
+            call_usage = usage_from_completion(body["usage"], cost_multiplier)
+            for username in usernames:
+                usage[username][node] = _usage_share(call_usage, len(usernames))
+
+    # Node by node, so each profile sees its results in graph order
+    for batch_node in BATCH_NODES:
+        for index, members in enumerate(packs):
+            usernames = [state["username"] for state in members]
+            result = results.get(custom_id(pack_id(index), batch_node.name))
+            unpacked = unpack_result([current[username] for username in usernames], batch_node, result)
+            current.update(zip(usernames, unpacked))
+            record_usage(result, usernames, batch_node.name)
+        for state in singles:
+            username = state["username"]
+            if state.get("error"):
+                continue
+            result = results.get(custom_id(username, batch_node.name))
+            current[username] = apply_result(current[username], batch_node, result)
+            record_usage(result, [username], batch_node.name)
+
+    return [_to_response(current[state["username"]], summarize_usage(usage[state["username"]])) for state in states]
+
+
+def _to_response(state: ProfileAnalysisState, usage: Dict[str, Any]) -> AnalysisResponse:
+    fields = {name: state.get(name) for name in AnalysisResponse.model_fields if name in state}
+    return AnalysisResponse(**fields, usage=usage)
+
+
+# --- Runs ---
+def _write_jsonl(path: Path, rows: Iterable[Dict[str, Any]]) -> None:
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+
+
+def _read_jsonl(path: Path) -> List[Dict[str, Any]]:
+    return [json.loads(line) for line in path.read_text().splitlines() if line.strip()]
+
+
+def _write_manifest(work_dir: Path, manifest: Dict[str, Any]) -> None:
+    # Replaced atomically so an interruption never leaves a truncated manifest
+    partial = work_dir / f".{MANIFEST_FILE}.tmp"
+    partial.write_text(json.dumps(manifest, indent=2))
+    partial.replace(work_dir / MANIFEST_FILE)
+
+
+async def submit_pending_batches(work_dir: Path, manifest: Dict[str, Any], client: BatchClient) -> List[str]:
+    """
+    Submits the manifest's input files that have no batch yet, recording each batch id in
+    the manifest as soon as it is created.
+
+    Returns:
+        The batch ids of every input file, in file order
+    """
+    batch_ids = manifest.setdefault("batch_ids", [])
+    for name in manifest.get("input_files", [])[len(batch_ids):]:
+        batch_ids.append(await client.submit(work_dir / name, metadata={"job": "bulk-analysis", "file": name}))
+        _write_manifest(work_dir, manifest)
+    return batch_ids
+
+
+async def collect_bulk_analysis(
+    work_dir: Path,
+    client: Optional[BatchClient] = None,
+    poll_interval: float = BATCH_POLL_INTERVAL_SECONDS,
+    timeout: Optional[float] = None
+) -> List[AnalysisResponse]:
+    """
+    Waits for the batches of a submitted run and writes `results.jsonl` to its work directory.
+    Also resumes a run whose process was interrupted, submitting the files that were not
+    submitted yet.
+    """
+    client = client or BatchClient()
+    manifest = json.loads((work_dir / MANIFEST_FILE).read_text())
+    states = _read_jsonl(work_dir / PROFILES_FILE)
+    # A run interrupted during submission still has files to submit
+    batch_ids = await submit_pending_batches(work_dir, manifest, client)
+
+    result_lines: List[Dict[str, Any]] = []
+    for batch_id in batch_ids:
+        batch = await client.wait(batch_id, poll_interval, timeout)
+        result_lines.extend(await client.results(batch))
+
+    responses = assemble_results(states, result_lines, pack=manifest.get("packed", False))
+    (work_dir / RESULTS_FILE).write_text("".join(response.model_dump_json() + "\n" for response in responses))
+    export_results(response.model_dump() for response in responses)
+    index_profiles(response.model_dump() for response in responses)
+    failed = sum(1 for response in responses if response.error)
+    logger.info("Bulk analysis finished", extra={"profiles": len(responses), "failed": failed, "work_dir": str(work_dir)})
+    return responses
+
+
+async def run_bulk_analysis(
+    usernames: Iterable[str],
+    tweet_count: int,
+    work_dir: Path,
+    client: Optional[BatchClient] = None,
+    poll_interval: float = BATCH_POLL_INTERVAL_SECONDS,
+    timeout: Optional[float] = None,
+    pack: bool = False
+) -> List[AnalysisResponse]:
+    """
+    Analyzes many profiles through the batch API.
+
+    Args:
+        usernames: Profiles to analyze (duplicates are analyzed once)
+        tweet_count: Tweets to fetch per profile
+        work_dir: Directory for the input files, manifest and results
+        client: Batch API client (defaults to one for the configured OpenAI account)
+        poll_interval: Seconds between status checks
+        timeout: Longest wait for each batch, in seconds (None waits for the completion window)
+        pack: Whether to pack small profiles into shared calls
+
+    Returns:
+        One AnalysisResponse per profile
+    """
+    client = client or BatchClient()
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    states = await prepare_profiles(usernames, tweet_count)
+    _write_jsonl(work_dir / PROFILES_FILE, states)
+    input_paths = write_batch_inputs(states, work_dir, pack=pack)
+    logger.info("Prepared bulk analysis", extra={"profiles": len(states), "batch_files": len(input_paths)})
+
+    manifest = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "tweet_count": tweet_count,
+        "packed": pack,
+        "input_files": [path.name for path in input_paths],
+        "batch_ids": []
+    }
+    _write_manifest(work_dir, manifest)
+    await submit_pending_batches(work_dir, manifest, client)
+
+    return await collect_bulk_analysis(work_dir, client, poll_interval, timeout)
@@ -1,18 +1,46 @@
 import asyncio
 import os
-from dotenv import load_dotenv
-from twscrape import API, AccountsPool 
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
 
+from src.observability.log import get_logger
+from src.observability.metrics import CACHE_REQUESTS, FETCH_DURATION, FETCH_ERRORS
+from src.shared.store import get_shared_store
 
-load_dotenv()
+if TYPE_CHECKING:
+    from twscrape import API
 
+logger = get_logger(__name__)
 
-async def get_api_client() -> API | None:
+
+# Both block on SQLite, so the async fetchers call them in a worker thread
+def _cached_user_id(username: str) -> "int | None":
+    store = get_shared_store()
+    if store is None:
+        return None
+    user_id = store.get("user_id", username.lower())
+    CACHE_REQUESTS.inc("user_id", "hit" if user_id is not None else "miss")
+    return user_id
+
+
+def _remember_user_id(username: str, user_id: int) -> None:
+    # Imported here: the pipeline package imports this module (through the data fetcher node)
+    from src.pipeline.constants import USER_ID_CACHE_TTL_SECONDS
+
+    store = get_shared_store()
+    if store is not None:
+        store.set("user_id", username.lower(), user_id, ttl=USER_ID_CACHE_TTL_SECONDS)
+
+
+
+async def get_api_client() -> "API | None":
     """
     Helper function to initialize and return a twscrape API client.
     IMPORTANT: You must add your X account(s) here for twscrape to work.
     """
-    print("Initializing twscrape API client...")
+    from twscrape import API, AccountsPool
+
+    logger.info("Initializing twscrape API client")
     current_pool = AccountsPool() 
 
     try:
@@ -24,17 +52,17 @@ async def get_api_client() -> API | None:
         if not all([x_username, x_password, x_email, x_email_password]):
             raise ValueError("Missing X account credentials in environment variables. Please set X_USERNAME, X_PASSWORD, X_EMAIL, and X_EMAIL_PASSWORD in your .env file.")
         
-        await current_pool.add_account(x_username, x_password, x_email, x_email_password)
-
-        
-        await current_pool.login_all() 
+        with FETCH_DURATION.time("login"):
+            await current_pool.add_account(x_username, x_password, x_email, x_email_password)
+            await current_pool.login_all() 
 
         api_client = API(current_pool)
-        print("API client initialized successfully.")
+        logger.info("API client initialized successfully")
         return api_client
 
     except Exception as e:
-        print(f"Error during API client initialization (add or login): {type(e).__name__} - {e}")
+        FETCH_ERRORS.inc("login")
+        logger.error("Error during API client initialization (add or login): %s - %s", type(e).__name__, e)
         return None
 
 async def fetch_user_details(username: str) -> dict[str, str | None] | None:
@@ -42,12 +70,15 @@ async def fetch_user_details(username: str) -> dict[str, str | None] | None:
     Fetches the bio, profile image URL, and display name of a given X user.
     Returns a dictionary with these details or None if the user is not found or an error occurs.
     """
-    print(f"Fetching details for {username} using twscrape...")
+    logger.info("Fetching details for %s using twscrape", username)
     api = await get_api_client()
 
     try:
-        user = await api.user_by_login(username)
+        with FETCH_DURATION.time("user_details"):
+            user = await api.user_by_login(username)
         if user:
+            if hasattr(user, 'id'):
+                await asyncio.to_thread(_remember_user_id, username, user.id)
             details = {
                 "bio": user.rawDescription if hasattr(user, 'rawDescription') else None,
                 "profile_image_url": user.profileImageUrl if hasattr(user, 'profileImageUrl') else None,
@@ -56,10 +87,11 @@ async def fetch_user_details(username: str) -> dict[str, str | None] | None:
 
             return details
         else:
-            print(f"User {username} not found (api.user_by_login returned None).")
+            logger.warning("User %s not found (api.user_by_login returned None)", username)
             return None
     except Exception as e:
-        print(f"Error fetching details for {username}: {type(e).__name__} - {e}")
+        FETCH_ERRORS.inc("user_details")
+        logger.error("Error fetching details for %s: %s - %s", username, type(e).__name__, e)
         return None
 
 async def fetch_recent_tweets(username: str, n: int = 10) -> list[str]:
@@ -67,35 +99,92 @@ async def fetch_recent_tweets(username: str, n: int = 10) -> list[str]:
     Fetches the N most recent tweets for a given X user.
     Returns a list of tweet text strings.
     """
-    print(f"Fetching {n} tweets for {username} using twscrape...")
+    return [record["text"] for record in await fetch_tweet_records(username, n)]
+
+
+async def fetch_tweet_records(username: str, n: int = 10) -> list[dict[str, str | None]]:
+    """
+    Fetches the N most recent tweets for a given X user with their ids and dates.
+    Returns a list of {"id", "date", "text"} dicts, newest first; the id is a string (tweet
+    ids exceed the integers JSON clients can represent) and the date is ISO 8601 in UTC.
+    """
+    logger.info("Fetching %d tweets for %s using twscrape", n, username)
     api = await get_api_client()
     if not api:
-        print("Failed to initialize twscrape API client.")
+        logger.error("Failed to initialize twscrape API client")
         return []
     
-    tweets_content = []
+    records = []
     try:
-        # First, get the user object to retrieve their ID, as user_tweets usually takes user_id
-        user = await api.user_by_login(username)
-        if not user or not hasattr(user, 'id'):
-            print(f"User {username} not found or ID missing, cannot fetch tweets.")
-            return []
-
-        user_id = user.id
-        i = 0
-        async for tweet in api.user_tweets(user_id, limit=n):
-            if hasattr(tweet, 'rawContent') and tweet.rawContent:
-                tweets_content.append(tweet.rawContent)
-                i += 1
-                if i == n:
-                    break
-
-        if not tweets_content:
-            print(f"No tweets found for {username} (or tweets had no text content).")
+        # First, resolve the user's ID, as user_tweets usually takes user_id; the details
+        # fetch (or another worker) has usually resolved it already
+        user_id = await asyncio.to_thread(_cached_user_id, username)
+        if user_id is None:
+            with FETCH_DURATION.time("user_lookup"):
+                user = await api.user_by_login(username)
+            if not user or not hasattr(user, 'id'):
+                logger.warning("User %s not found or ID missing, cannot fetch tweets", username)
+                return []
+            user_id = user.id
+            await asyncio.to_thread(_remember_user_id, username, user_id)
+
+        with FETCH_DURATION.time("user_tweets"):
+            async for tweet in api.user_tweets(user_id, limit=n):
+                if hasattr(tweet, 'rawContent') and tweet.rawContent:
+                    tweet_id = getattr(tweet, 'id', None)
+                    tweet_date = getattr(tweet, 'date', None)
+                    records.append({
+                        "id": str(tweet_id) if tweet_id is not None else None,
+                        "date": tweet_date.astimezone(timezone.utc).isoformat() if isinstance(tweet_date, datetime) else None,
+                        "text": tweet.rawContent
+                    })
+                    if len(records) == n:
+                        break
+
+        if not records:
+            logger.warning("No tweets found for %s (or tweets had no text content)", username)
  
-        return tweets_content
+        return records
 
     except Exception as e: # Generic exception handler
-        print(f"Error fetching tweets for {username}: {type(e).__name__} - {e}")
+        FETCH_ERRORS.inc("user_tweets")
+        logger.error("Error fetching tweets for %s: %s - %s", username, type(e).__name__, e)
         return []
 
+
+async def fetch_followers(username: str, limit: int = 1000) -> list[str] | None:
+    """
+    Fetches the usernames of up to `limit` followers of a given X user, most recent
+    followers first (the order X returns them in).
+    Returns None if the user is not found or an error occurs.
+    """
+    logger.info("Fetching up to %d followers of %s using twscrape", limit, username)
+    api = await get_api_client()
+    if not api:
+        logger.error("Failed to initialize twscrape API client")
+        return None
+
+    try:
+        user_id = await asyncio.to_thread(_cached_user_id, username)
+        if user_id is None:
+            with FETCH_DURATION.time("user_lookup"):
+                user = await api.user_by_login(username)
+            if not user or not hasattr(user, 'id'):
+                logger.warning("User %s not found or ID missing, cannot fetch followers", username)
+                return None
+            user_id = user.id
+            await asyncio.to_thread(_remember_user_id, username, user_id)
+
+        followers = []
+        with FETCH_DURATION.time("followers"):
+            async for follower in api.followers(user_id, limit=limit):
+                if getattr(follower, 'username', None):
+                    followers.append(follower.username)
+                    if len(followers) == limit:
+                        break
+        return followers
+
+    except Exception as e:
+        FETCH_ERRORS.inc("followers")
+        logger.error("Error fetching followers of %s: %s - %s", username, type(e).__name__, e)
+        return None
\ No newline at end of file
@@ -0,0 +1,6 @@
+"""
+Columnar export of analysis results: completed analyses are appended to date-partitioned
+Parquet files (see `writer`) and date ranges are read back for analytics (see `reader`).
+"""
+from .reader import check_columns, export_range, scan_results, stream_arrow
+from .writer import ResultExporter, close_result_exporter, export_results, get_result_exporter
\ No newline at end of file
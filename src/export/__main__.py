@@ -0,0 +1,39 @@
+"""
+Command line entry point for exporting a date range of results.
+
+    python -m src.export --start 2026-01-01 --end 2026-01-31 --output january.parquet
+    python -m src.export --start 2026-01-01 --output january.arrow --columns username,score_tech
+"""
+import argparse
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+from src.pipeline.constants import EXPORT_DIR
+from .reader import check_columns, export_range
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export analysis results of a date range to Parquet or Arrow.")
+    parser.add_argument("--start", type=date.fromisoformat, required=True, help="First day, YYYY-MM-DD")
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="Last day, YYYY-MM-DD (default: today)")
+    parser.add_argument("--output", type=Path, required=True, help="File to write; .arrow or .feather writes Arrow IPC")
+    parser.add_argument("--columns", default=None, help="Comma-separated columns (default: all)")
+    parser.add_argument("--export-dir", type=Path, default=Path(EXPORT_DIR) if EXPORT_DIR else None)
+    args = parser.parse_args()
+
+    if args.export_dir is None:
+        parser.error("--export-dir is required when EXPORT_DIR is not set")
+    columns = args.columns.split(",") if args.columns else None
+    try:
+        check_columns(columns)
+    except ValueError as e:
+        parser.error(str(e))
+    end = args.end or datetime.now(timezone.utc).date()
+    format = "arrow" if args.output.suffix in (".arrow", ".feather") else "parquet"
+
+    rows = export_range(args.export_dir, args.start, end, args.output, format, columns)
+    print(f"{rows} results from {args.start} to {end} written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,258 @@
+"""
+Append-only Parquet store of completed analyses, for analytics jobs.
+
+Each result becomes one flat row: the profile fields, one float column per category in
+CATEGORIES (null when the category was not scored), the MBTI code, the keywords, the
+sentiment score, the LLM cost and the analysis time. Rows are written to Hive-style date
+partitions, `EXPORT_DIR/date=YYYY-MM-DD/part-<id>.parquet`, so a date range is read by
+listing directories, and a category is read as one column instead of parsing every
+result.
+
+Memory stays bounded: rows are buffered per partition and written as a row group every
+EXPORT_FLUSH_ROWS rows. A file is finished (its footer written and the file renamed to
+its visible name) once it holds EXPORT_FILE_ROWS rows, once it has been open for
+EXPORT_ROLL_SECONDS, or when the exporter is closed. A background thread rolls expired
+files, so results become visible, and a crash loses at most EXPORT_ROLL_SECONDS of them,
+even when no more results arrive. Files being written are hidden (their names start with
+a dot), so readers only ever see complete files. Every process writes its own files, so
+API workers, queue workers and bulk runs can share one directory.
+
+pyarrow is imported on first use, so importing the API does not pay for it (or numpy)
+when the export is off.
+"""
+import importlib.util
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Mapping, Optional
+
+from src.observability.log import get_logger
+from src.pipeline.constants import (
+    CATEGORIES,
+    EXPORT_DIR,
+    EXPORT_FILE_ROWS,
+    EXPORT_FLUSH_ROWS,
+    EXPORT_ROLL_SECONDS
+)
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+logger = get_logger(__name__)
+
+PARTITION_FIELD = "date"
+CATEGORY_COLUMN_PREFIX = "score_"
+
+
+def pyarrow_available() -> bool:
+    """Whether pyarrow is installed (checked without importing it)."""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def result_schema() -> "pa.Schema":
+    """The schema of the exported rows (without the date partition column)."""
+    import pyarrow as pa
+
+    return pa.schema([
+        ("username", pa.string()),
+        ("user_display_name", pa.string()),
+        ("analyzed_at", pa.timestamp("ms", tz="UTC")),
+        ("tweets_analyzed", pa.int32()),
+        ("mbti_code", pa.string()),
+        ("top_keywords", pa.list_(pa.string())),
+        ("sentiment_scaled_score", pa.float32()),
+        ("llm_cost_usd", pa.float64()),
+        *[(f"{CATEGORY_COLUMN_PREFIX}{category}", pa.float32()) for category in CATEGORIES]
+    ])
+
+
+def to_row(result: Mapping[str, Any], analyzed_at: datetime) -> Dict[str, Any]:
+    """Flattens a final state or AnalysisResponse dict into an export row."""
+    category_scores = result.get("category_scores") or {}
+    usage_total = (result.get("usage") or {}).get("total") or {}
+    row = {
+        "username": result.get("username"),
+        "user_display_name": result.get("user_display_name"),
+        "analyzed_at": analyzed_at,
+        "tweets_analyzed": len(result.get("recent_tweets") or []),
+        "mbti_code": (result.get("mbti_result") or {}).get("mbti_code"),
+        "top_keywords": result.get("top_keywords"),
+        "sentiment_scaled_score": result.get("sentiment_scaled_score"),
+        "llm_cost_usd": usage_total.get("cost_usd")
+    }
+    for category in CATEGORIES:
+        score = category_scores.get(category)
+        row[f"{CATEGORY_COLUMN_PREFIX}{category}"] = score.get("score") if score else None
+    return row
+
+
+class _Partition:
+    """Buffered rows and the open file of one date partition."""
+
+    def __init__(self, names: Iterable[str]):
+        self.columns: Dict[str, List[Any]] = {name: [] for name in names}
+        self.buffered = 0
+        self.writer: Optional["pq.ParquetWriter"] = None
+        self.path: Optional[Path] = None
+        self.rows_written = 0
+        self.started = time.monotonic()
+
+
+class ResultExporter:
+    """
+    Streams analysis results into date-partitioned Parquet files. Thread-safe.
+
+    Args:
+        directory: Root of the partitioned dataset
+        flush_rows: Rows per row group
+        file_rows: Rows per file
+        roll_seconds: Longest time a file stays open (checked every quarter of it)
+    """
+
+    def __init__(
+        self,
+        directory: Path | str,
+        flush_rows: int = EXPORT_FLUSH_ROWS,
+        file_rows: int = EXPORT_FILE_ROWS,
+        roll_seconds: float = EXPORT_ROLL_SECONDS
+    ):
+        if not pyarrow_available():
+            raise RuntimeError("Result export requires the pyarrow package (pip install pyarrow).")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.flush_rows = flush_rows
+        self.file_rows = file_rows
+        self.roll_seconds = roll_seconds
+        self.schema = result_schema()
+        self._partitions: Dict[str, _Partition] = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._roller = threading.Thread(target=self._run_roller, name="export-roller", daemon=True)
+        self._roller.start()
+
+    def append(self, results: Iterable[Mapping[str, Any]], analyzed_at: Optional[datetime] = None) -> int:
+        """
+        Buffers results for export; full row groups are written out.
+
+        Args:
+            results: Final states or AnalysisResponse dicts; ones with an error are skipped
+            analyzed_at: Analysis time (defaults to now)
+
+        Returns:
+            The number of rows added
+        """
+        analyzed_at = analyzed_at or datetime.now(timezone.utc)
+        rows = [to_row(result, analyzed_at) for result in results if not result.get("error")]
+        if not rows:
+            return 0
+        key = analyzed_at.astimezone(timezone.utc).date().isoformat()
+        with self._lock:
+            partition = self._partitions.get(key)
+            if partition is None:
+                partition = self._partitions[key] = _Partition(self.schema.names)
+            for row in rows:
+                for name, values in partition.columns.items():
+                    values.append(row[name])
+            partition.buffered += len(rows)
+            if partition.buffered >= self.flush_rows:
+                self._flush(key, partition)
+                if partition.rows_written >= self.file_rows:
+                    self._finish(key, partition)
+            self._roll_expired()
+        return len(rows)
+
+    def _flush(self, key: str, partition: _Partition) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not partition.buffered:
+            return
+        if partition.writer is None:
+            partition_dir = self.directory / f"{PARTITION_FIELD}={key}"
+            partition_dir.mkdir(exist_ok=True)
+            partition.path = partition_dir / f"part-{uuid.uuid4().hex}.parquet"
+            partition.writer = pq.ParquetWriter(self._hidden(partition.path), self.schema, compression="zstd")
+        partition.writer.write_batch(pa.RecordBatch.from_pydict(partition.columns, schema=self.schema))
+        partition.rows_written += partition.buffered
+        partition.columns = {name: [] for name in self.schema.names}
+        partition.buffered = 0
+
+    def _finish(self, key: str, partition: _Partition) -> None:
+        """Writes out the buffer and makes the partition's open file visible."""
+        if partition.buffered:
+            self._flush(key, partition)
+        if partition.writer is not None:
+            partition.writer.close()
+            os.replace(self._hidden(partition.path), partition.path)
+            logger.info("Finished export file %s", partition.path, extra={"rows": partition.rows_written})
+        self._partitions.pop(key, None)
+
+    def _run_roller(self) -> None:
+        while not self._closed.wait(self.roll_seconds / 4):
+            try:
+                with self._lock:
+                    self._roll_expired()
+            except Exception as e:
+                logger.warning("Could not roll export files: %s - %s", type(e).__name__, e)
+
+    def _roll_expired(self) -> None:
+        now = time.monotonic()
+        for key, partition in list(self._partitions.items()):
+            if now - partition.started >= self.roll_seconds:
+                self._finish(key, partition)
+
+    @staticmethod
+    def _hidden(path: Path) -> Path:
+        return path.with_name(f".{path.name}")
+
+    def close(self) -> None:
+        """Stops the background roll and finishes every open file."""
+        self._closed.set()
+        self._roller.join()
+        with self._lock:
+            for key, partition in list(self._partitions.items()):
+                self._finish(key, partition)
+
+
+_exporter: Optional[ResultExporter] = None
+_exporter_unavailable = False
+_exporter_lock = threading.Lock()
+
+
+def get_result_exporter() -> Optional[ResultExporter]:
+    """Returns the process-wide exporter, or None when EXPORT_DIR is unset or pyarrow is missing."""
+    global _exporter, _exporter_unavailable
+    if not EXPORT_DIR or _exporter_unavailable:
+        return None
+    with _exporter_lock:
+        if _exporter is None:
+            if not pyarrow_available():
+                logger.warning("EXPORT_DIR is set but pyarrow is not installed; results are not exported")
+                _exporter_unavailable = True
+                return None
+            _exporter = ResultExporter(EXPORT_DIR)
+        return _exporter
+
+
+def export_results(results: Iterable[Mapping[str, Any]]) -> None:
+    """Appends results to the configured export. Failures are logged, never raised."""
+    exporter = get_result_exporter()
+    if exporter is None:
+        return
+    try:
+        exporter.append(results)
+    except Exception as e:
+        logger.warning("Could not export results: %s - %s", type(e).__name__, e)
+
+
+def close_result_exporter() -> None:
+    """Finishes the open export files; called on shutdown."""
+    global _exporter
+    with _exporter_lock:
+        if _exporter is not None:
+            _exporter.close()
+            _exporter = None
@@ -1,9 +1,27 @@
 """
 API client functions for interacting with the backend.
 """
+from urllib.parse import urlencode
+
 import requests
 import streamlit as st
-from .config import ANALYZE_ENDPOINT
+from .config import ANALYZE_ENDPOINT, AVATAR_ENDPOINT
+
+def avatar_url(image_url: str | None, size: int) -> str:
+    """
+    Build the URL of a profile image's thumbnail on the API's image proxy.
+    
+    Args:
+        image_url: Original profile image URL, or None for the placeholder
+        size: Displayed size in pixels
+        
+    Returns:
+        Thumbnail URL
+    """
+    params = {"size": size}
+    if image_url:
+        params["url"] = image_url
+    return f"{AVATAR_ENDPOINT}?{urlencode(params)}"
 
 def call_analyze_api(username: str, tweet_count: int):
     """
@@ -14,7 +14,7 @@ if project_root not in sys.path:
 from src.frontend.config import PAGE_TITLE, PAGE_LAYOUT
 from src.frontend.styles import CUSTOM_CSS, SENTIMENT_LEGEND_HTML
 from src.frontend.api import call_analyze_api
-from src.frontend.visualizations import create_sentiment_chart, create_topics_chart
+from src.frontend.visualizations import create_sentiment_chart, create_sentiment_timeseries_chart, create_topics_chart
 from src.frontend.components import display_persona_card, display_detailed_info
 
 
@@ -58,6 +58,11 @@ if analyze_button and username_input:
             fig = create_sentiment_chart(scaled)
             st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False})
             st.markdown(SENTIMENT_LEGEND_HTML, unsafe_allow_html=True)
+            timeseries = analysis_results.get("sentiment_timeseries")
+            if timeseries and len(timeseries.get("rolling", [])) > 1:
+                st.caption("Sentiment over time")
+                fig = create_sentiment_timeseries_chart(timeseries)
+                st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False})
         else:
             st.info("Sentiment analysis not available.")
         
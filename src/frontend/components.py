@@ -2,6 +2,8 @@
 Reusable UI components for the application.
 """
 import streamlit as st
+from .api import avatar_url
+from .config import AVATAR_SIZE
 from .styles import render_tags
 
 def display_persona_card(analysis_results, username_input):
@@ -21,7 +23,7 @@ def display_persona_card(analysis_results, username_input):
         # Profile image
         with col_img:
             url = analysis_results.get("user_profile_image_url")
-            st.image(url or "https://via.placeholder.com/110/007ACC/FFFFFF?Text=User", width=80)
+            st.image(avatar_url(url, AVATAR_SIZE), width=AVATAR_SIZE)
         
         # User info
         with col_info:
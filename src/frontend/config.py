@@ -3,6 +3,10 @@ import os
 # API Configuration
 API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
 ANALYZE_ENDPOINT = f"{API_BASE_URL}/analyze"
+# Images are loaded by the browser, so they need a URL the browser can reach
+PUBLIC_API_BASE_URL = os.getenv("PUBLIC_API_BASE_URL", API_BASE_URL)
+AVATAR_ENDPOINT = f"{PUBLIC_API_BASE_URL}/images/avatar"
+AVATAR_SIZE = 80  # Displayed avatar width in pixels
 
 # UI Configuration
 PAGE_TITLE = "Social Profiler"
@@ -139,4 +139,62 @@ def create_topics_chart(topic_scores):
         plot_bgcolor="rgba(0,0,0,0)"
     )
     
-    return fig 
\ No newline at end of file
+    return fig
+
+def create_sentiment_timeseries_chart(timeseries):
+    """
+    Create a chart of per-tweet sentiment over time with its rolling mean.
+    
+    Args:
+        timeseries: The `sentiment_timeseries` of an analysis (points and rolling windows)
+        
+    Returns:
+        Plotly figure object
+    """
+    points = [point for point in timeseries.get("points", []) if point.get("date")]
+    rolling = timeseries.get("rolling", [])
+    window_days = timeseries.get("window_days", 7)
+    
+    fig = go.Figure()
+    
+    # Background bands matching the sentiment gauge
+    for low, high, color in SENTIMENT_COLORS:
+        fig.add_hrect(y0=low, y1=high, fillcolor=color, opacity=0.12, line_width=0, layer="below")
+    
+    # One marker per tweet
+    fig.add_trace(
+        go.Scatter(
+            x=[point["date"] for point in points], 
+            y=[point["score"] for point in points], 
+            mode="markers", 
+            name="Tweet", 
+            marker=dict(size=7, color="rgba(255,255,255,0.6)"), 
+            hovertemplate="%{x|%b %d, %H:%M}: %{y:.1f}<extra></extra>"
+        )
+    )
+    
+    # Rolling mean with its min-max range
+    fig.add_trace(
+        go.Scatter(
+            x=[window["date"] for window in rolling], 
+            y=[window["mean"] for window in rolling], 
+            mode="lines", 
+            name=f"{window_days:g}-day mean", 
+            line=dict(color="#17a2b8", width=3, shape="spline"), 
+            customdata=[[window["min"], window["max"], window["count"]] for window in rolling], 
+            hovertemplate="%{x|%b %d}: %{y:.1f} (range %{customdata[0]:.0f}-%{customdata[1]:.0f}, %{customdata[2]} tweets)<extra></extra>"
+        )
+    )
+    
+    # Layout settings
+    fig.update_layout(
+        height=320, 
+        margin=dict(l=10, r=10, t=30, b=20),
+        yaxis=dict(range=[0, 100], title="Sentiment", fixedrange=True),
+        xaxis=dict(showgrid=False),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, x=0),
+        paper_bgcolor="rgba(0,0,0,0)", 
+        plot_bgcolor="rgba(0,0,0,0)"
+    )
+    
+    return fig
\ No newline at end of file
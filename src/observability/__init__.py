@@ -0,0 +1 @@
+# Observability package: metrics and other runtime instrumentation.
\ No newline at end of file
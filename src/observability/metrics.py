@@ -0,0 +1,231 @@
+"""
+Low-overhead in-process metrics rendered in the Prometheus text exposition format.
+
+Metric updates are a dictionary lookup and an addition under a per-metric lock,
+so they can be called from the request hot path and from worker threads.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry: List["_Metric"] = []
+_collectors: List[Callable[[], List[str]]] = []
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str], extra: str = "") -> str:
+    """Formats a label set as `{a="x",b="y"}` (empty string if there are no labels)."""
+    pairs = [
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(labelnames, labelvalues)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    """Formats a sample value, printing whole numbers without a decimal point."""
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """Base class holding the metric name, help text and label names."""
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labelvalues: Tuple[str, ...]) -> Tuple[str, ...]:
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labelvalues}")
+        return labelvalues
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """A monotonically increasing value."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        return self._values.get(self._key(labelvalues), 0.0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = list(self._values.items())
+        for labelvalues, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """A value that can go up and down."""
+    kind = "gauge"
+
+    def dec(self, *labelvalues: str, amount: float = 1.0) -> None:
+        self.inc(*labelvalues, amount=-amount)
+
+    def set(self, *labelvalues: str, value: float) -> None:
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, plus their sum and count."""
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (last is +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        key = self._key(labelvalues)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labelvalues: str) -> int:
+        series = self._series.get(self._key(labelvalues))
+        return series[2] if series else 0
+
+    @contextmanager
+    def time(self, *labelvalues: str) -> Iterator[None]:
+        """Observes the wall-clock duration of the wrapped block in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labelvalues)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = [(key, (list(s[0]), s[1], s[2])) for key, s in self._series.items()]
+        for labelvalues, (bucket_counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, labelvalues, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def register_collector(collector: Callable[[], List[str]]) -> None:
+    """
+    Registers a function that returns extra exposition lines computed at scrape time.
+    """
+    _collectors.append(collector)
+
+
+def render_metrics() -> str:
+    """
+    Renders every registered metric in the Prometheus text format (version 0.0.4).
+    """
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
+
+
+# --- HTTP ---
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests handled.", ["method", "path", "status"])
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being handled.")
+HTTP_REQUEST_DURATION = Histogram("http_request_duration_seconds", "HTTP request latency.", ["method", "path"])
+
+# --- Scheduling ---
+SCHEDULER_QUEUED = Gauge("scheduler_queued", "Requests waiting for a slot of a shared resource.", ["resource", "priority"])
+SCHEDULER_ACTIVE = Gauge("scheduler_active", "Slots of a shared resource currently held.", ["resource", "priority"])
+SCHEDULER_QUEUE_WAIT = Histogram("scheduler_queue_wait_seconds", "Time spent waiting for a slot of a shared resource.", ["resource", "priority"])
+
+# --- Pipeline ---
+GRAPH_NODE_DURATION = Histogram("graph_node_duration_seconds", "Wall-clock time spent in each graph node.", ["node"])
+LLM_ERRORS = Counter("llm_errors_total", "LLM calls that raised an error.", ["node"])
+LLM_RETRIES = Counter("llm_retries_total", "LLM calls retried after a transient error.", ["node"])
+LLM_CALL_DURATION = Histogram("llm_call_duration_seconds", "Latency of successful LLM calls, including retries and hedging.", ["node"])
+LLM_HEDGES = Counter("llm_hedged_requests_total", "Duplicate LLM requests fired after the hedge delay, and how many of them won.", ["node", "outcome"])
+LLM_RATE_LIMITED = Counter("llm_rate_limited_total", "LLM responses rejected with HTTP 429.")
+LLM_RATE_LIMIT_QUEUE = Gauge("llm_rate_limit_queue_depth", "LLM calls waiting for rate limit capacity.")
+LLM_RATE_LIMIT_WAIT = Histogram("llm_rate_limit_wait_seconds", "Time LLM calls waited for rate limit capacity.")
+LLM_DEADLINE_EXCEEDED = Counter("llm_deadline_exceeded_total", "LLM calls abandoned because the request deadline passed.", ["node"])
+LLM_TOKENS = Counter("llm_tokens_total", "LLM tokens consumed.", ["node", "kind"])
+LLM_COST = Counter("llm_cost_usd_total", "Estimated LLM spend in USD.", ["node"])
+
+# --- Data fetching ---
+FETCH_DURATION = Histogram("twscrape_fetch_duration_seconds", "Latency of twscrape fetches.", ["operation"])
+FETCH_ERRORS = Counter("twscrape_fetch_errors_total", "twscrape fetches that failed.", ["operation"])
+
+# --- Worker mode ---
+WORKER_TASKS = Counter("worker_tasks_total", "Analysis tasks processed by the worker, by outcome.", ["outcome"])
+WORKER_TASK_DURATION = Histogram("worker_task_duration_seconds", "Time the worker spent on each analysis task.")
+
+# --- Watchlist ---
+WATCHLIST_REFRESHES = Counter("watchlist_refreshes_total", "Watchlist entries refreshed, by outcome (analyzed, unchanged, failed).", ["outcome"])
+WATCHLIST_SCHEDULE_LAG = Histogram(
+    "watchlist_schedule_lag_seconds",
+    "Time from a watchlist entry falling due to its refresh starting.",
+    buckets=(1.0, 5.0, 15.0, 30.0, 60.0, 300.0, 900.0, 1800.0, 3600.0, 7200.0, 21600.0, 86400.0)
+)
+WATCHLIST_ENTRIES = Gauge("watchlist_entries", "Accounts on the watchlist.")
+WATCHLIST_OVERDUE = Gauge("watchlist_overdue_entries", "Watchlist entries past their due time and not yet being refreshed.")
+WATCHLIST_MAX_LAG = Gauge("watchlist_max_lag_seconds", "How long the most overdue watchlist entry has been due.")
+
+# --- Caches ---
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by result (hit or miss).", ["cache", "result"])
+
+
+def _cache_hit_ratio_lines() -> List[str]:
+    """Derives a hit ratio gauge per cache from CACHE_REQUESTS."""
+    totals: Dict[str, List[float]] = {}
+    with CACHE_REQUESTS._lock:
+        for (cache, result), value in CACHE_REQUESTS._values.items():
+            hits_and_total = totals.setdefault(cache, [0.0, 0.0])
+            if result == "hit":
+                hits_and_total[0] += value
+            hits_and_total[1] += value
+    lines = ["# HELP cache_hit_ratio Fraction of cache lookups that were hits.", "# TYPE cache_hit_ratio gauge"]
+    for cache, (hits, total) in totals.items():
+        lines.append(f'cache_hit_ratio{{cache="{cache}"}} {_format_value(hits / total if total else 0.0)}')
+    return lines
+
+
+register_collector(_cache_hit_ratio_lines)
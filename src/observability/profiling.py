@@ -0,0 +1,247 @@
+"""
+Opt-in per-request profiling.
+
+When ENABLE_REQUEST_PROFILING is set, a request can ask for a profile (`?profile=true`
+or the `X-Profile: 1` header). The graph run for that request then records:
+
+- a wall-clock timeline of every node (start offset, duration and, for sync nodes, the
+  CPU time of the thread that ran it), and
+- a statistical stack profile: a background thread samples the stacks of only the
+  threads currently running one of this request's sync nodes, so concurrent requests do
+  not pollute the result. Stacks are stored in the collapsed format understood by
+  flamegraph.pl and speedscope, prefixed with the node name.
+
+Async nodes (such as data_fetcher) only appear in the timeline: they run on the event
+loop thread, whose stack at any moment may belong to another request, so it is never
+sampled.
+
+Profiles are written to PROFILE_DIR as `<profile_id>.json` and `<profile_id>.collapsed`,
+off the event loop.
+Requests that do not ask for a profile only pay for a context variable lookup per node.
+"""
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+PROFILE_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+MAX_STACK_DEPTH = 64
+
+# Profile being captured for the current request (None when profiling is off)
+profile_var: ContextVar[Optional["RequestProfile"]] = ContextVar("request_profile", default=None)
+
+
+def _profiling_settings() -> Dict[str, Any]:
+    """Reads the profiling configuration from the environment."""
+    return {
+        "enabled": os.getenv("ENABLE_REQUEST_PROFILING", "false").lower() in ("1", "true", "yes"),
+        "directory": Path(os.getenv("PROFILE_DIR", "profiles")),
+        "interval_ms": float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5")),
+        "max_files": int(os.getenv("PROFILE_MAX_FILES", "50"))
+    }
+
+
+def profiling_enabled() -> bool:
+    """Returns whether per-request profiling may be requested."""
+    return _profiling_settings()["enabled"]
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class RequestProfile:
+    """
+    Profile of a single request: the node timeline and sampled stacks.
+
+    Args:
+        request_id: Correlation id of the profiled request
+        interval_ms: Stack sampling interval
+    """
+
+    def __init__(self, request_id: Optional[str], interval_ms: float = 5.0):
+        self.profile_id = uuid.uuid4().hex
+        self.request_id = request_id
+        self.interval = interval_ms / 1000
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.timeline: List[Dict[str, Any]] = []
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._active_threads: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    # --- Node timeline ---
+    @contextmanager
+    def node(self, name: str, exclusive_thread: bool = True) -> Iterator[None]:
+        """
+        Records a node's wall-clock span. Nodes that have their thread to themselves (sync
+        nodes) also get their CPU time measured and their stacks sampled; nodes on a shared
+        thread such as the event loop only get the span.
+        """
+        thread_id = threading.get_ident()
+        if exclusive_thread:
+            with self._lock:
+                self._active_threads[thread_id] = name
+        start = time.perf_counter()
+        cpu_start = time.thread_time() if exclusive_thread else None
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self._active_threads.pop(thread_id, None)
+                self.timeline.append({
+                    "node": name,
+                    "start_ms": round((start - self._started) * 1000, 3),
+                    "duration_ms": round((end - start) * 1000, 3),
+                    "cpu_ms": round((time.thread_time() - cpu_start) * 1000, 3) if cpu_start is not None else None,
+                    "thread": thread_id,
+                    "status": status
+                })
+
+    # --- Stack sampling ---
+    def _sample_once(self) -> None:
+        with self._lock:
+            active = dict(self._active_threads)
+        if not active:
+            return
+        frames = sys._current_frames()
+        for thread_id, node_name in active.items():
+            frame = frames.get(thread_id)
+            labels = []
+            while frame is not None and len(labels) < MAX_STACK_DEPTH:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join([node_name, *reversed(labels)])] += 1
+                self.samples += 1
+
+    def _run_sampler(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample_once()
+
+    def start(self) -> None:
+        self._sampler = threading.Thread(target=self._run_sampler, name=f"profiler-{self.profile_id[:8]}", daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    # --- Output ---
+    def collapsed(self) -> str:
+        """Returns the sampled stacks in the collapsed (flamegraph) format."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "profile_id": self.profile_id,
+            "request_id": self.request_id,
+            "started_at": self.started_at,
+            "duration_ms": round((time.perf_counter() - self._started) * 1000, 3),
+            "sample_interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "timeline": sorted(self.timeline, key=lambda entry: entry["start_ms"]),
+            "top_stacks": [{"stack": stack, "samples": count} for stack, count in self.stacks.most_common(20)]
+        }
+
+
+def _prune_profiles(directory: Path, max_files: int) -> None:
+    """Deletes the oldest profiles so at most `max_files` remain."""
+    profiles = sorted(directory.glob("*.json"), key=lambda path: path.stat().st_mtime)
+    for path in profiles[:max(0, len(profiles) - max_files)]:
+        path.unlink(missing_ok=True)
+        path.with_suffix(".collapsed").unlink(missing_ok=True)
+
+
+def save_profile(profile: RequestProfile) -> Path:
+    """
+    Writes a profile to PROFILE_DIR.
+
+    Args:
+        profile: The finished profile
+
+    Returns:
+        Path of the JSON document
+    """
+    settings = _profiling_settings()
+    directory = settings["directory"]
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{profile.profile_id}.json"
+    path.write_text(json.dumps(profile.to_dict(), indent=2))
+    path.with_suffix(".collapsed").write_text(profile.collapsed())
+    _prune_profiles(directory, settings["max_files"])
+    return path
+
+
+def _finish_profile(profile: RequestProfile) -> Path:
+    profile.stop()
+    return save_profile(profile)
+
+
+@asynccontextmanager
+async def capture_profile(request_id: Optional[str]) -> AsyncIterator[RequestProfile]:
+    """
+    Profiles everything run inside the block for the current request and saves the result
+    from a worker thread.
+
+    Args:
+        request_id: Correlation id stored with the profile
+
+    Yields:
+        The RequestProfile being captured
+    """
+    profile = RequestProfile(request_id, _profiling_settings()["interval_ms"])
+    token = profile_var.set(profile)
+    profile.start()
+    try:
+        yield profile
+    finally:
+        profile_var.reset(token)
+        try:
+            path = await asyncio.to_thread(_finish_profile, profile)
+            logger.info("Saved request profile to %s", path, extra={"profile_id": profile.profile_id})
+        except OSError as e:
+            logger.error("Could not save request profile %s: %s", profile.profile_id, e)
+
+
+def load_profile(profile_id: str, fmt: str = "json") -> Optional[str]:
+    """
+    Reads a stored profile.
+
+    Args:
+        profile_id: Id returned in the X-Profile-ID response header
+        fmt: "json" for the timeline document or "collapsed" for the stack profile
+
+    Returns:
+        The file contents, or None if the id is invalid or unknown
+    """
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    suffix = ".collapsed" if fmt == "collapsed" else ".json"
+    path = _profiling_settings()["directory"] / f"{profile_id}{suffix}"
+    if not path.is_file():
+        return None
+    return path.read_text()
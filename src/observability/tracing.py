@@ -0,0 +1,123 @@
+"""
+Sampled Langfuse tracing backed by a single long-lived client.
+
+The client is created once per process. Its background consumer batches trace
+events and flushes them every TRACE_FLUSH_AT events or TRACE_FLUSH_INTERVAL seconds.
+Events go into a bounded in-memory queue; when it is full, new events are dropped
+instead of blocking the request. Requests are sampled up front, so unsampled requests
+pay no tracing cost at all. Point LANGFUSE_HOST at a local stand-in collector to
+test without the hosted service.
+"""
+import os
+import random
+import threading
+from typing import Any, Dict, List, Optional
+
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _tracing_settings() -> Dict[str, Any]:
+    """Reads the tracing configuration from the environment."""
+    return {
+        "public_key": os.getenv("LANGFUSE_PUBLIC_KEY"),
+        "secret_key": os.getenv("LANGFUSE_SECRET_KEY"),
+        "host": os.getenv("LANGFUSE_HOST", "https://cloud.langfuse.com"),
+        "sample_rate": float(os.getenv("TRACE_SAMPLE_RATE", "1.0")),
+        "flush_at": int(os.getenv("TRACE_FLUSH_AT", "50")),
+        "flush_interval": float(os.getenv("TRACE_FLUSH_INTERVAL", "5"))
+    }
+
+
+def get_langfuse_client():
+    """
+    Returns the process-wide Langfuse client, creating it on first use.
+
+    Returns:
+        A Langfuse client, or None if credentials are missing or initialization fails
+    """
+    global _client
+
+    if _client is not None:
+        return _client
+
+    with _client_lock:
+        if _client is not None:
+            return _client
+
+        settings = _tracing_settings()
+        if not (settings["public_key"] and settings["secret_key"]):
+            return None
+
+        try:
+            from langfuse import Langfuse
+
+            _client = Langfuse(
+                public_key=settings["public_key"],
+                secret_key=settings["secret_key"],
+                host=settings["host"],
+                flush_at=settings["flush_at"],
+                flush_interval=settings["flush_interval"]
+            )
+            logger.info("Langfuse tracing client initialized", extra={"langfuse_host": settings["host"]})
+        except Exception as e:
+            logger.warning("Failed to initialize Langfuse client: %s", e)
+            return None
+
+    return _client
+
+
+def get_trace_callbacks(
+    session_id: str,
+    request_id: Optional[str] = None,
+    metadata: Optional[Dict[str, Any]] = None
+) -> List[Any]:
+    """
+    Returns the LangChain callbacks that trace one request, or an empty list if the
+    request is not sampled or tracing is not configured.
+
+    Args:
+        session_id: Langfuse session to group the trace under
+        request_id: Correlation id of the request, stored in the trace metadata
+        metadata: Extra metadata attached to the trace
+
+    Returns:
+        A list containing at most one Langfuse callback handler
+    """
+    sample_rate = _tracing_settings()["sample_rate"]
+    if sample_rate <= 0 or random.random() >= sample_rate:
+        return []
+
+    client = get_langfuse_client()
+    if client is None:
+        return []
+
+    try:
+        trace = client.trace(
+            name="profile-analysis",
+            session_id=session_id,
+            metadata={**(metadata or {}), "request_id": request_id}
+        )
+        return [trace.get_langchain_handler(update_parent=True)]
+    except Exception as e:
+        logger.warning("Failed to create Langfuse trace: %s", e)
+        return []
+
+
+def flush_tracing() -> None:
+    """Blocks until all buffered trace events have been sent."""
+    if _client is not None:
+        _client.flush()
+
+
+def shutdown_tracing() -> None:
+    """Flushes buffered events and stops the background consumer threads."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.shutdown()
+            _client = None
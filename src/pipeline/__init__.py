@@ -1 +1,2 @@
+from .constants import validate_config
 from .graph import create_profiling_graph 
\ No newline at end of file
@@ -1,14 +1,165 @@
 import os
 import json
 from typing import Dict, Any
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+# Settings are read from the process environment when this module is first imported, so
+# importing it has no side effects. A `.env` file is loaded by the launcher before that
+# import: `uvicorn --env-file .env`, `python -m src.api.main`, or `python -m dotenv run --`
+# for the other entry points (see README).
 
 # --- Configuration ---
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 MODEL_NAME = os.environ.get("MODEL_NAME", "gpt-4.1")
+# USD per 1M tokens, used for cost accounting (defaults match gpt-4.1 list prices)
+MODEL_INPUT_COST_PER_1M = float(os.environ.get("MODEL_INPUT_COST_PER_1M", "2.0"))
+MODEL_OUTPUT_COST_PER_1M = float(os.environ.get("MODEL_OUTPUT_COST_PER_1M", "8.0"))
+MODEL_CACHED_INPUT_COST_PER_1M = float(os.environ.get("MODEL_CACHED_INPUT_COST_PER_1M", "0.5"))
+
+# --- Deadlines, Retries and Hedging ---
+REQUEST_DEADLINE_SECONDS = float(os.environ.get("REQUEST_DEADLINE_SECONDS", "60"))  # Budget for a whole /analyze run
+LLM_TIMEOUT_SECONDS = float(os.environ.get("LLM_TIMEOUT_SECONDS", "30"))  # Upper bound for a single LLM attempt
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_DELAY = 0.5  # Seconds; backoff is full-jitter exponential from this base
+LLM_RETRY_MAX_DELAY = 8.0
+# Hedging fires a duplicate request once a call has been pending longer than the
+# node's recent LLM_HEDGE_QUANTILE latency; the first response wins.
+LLM_HEDGE_ENABLED = os.environ.get("LLM_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+LLM_HEDGE_QUANTILE = float(os.environ.get("LLM_HEDGE_QUANTILE", "0.95"))
+LLM_HEDGE_MIN_SAMPLES = 20  # Latency samples needed per node before hedging starts
+LLM_LATENCY_WINDOW = 200  # Recent latencies kept per node for the hedge delay
+
+# --- LLM Rate Limits ---
+# Starting limits (default: OpenAI tier 1 for gpt-4.1); they are replaced by the limits the
+# API reports in its x-ratelimit-* headers. 0 disables a bucket.
+LLM_RPM_LIMIT = float(os.environ.get("LLM_RPM_LIMIT", "500"))
+LLM_TPM_LIMIT = float(os.environ.get("LLM_TPM_LIMIT", "30000"))
+LLM_EXPECTED_COMPLETION_TOKENS = 300  # Reserved per call on top of the prompt estimate
+
+# Threads for running the sync graph nodes. They mostly wait on LLM I/O, so this should be
+# well above the CPU count or one slow call holds up every request queued behind it. It is
+# also the number of concurrent graph runs, shared by the priority classes like the slots below.
+GRAPH_EXECUTOR_THREADS = int(os.environ.get("GRAPH_EXECUTOR_THREADS", "64"))
+
+# --- Priority Scheduling ---
+# Concurrent slots on the shared resources. Requests of every priority class compete for
+# them through weighted fair queuing; a class may hold at most its cap share of a resource.
+FETCH_CONCURRENCY = int(os.environ.get("FETCH_CONCURRENCY", "4"))  # Roughly one per twscrape account
+LLM_CONCURRENCY = int(os.environ.get("LLM_CONCURRENCY", "32"))
+PRIORITY_CLASSES = ("interactive", "batch", "background")
+DEFAULT_PRIORITY = "interactive"
+PRIORITY_WEIGHTS = {
+    "interactive": float(os.environ.get("PRIORITY_WEIGHT_INTERACTIVE", "8")),
+    "batch": float(os.environ.get("PRIORITY_WEIGHT_BATCH", "2")),
+    "background": float(os.environ.get("PRIORITY_WEIGHT_BACKGROUND", "1"))
+}
+# Largest fraction of a resource's slots a class may hold at once
+PRIORITY_CAPS = {
+    "interactive": float(os.environ.get("PRIORITY_CAP_INTERACTIVE", "1.0")),
+    "batch": float(os.environ.get("PRIORITY_CAP_BATCH", "0.5")),
+    "background": float(os.environ.get("PRIORITY_CAP_BACKGROUND", "0.25"))
+}
+
+# --- Bulk Mode (batch API) ---
+BATCH_COMPLETION_WINDOW = os.environ.get("BATCH_COMPLETION_WINDOW", "24h")
+BATCH_MAX_REQUESTS = int(os.environ.get("BATCH_MAX_REQUESTS", "50000"))  # Provider limit per batch file
+BATCH_POLL_INTERVAL_SECONDS = float(os.environ.get("BATCH_POLL_INTERVAL_SECONDS", "30"))
+BATCH_COST_MULTIPLIER = float(os.environ.get("BATCH_COST_MULTIPLIER", "0.5"))  # Batch API price relative to sync calls
+# Packing: profiles whose bio and tweets fit in PACK_SMALL_PROFILE_TOKENS share one call per
+# node with other small profiles, up to PACK_TOKEN_BUDGET of profile text per call
+PACK_SMALL_PROFILE_TOKENS = int(os.environ.get("PACK_SMALL_PROFILE_TOKENS", "400"))
+PACK_TOKEN_BUDGET = int(os.environ.get("PACK_TOKEN_BUDGET", "3000"))
+PACK_MAX_PROFILES = int(os.environ.get("PACK_MAX_PROFILES", "8"))  # Also bounds the completion size
+
+# --- Response Encoding ---
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))  # Smaller bodies are sent uncompressed
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # Close to gzip -9 in size at a fraction of brotli 11's CPU time
+
+# --- Image Proxy (see src.api.images) ---
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", "image_cache")
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Hosts images may be fetched from; the proxy must not become an open relay into the network
+IMAGE_ALLOWED_HOSTS = [
+    host.strip().lower() for host in os.environ.get("IMAGE_ALLOWED_HOSTS", "pbs.twimg.com,abs.twimg.com").split(",") if host.strip()
+]
+IMAGE_FETCH_TIMEOUT_SECONDS = float(os.environ.get("IMAGE_FETCH_TIMEOUT_SECONDS", "5"))
+IMAGE_MAX_SOURCE_BYTES = 5 * 1024 * 1024  # Larger originals are refused
+# Originals with more pixels are refused before decoding: a small file can declare huge dimensions
+IMAGE_MAX_SOURCE_PIXELS = 4096 * 4096
+IMAGE_MAX_SIZE = 400  # Largest thumbnail edge in pixels
+IMAGE_JPEG_QUALITY = 85
+IMAGE_CACHE_MAX_AGE_SECONDS = 30 * 24 * 3600  # Thumbnails are immutable: a new avatar has a new URL
+
+# --- Shared State (across API workers, see src.shared.store) ---
+SHARED_STORE_PATH = os.environ.get("SHARED_STORE_PATH", "")  # SQLite file shared by the workers on a host; unset keeps state per process
+SHARED_STORE_BUSY_TIMEOUT_MS = int(os.environ.get("SHARED_STORE_BUSY_TIMEOUT_MS", "5000"))  # How long a write waits for another process's write
+SHARED_STORE_PURGE_INTERVAL_SECONDS = float(os.environ.get("SHARED_STORE_PURGE_INTERVAL_SECONDS", "300"))  # How often expired entries are deleted
+# Completed analyses are served from the shared store for this long (0 disables the cache)
+ANALYSIS_CACHE_TTL_SECONDS = float(os.environ.get("ANALYSIS_CACHE_TTL_SECONDS", "900"))
+# Username -> user id resolutions; ids never change, but a username can be released and taken by another account
+USER_ID_CACHE_TTL_SECONDS = float(os.environ.get("USER_ID_CACHE_TTL_SECONDS", "86400"))
+
+# --- Worker Mode (task queue, see src.worker) ---
+TASK_QUEUE_URL = os.environ.get("TASK_QUEUE_URL", "sqlite:///task_queue.sqlite3")  # Or redis://host:6379/0
+WORKER_CONCURRENCY = int(os.environ.get("WORKER_CONCURRENCY", "8"))  # Analyses a worker runs at once
+# A task's lease; renewed while the worker is alive, so it only bounds how soon a dead worker's tasks are retried
+TASK_VISIBILITY_TIMEOUT_SECONDS = float(os.environ.get("TASK_VISIBILITY_TIMEOUT_SECONDS", "60"))
+TASK_MAX_ATTEMPTS = int(os.environ.get("TASK_MAX_ATTEMPTS", "3"))
+TASK_RETRY_DELAY_SECONDS = float(os.environ.get("TASK_RETRY_DELAY_SECONDS", "5"))  # Doubles with each attempt
+TASK_POLL_INTERVAL_SECONDS = float(os.environ.get("TASK_POLL_INTERVAL_SECONDS", "1"))
+TASK_RESULT_TTL_SECONDS = float(os.environ.get("TASK_RESULT_TTL_SECONDS", "86400"))
+# How often workers delete finished tasks older than TASK_RESULT_TTL_SECONDS (SQLite queues)
+TASK_PURGE_INTERVAL_SECONDS = float(os.environ.get("TASK_PURGE_INTERVAL_SECONDS", "600"))
+
+# --- Result Export (Parquet, see src.export) ---
+EXPORT_DIR = os.environ.get("EXPORT_DIR", "")  # Unset disables the export
+EXPORT_FLUSH_ROWS = int(os.environ.get("EXPORT_FLUSH_ROWS", "1000"))  # Rows buffered per row group
+EXPORT_FILE_ROWS = int(os.environ.get("EXPORT_FILE_ROWS", "100000"))  # Rows per file before a new one is started
+# Open files are finished after this long, so results become visible to readers
+EXPORT_ROLL_SECONDS = float(os.environ.get("EXPORT_ROLL_SECONDS", "600"))
+
+# --- Similar Profiles (see src.similarity) ---
+SIMILARITY_INDEX_DIR = os.environ.get("SIMILARITY_INDEX_DIR", "")  # Unset disables the index
+# Feature weights relative to the category scores (each category weighs 1)
+SIMILARITY_SENTIMENT_WEIGHT = 1.0
+SIMILARITY_MBTI_WEIGHT = 1.5
+SIMILARITY_MAX_RESULTS = 100
+
+# --- Audience Analysis (see src.audience) ---
+AUDIENCE_SAMPLE_SIZE = int(os.environ.get("AUDIENCE_SAMPLE_SIZE", "50"))  # Followers analyzed by default
+AUDIENCE_MAX_SAMPLE_SIZE = int(os.environ.get("AUDIENCE_MAX_SAMPLE_SIZE", "500"))
+AUDIENCE_MAX_FOLLOWERS = int(os.environ.get("AUDIENCE_MAX_FOLLOWERS", "1000"))  # Followers fetched to sample from
+AUDIENCE_CONCURRENCY = int(os.environ.get("AUDIENCE_CONCURRENCY", "8"))  # Follower analyses run at once per audience
+AUDIENCE_CONFIDENCE = 0.95  # Level of the reported confidence intervals
+
+# --- Watchlist (periodic re-analysis, see src.watchlist) ---
+WATCHLIST_PATH = os.environ.get("WATCHLIST_PATH", "")  # SQLite file of the watchlist; unset disables it
+WATCHLIST_RUN_IN_API = os.environ.get("WATCHLIST_RUN_IN_API", "false").lower() in ("1", "true", "yes")
+WATCHLIST_DEFAULT_INTERVAL_SECONDS = float(os.environ.get("WATCHLIST_DEFAULT_INTERVAL_SECONDS", "86400"))
+WATCHLIST_MIN_INTERVAL_SECONDS = 300.0
+WATCHLIST_JITTER = float(os.environ.get("WATCHLIST_JITTER", "0.1"))  # Intervals vary by +-10% so entries drift apart
+WATCHLIST_CONCURRENCY = int(os.environ.get("WATCHLIST_CONCURRENCY", "4"))  # Refreshes run at once per scheduler
+WATCHLIST_MAX_PER_MINUTE = float(os.environ.get("WATCHLIST_MAX_PER_MINUTE", "30"))  # Refreshes started per minute, host-wide with a shared store (0 = unlimited)
+WATCHLIST_RETRY_SECONDS = float(os.environ.get("WATCHLIST_RETRY_SECONDS", "900"))  # Next attempt after a failed refresh
+WATCHLIST_LEASE_SECONDS = 600.0  # A claimed entry comes back after this long if its scheduler dies
+WATCHLIST_POLL_INTERVAL_SECONDS = float(os.environ.get("WATCHLIST_POLL_INTERVAL_SECONDS", "5"))
+
+def validate_config() -> None:
+    """
+    Checks the settings required to serve analyses. Called explicitly at startup, not on
+    import, so the pipeline can be imported (by tests, tools, benchmarks) without credentials.
+
+    Raises:
+        ValueError: If a required setting is missing
+    """
+    if not OPENAI_API_KEY:
+        hint = " (.env exists but was not loaded; start with --env-file .env or `python -m dotenv run --`)" \
+            if os.path.exists(".env") else ""
+        raise ValueError(f"OPENAI_API_KEY environment variable not set{hint}.")
+    if SHARED_STORE_PATH and os.path.isdir(SHARED_STORE_PATH):
+        raise ValueError("SHARED_STORE_PATH must name a database file, not a directory.")
+    if min(SHARED_STORE_BUSY_TIMEOUT_MS, SHARED_STORE_PURGE_INTERVAL_SECONDS, ANALYSIS_CACHE_TTL_SECONDS, USER_ID_CACHE_TTL_SECONDS) < 0:
+        raise ValueError("SHARED_STORE_BUSY_TIMEOUT_MS, SHARED_STORE_PURGE_INTERVAL_SECONDS and the cache TTLs must not be negative.")
 
 # --- Categories ---
 CATEGORIES = [
@@ -41,5 +192,32 @@ MBTI_TYPES: Dict[str, Dict[str, str]] = {
 
 MBTI_TYPES_JSON_STR = json.dumps(MBTI_TYPES, indent=2)
 
+# --- Tweet Preprocessing ---
+# Estimated Jaccard similarity above which two tweets are treated as near-duplicates.
+DEDUP_SIMILARITY_THRESHOLD = float(os.environ.get("DEDUP_SIMILARITY_THRESHOLD", "0.8"))
+SHINGLE_SIZE = 5  # Character shingle length used for MinHash
+MINHASH_NUM_PERM = 32  # Signature length; must be divisible by MINHASH_BANDS
+MINHASH_BANDS = 8  # LSH bands (rows per band = MINHASH_NUM_PERM // MINHASH_BANDS)
+MAX_EMOJI_RUN = 3  # Longer runs of emoji/symbols are truncated to this length
+
+# --- Category Evidence ---
+# "indices": tweets are numbered in the prompts and the category scorer cites them by number;
+# the pipeline resolves the numbers back to the tweet text. "quotes": the model quotes the text.
+EVIDENCE_MODE = os.environ.get("EVIDENCE_MODE", "indices").lower()
+
+# --- Sentiment ---
+# "aggregate": one score for the bio and tweets together. "per_tweet": every fetched tweet is
+# scored (TWEET_SENTIMENT_BATCH_SIZE per LLM call) and the response adds a time series of
+# the scores with rolling-window aggregates; the overall score is the mean tweet score.
+SENTIMENT_MODE = os.environ.get("SENTIMENT_MODE", "aggregate").lower()
+TWEET_SENTIMENT_BATCH_SIZE = int(os.environ.get("TWEET_SENTIMENT_BATCH_SIZE", "25"))
+SENTIMENT_WINDOW_DAYS = float(os.environ.get("SENTIMENT_WINDOW_DAYS", "7"))  # Trailing window of the rolling aggregates
+
+# --- Tweet Sampling ---
+# Token budget for the tweets section of each LLM node's prompt.
+PROMPT_TWEET_TOKEN_BUDGET = int(os.environ.get("PROMPT_TWEET_TOKEN_BUDGET", "1500"))
+RECENT_TWEETS_ALWAYS_KEPT = 3  # Newest tweets kept before representative sampling
+HASHED_VECTOR_DIM = 512  # Feature-hashing dimension for tweet vectors
+
 # --- Project Root Path ---
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)) 
\ No newline at end of file
@@ -1,48 +1,103 @@
-import os
-import sys
-from dotenv import load_dotenv
-from langgraph.graph import StateGraph, END
-
-# Add project root to path
-PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
-if PROJECT_ROOT not in sys.path:
-    sys.path.append(PROJECT_ROOT)
-
-# Load environment variables
-load_dotenv()
+import functools
+import inspect
+from typing import TYPE_CHECKING, Callable
 
 # Import from refactored modules
-from .constants import OPENAI_API_KEY
+from src.observability.log import request_id_var
+from src.observability.metrics import GRAPH_NODE_DURATION
+from src.observability.profiling import profile_var
+from .constants import SENTIMENT_MODE
 from .models import ProfileAnalysisState
 from .nodes import (
     data_fetcher_node,
+    tweet_preprocessor_node,
+    tweet_sampler_node,
     category_scorer_node,
     mbti_classifier_node,
     keywords_extractor_node,
-    sentiment_analyzer_node
+    sentiment_analyzer_node,
+    tweet_sentiment_node
 )
 
-# Validate API key
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY environment variable not set.")
+if TYPE_CHECKING:
+    from langgraph.graph import StateGraph
+
+# --- Node Instrumentation ---
+def _request_id_from_config() -> str | None:
+    """Returns the request id from the running graph's config, if any."""
+    from langgraph.config import get_config
+
+    try:
+        return (get_config().get("configurable") or {}).get("request_id")
+    except RuntimeError:
+        # Called outside of a graph run (e.g. a node invoked directly)
+        return None
+
+def _instrument_node(name: str, node: Callable) -> Callable:
+    """
+    Wraps a graph node so its wall-clock duration is recorded in the node latency histogram
+    and its log records carry the request id from the graph config. When the request is
+    being profiled, the node is also added to the profile's timeline.
+    Works for both sync and async nodes and keeps the wrapped signature visible to LangGraph.
+    """
+    if inspect.iscoroutinefunction(node):
+        @functools.wraps(node)
+        async def async_wrapper(*args, **kwargs):
+            token = request_id_var.set(_request_id_from_config() or request_id_var.get())
+            profile = profile_var.get()
+            try:
+                with GRAPH_NODE_DURATION.time(name):
+                    if profile is None:
+                        return await node(*args, **kwargs)
+                    # The event loop thread is shared, so neither its CPU time nor its stacks are attributable
+                    with profile.node(name, exclusive_thread=False):
+                        return await node(*args, **kwargs)
+            finally:
+                request_id_var.reset(token)
+        return async_wrapper
+
+    @functools.wraps(node)
+    def wrapper(*args, **kwargs):
+        token = request_id_var.set(_request_id_from_config() or request_id_var.get())
+        profile = profile_var.get()
+        try:
+            with GRAPH_NODE_DURATION.time(name):
+                if profile is None:
+                    return node(*args, **kwargs)
+                with profile.node(name):
+                    return node(*args, **kwargs)
+        finally:
+            request_id_var.reset(token)
+    return wrapper
 
 # --- Graph Definition ---
-def create_profiling_graph() -> StateGraph:
+def create_profiling_graph() -> "StateGraph":
     """
     Creates and configures the LangGraph for profile analysis.
+    LangGraph is imported here rather than at module level so importing the pipeline stays cheap.
     """
+    from langgraph.graph import StateGraph, END
+
     workflow = StateGraph(ProfileAnalysisState)
 
-    # Add nodes
-    workflow.add_node("data_fetcher", data_fetcher_node)
-    workflow.add_node("category_scorer", category_scorer_node)
-    workflow.add_node("mbti_classifier", mbti_classifier_node)
-    workflow.add_node("keywords_extractor", keywords_extractor_node)
-    workflow.add_node("sentiment_analyzer", sentiment_analyzer_node)
+    # Add nodes (each one instrumented with a latency histogram)
+    nodes = {
+        "data_fetcher": data_fetcher_node,
+        "tweet_preprocessor": tweet_preprocessor_node,
+        "tweet_sampler": tweet_sampler_node,
+        "category_scorer": category_scorer_node,
+        "mbti_classifier": mbti_classifier_node,
+        "keywords_extractor": keywords_extractor_node,
+        "sentiment_analyzer": tweet_sentiment_node if SENTIMENT_MODE == "per_tweet" else sentiment_analyzer_node
+    }
+    for name, node in nodes.items():
+        workflow.add_node(name, _instrument_node(name, node))
 
     # Define edges
     workflow.set_entry_point("data_fetcher")
-    workflow.add_edge("data_fetcher", "category_scorer")
+    workflow.add_edge("data_fetcher", "tweet_preprocessor")
+    workflow.add_edge("tweet_preprocessor", "tweet_sampler")
+    workflow.add_edge("tweet_sampler", "category_scorer")
     workflow.add_edge("category_scorer", "mbti_classifier")
     workflow.add_edge("mbti_classifier", "keywords_extractor")
     workflow.add_edge("keywords_extractor", "sentiment_analyzer")
@@ -1,36 +1,70 @@
-import os
-from langchain_openai import ChatOpenAI
-from .models import CategoryScores, MBTIResult, TopKeywords, SentimentDirectScaledScore
-from .constants import OPENAI_API_KEY, MODEL_NAME
+import functools
+from .models import (
+    CategoryScores,
+    CategoryScoresWithEvidenceIndices,
+    MBTIResult,
+    TopKeywords,
+    SentimentDirectScaledScore,
+    TweetSentimentScores
+)
+from .constants import EVIDENCE_MODE, OPENAI_API_KEY, MODEL_NAME, LLM_TIMEOUT_SECONDS, SENTIMENT_MODE
+from .rate_limit import RateLimitFeedback
+
+def _chat_model(temperature: float):
+    """
+    Returns a ChatOpenAI client. langchain_openai is imported on first use as it is slow to import.
+    Retries are disabled here because `resilience.invoke_llm` retries within the request deadline.
+    Response headers are kept so the rate limiter can adapt to the reported limits.
+    """
+    from langchain_openai import ChatOpenAI
 
-def get_category_scorer_llm():
-    """Returns a configured LLM for category scoring with structured output."""
     return ChatOpenAI(
         model=MODEL_NAME,
-        temperature=0,
-        api_key=OPENAI_API_KEY
-    ).with_structured_output(CategoryScores)
+        temperature=temperature,
+        api_key=OPENAI_API_KEY,
+        timeout=LLM_TIMEOUT_SECONDS,
+        max_retries=0,
+        include_response_headers=True,
+        callbacks=[RateLimitFeedback()]
+    )
+
+def category_output_model() -> type:
+    """Returns the category scorer's output model for the configured EVIDENCE_MODE."""
+    return CategoryScoresWithEvidenceIndices if EVIDENCE_MODE == "indices" else CategoryScores
 
+# The getters are cached so every call reuses one client (and its HTTP connection pool).
+# Structured output uses function calling, the only method that accepts the pydantic.v1 models.
+@functools.lru_cache(maxsize=None)
+def get_category_scorer_llm():
+    """Returns a configured LLM for category scoring with structured output (evidence per EVIDENCE_MODE)."""
+    return _chat_model(temperature=0).with_structured_output(category_output_model(), method="function_calling")
+
+@functools.lru_cache(maxsize=None)
 def get_mbti_classifier_llm():
     """Returns a configured LLM for MBTI classification with structured output."""
-    return ChatOpenAI(
-        model=MODEL_NAME, 
-        temperature=0.1, 
-        api_key=OPENAI_API_KEY
-    ).with_structured_output(MBTIResult)
+    return _chat_model(temperature=0.1).with_structured_output(MBTIResult, method="function_calling")
 
+@functools.lru_cache(maxsize=None)
 def get_keywords_extractor_llm():
     """Returns a configured LLM for keyword extraction with structured output."""
-    return ChatOpenAI(
-        model=MODEL_NAME,
-        temperature=0,
-        api_key=OPENAI_API_KEY
-    ).with_structured_output(TopKeywords)
+    return _chat_model(temperature=0).with_structured_output(TopKeywords, method="function_calling")
 
+@functools.lru_cache(maxsize=None)
 def get_sentiment_analyzer_llm():
     """Returns a configured LLM for sentiment analysis with structured output."""
-    return ChatOpenAI(
-        model=MODEL_NAME,
-        temperature=0,
-        api_key=OPENAI_API_KEY
-    ).with_structured_output(SentimentDirectScaledScore) 
\ No newline at end of file
+    return _chat_model(temperature=0).with_structured_output(SentimentDirectScaledScore, method="function_calling") 
+
+@functools.lru_cache(maxsize=None)
+def get_tweet_sentiment_llm():
+    """Returns a configured LLM for per-tweet sentiment scoring with structured output."""
+    return _chat_model(temperature=0).with_structured_output(TweetSentimentScores, method="function_calling")
+
+def warm_up_llms() -> None:
+    """
+    Builds every cached LLM client ahead of the first request, so the slow langchain_openai
+    import and client setup do not land on the first wave of concurrent requests.
+    """
+    for get_llm in (get_category_scorer_llm, get_mbti_classifier_llm, get_keywords_extractor_llm, get_sentiment_analyzer_llm):
+        get_llm()
+    if SENTIMENT_MODE == "per_tweet":
+        get_tweet_sentiment_llm()
\ No newline at end of file
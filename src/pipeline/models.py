@@ -1,5 +1,5 @@
 from typing import TypedDict, List, Dict, Any, Optional
-from langchain_core.pydantic_v1 import BaseModel, Field
+from pydantic.v1 import BaseModel, Field
 
 # --- State Definition ---
 class ProfileAnalysisState(TypedDict):
@@ -8,13 +8,39 @@ class ProfileAnalysisState(TypedDict):
     user_display_name: str | None
     user_profile_image_url: str | None
     recent_tweets: List[str] | None
+    tweet_records: List[Dict[str, Any]] | None  # Ids and dates of recent_tweets, in per-tweet sentiment mode
     tweet_count_requested: int
+    prompt_tweets: List[str] | None
+    preprocessing_stats: Dict[str, int] | None
+    sampling_stats: Dict[str, int] | None
     category_scores: Dict[str, Dict[str, Any]] | None
     mbti_result: Dict[str, str] | None 
     top_keywords: List[str] | None
     sentiment_scaled_score: float | None
+    sentiment_timeseries: Dict[str, Any] | None
     error: str | None
 
+def initial_state(username: str, tweet_count: int) -> ProfileAnalysisState:
+    """Returns the state a profile analysis starts from."""
+    return {
+        "username": username,
+        "user_bio": None, 
+        "user_display_name": None,
+        "user_profile_image_url": None,
+        "recent_tweets": None,
+        "tweet_records": None,
+        "tweet_count_requested": tweet_count,
+        "prompt_tweets": None,
+        "preprocessing_stats": None,
+        "sampling_stats": None,
+        "category_scores": None,
+        "mbti_result": None,
+        "top_keywords": None,
+        "sentiment_scaled_score": None,
+        "sentiment_timeseries": None,
+        "error": None
+    }
+
 # --- Category Scorer Models ---
 class CategoryScoreWithEvidence(BaseModel):
     category: str = Field(description="The relevant category that was identified and scored.")
@@ -24,6 +50,15 @@ class CategoryScoreWithEvidence(BaseModel):
 class CategoryScores(BaseModel):
     scores: List[CategoryScoreWithEvidence] = Field(description="A list of scores and evidence for ONLY the relevant categories identified in the text.")
 
+# Evidence cited by number: far fewer output tokens than quoting, resolved to text by the pipeline
+class CategoryScoreWithEvidenceIndices(BaseModel):
+    category: str = Field(description="The relevant category that was identified and scored.")
+    score: float = Field(description="The relevance score for this category, from 0 to 100.")
+    evidence: List[int] = Field(description="The numbers of the tweets that support the score for this category (0 for the bio).")
+
+class CategoryScoresWithEvidenceIndices(BaseModel):
+    scores: List[CategoryScoreWithEvidenceIndices] = Field(description="A list of scores and evidence for ONLY the relevant categories identified in the text.")
+
 # --- Keywords Extractor Model ---
 class TopKeywords(BaseModel):
     keywords: List[str] = Field(description="A list of the top 3-5 keywords or hashtags that summarize the provided text.")
@@ -36,4 +71,12 @@ class MBTIResult(BaseModel):
 
 # --- Sentiment Analyzer Model ---
 class SentimentDirectScaledScore(BaseModel):
-    scaled_sentiment_score: float = Field(description="A single sentiment score from 0 (most negative) to 100 (most positive), with 50 representing neutral.") 
\ No newline at end of file
+    scaled_sentiment_score: float = Field(description="A single sentiment score from 0 (most negative) to 100 (most positive), with 50 representing neutral.")
+
+# Per-tweet scores: tweets are numbered in the prompt and scored by number
+class TweetSentimentScore(BaseModel):
+    tweet: int = Field(description="The number of the tweet.")
+    score: float = Field(description="The tweet's sentiment from 0 (most negative) to 100 (most positive), with 50 representing neutral.")
+
+class TweetSentimentScores(BaseModel):
+    scores: List[TweetSentimentScore] = Field(description="One score for EVERY numbered tweet.")
\ No newline at end of file
@@ -1,35 +1,44 @@
 import asyncio
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Mapping, Sequence
 from .models import ProfileAnalysisState
-from .constants import CATEGORIES, MBTI_TYPES
+from .constants import CATEGORIES, MBTI_TYPES, SENTIMENT_MODE
 from .prompts import (
     CATEGORY_SCORING_PROMPT_TEMPLATE,
     MBTI_CLASSIFICATION_PROMPT_TEMPLATE, 
     KEYWORD_EXTRACTION_PROMPT_TEMPLATE,
-    SENTIMENT_ANALYSIS_PROMPT_TEMPLATE
+    SENTIMENT_ANALYSIS_PROMPT_TEMPLATE,
+    TWEET_SENTIMENT_PROMPT_TEMPLATE
 )
 from .llm import (
     get_category_scorer_llm,
     get_mbti_classifier_llm,
     get_keywords_extractor_llm,
-    get_sentiment_analyzer_llm
+    get_sentiment_analyzer_llm,
+    get_tweet_sentiment_llm
 )
-from .utils import _prepare_prompt_inputs
+from .utils import _prepare_prompt_inputs, _select_prompt_tweets, resolve_evidence
+from .preprocessing import preprocess_tweets
+from .sampling import sample_tweets
+from .sentiment import batch_scores, numbered_tweets_text, sentiment_timeseries, tweet_batches
+from .resilience import current_run_config, invoke_llm, remaining_budget, resource_slot_async, submit_in_context
 
 # Import data fetchers
-from src.data_fetcher.fetcher import fetch_user_details, fetch_recent_tweets
+from src.data_fetcher.fetcher import fetch_user_details, fetch_recent_tweets, fetch_tweet_records
+from src.observability.log import get_logger
+
+logger = get_logger(__name__)
 
 async def data_fetcher_node(state: ProfileAnalysisState) -> ProfileAnalysisState:
     """
     Fetches user bio, display name, profile image URL and recent tweets using functions from fetcher.py.
     This node is asynchronous.
     """
-    print("--- Running Data Fetcher Node ---")
+    logger.info("Running data fetcher node")
     username = state.get("username")
     tweet_count = state.get("tweet_count_requested", 10) # Default to 10 if not provided
 
     if not username:
-        print("Error: Username not provided in state for data_fetcher_node.")
+        logger.error("Username not provided in state for data_fetcher_node")
         return {
             **state,
             "user_bio": None,
@@ -40,12 +49,18 @@ async def data_fetcher_node(state: ProfileAnalysisState) -> ProfileAnalysisState
         }
 
     try:
-        # Fetch user details (bio, display name, profile image url)
-        user_details_result = await fetch_user_details(username)
-        # Fetch recent tweets
-        tweets_task = fetch_recent_tweets(username, n=tweet_count) # Use tweet_count from state
-        
-        recent_tweets_result = await tweets_task
+        # Both fetches share one twscrape slot, granted in the request's priority order
+        config = current_run_config()
+        async with resource_slot_async(config, "fetch", timeout=remaining_budget(config)):
+            # Fetch user details (bio, display name, profile image url)
+            user_details_result = await fetch_user_details(username)
+            # Fetch recent tweets; per-tweet sentiment also needs their ids and dates
+            if SENTIMENT_MODE == "per_tweet":
+                tweet_records = await fetch_tweet_records(username, n=tweet_count)
+                recent_tweets_result = [record["text"] for record in tweet_records]
+            else:
+                tweet_records = None
+                recent_tweets_result = await fetch_recent_tweets(username, n=tweet_count) # Use tweet_count from state
         
         bio = None
         display_name = None
@@ -55,9 +70,12 @@ async def data_fetcher_node(state: ProfileAnalysisState) -> ProfileAnalysisState
             bio = user_details_result.get("bio")
             display_name = user_details_result.get("display_name")
             profile_image_url = user_details_result.get("profile_image_url")
-            print(f"User details fetched: Bio_found={bool(bio)}, Name_found={bool(display_name)}, Image_found={bool(profile_image_url)}")
+            logger.info(
+                "User details fetched",
+                extra={"bio_found": bool(bio), "name_found": bool(display_name), "image_found": bool(profile_image_url)}
+            )
         else:
-            print(f"Failed to fetch user details for {username}.")
+            logger.warning("Failed to fetch user details for %s", username)
 
         
         return {
@@ -66,8 +84,18 @@ async def data_fetcher_node(state: ProfileAnalysisState) -> ProfileAnalysisState
             "user_display_name": display_name,
             "user_profile_image_url": profile_image_url,
             "recent_tweets": recent_tweets_result,
+            "tweet_records": tweet_records,
             "error": None
         }
+    except TimeoutError as e:
+        return {
+            **state,
+            "user_bio": None,
+            "user_display_name": None,
+            "user_profile_image_url": None,
+            "recent_tweets": [],
+            "error": f"Request deadline exceeded while waiting to fetch data: {str(e)}"
+        }
     except Exception as e:
         return {
             **state,
@@ -78,59 +106,132 @@ async def data_fetcher_node(state: ProfileAnalysisState) -> ProfileAnalysisState
             "error": f"Data fetching failed: {str(e)}"
         }
 
+def tweet_preprocessor_node(state: ProfileAnalysisState) -> ProfileAnalysisState:
+    """
+    Normalizes the fetched tweets and drops exact and near-duplicates before prompting.
+    The raw tweets are kept in `recent_tweets`; the cleaned ones go to `prompt_tweets`.
+    """
+    logger.info("Running tweet preprocessor node")
+    prompt_tweets, stats = preprocess_tweets(state.get("recent_tweets"))
+    logger.info("Tweet preprocessing complete", extra={"preprocessing_stats": stats})
+    return {**state, "prompt_tweets": prompt_tweets, "preprocessing_stats": stats}
+
+def tweet_sampler_node(state: ProfileAnalysisState) -> ProfileAnalysisState:
+    """
+    Selects a representative subset of the prompt tweets that fits the per-node token budget,
+    so prompt size (and LLM latency) stays flat as the requested tweet count grows.
+    """
+    logger.info("Running tweet sampler node")
+    sampled_tweets, stats = sample_tweets(_select_prompt_tweets(state))
+    logger.info("Tweet sampling complete", extra={"sampling_stats": stats})
+    return {**state, "prompt_tweets": sampled_tweets, "sampling_stats": stats}
+
+# --- LLM Output Handling ---
+# Turn a node's structured LLM output into its state update. Shared with the bulk mode
+# (src.batch), which gets the same outputs from the provider's batch API.
+def category_scores_update(response, state: ProfileAnalysisState) -> Dict[str, Any]:
+    """Keeps the scores of known categories, with their evidence resolved to text."""
+    scores_dict: Dict[str, Dict[str, Any]] = {}
+    if response and response.scores:
+        for item in response.scores:
+            if item.category in CATEGORIES:
+                scores_dict[item.category] = {
+                    "score": round(item.score, 2),
+                    "evidence": resolve_evidence(item.evidence, state)
+                }
+            else:
+                logger.warning("LLM returned score for an unknown category: %s", item.category)
+    return {"category_scores": scores_dict, "error": None}
+
+def mbti_result_update(response) -> Dict[str, Any]:
+    """Validates the MBTI code and adds the type's portrait."""
+    if response and response.mbti_code in MBTI_TYPES:
+        mbti_details = MBTI_TYPES[response.mbti_code]
+        mbti_data = {
+            "mbti_code": response.mbti_code,
+            "mbti_name": response.mbti_name,
+            "mbti_portrait": mbti_details["portrait"], 
+            "rationale": response.rationale
+        }
+        logger.info("MBTI classification successful: %s (%s)", mbti_data["mbti_code"], mbti_data["mbti_name"])
+        return {"mbti_result": mbti_data}
+    logger.warning("MBTI classification failed or returned invalid code: %s", response)
+    error_msg = "MBTI classification failed or returned an invalid MBTI code."
+    if response and response.mbti_code:
+        error_msg += f" Received code: {response.mbti_code}"
+    return {"mbti_result": None, "error": error_msg}
+
+def top_keywords_update(response) -> Dict[str, Any]:
+    """Keeps at most 5 keywords."""
+    if response and response.keywords:
+        # Ensure we only take up to 5 keywords as a safeguard, though prompt asks for 3-5
+        keywords = response.keywords[:5]
+        logger.info("Keywords extracted: %s", keywords)
+        return {"top_keywords": keywords, "error": None}
+    logger.warning("No keywords extracted or LLM response was empty")
+    return {"top_keywords": [], "error": None} # Return empty list
+
+def sentiment_score_update(response) -> Dict[str, Any]:
+    """Clamps the sentiment score to 0-100."""
+    if response and isinstance(response.scaled_sentiment_score, (float, int)):
+        # Ensure the score is within the 0-100 range
+        score = round(max(0.0, min(100.0, float(response.scaled_sentiment_score))), 2)
+        logger.info("Sentiment analysis successful. Scaled score: %s", score)
+        return {"sentiment_scaled_score": score, "error": None}
+    error_msg = "Sentiment analysis LLM response was empty, invalid, or did not contain a valid score."
+    if response:
+        error_msg += f" Received response: {response}"
+    logger.warning(error_msg)
+    return {"sentiment_scaled_score": None, "error": error_msg}
+
+def tweet_sentiment_update(records: Sequence[Mapping[str, Any]], scores: Mapping[int, float]) -> Dict[str, Any]:
+    """Averages the tweet scores into the overall score and builds their time series."""
+    if not scores:
+        error_msg = "Per-tweet sentiment scoring returned no valid scores."
+        logger.warning(error_msg)
+        return {"sentiment_scaled_score": None, "sentiment_timeseries": None, "error": error_msg}
+    score = round(sum(scores.values()) / len(scores), 2)
+    logger.info("Per-tweet sentiment scoring successful. Scaled score: %s", score, extra={"tweets_scored": len(scores)})
+    return {"sentiment_scaled_score": score, "sentiment_timeseries": sentiment_timeseries(records, scores), "error": None}
+
 def category_scorer_node(state: ProfileAnalysisState) -> ProfileAnalysisState:
     """
     Identifies relevant categories, scores them, and extracts evidence using an LLM.
     """
-    print("--- Running Category Scorer Node ---")
+    logger.info("Running category scorer node")
     user_bio = state.get("user_bio")
-    recent_tweets = state.get("recent_tweets")
+    recent_tweets = _select_prompt_tweets(state)
     
     if not user_bio and not (recent_tweets and len(recent_tweets) > 0):
-        print("No text available for category scoring.")
+        logger.warning("No text available for category scoring")
         return {**state, "category_scores": {}, "error": "No text to analyze for categories."}
 
     prompt_inputs = _prepare_prompt_inputs(user_bio, recent_tweets)
     
-    category_list_str = ", ".join(CATEGORIES)
-    
     try:
         llm = get_category_scorer_llm()
         prompt = CATEGORY_SCORING_PROMPT_TEMPLATE.format_messages(
-            categories=category_list_str,
             bio=prompt_inputs["bio"],
             tweets_text=prompt_inputs["tweets_text"]
         )
         
-        response = llm.invoke(prompt) 
-        
-        scores_dict: Dict[str, Dict[str, Any]] = {}
-        if response and response.scores:
-            for item in response.scores:
-                if item.category in CATEGORIES:
-                    scores_dict[item.category] = {
-                        "score": round(item.score, 2),
-                        "evidence": item.evidence
-                    }
-                else:
-                    print(f"Warning: LLM returned score for an unknown category: {item.category}")
-        
-        return {**state, "category_scores": scores_dict, "error": None}
+        response = invoke_llm(llm, prompt)
+        return {**state, **category_scores_update(response, state)}
 
     except Exception as e:
-        print(f"Error during category scoring: {type(e).__name__} - {e}")
+        logger.error("Error during category scoring: %s - %s", type(e).__name__, e)
         return {**state, "category_scores": None, "error": f"LLM call failed: {str(e)}"}
 
 def mbti_classifier_node(state: ProfileAnalysisState) -> ProfileAnalysisState:
     """
     Classifies the user's MBTI type based on their bio and tweets using an LLM.
     """
-    print("--- Running MBTI Classifier Node ---")
+    logger.info("Running MBTI classifier node")
     user_bio = state.get("user_bio")
-    recent_tweets = state.get("recent_tweets")
+    recent_tweets = _select_prompt_tweets(state)
 
     if not user_bio and not (recent_tweets and len(recent_tweets) > 0):
-        print("No text available for MBTI classification.")
+        logger.warning("No text available for MBTI classification")
         return {**state, "mbti_result": None, "error": "No text to analyze for MBTI."}
 
     prompt_inputs = _prepare_prompt_inputs(user_bio, recent_tweets)
@@ -138,43 +239,26 @@ def mbti_classifier_node(state: ProfileAnalysisState) -> ProfileAnalysisState:
     try:
         llm = get_mbti_classifier_llm()
         prompt = MBTI_CLASSIFICATION_PROMPT_TEMPLATE.format_messages(
-            mbti_types_list_json=str({k: {"name": v["name"], "portrait": v["portrait"]} for k, v in MBTI_TYPES.items()}),
             bio=prompt_inputs["bio"],
             tweets_text=prompt_inputs["tweets_text"]
         )
-        response = llm.invoke(prompt) 
-        
-        if response and response.mbti_code in MBTI_TYPES:
-            mbti_details = MBTI_TYPES[response.mbti_code]
-            mbti_data = {
-                "mbti_code": response.mbti_code,
-                "mbti_name": response.mbti_name,
-                "mbti_portrait": mbti_details["portrait"], 
-                "rationale": response.rationale
-            }
-            print(f"MBTI Classification successful: {mbti_data['mbti_code']} ({mbti_data['mbti_name']})")
-            return {**state, "mbti_result": mbti_data}
-        else:
-            print(f"MBTI classification failed or returned invalid code: {response}")
-            error_msg = "MBTI classification failed or returned an invalid MBTI code."
-            if response and response.mbti_code:
-                error_msg += f" Received code: {response.mbti_code}"
-            return {**state, "mbti_result": None, "error": error_msg}
+        response = invoke_llm(llm, prompt)
+        return {**state, **mbti_result_update(response)}
 
     except Exception as e:
-        print(f"Error during MBTI classification: {type(e).__name__} - {e}")
+        logger.error("Error during MBTI classification: %s - %s", type(e).__name__, e)
         return {**state, "mbti_result": None, "error": f"MBTI LLM call failed: {str(e)}"}
 
 def keywords_extractor_node(state: ProfileAnalysisState) -> ProfileAnalysisState:
     """
     Extracts top 3-5 keywords or hashtags from the user's bio and tweets using an LLM.
     """
-    print("--- Running Keywords Extractor Node ---")
+    logger.info("Running keywords extractor node")
     user_bio = state.get("user_bio")
-    recent_tweets = state.get("recent_tweets")
+    recent_tweets = _select_prompt_tweets(state)
 
     if not user_bio and not (recent_tweets and len(recent_tweets) > 0):
-        print("No text available for keyword extraction.")
+        logger.warning("No text available for keyword extraction")
         # Return empty list instead of None to be consistent with expected output type
         return {**state, "top_keywords": [], "error": "No text to analyze for keywords."}
 
@@ -186,19 +270,11 @@ def keywords_extractor_node(state: ProfileAnalysisState) -> ProfileAnalysisState
             bio=prompt_inputs["bio"],
             tweets_text=prompt_inputs["tweets_text"]
         )
-        response = llm.invoke(prompt)
-
-        if response and response.keywords:
-            # Ensure we only take up to 5 keywords as a safeguard, though prompt asks for 3-5
-            keywords = response.keywords[:5]
-            print(f"Keywords extracted: {keywords}")
-            return {**state, "top_keywords": keywords, "error": None}
-        else:
-            print("No keywords extracted or LLM response was empty.")
-            return {**state, "top_keywords": [], "error": None} # Return empty list
+        response = invoke_llm(llm, prompt)
+        return {**state, **top_keywords_update(response)}
 
     except Exception as e:
-        print(f"Error during keyword extraction: {type(e).__name__} - {e}")
+        logger.error("Error during keyword extraction: %s - %s", type(e).__name__, e)
         return {**state, "top_keywords": None, "error": f"Keyword extraction LLM call failed: {str(e)}"}
 
 def sentiment_analyzer_node(state: ProfileAnalysisState) -> ProfileAnalysisState:
@@ -206,12 +282,12 @@ def sentiment_analyzer_node(state: ProfileAnalysisState) -> ProfileAnalysisState
     Analyzes the sentiment of the user's bio and tweets using an LLM,
     outputting a single scaled score from 0 (negative) to 100 (positive).
     """
-    print("--- Running Sentiment Analyzer Node ---")
+    logger.info("Running sentiment analyzer node")
     user_bio = state.get("user_bio")
-    recent_tweets = state.get("recent_tweets")
+    recent_tweets = _select_prompt_tweets(state)
 
     if not user_bio and not (recent_tweets and len(recent_tweets) > 0):
-        print("No text available for sentiment analysis.")
+        logger.warning("No text available for sentiment analysis")
         return {**state, "sentiment_scaled_score": None, "error": "No text to analyze for sentiment."}
 
     prompt_inputs = _prepare_prompt_inputs(user_bio, recent_tweets)
@@ -222,20 +298,49 @@ def sentiment_analyzer_node(state: ProfileAnalysisState) -> ProfileAnalysisState
             bio=prompt_inputs["bio"],
             tweets_text=prompt_inputs["tweets_text"]
         )
-        response = llm.invoke(prompt)
-
-        if response and isinstance(response.scaled_sentiment_score, (float, int)):
-            # Ensure the score is within the 0-100 range
-            score = round(max(0.0, min(100.0, float(response.scaled_sentiment_score))), 2)
-            print(f"Sentiment analysis successful. Scaled score: {score}")
-            return {**state, "sentiment_scaled_score": score, "error": None}
-        else:
-            error_msg = "Sentiment analysis LLM response was empty, invalid, or did not contain a valid score."
-            if response:
-                error_msg += f" Received response: {response}"
-            print(error_msg)
-            return {**state, "sentiment_scaled_score": None, "error": error_msg}
+        response = invoke_llm(llm, prompt)
+        return {**state, **sentiment_score_update(response)}
 
     except Exception as e:
-        print(f"Error during sentiment analysis: {type(e).__name__} - {e}")
-        return {**state, "sentiment_scaled_score": None, "error": f"Sentiment analysis LLM call failed: {str(e)}"} 
\ No newline at end of file
+        logger.error("Error during sentiment analysis: %s - %s", type(e).__name__, e)
+        return {**state, "sentiment_scaled_score": None, "error": f"Sentiment analysis LLM call failed: {str(e)}"}
+
+def tweet_sentiment_node(state: ProfileAnalysisState) -> ProfileAnalysisState:
+    """
+    Scores the sentiment of every fetched tweet, many tweets per LLM call, and adds the
+    time series of the scores with rolling-window aggregates (SENTIMENT_MODE=per_tweet).
+    The overall score is the mean tweet score; without tweets, the bio is analyzed as in
+    `sentiment_analyzer_node`.
+    """
+    logger.info("Running tweet sentiment node")
+    records = state.get("tweet_records") or []
+    if not records:
+        return sentiment_analyzer_node(state)
+
+    llm = get_tweet_sentiment_llm()
+    batches = tweet_batches(records)
+    prompts = [TWEET_SENTIMENT_PROMPT_TEMPLATE.format_messages(tweets_text=numbered_tweets_text(batch)) for batch in batches]
+
+    # The batches are scored concurrently on the shared LLM call pool; each call keeps the
+    # deadline, scheduler and callbacks of the request
+    scores: Dict[int, float] = {}
+    errors: List[Exception] = []
+    futures = [submit_in_context(invoke_llm, llm, prompt) for prompt in prompts]
+    offset = 0
+    for batch, future in zip(batches, futures):
+        try:
+            response = future.result()
+            scores.update({offset + i: score for i, score in batch_scores(response, len(batch)).items()})
+        except Exception as e:
+            logger.error("Error during tweet sentiment scoring: %s - %s", type(e).__name__, e)
+            errors.append(e)
+        offset += len(batch)
+
+    if errors and not scores:
+        return {
+            **state,
+            "sentiment_scaled_score": None,
+            "sentiment_timeseries": None,
+            "error": f"Tweet sentiment LLM call failed: {str(errors[0])}"
+        }
+    return {**state, **tweet_sentiment_update(records, scores)}
\ No newline at end of file
@@ -0,0 +1,154 @@
+import random
+import re
+import zlib
+from typing import Any, Dict, List, Sequence, Set, Tuple
+from urllib.parse import urlparse
+
+from .constants import (
+    DEDUP_SIMILARITY_THRESHOLD,
+    SHINGLE_SIZE,
+    MINHASH_NUM_PERM,
+    MINHASH_BANDS,
+    MAX_EMOJI_RUN
+)
+from .utils import estimate_tokens
+
+# --- Normalization ---
+_RETWEET_PREFIX_RE = re.compile(r"^RT @\w+:\s*")
+_URL_RE = re.compile(r"https?://\S+")
+_WHITESPACE_RE = re.compile(r"\s+")
+_REPEATED_PUNCTUATION_RE = re.compile(r"([!?.])\1{3,}")
+_EMOJI_CHARS = "\U0001F000-\U0001FAFF\u2600-\u27BF\u2B00-\u2BFF\uFE0F\u200D"
+_EMOJI_RUN_RE = re.compile(f"[{_EMOJI_CHARS}]{{{MAX_EMOJI_RUN + 1},}}")
+
+
+def _shorten_url(match: re.Match) -> str:
+    """Replaces a URL with a compact marker that keeps only its domain."""
+    domain = urlparse(match.group(0)).netloc.lower().removeprefix("www.")
+    # t.co wraps every link on X, so its domain carries no signal
+    if not domain or domain == "t.co":
+        return "[link]"
+    return f"[link:{domain}]"
+
+
+def normalize_tweet(text: str) -> str:
+    """
+    Normalizes a tweet for prompting.
+
+    Strips the retweet prefix, shortens URLs to their domain, truncates long
+    emoji runs and repeated punctuation, and collapses whitespace.
+
+    Args:
+        text: Raw tweet text
+
+    Returns:
+        The normalized tweet text (may be empty)
+    """
+    text = _RETWEET_PREFIX_RE.sub("", text.strip())
+    text = _URL_RE.sub(_shorten_url, text)
+    text = _EMOJI_RUN_RE.sub(lambda m: m.group(0)[:MAX_EMOJI_RUN], text)
+    text = _REPEATED_PUNCTUATION_RE.sub(r"\1\1\1", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+# --- MinHash / LSH ---
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_rng = random.Random(42)  # Fixed seed so signatures are stable across processes
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(MINHASH_NUM_PERM)
+]
+_ROWS_PER_BAND = MINHASH_NUM_PERM // MINHASH_BANDS
+
+
+def _shingles(text: str, k: int = SHINGLE_SIZE) -> Set[str]:
+    """Returns the set of character k-shingles of the case-folded text."""
+    text = text.casefold()
+    if len(text) <= k:
+        return {text}
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+def _minhash_signature(shingles: Set[str]) -> Tuple[int, ...]:
+    """Computes the MinHash signature of a shingle set."""
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles]
+    return tuple(
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def _estimated_similarity(sig_a: Sequence[int], sig_b: Sequence[int]) -> float:
+    """Estimates the Jaccard similarity of two sets from their signatures."""
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+
+# --- Pipeline Stage ---
+def preprocess_tweets(
+    tweets: List[str] | None,
+    similarity_threshold: float = DEDUP_SIMILARITY_THRESHOLD
+) -> Tuple[List[str], Dict[str, Any]]:
+    """
+    Normalizes tweets and removes exact and near-duplicates.
+
+    Tweets are expected newest first; when duplicates are found the earliest
+    occurrence in the list (the most recent tweet) is kept.
+
+    Args:
+        tweets: Raw tweet texts or None
+        similarity_threshold: Estimated Jaccard similarity at or above which
+            two tweets are considered near-duplicates
+
+    Returns:
+        A tuple of (cleaned tweets, stats dictionary)
+    """
+    tweets = tweets or []
+    kept: List[str] = []
+    kept_signatures: List[Tuple[int, ...]] = []
+    seen: Set[str] = set()
+    buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+    exact_duplicates = 0
+    near_duplicates = 0
+    empty = 0
+
+    for raw in tweets:
+        text = normalize_tweet(raw)
+        if not text:
+            empty += 1
+            continue
+
+        key = text.casefold()
+        if key in seen:
+            exact_duplicates += 1
+            continue
+        seen.add(key)
+
+        signature = _minhash_signature(_shingles(text))
+        band_keys = [
+            (band, signature[band * _ROWS_PER_BAND:(band + 1) * _ROWS_PER_BAND])
+            for band in range(MINHASH_BANDS)
+        ]
+        candidates = {idx for band_key in band_keys for idx in buckets.get(band_key, [])}
+        if any(_estimated_similarity(signature, kept_signatures[idx]) >= similarity_threshold for idx in candidates):
+            near_duplicates += 1
+            continue
+
+        for band_key in band_keys:
+            buckets.setdefault(band_key, []).append(len(kept))
+        kept.append(text)
+        kept_signatures.append(signature)
+
+    tokens_before = sum(estimate_tokens(t) for t in tweets)
+    tokens_after = sum(estimate_tokens(t) for t in kept)
+    stats = {
+        "input_tweets": len(tweets),
+        "output_tweets": len(kept),
+        "empty_tweets": empty,
+        "exact_duplicates": exact_duplicates,
+        "near_duplicates": near_duplicates,
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": tokens_before - tokens_after
+    }
+    return kept, stats
@@ -1,12 +1,26 @@
+from langchain_core.messages import SystemMessage
 from langchain_core.prompts import ChatPromptTemplate
-from .constants import MBTI_TYPES_JSON_STR
+from .constants import CATEGORIES, EVIDENCE_MODE, MBTI_TYPES_JSON_STR
+
+# Prompt layout: every template starts with a fully rendered system message (instructions,
+# category list, MBTI catalog) built once at import, followed by a human message holding
+# only the per-request bio and tweets. The system message is byte-identical across calls,
+# so the provider can serve it from its prompt prefix cache. Keep request-specific content
+# out of the system messages.
+
+def _static_prompt(system_content: str, human_template: str) -> ChatPromptTemplate:
+    """Builds a template whose system message is fixed text rather than a format string."""
+    return ChatPromptTemplate.from_messages([
+        SystemMessage(content=system_content),
+        ("human", human_template)
+    ])
+
+_USER_TEXT = "Bio: {bio}\n\nTweets:\n{tweets_text}"
 
 # --- Category Scorer Prompt ---
-CATEGORY_SCORING_PROMPT_TEMPLATE = ChatPromptTemplate.from_messages([
-    ("system", 
-     """You are an expert text analyst. Your task is to analyze the provided text (a user's bio and their recent tweets) and identify relevant categories from the provided list.
+CATEGORY_SCORING_SYSTEM_PROMPT = f"""You are an expert text analyst. Your task is to analyze the provided text (a user's bio and their recent tweets) and identify relevant categories from the provided list.
 
-Categories List: {categories}
+Categories List: {", ".join(CATEGORIES)}
 
 For EACH category you identify as relevant based on the text:
 1. Provide a relevance score from 0 to 100 (where 0 is not relevant, and 100 is highly relevant).
@@ -14,16 +28,33 @@ For EACH category you identify as relevant based on the text:
 
 If no categories are relevant, return an empty list of scores.
 Output the results in the requested JSON format, including only the categories you deemed relevant.
-"""),
-    ("human", "Please analyze the following text and provide category scores with evidence for relevant categories only:\n\nBio: {bio}\n\nTweets:\n{tweets_text}")
-])
+"""
+
+CATEGORY_SCORING_INDICES_SYSTEM_PROMPT = f"""You are an expert text analyst. Your task is to analyze the provided text (a user's bio and their recent tweets) and identify relevant categories from the provided list.
+
+Categories List: {", ".join(CATEGORIES)}
+
+The tweets are numbered: each one starts with its number in square brackets, e.g. [3].
+
+For EACH category you identify as relevant based on the text:
+1. Provide a relevance score from 0 to 100 (where 0 is not relevant, and 100 is highly relevant).
+2. List the numbers of the tweets (evidence) that justify the score and relevance of that category. Use 0 to cite the bio. Give the numbers only; do not quote the text.
+
+If no categories are relevant, return an empty list of scores.
+Output the results in the requested JSON format, including only the categories you deemed relevant.
+"""
+
+CATEGORY_SCORING_PROMPT_TEMPLATE = _static_prompt(
+    CATEGORY_SCORING_INDICES_SYSTEM_PROMPT if EVIDENCE_MODE == "indices" else CATEGORY_SCORING_SYSTEM_PROMPT,
+    "Please analyze the following text and provide category scores with evidence for relevant categories only:\n\n" + _USER_TEXT
+)
 
 # --- MBTI Classifier Prompt ---
-_MBTI_SYSTEM_PROMPT_CONTENT = """You are an expert in psychological profiling using the Myers-Briggs Type Indicator (MBTI).
+MBTI_SYSTEM_PROMPT = f"""You are an expert in psychological profiling using the Myers-Briggs Type Indicator (MBTI).
 Your task is to analyze the provided text (a user's bio and their recent tweets) and classify the user into one of the 16 MBTI types.
 
 You will be provided with a list of MBTI types, their names, and portraits:
-{mbti_types_list_json}
+{MBTI_TYPES_JSON_STR}
 
 Your response MUST be a single, valid JSON object.
 This JSON object MUST contain exactly three keys: "mbti_code", "mbti_name", and "rationale".
@@ -36,35 +67,64 @@ Do NOT include the portrait in your output.
 Ensure your entire output is ONLY this single, valid JSON object and nothing else (no preamble, no apologies, no explanations outside the JSON structure).
 """
 
-MBTI_CLASSIFICATION_PROMPT_TEMPLATE = ChatPromptTemplate.from_messages([
-    ("system", _MBTI_SYSTEM_PROMPT_CONTENT),
-    ("human", "Please classify the MBTI type for the user based on the following text:\n\nBio: {bio}\n\nTweets:\n{tweets_text}")
-])
+MBTI_CLASSIFICATION_PROMPT_TEMPLATE = _static_prompt(
+    MBTI_SYSTEM_PROMPT,
+    "Please classify the MBTI type for the user based on the following text:\n\n" + _USER_TEXT
+)
 
 # --- Keyword Extractor Prompt ---
-KEYWORD_EXTRACTION_PROMPT_TEMPLATE = ChatPromptTemplate.from_messages([
-    ("system",
-     """You are an expert text analyst. Your task is to analyze the provided text (a user's bio and their recent tweets) and extract the top 3-5 most representative keywords or hashtags.
+KEYWORD_EXTRACTION_SYSTEM_PROMPT = """You are an expert text analyst. Your task is to analyze the provided text (a user's bio and their recent tweets) and extract the top 3-5 most representative keywords or hashtags.
 These keywords/hashtags should capture the main themes, topics, or interests expressed in the text.
 If the text is too short or vague to extract meaningful keywords, return an empty list.
 
 Output the results in the requested JSON format.
-"""),
-    ("human", "Please extract the top 3-5 keywords or hashtags from the following text:\n\nBio: {bio}\n\nTweets:\n{tweets_text}")
-])
+"""
+
+KEYWORD_EXTRACTION_PROMPT_TEMPLATE = _static_prompt(
+    KEYWORD_EXTRACTION_SYSTEM_PROMPT,
+    "Please extract the top 3-5 keywords or hashtags from the following text:\n\n" + _USER_TEXT
+)
 
 # --- Sentiment Analyzer Prompt ---
-SENTIMENT_ANALYSIS_PROMPT_TEMPLATE = ChatPromptTemplate.from_messages([
-    ("system",
-     """You are an expert sentiment analyst. Your task is to analyze the provided text (a user's bio and their recent tweets) and determine the overall sentiment.
+SENTIMENT_ANALYSIS_SYSTEM_PROMPT = """You are an expert sentiment analyst. Your task is to analyze the provided text (a user's bio and their recent tweets) and determine the overall sentiment.
 You should provide a single numerical score representing this sentiment:
 - The score must be between 0 and 100 (inclusive).
 - 0 represents the most negative sentiment.
 - 100 represents the most positive sentiment.
 - 50 represents a neutral sentiment.
 
-Output the result in the requested JSON format: {{"scaled_sentiment_score": <score_value>}}
+Output the result in the requested JSON format: {"scaled_sentiment_score": <score_value>}
 Ensure the <score_value> is a floating-point number.
-"""),
-    ("human", "Please analyze the sentiment of the following text and provide a scaled score (0-100):\n\nBio: {bio}\n\nTweets:\n{tweets_text}")
-]) 
\ No newline at end of file
+"""
+
+SENTIMENT_ANALYSIS_PROMPT_TEMPLATE = _static_prompt(
+    SENTIMENT_ANALYSIS_SYSTEM_PROMPT,
+    "Please analyze the sentiment of the following text and provide a scaled score (0-100):\n\n" + _USER_TEXT
+)
+
+TWEET_SENTIMENT_SYSTEM_PROMPT = """You are an expert sentiment analyst. Your task is to score the sentiment of each of the provided tweets on its own.
+The tweets are numbered: each one starts with its number in square brackets, e.g. [3].
+
+For EVERY tweet, return its number and a sentiment score:
+- The score must be between 0 and 100 (inclusive).
+- 0 represents the most negative sentiment.
+- 100 represents the most positive sentiment.
+- 50 represents a neutral sentiment.
+
+Judge each tweet by its own text only. Output the results in the requested JSON format.
+"""
+
+TWEET_SENTIMENT_PROMPT_TEMPLATE = _static_prompt(
+    TWEET_SENTIMENT_SYSTEM_PROMPT,
+    "Please score the sentiment of each of the following tweets (0-100):\n\n{tweets_text}"
+)
+
+# --- Packed Prompts (bulk mode) ---
+# Several small profiles analyzed in one call: the node's system prompt is reused as is (so
+# it still hits the prefix cache) and the human message lists the profiles by id.
+PACKED_PROFILES_INSTRUCTION = (
+    "The text below contains {count} separate user profiles. Apply the instructions to each "
+    "profile independently, using only that profile's bio and tweets, and return exactly one "
+    "result per profile in `results`, tagged with its profile_id."
+)
+PACKED_PROFILE_TEXT = "=== profile_id: {profile_id} ===\n" + _USER_TEXT
\ No newline at end of file
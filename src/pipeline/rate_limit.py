@@ -0,0 +1,391 @@
+"""
+Process-wide adaptive rate limiter for LLM requests.
+
+Every LLM call first reserves one request and its estimated tokens (prompt estimate plus
+expected completion) from two token buckets sized to the provider's requests-per-minute
+and tokens-per-minute limits. Callers that do not fit wait in a queue instead of failing.
+The queue is bounded only by the caller's own timeout, which is derived from the request
+deadline. It is ordered by priority class like the scheduler's slots (see
+`src.api.scheduler`): the classes share the grants by weighted fair queuing and each class
+is served in arrival order. The rate limit, not the slot count, is usually what calls wait
+for, so an interactive call does not queue behind a backfill's reservations here either. `RateLimitFeedback`, attached to the LLM clients, keeps the buckets
+in line with reality:
+
+- it reconciles the estimate with the tokens actually used,
+- it adopts the limits and remaining budget reported in `x-ratelimit-*` response headers,
+- it pauses all callers for Retry-After when a 429 arrives anyway.
+
+When a shared store is configured (see `src.shared.store`), grants are also reserved from
+per-minute counters shared by every worker process on the host, and a 429 pauses all of
+them. Each worker's own buckets then only smooth its bursts while the shared counters keep
+the sum of all workers within the account's limits.
+
+The limiter is thread-based because the LLM nodes are sync and run in executor threads.
+`acquire_async` lets async code share the same buckets.
+"""
+import asyncio
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Mapping, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from src.observability.log import get_logger
+from src.observability.metrics import LLM_RATE_LIMITED, LLM_RATE_LIMIT_QUEUE, LLM_RATE_LIMIT_WAIT
+from src.shared.store import SharedStore, get_shared_store
+from .constants import DEFAULT_PRIORITY, LLM_EXPECTED_COMPLETION_TOKENS, LLM_RPM_LIMIT, LLM_TPM_LIMIT, PRIORITY_WEIGHTS
+from .utils import estimate_tokens
+
+logger = get_logger(__name__)
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+_SHARED_NAMESPACE = "llm_rate_limit"
+_SHARED_WINDOW_SECONDS = 60.0
+
+
+class RateLimitTimeout(TimeoutError):
+    """Raised when capacity does not free up within the caller's timeout."""
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Parses OpenAI reset durations such as "6m0s", "1.5s" or "120ms" into seconds."""
+    if not value:
+        return None
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def estimate_request_tokens(prompt: Any) -> int:
+    """
+    Estimates the tokens a request will count against the TPM limit: the prompt plus
+    the expected completion.
+    """
+    if isinstance(prompt, str):
+        text = prompt
+    else:
+        text = "".join(str(getattr(message, "content", message)) for message in prompt)
+    return estimate_tokens(text) + LLM_EXPECTED_COMPLETION_TOKENS
+
+
+class TokenBucket:
+    """A bucket holding up to `capacity` units that refills at `capacity` per minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self._updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.capacity / 60)
+        self._updated = now
+
+    def seconds_until(self, amount: float) -> float:
+        """Seconds until `amount` is available (assumes `refill` was just called)."""
+        # A request larger than the whole bucket may go once the bucket is full
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60 / self.capacity
+
+
+class AdaptiveRateLimiter:
+    """
+    Token-bucket limiter for requests per minute and tokens per minute, serving waiting
+    callers in weighted fair order of their priority classes.
+
+    Args:
+        rpm: Requests per minute (0 disables the request bucket)
+        tpm: Tokens per minute (0 disables the token bucket)
+        shared: Store holding the counters shared with other processes (None keeps the limits per process)
+        weights: Share of the grants per priority class while several classes wait
+    """
+
+    def __init__(
+        self,
+        rpm: float,
+        tpm: float,
+        shared: Optional[SharedStore] = None,
+        weights: Mapping[str, float] = PRIORITY_WEIGHTS
+    ):
+        self._requests = TokenBucket(rpm) if rpm > 0 else None
+        self._tokens = TokenBucket(tpm) if tpm > 0 else None
+        self._cond = threading.Condition()
+        self._next_ticket = 0
+        # Stride scheduling as in `src.api.scheduler.FairShareResource`
+        self._weights = {cls: max(weight, 1e-6) for cls, weight in weights.items()}
+        self._queues: Dict[str, Deque[int]] = {cls: deque() for cls in self._weights}
+        self._pass = {cls: 0.0 for cls in self._weights}
+        self._virtual_time = 0.0
+        self._paused_until = 0.0
+        # Reservations for requests sent but not yet answered, so the remaining budget the
+        # server reports can be adopted without double-counting them
+        self._in_flight = {"requests": 0.0, "tokens": 0.0}
+        self._shared = shared
+
+    @property
+    def enabled(self) -> bool:
+        return self._requests is not None or self._tokens is not None
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        wait = max(0.0, self._paused_until - now)
+        for bucket, amount in ((self._requests, 1), (self._tokens, tokens)):
+            if bucket is not None:
+                bucket.refill(now)
+                wait = max(wait, bucket.seconds_until(amount))
+        return wait
+
+    def _shared_wait(self, tokens: int) -> float:
+        """
+        Reserves the request from the counters shared with the other processes.
+
+        Returns:
+            0.0 if reserved, otherwise the seconds until the shared budget allows it
+        """
+        if self._shared is None:
+            return 0.0
+        amounts, limits = {}, {}
+        for bucket, kind, amount in ((self._requests, "requests", 1), (self._tokens, "tokens", tokens)):
+            if bucket is not None:
+                amounts[kind] = amount
+                limits[kind] = bucket.capacity
+        try:
+            paused_until = self._shared.get(_SHARED_NAMESPACE, "paused_until") or 0.0
+            if paused_until > time.time():
+                return paused_until - time.time()
+            return self._shared.take(_SHARED_NAMESPACE, amounts, limits, _SHARED_WINDOW_SECONDS)
+        except sqlite3.Error as e:
+            # The shared limits are a ceiling on top of the local ones; don't fail calls over them
+            logger.warning("Shared rate limit store unavailable: %s", e)
+            return 0.0
+
+    def _head(self) -> Optional[int]:
+        """Returns the ticket served next: the oldest of the backlogged class with the lowest virtual time."""
+        backlogged = [cls for cls, queue in self._queues.items() if queue]
+        if not backlogged:
+            return None
+        cls = min(backlogged, key=lambda c: (self._pass[c], -self._weights[c]))
+        return self._queues[cls][0]
+
+    def _advance(self, priority: str) -> None:
+        """Removes the served head of `priority`'s queue and charges the class for the grant."""
+        self._queues[priority].popleft()
+        self._virtual_time = self._pass[priority]
+        self._pass[priority] += 1.0 / self._weights[priority]
+        self._cond.notify_all()
+
+    def acquire(self, tokens: int, timeout: Optional[float] = None, priority: Optional[str] = None) -> float:
+        """
+        Blocks until one request and `tokens` tokens can be spent, in fair order of the
+        priority classes and arrival order within a class.
+
+        Args:
+            tokens: Estimated tokens for the request
+            timeout: Longest acceptable wait in seconds (None waits indefinitely)
+            priority: Priority class of the caller (defaults to DEFAULT_PRIORITY)
+
+        Returns:
+            Seconds spent waiting
+
+        Raises:
+            RateLimitTimeout: If capacity would not be available within `timeout`
+        """
+        if not self.enabled:
+            return 0.0
+
+        started = time.monotonic()
+        give_up_at = None if timeout is None else started + timeout
+        priority = priority or DEFAULT_PRIORITY
+        with self._cond:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            queue = self._queues[priority]
+            if not queue:
+                # Returning from idle: no credit for the time spent away
+                self._pass[priority] = max(self._pass[priority], self._virtual_time)
+            queue.append(ticket)
+            LLM_RATE_LIMIT_QUEUE.inc()
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._wait_time(tokens, now) if ticket == self._head() else None
+                    if wait == 0.0 and self._shared is not None:
+                        # Nobody else is served until the head of the queue advances, so
+                        # the shared counters (disk I/O, locks between processes) are reserved
+                        # without holding the lock the other callers and the feedback need
+                        self._cond.release()
+                        try:
+                            wait = self._shared_wait(tokens)
+                        finally:
+                            self._cond.acquire()
+                    if wait == 0.0:
+                        break
+                    if give_up_at is not None and (now >= give_up_at or (wait is not None and now + wait > give_up_at)):
+                        # Give up now rather than wait for capacity that comes too late
+                        queue.remove(ticket)
+                        self._cond.notify_all()
+                        raise RateLimitTimeout(f"LLM rate limit capacity not available within {timeout:.1f}s")
+                    timeouts = [t for t in (wait, None if give_up_at is None else give_up_at - now) if t is not None]
+                    self._cond.wait(min(timeouts) if timeouts else None)
+
+                if self._requests is not None:
+                    self._requests.level -= 1
+                if self._tokens is not None:
+                    self._tokens.level -= tokens
+                self._in_flight["requests"] += 1
+                self._in_flight["tokens"] += tokens
+                self._advance(priority)
+            finally:
+                LLM_RATE_LIMIT_QUEUE.dec()
+
+        waited = time.monotonic() - started
+        LLM_RATE_LIMIT_WAIT.observe(waited)
+        return waited
+
+    async def acquire_async(self, tokens: int, timeout: Optional[float] = None, priority: Optional[str] = None) -> float:
+        """Awaitable `acquire` for use from async code."""
+        return await asyncio.to_thread(self.acquire, tokens, timeout, priority)
+
+    def release(self, estimated: int) -> None:
+        """Marks a request as no longer in flight."""
+        with self._cond:
+            self._in_flight["requests"] = max(0.0, self._in_flight["requests"] - 1)
+            self._in_flight["tokens"] = max(0.0, self._in_flight["tokens"] - estimated)
+
+    def reconcile(self, estimated: int, actual: int) -> None:
+        """Completes a request: returns over-reserved tokens to the bucket, or charges the shortfall."""
+        self.release(estimated)
+        if self._tokens is None or not actual:
+            return
+        with self._cond:
+            self._tokens.level = min(self._tokens.capacity, self._tokens.level + estimated - actual)
+            self._cond.notify_all()
+        if self._shared is not None:
+            try:
+                self._shared.adjust(_SHARED_NAMESPACE, {"tokens": actual - estimated}, _SHARED_WINDOW_SECONDS)
+            except sqlite3.Error as e:
+                logger.warning("Shared rate limit store unavailable: %s", e)
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """
+        Adopts the provider's reported limits and remaining budget. The server's figure is
+        authoritative, less whatever is still in flight that it has not seen yet.
+        """
+        headers = {key.lower(): value for key, value in headers.items()}
+        with self._cond:
+            now = time.monotonic()
+            for bucket, kind in ((self._requests, "requests"), (self._tokens, "tokens")):
+                if bucket is None:
+                    continue
+                limit = headers.get(f"x-ratelimit-limit-{kind}")
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                try:
+                    if limit is not None and float(limit) > 0:
+                        bucket.refill(now)
+                        bucket.capacity = float(limit)
+                    if remaining is not None:
+                        bucket.refill(now)
+                        bucket.level = min(bucket.capacity, float(remaining) - self._in_flight[kind])
+                except ValueError:
+                    continue
+            self._cond.notify_all()
+
+    def penalize(self, retry_after: Optional[float]) -> None:
+        """Pauses every caller after a 429 and empties the buckets."""
+        LLM_RATE_LIMITED.inc()
+        with self._cond:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + (retry_after if retry_after is not None else 1.0))
+            for bucket in (self._requests, self._tokens):
+                if bucket is not None:
+                    bucket.refill(now)
+                    bucket.level = min(bucket.level, 0.0)
+            self._cond.notify_all()
+        if self._shared is not None:
+            # Every other worker shares the account, so they pause too
+            pause = self._paused_until - now
+            try:
+                self._shared.set(_SHARED_NAMESPACE, "paused_until", time.time() + pause, ttl=pause)
+            except sqlite3.Error as e:
+                logger.warning("Shared rate limit store unavailable: %s", e)
+        logger.warning("LLM rate limit hit; pausing requests for %.2fs", self._paused_until - now)
+
+
+_limiter: Optional[AdaptiveRateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> AdaptiveRateLimiter:
+    """Returns the process-wide limiter shared by all LLM nodes."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = AdaptiveRateLimiter(LLM_RPM_LIMIT, LLM_TPM_LIMIT, shared=get_shared_store())
+        return _limiter
+
+
+# --- Feedback from responses ---
+def _response_headers(response: LLMResult) -> Dict[str, str]:
+    for generations in response.generations:
+        for generation in generations:
+            headers = (generation.generation_info or {}).get("headers")
+            message = getattr(generation, "message", None)
+            headers = headers or (getattr(message, "response_metadata", None) or {}).get("headers")
+            if headers:
+                return headers
+    return {}
+
+
+def _total_tokens(response: LLMResult) -> int:
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("total_tokens", 0)
+    return ((response.llm_output or {}).get("token_usage") or {}).get("total_tokens", 0)
+
+
+class RateLimitFeedback(BaseCallbackHandler):
+    """
+    Model-level callback that feeds actual usage, rate-limit headers and 429s back into the limiter.
+    """
+
+    def __init__(self, limiter: Optional[AdaptiveRateLimiter] = None):
+        self._limiter = limiter
+        self._lock = threading.Lock()
+        self._estimates: Dict[UUID, int] = {}
+
+    @property
+    def limiter(self) -> AdaptiveRateLimiter:
+        return self._limiter or get_rate_limiter()
+
+    def on_chat_model_start(self, serialized, messages: List[List[Any]], *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            self._estimates[run_id] = estimate_request_tokens([m for batch in messages for m in batch])
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            estimated = self._estimates.pop(run_id, 0)
+        self.limiter.reconcile(estimated, _total_tokens(response))
+        headers = _response_headers(response)
+        if headers:
+            self.limiter.update_from_headers(headers)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            estimated = self._estimates.pop(run_id, 0)
+        self.limiter.release(estimated)
+        if getattr(error, "status_code", None) == 429:
+            response = getattr(error, "response", None)
+            headers = {key.lower(): value for key, value in (getattr(response, "headers", None) or {}).items()}
+            retry_after = parse_reset_duration(headers.get("x-ratelimit-reset-tokens"))
+            if headers.get("retry-after", "").replace(".", "", 1).isdigit():
+                retry_after = float(headers["retry-after"])
+            self.limiter.penalize(retry_after)
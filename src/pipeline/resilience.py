@@ -0,0 +1,291 @@
+"""
+Deadline-aware, retried and optionally hedged LLM calls.
+
+Each `/analyze` run carries an absolute deadline (a `time.monotonic()` value) in the graph
+config under `configurable.deadline`. `invoke_llm` derives every attempt's timeout from
+the time left, retries transient errors with full-jitter exponential backoff (or the
+server's Retry-After) while the budget allows, queues for the shared rate limiter
+(see `rate_limit`) before each request, and, when hedging is enabled, fires a
+duplicate request once a call has been outstanding longer than the node's recent p95
+latency and returns whichever response arrives first.
+
+When the API runs the graph with a priority scheduler (`configurable.scheduler`), every
+LLM attempt and twscrape fetch first waits for a slot of that shared resource in the
+order the request's priority class (`configurable.priority`) entitles it to. LLM calls
+then queue for rate limit capacity in the same priority order.
+"""
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, Optional
+
+from src.observability.log import get_logger
+from src.observability.metrics import LLM_CALL_DURATION, LLM_DEADLINE_EXCEEDED, LLM_HEDGES, LLM_RETRIES
+from .rate_limit import RateLimitTimeout, estimate_request_tokens, get_rate_limiter
+from .constants import (
+    LLM_HEDGE_ENABLED,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_HEDGE_QUANTILE,
+    LLM_CONCURRENCY,
+    LLM_LATENCY_WINDOW,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BASE_DELAY,
+    LLM_RETRY_MAX_DELAY,
+    LLM_TIMEOUT_SECONDS
+)
+
+logger = get_logger(__name__)
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server errors
+TRANSIENT_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+_TRANSIENT_ERROR_NAMES = {"APITimeoutError", "APIConnectionError", "Timeout", "TimeoutException", "ConnectError"}
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when the request deadline passes before an LLM call could complete."""
+
+
+# --- Deadlines ---
+def current_run_config() -> Dict[str, Any]:
+    """Returns the config of the graph run this code executes in, or {} outside a run."""
+    from langgraph.config import get_config
+
+    try:
+        return get_config()
+    except RuntimeError:
+        return {}
+
+
+def remaining_budget(config: Dict[str, Any]) -> Optional[float]:
+    """
+    Returns the seconds left before the run's deadline, or None if it has no deadline.
+    """
+    deadline = (config.get("configurable") or {}).get("deadline")
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+# --- Shared resources ---
+@contextmanager
+def resource_slot(config: Dict[str, Any], resource: str, timeout: Optional[float] = None) -> Iterator[None]:
+    """
+    Holds a slot of a shared resource ("fetch" or "llm") for the block, queued by the run's
+    priority. A no-op when the run has no scheduler.
+    """
+    configurable = config.get("configurable") or {}
+    scheduler = configurable.get("scheduler")
+    if scheduler is None:
+        yield
+        return
+    with scheduler.slot(resource, configurable.get("priority"), timeout):
+        yield
+
+
+@asynccontextmanager
+async def resource_slot_async(config: Dict[str, Any], resource: str, timeout: Optional[float] = None) -> AsyncIterator[None]:
+    """Async variant of `resource_slot`."""
+    configurable = config.get("configurable") or {}
+    scheduler = configurable.get("scheduler")
+    if scheduler is None:
+        yield
+        return
+    async with scheduler.slot_async(resource, configurable.get("priority"), timeout):
+        yield
+
+
+# --- Retries ---
+def is_transient_error(error: BaseException) -> bool:
+    """Returns whether an error from the LLM client is worth retrying."""
+    # Imported here: the scheduler module imports the pipeline package
+    from src.api.scheduler import SchedulerTimeout
+
+    # Timing out in the slot or rate limit queue means the request's wait budget is spent
+    if isinstance(error, (DeadlineExceeded, SchedulerTimeout, RateLimitTimeout)):
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if getattr(error, "status_code", None) in TRANSIENT_STATUS_CODES:
+        return True
+    return type(error).__name__ in _TRANSIENT_ERROR_NAMES
+
+
+def _retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Reads a Retry-After header (in seconds) from an HTTP error, if present."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_delay(attempt: int, error: BaseException) -> float:
+    """
+    Returns how long to wait before retry number `attempt` (0-based).
+
+    Uses the server's Retry-After when given, otherwise full-jitter exponential backoff.
+    """
+    retry_after = _retry_after_seconds(error)
+    if retry_after is not None:
+        return retry_after
+    return random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt))
+
+
+# --- Hedging ---
+class LatencyWindow:
+    """Keeps the most recent LLM latencies per node to derive the hedge delay."""
+
+    def __init__(self, size: int = LLM_LATENCY_WINDOW):
+        self._size = size
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, node: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(node, deque(maxlen=self._size)).append(seconds)
+
+    def quantile(self, node: str, q: float, min_samples: int = LLM_HEDGE_MIN_SAMPLES) -> Optional[float]:
+        """Returns the q-quantile of the node's recent latencies, or None without enough samples."""
+        with self._lock:
+            samples = sorted(self._samples.get(node, ()))
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+_latencies = LatencyWindow()
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_pool_thread = threading.local()
+
+
+def _mark_pool_thread() -> None:
+    _pool_thread.active = True
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Calls beyond LLM_CONCURRENCY would only wait for an LLM slot
+            _executor = ThreadPoolExecutor(
+                max_workers=LLM_CONCURRENCY, thread_name_prefix="llm-call", initializer=_mark_pool_thread
+            )
+        return _executor
+
+
+def submit_in_context(fn, *args) -> Future:
+    """
+    Runs `fn(*args)` on the process-wide LLM call pool, which hedged attempts also use.
+
+    The call runs in its own copy of the caller's context so LangChain callbacks (usage
+    tracking, tracing), the request id and the graph run's config still apply in the pool
+    thread. Calls of `invoke_llm` made there are not hedged, so pool threads never wait on
+    other pool work.
+    """
+    return _get_executor().submit(contextvars.copy_context().run, fn, *args)
+
+
+def _call(llm, prompt, timeout: float, node: str, config: Dict[str, Any]):
+    # Wait for a scheduler slot, then for rate limit capacity; the HTTP timeout gets
+    # whatever time is left
+    started = time.monotonic()
+    priority = (config.get("configurable") or {}).get("priority")
+    with resource_slot(config, "llm", timeout):
+        waited = time.monotonic() - started
+        waited += get_rate_limiter().acquire(
+            estimate_request_tokens(prompt), timeout=max(0.0, timeout - waited), priority=priority
+        )
+        sent = time.perf_counter()
+        result = llm.invoke(prompt, timeout=max(0.1, timeout - waited))
+    # Only the provider's latency feeds the hedge delay, so queueing under load does not
+    # delay hedges
+    _latencies.record(node, time.perf_counter() - sent)
+    return result
+
+
+def _hedged_call(llm, prompt, timeout: float, hedge_after: float, node: str, config: Dict[str, Any]):
+    """Runs the call, firing a duplicate after `hedge_after` seconds; the first success wins."""
+    primary = submit_in_context(_call, llm, prompt, timeout, node, config)
+    done, _ = wait([primary], timeout=hedge_after)
+    if done:
+        return primary.result()
+
+    LLM_HEDGES.inc(node, "fired")
+    hedge = submit_in_context(_call, llm, prompt, max(0.1, timeout - hedge_after), node, config)
+    pending = {primary, hedge}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is hedge:
+                    LLM_HEDGES.inc(node, "won")
+                return future.result()
+    # Both attempts failed; surface the primary's error
+    raise primary.exception()
+
+
+def _hedge_delay(node: str, timeout: float) -> Optional[float]:
+    if not LLM_HEDGE_ENABLED:
+        return None
+    delay = _latencies.quantile(node, LLM_HEDGE_QUANTILE)
+    if delay is None or delay >= timeout:
+        return None
+    return delay
+
+
+# --- Entry Point ---
+def invoke_llm(llm, prompt):
+    """
+    Invokes an LLM runnable within the current request's deadline.
+
+    Args:
+        llm: LangChain runnable (typically a ChatOpenAI with structured output)
+        prompt: Messages to send
+
+    Returns:
+        The runnable's output
+
+    Raises:
+        DeadlineExceeded: If the request deadline passed before a call could be made
+        Exception: The last error if it was not transient or retries were exhausted
+    """
+    config = current_run_config()
+    node = (config.get("metadata") or {}).get("langgraph_node", "unknown")
+    started = time.perf_counter()
+
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        remaining = remaining_budget(config)
+        if remaining is not None and remaining <= 0:
+            LLM_DEADLINE_EXCEEDED.inc(node)
+            raise DeadlineExceeded("Request deadline exceeded before the LLM call completed")
+        timeout = LLM_TIMEOUT_SECONDS if remaining is None else min(LLM_TIMEOUT_SECONDS, remaining)
+
+        try:
+            # A hedge from a pool thread would wait on the pool itself and could deadlock it
+            hedge_after = None if getattr(_pool_thread, "active", False) else _hedge_delay(node, timeout)
+            if hedge_after is None:
+                result = _call(llm, prompt, timeout, node, config)
+            else:
+                result = _hedged_call(llm, prompt, timeout, hedge_after, node, config)
+            LLM_CALL_DURATION.observe(time.perf_counter() - started, node)
+            return result
+        except Exception as e:
+            if not is_transient_error(e) or attempt == LLM_MAX_RETRIES:
+                raise
+            delay = retry_delay(attempt, e)
+            remaining = remaining_budget(config)
+            if remaining is not None and delay >= remaining:
+                LLM_DEADLINE_EXCEEDED.inc(node)
+                raise DeadlineExceeded(f"Request deadline exceeded after {type(e).__name__}: {e}") from e
+            LLM_RETRIES.inc(node)
+            logger.warning(
+                "Transient LLM error in %s (%s), retrying in %.2fs",
+                node, type(e).__name__, delay, extra={"attempt": attempt + 1}
+            )
+            time.sleep(delay)
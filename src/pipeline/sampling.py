@@ -0,0 +1,148 @@
+import math
+import re
+import zlib
+from typing import Any, Dict, List, Tuple
+
+from .constants import (
+    PROMPT_TWEET_TOKEN_BUDGET,
+    RECENT_TWEETS_ALWAYS_KEPT,
+    HASHED_VECTOR_DIM
+)
+from .utils import estimate_tokens
+
+_TOKEN_RE = re.compile(r"[#@]?\w+")
+
+# --- Vectorization ---
+def _hashed_ngram_vector(text: str, dim: int = HASHED_VECTOR_DIM) -> Dict[int, float]:
+    """
+    Builds an L2-normalized sparse vector from hashed word unigrams and bigrams.
+
+    Args:
+        text: Tweet text
+        dim: Number of hash buckets
+
+    Returns:
+        Mapping of bucket index to weight
+    """
+    words = _TOKEN_RE.findall(text.casefold())
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    vector: Dict[int, float] = {}
+    for gram in grams:
+        h = zlib.crc32(gram.encode("utf-8"))
+        # Use one hash bit as the sign to keep collisions unbiased
+        sign = 1.0 if h & 1 else -1.0
+        bucket = (h >> 1) % dim
+        vector[bucket] = vector.get(bucket, 0.0) + sign
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    if norm == 0:
+        return {}
+    return {k: v / norm for k, v in vector.items()}
+
+
+def _cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    """Cosine similarity of two normalized sparse vectors."""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+# --- Clustering ---
+def _k_medoids(similarities: List[List[float]], k: int, max_iterations: int = 10) -> Tuple[List[int], List[List[int]]]:
+    """
+    Clusters items into k groups using a k-medoids (PAM-style) heuristic.
+
+    Initial medoids are chosen by farthest-point traversal starting from item 0,
+    so the result is deterministic.
+
+    Args:
+        similarities: Square matrix of pairwise similarities
+        k: Number of clusters
+
+    Returns:
+        A tuple of (medoid indices, member indices of each cluster)
+    """
+    n = len(similarities)
+    k = min(k, n)
+    medoids = [0]
+    while len(medoids) < k:
+        candidates = [i for i in range(n) if i not in medoids]
+        medoids.append(min(candidates, key=lambda i: max(similarities[i][m] for m in medoids)))
+
+    clusters: List[List[int]] = []
+    for _ in range(max_iterations):
+        clusters = [[] for _ in medoids]
+        for i in range(n):
+            best = max(range(len(medoids)), key=lambda c: similarities[i][medoids[c]])
+            clusters[best].append(i)
+        new_medoids = [
+            max(members, key=lambda c: sum(similarities[c][j] for j in members))
+            for members in clusters
+        ]
+        if new_medoids == medoids:
+            break
+        medoids = new_medoids
+    return medoids, clusters
+
+
+# --- Pipeline Stage ---
+def sample_tweets(
+    tweets: List[str] | None,
+    token_budget: int = PROMPT_TWEET_TOKEN_BUDGET,
+    recent_keep: int = RECENT_TWEETS_ALWAYS_KEPT
+) -> Tuple[List[str], Dict[str, Any]]:
+    """
+    Selects a diverse, representative subset of tweets that fits a token budget.
+
+    The newest tweets are always kept first. The rest are clustered on hashed
+    n-gram vectors and cluster medoids are added, largest clusters first,
+    until the budget is spent. Selected tweets keep their original order.
+
+    Args:
+        tweets: Tweets ordered newest first, or None
+        token_budget: Maximum estimated tokens for the selected tweets
+        recent_keep: Number of newest tweets to keep before sampling
+
+    Returns:
+        A tuple of (selected tweets, stats dictionary)
+    """
+    tweets = tweets or []
+    costs = [estimate_tokens(t) for t in tweets]
+    total_tokens = sum(costs)
+
+    if total_tokens <= token_budget:
+        selected_indices = list(range(len(tweets)))
+    else:
+        selected_indices = []
+        used = 0
+        for i in range(min(recent_keep, len(tweets))):
+            if used + costs[i] <= token_budget:
+                selected_indices.append(i)
+                used += costs[i]
+
+        remaining = [i for i in range(len(tweets)) if i not in selected_indices]
+        if remaining and used < token_budget:
+            avg_cost = sum(costs[i] for i in remaining) / len(remaining)
+            k = max(1, int((token_budget - used) // max(avg_cost, 1)))
+            vectors = [_hashed_ngram_vector(tweets[i]) for i in remaining]
+            similarities = [[_cosine(a, b) for b in vectors] for a in vectors]
+            medoids, clusters = _k_medoids(similarities, k)
+
+            # Bigger clusters are more representative; ties go to the newer tweet
+            ranked = sorted(zip(medoids, clusters), key=lambda mc: (-len(mc[1]), mc[0]))
+            for medoid, _ in ranked:
+                idx = remaining[medoid]
+                if used + costs[idx] <= token_budget:
+                    selected_indices.append(idx)
+                    used += costs[idx]
+
+        selected_indices.sort()
+
+    selected = [tweets[i] for i in selected_indices]
+    stats = {
+        "input_tweets": len(tweets),
+        "selected_tweets": len(selected),
+        "token_budget": token_budget,
+        "tokens_before": total_tokens,
+        "tokens_after": sum(costs[i] for i in selected_indices)
+    }
+    return selected, stats
@@ -0,0 +1,96 @@
+"""
+Per-tweet sentiment scoring (SENTIMENT_MODE=per_tweet).
+
+Tweets are scored in batches: each LLM call gets up to TWEET_SENTIMENT_BATCH_SIZE tweets,
+numbered like the evidence prompts, and returns a score per number. Numbered output keeps
+the completion to a few tokens per tweet, and the numbers map the scores back to the
+fetched tweets with their ids and dates.
+
+The scores become a time series, oldest first, with rolling aggregates over a trailing
+window of SENTIMENT_WINDOW_DAYS ending at each tweet, which shows how the sentiment
+moves over time rather than only its level.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+from .constants import SENTIMENT_WINDOW_DAYS, TWEET_SENTIMENT_BATCH_SIZE
+from .preprocessing import normalize_tweet
+
+
+def tweet_batches(records: Sequence[Mapping[str, Any]], batch_size: int = TWEET_SENTIMENT_BATCH_SIZE) -> List[Sequence[Mapping[str, Any]]]:
+    """Splits the tweets into the groups scored by one LLM call each."""
+    batch_size = max(1, batch_size)
+    return [records[start:start + batch_size] for start in range(0, len(records), batch_size)]
+
+
+def numbered_tweets_text(records: Sequence[Mapping[str, Any]]) -> str:
+    """Formats a batch of tweets as `[n] text` lines, numbered from 1."""
+    return "\n".join(f"[{i}] {normalize_tweet(record['text']) or record['text']}" for i, record in enumerate(records, 1))
+
+
+def batch_scores(response, count: int) -> Dict[int, float]:
+    """
+    Maps the scores of one batch to the positions (0-based) of its tweets.
+
+    Scores are clamped to 0-100; numbers outside the batch and repeated numbers after the
+    first are dropped.
+    """
+    scores: Dict[int, float] = {}
+    for item in (response.scores if response and response.scores else []):
+        if isinstance(item.tweet, int) and 1 <= item.tweet <= count and item.tweet - 1 not in scores:
+            if isinstance(item.score, (float, int)):
+                scores[item.tweet - 1] = round(max(0.0, min(100.0, float(item.score))), 2)
+    return scores
+
+
+def _parse_date(value: Optional[str]) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def sentiment_timeseries(
+    records: Sequence[Mapping[str, Any]],
+    scores: Mapping[int, float],
+    window_days: float = SENTIMENT_WINDOW_DAYS
+) -> Dict[str, Any]:
+    """
+    Builds the time series of tweet scores and its rolling-window aggregates.
+
+    Args:
+        records: The tweets as fetched ({"id", "date", "text"}), in any order
+        scores: Score by position in `records`; unscored tweets are left out
+        window_days: Length of the trailing window ending at each tweet
+
+    Returns:
+        {"window_days", "points": [{"id", "date", "score"}], "rolling": [{"date", "mean",
+        "min", "max", "count"}]}; points are oldest first with undated tweets last, and
+        there is one rolling entry per dated point
+    """
+    points = [
+        {"id": records[i].get("id"), "date": records[i].get("date"), "score": score, "_date": _parse_date(records[i].get("date"))}
+        for i, score in scores.items()
+    ]
+    points.sort(key=lambda point: (point["_date"] is None, point["_date"] or datetime.min))
+
+    dated = [point for point in points if point["_date"] is not None]
+    window = timedelta(days=window_days)
+    rolling = []
+    start = 0
+    for end, point in enumerate(dated):
+        while dated[start]["_date"] <= point["_date"] - window:
+            start += 1
+        values = [other["score"] for other in dated[start:end + 1]]
+        rolling.append({
+            "date": point["date"],
+            "mean": round(sum(values) / len(values), 2),
+            "min": min(values),
+            "max": max(values),
+            "count": len(values)
+        })
+    return {
+        "window_days": window_days,
+        "points": [{key: value for key, value in point.items() if key != "_date"} for point in points],
+        "rolling": rolling
+    }
\ No newline at end of file
@@ -0,0 +1,187 @@
+import threading
+import time
+from typing import Any, Dict, Mapping, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from src.observability.metrics import LLM_COST, LLM_ERRORS, LLM_TOKENS
+from .constants import MODEL_CACHED_INPUT_COST_PER_1M, MODEL_INPUT_COST_PER_1M, MODEL_OUTPUT_COST_PER_1M
+
+_USAGE_FIELDS = (
+    "llm_calls", "llm_errors", "prompt_tokens", "cached_prompt_tokens", "completion_tokens",
+    "total_tokens", "latency_ms", "cost_usd"
+)
+
+
+def _empty_usage() -> Dict[str, float]:
+    """Returns a zeroed usage record."""
+    return {field: 0 for field in _USAGE_FIELDS}
+
+
+def _add_usage(target: Dict[str, float], delta: Dict[str, float]) -> None:
+    """Adds the fields of `delta` into `target` in place."""
+    for field in _USAGE_FIELDS:
+        target[field] += delta.get(field, 0)
+
+
+def _extract_token_usage(response: LLMResult) -> Dict[str, int]:
+    """
+    Extracts prompt/completion token counts from an LLM result, including the number of
+    prompt tokens served from the provider's prefix cache.
+
+    Prefers the standard `usage_metadata` on the generated message and falls back
+    to the provider's `token_usage` block in `llm_output`.
+    """
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            usage = getattr(message, "usage_metadata", None)
+            if usage:
+                return {
+                    "prompt_tokens": usage.get("input_tokens", 0),
+                    "cached_prompt_tokens": (usage.get("input_token_details") or {}).get("cache_read", 0),
+                    "completion_tokens": usage.get("output_tokens", 0),
+                    "total_tokens": usage.get("total_tokens", 0)
+                }
+
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    return {
+        "prompt_tokens": token_usage.get("prompt_tokens", 0),
+        "cached_prompt_tokens": (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0),
+        "completion_tokens": token_usage.get("completion_tokens", 0),
+        "total_tokens": token_usage.get("total_tokens", 0)
+    }
+
+
+def _cost_usd(prompt_tokens: int, completion_tokens: int, cached_prompt_tokens: int = 0) -> float:
+    """Converts token counts to USD using the configured model prices (cached prompt tokens are discounted)."""
+    return (
+        (prompt_tokens - cached_prompt_tokens) * MODEL_INPUT_COST_PER_1M
+        + cached_prompt_tokens * MODEL_CACHED_INPUT_COST_PER_1M
+        + completion_tokens * MODEL_OUTPUT_COST_PER_1M
+    ) / 1_000_000
+
+
+def usage_from_completion(usage: Mapping[str, Any], cost_multiplier: float = 1.0) -> Dict[str, float]:
+    """
+    Builds the usage record of one call from the `usage` block of an OpenAI chat completion,
+    for calls made outside LangChain (e.g. through the batch API).
+
+    Args:
+        usage: The completion's `usage` object
+        cost_multiplier: Price factor, e.g. the batch API discount
+
+    Returns:
+        A usage record for `summarize_usage`
+    """
+    prompt_tokens = usage.get("prompt_tokens", 0)
+    completion_tokens = usage.get("completion_tokens", 0)
+    cached_prompt_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+    return {
+        "llm_calls": 1,
+        "prompt_tokens": prompt_tokens,
+        "cached_prompt_tokens": cached_prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": usage.get("total_tokens", prompt_tokens + completion_tokens),
+        "cost_usd": _cost_usd(prompt_tokens, completion_tokens, cached_prompt_tokens) * cost_multiplier
+    }
+
+
+def summarize_usage(nodes: Mapping[str, Mapping[str, float]]) -> Dict[str, Any]:
+    """
+    Returns per-node usage and their total, rounded for the API response.
+    """
+    nodes = {node: {**_empty_usage(), **usage} for node, usage in nodes.items()}
+    total = _empty_usage()
+    for usage in nodes.values():
+        _add_usage(total, usage)
+    for usage in [total, *nodes.values()]:
+        usage["latency_ms"] = round(usage["latency_ms"], 2)
+        usage["cost_usd"] = round(usage["cost_usd"], 6)
+    return {"total": total, "nodes": nodes}
+
+
+# --- Process-wide Counters ---
+_totals_lock = threading.Lock()
+_process_totals: Dict[str, Dict[str, float]] = {}
+
+
+def _record_process_usage(node: str, delta: Dict[str, float]) -> None:
+    """Adds a call's usage to the process-wide totals and metrics."""
+    with _totals_lock:
+        _add_usage(_process_totals.setdefault(node, _empty_usage()), delta)
+    if delta.get("llm_errors"):
+        LLM_ERRORS.inc(node)
+    if delta.get("prompt_tokens"):
+        LLM_TOKENS.inc(node, "prompt", amount=delta["prompt_tokens"])
+    if delta.get("cached_prompt_tokens"):
+        LLM_TOKENS.inc(node, "cached_prompt", amount=delta["cached_prompt_tokens"])
+    if delta.get("completion_tokens"):
+        LLM_TOKENS.inc(node, "completion", amount=delta["completion_tokens"])
+    if delta.get("cost_usd"):
+        LLM_COST.inc(node, amount=delta["cost_usd"])
+
+
+def get_usage_totals() -> Dict[str, Dict[str, float]]:
+    """
+    Returns a snapshot of token usage accumulated by this process since startup, keyed by node.
+    """
+    with _totals_lock:
+        return {node: dict(usage) for node, usage in _process_totals.items()}
+
+
+# --- Per-request Tracker ---
+class UsageTracker(BaseCallbackHandler):
+    """
+    Callback handler that records token usage and latency of every LLM call in a graph run.
+
+    Calls are attributed to the LangGraph node they were made from (via the
+    `langgraph_node` run metadata). Pass one instance per request in the graph
+    config's callbacks and read `summary()` after the run.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pending: Dict[UUID, tuple[str, float]] = {}
+        self._nodes: Dict[str, Dict[str, float]] = {}
+
+    def _start(self, run_id: UUID, metadata: Optional[Dict[str, Any]]) -> None:
+        node = (metadata or {}).get("langgraph_node", "unknown")
+        with self._lock:
+            self._pending[run_id] = (node, time.perf_counter())
+
+    def _finish(self, run_id: UUID, delta: Dict[str, float]) -> None:
+        with self._lock:
+            node, started = self._pending.pop(run_id, ("unknown", None))
+            if started is not None:
+                delta["latency_ms"] = (time.perf_counter() - started) * 1000
+            _add_usage(self._nodes.setdefault(node, _empty_usage()), delta)
+        _record_process_usage(node, delta)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, metadata=None, **kwargs: Any) -> None:
+        self._start(run_id, metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, metadata=None, **kwargs: Any) -> None:
+        self._start(run_id, metadata)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        tokens = _extract_token_usage(response)
+        delta = {
+            "llm_calls": 1,
+            **tokens,
+            "cost_usd": _cost_usd(tokens["prompt_tokens"], tokens["completion_tokens"], tokens["cached_prompt_tokens"])
+        }
+        self._finish(run_id, delta)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, {"llm_calls": 1, "llm_errors": 1})
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Returns per-node usage and the request total.
+        """
+        with self._lock:
+            nodes = {node: dict(usage) for node, usage in self._nodes.items()}
+        return summarize_usage(nodes)
@@ -1,4 +1,40 @@
-from typing import Dict, List
+import math
+from typing import Any, Dict, List, Mapping, Sequence
+
+from .constants import EVIDENCE_MODE
+
+# Rough average for English text with OpenAI tokenizers
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str | None) -> int:
+    """
+    Cheaply estimates the number of LLM tokens in a piece of text.
+    
+    Args:
+        text: Text to measure or None
+        
+    Returns:
+        Estimated token count
+    """
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def has_prompt_text(state: Mapping[str, Any]) -> bool:
+    """Returns whether the state has a bio or tweets for the LLM nodes to analyze."""
+    return bool(state.get("user_bio") or _select_prompt_tweets(state))
+
+def _select_prompt_tweets(state: Mapping[str, Any]) -> List[str] | None:
+    """
+    Returns the tweets that should be sent to the LLM nodes.
+    
+    Prefers the preprocessed ``prompt_tweets`` and falls back to the raw
+    ``recent_tweets`` when preprocessing has not run.
+    """
+    prompt_tweets = state.get("prompt_tweets")
+    if prompt_tweets is not None:
+        return prompt_tweets
+    return state.get("recent_tweets")
 
 def _prepare_prompt_inputs(user_bio: str | None, recent_tweets: List[str] | None) -> Dict[str, str]:
     """
@@ -12,5 +48,32 @@ def _prepare_prompt_inputs(user_bio: str | None, recent_tweets: List[str] | None
         Dictionary with formatted bio and tweets text
     """
     prepared_bio = user_bio if user_bio else "Not provided"
-    prepared_tweets_text = "\n".join([f"- {t}" for t in recent_tweets]) if recent_tweets else "None"
-    return {"bio": prepared_bio, "tweets_text": prepared_tweets_text} 
\ No newline at end of file
+    if EVIDENCE_MODE == "indices":
+        # Numbered so the category scorer can cite tweets by number (see `resolve_evidence`)
+        prepared_tweets_text = "\n".join([f"[{i}] {t}" for i, t in enumerate(recent_tweets, 1)]) if recent_tweets else "None"
+    else:
+        prepared_tweets_text = "\n".join([f"- {t}" for t in recent_tweets]) if recent_tweets else "None"
+    return {"bio": prepared_bio, "tweets_text": prepared_tweets_text}
+
+def resolve_evidence(evidence: Sequence[Any], state: Mapping[str, Any]) -> List[str]:
+    """
+    Turns evidence cited by number (0 for the bio, n for the n-th prompt tweet) back into
+    text. Quoted evidence is kept as is, and numbers that match nothing are dropped.
+
+    Args:
+        evidence: Evidence items from the category scorer
+        state: The state whose bio and prompt tweets were sent to the model
+
+    Returns:
+        The evidence as text, without duplicates
+    """
+    sources = [state.get("user_bio")] + list(_select_prompt_tweets(state) or [])
+    resolved: List[str] = []
+    for item in evidence:
+        if isinstance(item, int) and not isinstance(item, bool):
+            text = sources[item] if 0 <= item < len(sources) else None
+        else:
+            text = item if isinstance(item, str) else None
+        if text and text not in resolved:
+            resolved.append(text)
+    return resolved 
\ No newline at end of file
@@ -0,0 +1,4 @@
+"""
+State shared between the API worker processes of one host (see `store`).
+"""
+from .store import SharedStore, get_shared_store
\ No newline at end of file
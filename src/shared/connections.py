@@ -0,0 +1,41 @@
+"""
+Per-thread connections to the SQLite files shared between processes (the shared store,
+the task queue and the watchlist).
+
+sqlite3 connections must not be shared between threads, so every thread opens its own. They
+run in autocommit mode (transactions are opened explicitly with BEGIN IMMEDIATE) and in WAL
+mode, so readers proceed while another process commits.
+"""
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+
+
+class ThreadLocalConnections:
+    """
+    Opens one connection per thread to a SQLite database in WAL mode.
+
+    Args:
+        path: Database file (its directory is created if missing)
+        busy_timeout_ms: How long a write waits for another process's write to finish
+        synchronous: PRAGMA synchronous value (None keeps SQLite's default)
+    """
+
+    def __init__(self, path: str | Path, busy_timeout_ms: int = 5000, synchronous: Optional[str] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.busy_timeout_ms = busy_timeout_ms
+        self.synchronous = synchronous
+        self._local = threading.local()
+
+    def get(self) -> sqlite3.Connection:
+        """Returns the calling thread's connection, opening it on first use."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            if self.synchronous is not None:
+                connection.execute(f"PRAGMA synchronous={self.synchronous}")
+            self._local.connection = connection
+        return connection
\ No newline at end of file
@@ -0,0 +1,227 @@
+"""
+Cross-process shared state backed by a local SQLite database in WAL mode.
+
+With `uvicorn --workers N` every worker is a separate process, so in-memory caches and
+rate limiters exist N times: each worker misses the cache on its own, and each believes
+it has the provider's whole rate limit to itself. The shared store gives all workers on a
+host one copy of that state:
+
+- `get`/`set`/`delete` hold JSON values with a time to live, per namespace. They back the
+  analysis result cache and the username -> user id resolutions. Expired entries are
+  deleted by the first `set` after every `purge_interval`, so the file does not grow with
+  every profile ever analyzed. The purge is one indexed DELETE per process and interval,
+  run on the thread that calls `set` (callers on the event loop already use a thread).
+- `take` atomically reserves amounts from fixed-window counters. It backs the
+  cross-process side of the LLM rate limiter.
+
+WAL mode lets readers proceed while one writer commits, and writes are short single
+transactions, so contention stays low at the worker counts a single host runs. Every
+thread gets its own connection (see `connections`).
+
+The store is off unless SHARED_STORE_PATH is set; `get_shared_store()` then returns None
+and callers keep their per-process behaviour.
+"""
+import json
+import math
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional
+
+from src.observability.log import get_logger
+from .connections import ThreadLocalConnections
+
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires_at);
+CREATE TABLE IF NOT EXISTS counters (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    window_start REAL NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+"""
+
+
+class SharedStore:
+    """
+    Key/value entries and windowed counters shared by every process using the same file.
+
+    Args:
+        path: SQLite database file (created if missing)
+        busy_timeout_ms: How long a write waits for another process's write to finish
+        purge_interval: Seconds between deletions of expired entries (0 purges on every `set`)
+    """
+
+    def __init__(self, path: str | Path, busy_timeout_ms: int = 5000, purge_interval: float = 300.0):
+        self.path = Path(path)
+        self.busy_timeout_ms = busy_timeout_ms
+        self.purge_interval = purge_interval
+        self._purged_at: Optional[float] = None
+        self._connections = ThreadLocalConnections(self.path, busy_timeout_ms, synchronous="NORMAL")
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        return self._connections.get()
+
+    def _transaction(self):
+        return _Transaction(self._connection())
+
+    # --- Entries ---
+    def get(self, namespace: str, key: str) -> Any:
+        """Returns the value stored under `key`, or None if it is missing or expired."""
+        row = self._connection().execute(
+            "SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return json.loads(row[0])
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Stores a JSON-serializable value.
+
+        Args:
+            namespace: Group of keys (e.g. "analysis" or "user_id")
+            key: Key within the namespace
+            value: The value
+            ttl: Seconds until the entry expires (None keeps it until it is overwritten)
+        """
+        expires_at = None if ttl is None else time.time() + ttl
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), expires_at)
+            )
+        now = time.monotonic()
+        if self._purged_at is None or now - self._purged_at >= self.purge_interval:
+            self._purged_at = now
+            purged = self.purge_expired()
+            if purged:
+                logger.debug("Purged %d expired shared store entries", purged)
+
+    def delete(self, namespace: str, key: str) -> None:
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def purge_expired(self) -> int:
+        """Deletes expired entries and returns how many there were."""
+        with self._transaction() as connection:
+            return connection.execute(
+                "DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+            ).rowcount
+
+    # --- Counters ---
+    def take(
+        self,
+        namespace: str,
+        amounts: Mapping[str, float],
+        limits: Mapping[str, float],
+        window_seconds: float
+    ) -> float:
+        """
+        Reserves every amount from its counter in the current window, or none of them.
+
+        Windows are aligned to multiples of `window_seconds` on the wall clock, so all
+        processes agree on when a window starts.
+
+        Args:
+            namespace: Group of counters
+            amounts: Amount to add to each counter
+            limits: Most each counter may hold per window (counters without a limit are not capped)
+            window_seconds: Window length
+
+        Returns:
+            0.0 if the amounts were reserved, otherwise the seconds until the window resets
+        """
+        now = time.time()
+        window_start = math.floor(now / window_seconds) * window_seconds
+        with self._transaction() as connection:
+            current = self._window_values(connection, namespace, amounts, window_start)
+            for key, amount in amounts.items():
+                limit = limits.get(key)
+                # A reservation larger than the whole limit may go into an empty window
+                if limit is not None and current[key] > 0 and current[key] + amount > limit:
+                    return window_start + window_seconds - now
+            for key, amount in amounts.items():
+                self._write_counter(connection, namespace, key, window_start, current[key] + amount)
+        return 0.0
+
+    def adjust(self, namespace: str, amounts: Mapping[str, float], window_seconds: float) -> None:
+        """Adds (possibly negative) amounts to the current window's counters, flooring them at zero."""
+        window_start = math.floor(time.time() / window_seconds) * window_seconds
+        with self._transaction() as connection:
+            current = self._window_values(connection, namespace, amounts, window_start)
+            for key, amount in amounts.items():
+                self._write_counter(connection, namespace, key, window_start, max(0.0, current[key] + amount))
+
+    def counter(self, namespace: str, key: str, window_seconds: float) -> float:
+        """Returns a counter's value in the current window."""
+        window_start = math.floor(time.time() / window_seconds) * window_seconds
+        return self._window_values(self._connection(), namespace, [key], window_start)[key]
+
+    @staticmethod
+    def _window_values(connection, namespace, keys, window_start) -> Dict[str, float]:
+        values = {key: 0.0 for key in keys}
+        for key in values:
+            row = connection.execute(
+                "SELECT window_start, value FROM counters WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            if row is not None and row[0] == window_start:
+                values[key] = row[1]
+        return values
+
+    @staticmethod
+    def _write_counter(connection, namespace, key, window_start, value) -> None:
+        connection.execute(
+            "INSERT OR REPLACE INTO counters (namespace, key, window_start, value) VALUES (?, ?, ?, ?)",
+            (namespace, key, window_start, value)
+        )
+
+
+class _Transaction:
+    """Runs a block in a write transaction (BEGIN IMMEDIATE takes the write lock up front)."""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.connection.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+_store: Optional[SharedStore] = None
+_store_path: Optional[str] = None
+_store_lock = threading.Lock()
+
+
+def get_shared_store() -> Optional[SharedStore]:
+    """Returns the store at SHARED_STORE_PATH, or None when no path is configured."""
+    # Imported here: the pipeline package imports this module (through the rate limiter)
+    from src.pipeline import constants
+
+    global _store, _store_path
+    path = constants.SHARED_STORE_PATH
+    if not path:
+        return None
+    with _store_lock:
+        if _store is None or _store_path != path:
+            _store = SharedStore(
+                path, constants.SHARED_STORE_BUSY_TIMEOUT_MS, constants.SHARED_STORE_PURGE_INTERVAL_SECONDS
+            )
+            _store_path = path
+            logger.info("Shared store opened", extra={"path": path})
+        return _store
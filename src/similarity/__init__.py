@@ -0,0 +1,5 @@
+"""
+Similar-profile search over the category, sentiment and MBTI vectors of completed
+analyses (see `index`).
+"""
+from .index import SimilarityIndex, get_similarity_index, index_profiles, profile_vector
\ No newline at end of file
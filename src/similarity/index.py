@@ -0,0 +1,246 @@
+"""
+Similar-profile search over the vectors of completed analyses.
+
+Every analysis becomes one feature vector: the 30 category scores (0 for categories that
+were not scored), the sentiment score and a one-hot MBTI code, scaled by the weights in
+constants and normalized to unit length. Cosine similarity is then a dot product, and
+a search is one matrix-vector product over all profiles followed by a partial sort.
+
+The vectors are rows of one contiguous float32 matrix in a memory-mapped file, so the
+index needs no load step, stays in the page cache between searches and is shared by
+every process that maps it. Rows are padded to a multiple of 8 floats, which keeps them
+aligned for the vectorized product. The file grows by doubling. Usernames are appended
+to a text file, one per row, and a profile that is analyzed again overwrites its row.
+
+Writers take a file lock and first catch up on rows appended by other processes, so API
+workers, queue workers and bulk runs can share one index directory.
+
+numpy is imported on first use, so importing the API does not pay for it when the index
+is off.
+"""
+import json
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from src.observability.log import get_logger
+from src.pipeline.constants import (
+    CATEGORIES,
+    MBTI_TYPES,
+    SIMILARITY_INDEX_DIR,
+    SIMILARITY_MBTI_WEIGHT,
+    SIMILARITY_SENTIMENT_WEIGHT
+)
+
+if TYPE_CHECKING:
+    import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = get_logger(__name__)
+
+MBTI_CODES = sorted(MBTI_TYPES)
+FEATURES = [*CATEGORIES, "sentiment", *[f"mbti_{code}" for code in MBTI_CODES]]
+DIMENSIONS = -(-len(FEATURES) // 8) * 8
+INITIAL_CAPACITY = 1024
+
+
+def profile_vector(result: Mapping[str, Any]) -> Optional["np.ndarray"]:
+    """
+    Builds the unit-length feature vector of an analysis.
+
+    Args:
+        result: Final state or AnalysisResponse dict
+
+    Returns:
+        The vector, or None if the analysis has no category scores to compare
+    """
+    import numpy as np
+
+    category_scores = result.get("category_scores") or {}
+    if not category_scores:
+        return None
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    for i, category in enumerate(CATEGORIES):
+        score = category_scores.get(category)
+        if score:
+            vector[i] = (score.get("score") or 0.0) / 100
+    sentiment = result.get("sentiment_scaled_score")
+    if sentiment is not None:
+        vector[len(CATEGORIES)] = SIMILARITY_SENTIMENT_WEIGHT * sentiment / 100
+    mbti_code = (result.get("mbti_result") or {}).get("mbti_code")
+    if mbti_code in MBTI_TYPES:
+        vector[len(CATEGORIES) + 1 + MBTI_CODES.index(mbti_code)] = SIMILARITY_MBTI_WEIGHT
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm > 0 else None
+
+
+class SimilarityIndex:
+    """
+    Memory-mapped matrix of profile vectors with top-k cosine search. Thread-safe.
+
+    Args:
+        directory: Directory holding the vectors, usernames and layout files
+    """
+
+    def __init__(self, directory: Path | str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = self.directory / "vectors.f32"
+        self._names_path = self.directory / "usernames.txt"
+        self._lock = threading.RLock()
+        self._usernames: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._names_offset = 0
+        self._matrix: Optional["np.memmap"] = None
+        self._check_layout()
+        self._refresh()
+
+    def _check_layout(self) -> None:
+        """Starts a new index if the stored one was built for other features."""
+        layout_path = self.directory / "layout.json"
+        layout = {"features": FEATURES, "dimensions": DIMENSIONS}
+        if layout_path.exists() and json.loads(layout_path.read_text()) != layout:
+            logger.warning("Similarity index features changed; starting a new index in %s", self.directory)
+            self._vectors_path.unlink(missing_ok=True)
+            self._names_path.unlink(missing_ok=True)
+        layout_path.write_text(json.dumps(layout))
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self.directory / ".lock", "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _refresh(self) -> None:
+        """Picks up rows other processes appended and remaps the matrix if it grew."""
+        import numpy as np
+
+        size = self._names_path.stat().st_size if self._names_path.exists() else 0
+        if size > self._names_offset:
+            with open(self._names_path, "rb") as names:
+                names.seek(self._names_offset)
+                appended = names.read(size - self._names_offset)
+            complete = appended[:appended.rfind(b"\n") + 1]
+            for username in complete.decode().splitlines():
+                self._rows[username.lower()] = len(self._usernames)
+                self._usernames.append(username)
+            self._names_offset += len(complete)
+        capacity = self._vectors_path.stat().st_size // (DIMENSIONS * 4) if self._vectors_path.exists() else 0
+        if capacity and (self._matrix is None or self._matrix.shape[0] != capacity):
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, DIMENSIONS))
+
+    def _reserve(self, rows: int) -> None:
+        import numpy as np
+
+        capacity = 0 if self._matrix is None else self._matrix.shape[0]
+        if rows <= capacity:
+            return
+        capacity = max(rows, 2 * capacity, INITIAL_CAPACITY)
+        with open(self._vectors_path, "ab") as vectors:
+            vectors.truncate(capacity * DIMENSIONS * 4)
+        self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, DIMENSIONS))
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._usernames)
+
+    def add(self, items: Iterable[Tuple[str, "np.ndarray"]]) -> int:
+        """
+        Inserts or replaces profile vectors.
+
+        Args:
+            items: (username, vector) pairs; vectors come from `profile_vector`
+
+        Returns:
+            The number of new profiles
+        """
+        latest = {username.lower(): (username, vector) for username, vector in items}
+        if not latest:
+            return 0
+        with self._lock, self._file_lock():
+            self._refresh()
+            new = [username for key, (username, _) in latest.items() if key not in self._rows]
+            self._reserve(len(self._usernames) + len(new))
+            for i, username in enumerate(new):
+                self._rows[username.lower()] = len(self._usernames) + i
+            for key, (_, vector) in latest.items():
+                self._matrix[self._rows[key]] = vector
+            self._matrix.flush()
+            # Names are appended after their vectors are written, so readers never see a
+            # username whose row is not filled in yet
+            if new:
+                appended = "".join(f"{username}\n" for username in new).encode()
+                with open(self._names_path, "ab") as names:
+                    names.write(appended)
+                self._usernames.extend(new)
+                self._names_offset += len(appended)
+        return len(new)
+
+    def search(self, username: str, k: int = 10) -> Optional[List[Tuple[str, float]]]:
+        """
+        Finds the profiles most similar to an indexed one.
+
+        Args:
+            username: Profile to compare against
+            k: Number of results
+
+        Returns:
+            Up to `k` (username, cosine similarity) pairs, most similar first, or None if
+            the profile is not in the index
+        """
+        import numpy as np
+
+        with self._lock:
+            self._refresh()
+            row = self._rows.get(username.lower())
+            if row is None:
+                return None
+            count = len(self._usernames)
+            matrix = self._matrix[:count]
+            usernames = self._usernames
+        k = min(k, count - 1)
+        if k <= 0:
+            return []
+        scores = matrix @ np.array(matrix[row])
+        scores[row] = -np.inf
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(usernames[i], float(scores[i])) for i in top]
+
+
+_index: Optional[SimilarityIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_similarity_index() -> Optional[SimilarityIndex]:
+    """Returns the process-wide index in SIMILARITY_INDEX_DIR, or None when it is not set."""
+    global _index
+    if not SIMILARITY_INDEX_DIR:
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = SimilarityIndex(SIMILARITY_INDEX_DIR)
+        return _index
+
+
+def index_profiles(results: Iterable[Mapping[str, Any]]) -> None:
+    """Adds completed analyses to the index. Failures are logged, never raised."""
+    try:
+        index = get_similarity_index()
+        if index is None:
+            return
+        items = []
+        for result in results:
+            vector = None if result.get("error") else profile_vector(result)
+            if vector is not None:
+                items.append((result["username"], vector))
+        index.add(items)
+    except Exception as e:
+        logger.warning("Could not index profiles: %s - %s", type(e).__name__, e)
\ No newline at end of file
@@ -0,0 +1,6 @@
+"""
+Watchlist: accounts re-analyzed periodically in the background (see `store` for the
+entries and their due times, and `scheduler` for the refreshes).
+"""
+from .scheduler import WatchlistScheduler
+from .store import WatchlistEntry, WatchlistStore, get_watchlist_store
\ No newline at end of file
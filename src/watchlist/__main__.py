@@ -0,0 +1,59 @@
+"""
+Command line entry point for the watchlist.
+
+    python -m src.watchlist run                               # refresh due entries
+    python -m src.watchlist run --concurrency 8
+    python -m src.watchlist add accounts.txt --interval 3600  # one username per line
+
+Both use the watchlist at WATCHLIST_PATH. Several schedulers (this one and API processes
+with WATCHLIST_RUN_IN_API) can share it; each due entry is refreshed by one of them.
+"""
+import argparse
+import sys
+
+from src.api.runtime import run_service
+from src.pipeline.constants import (
+    WATCHLIST_CONCURRENCY,
+    WATCHLIST_DEFAULT_INTERVAL_SECONDS,
+    WATCHLIST_MAX_PER_MINUTE,
+    WATCHLIST_MIN_INTERVAL_SECONDS
+)
+from .scheduler import WatchlistScheduler
+from .store import WatchlistStore, get_watchlist_store
+
+
+def _add(store: WatchlistStore, args: argparse.Namespace) -> None:
+    with open(args.file, encoding="utf-8") as f:
+        usernames = [line.strip().lstrip("@") for line in f if line.strip() and not line.startswith("#")]
+    added = store.add(usernames, args.interval, args.tweet_count)
+    print(f"Added {added} accounts, updated {len(set(usernames)) - added}; {len(store)} on the watchlist")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Refresh or import the watchlist.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="Refresh due entries until interrupted")
+    run.add_argument("--concurrency", type=int, default=WATCHLIST_CONCURRENCY)
+    run.add_argument("--max-per-minute", type=float, default=WATCHLIST_MAX_PER_MINUTE)
+    add = commands.add_parser("add", help="Add the usernames in a file, one per line")
+    add.add_argument("file")
+    add.add_argument("--interval", type=float, default=WATCHLIST_DEFAULT_INTERVAL_SECONDS, help="Seconds between refreshes")
+    add.add_argument("--tweet-count", type=int, default=10)
+    args = parser.parse_args()
+
+    store = get_watchlist_store()
+    if store is None:
+        sys.exit("WATCHLIST_PATH is not set")
+    if args.command == "add":
+        if args.interval < WATCHLIST_MIN_INTERVAL_SECONDS:
+            sys.exit(f"--interval must be at least {WATCHLIST_MIN_INTERVAL_SECONDS:g} seconds")
+        _add(store, args)
+        return
+
+    run_service(
+        lambda stop: WatchlistScheduler(store, concurrency=args.concurrency, max_per_minute=args.max_per_minute).run(stop)
+    )
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
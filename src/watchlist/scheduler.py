@@ -0,0 +1,224 @@
+"""
+Scheduler that keeps the watchlist fresh.
+
+Due entries are claimed from the store one at a time and refreshed concurrently, up to
+`concurrency` at once. A refresh first fetches the account's newest tweets (a single
+twscrape call) and skips the analysis when the newest tweet id is the one the last
+refresh saw. Otherwise the account is analyzed through the same service path as
+`/analyze`, bypassing the analysis cache.
+
+Refreshes stay within the fetch and LLM budgets in three ways. They run at `background`
+priority, so the priority scheduler gives them at most their capped share of the fetch
+and LLM slots, behind interactive and batch requests. At most `max_per_minute` refreshes
+start per minute; with a shared store (SHARED_STORE_PATH) the budget is counted there, so
+it holds for all the schedulers on the host together rather than for each API worker. And
+no new refresh starts while background requests are already
+queued for a slot or LLM calls are queued for rate limit capacity, so a backlog of
+overdue entries turns into schedule lag instead of timeouts.
+
+Schedule lag (time from an entry falling due to its refresh starting), the number of
+overdue entries and the outcome of every refresh are exported as metrics.
+"""
+import asyncio
+import sqlite3
+import time
+from typing import Optional, Set
+
+from fastapi import HTTPException
+
+from src.api.scheduler import get_scheduler
+from src.api.services import analyze_profile_service
+from src.data_fetcher.fetcher import fetch_tweet_records
+from src.observability.log import get_logger
+from src.observability.metrics import (
+    LLM_RATE_LIMIT_QUEUE,
+    WATCHLIST_ENTRIES,
+    WATCHLIST_MAX_LAG,
+    WATCHLIST_OVERDUE,
+    WATCHLIST_REFRESHES,
+    WATCHLIST_SCHEDULE_LAG
+)
+from src.pipeline.constants import (
+    WATCHLIST_CONCURRENCY,
+    WATCHLIST_LEASE_SECONDS,
+    WATCHLIST_MAX_PER_MINUTE,
+    WATCHLIST_POLL_INTERVAL_SECONDS,
+    WATCHLIST_RETRY_SECONDS
+)
+from src.pipeline.rate_limit import TokenBucket
+from src.shared.store import SharedStore, get_shared_store
+from .store import ANALYZED, FAILED, UNCHANGED, WatchlistEntry, WatchlistStore, jittered
+
+logger = get_logger(__name__)
+
+PRIORITY = "background"
+PROBE_TWEETS = 3  # The newest tweet can sit behind a pinned one
+_BUDGET_NAMESPACE = "watchlist_budget"
+_BUDGET_WINDOW_SECONDS = 60.0
+
+
+async def newest_tweet_id(username: str) -> Optional[str]:
+    """Returns the id of the account's newest tweet, or None if it could not be fetched."""
+    async with get_scheduler().slot_async("fetch", PRIORITY):
+        records = await fetch_tweet_records(username, n=PROBE_TWEETS)
+    ids = [int(record["id"]) for record in records if (record.get("id") or "").isdigit()]
+    return str(max(ids)) if ids else None
+
+
+class WatchlistScheduler:
+    """
+    Refreshes due watchlist entries.
+
+    Args:
+        store: The watchlist
+        concurrency: Refreshes run at once
+        max_per_minute: Refreshes started per minute (0 for no limit)
+        poll_interval: Seconds to wait before looking for due entries again
+        lease_seconds: How long a claimed entry is held before another scheduler may take it
+        shared: Store holding the refresh budget shared with other processes (defaults to the
+            configured shared store; without one the budget is per scheduler)
+    """
+
+    def __init__(
+        self,
+        store: WatchlistStore,
+        concurrency: int = WATCHLIST_CONCURRENCY,
+        max_per_minute: float = WATCHLIST_MAX_PER_MINUTE,
+        poll_interval: float = WATCHLIST_POLL_INTERVAL_SECONDS,
+        lease_seconds: float = WATCHLIST_LEASE_SECONDS,
+        shared: Optional[SharedStore] = None
+    ):
+        self.store = store
+        self.concurrency = concurrency
+        self.max_per_minute = max_per_minute
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self._shared = shared if shared is not None else get_shared_store()
+        self._budget = TokenBucket(max_per_minute) if max_per_minute > 0 and self._shared is None else None
+        self._lag_updated = 0.0
+
+    def _backpressure_wait(self) -> float:
+        """Seconds to wait while background requests or LLM calls are already queued."""
+        resources = get_scheduler()
+        if any(resources.resource(name).queued(PRIORITY) for name in ("fetch", "llm")) or LLM_RATE_LIMIT_QUEUE.value() > 0:
+            return self.poll_interval
+        return 0.0
+
+    def _reserve_refresh(self) -> float:
+        """
+        Takes one refresh from the per-minute budget.
+
+        Returns:
+            0.0 if taken, otherwise the seconds until the budget allows another refresh
+        """
+        if self.max_per_minute <= 0:
+            return 0.0
+        if self._shared is not None:
+            try:
+                return self._shared.take(
+                    _BUDGET_NAMESPACE, {"refreshes": 1}, {"refreshes": self.max_per_minute}, _BUDGET_WINDOW_SECONDS
+                )
+            except sqlite3.Error as e:
+                # The budget protects the shared capacity, which is also guarded by the backpressure check
+                logger.warning("Shared store unavailable for the watchlist budget: %s", e)
+                return 0.0
+        self._budget.refill(time.monotonic())
+        wait = self._budget.seconds_until(1)
+        if wait == 0.0:
+            self._budget.level -= 1
+        return wait
+
+    def _return_refresh(self) -> None:
+        """Gives back a refresh taken from the budget when nothing was due after all."""
+        if self.max_per_minute <= 0:
+            return
+        if self._shared is not None:
+            try:
+                self._shared.adjust(_BUDGET_NAMESPACE, {"refreshes": -1}, _BUDGET_WINDOW_SECONDS)
+            except sqlite3.Error as e:
+                logger.warning("Shared store unavailable for the watchlist budget: %s", e)
+            return
+        self._budget.level = min(self._budget.capacity, self._budget.level + 1)
+
+    def _update_lag_metrics(self) -> None:
+        overdue, max_lag = self.store.lag()
+        WATCHLIST_ENTRIES.set(value=len(self.store))
+        WATCHLIST_OVERDUE.set(value=overdue)
+        WATCHLIST_MAX_LAG.set(value=max_lag)
+
+    async def _sleep(self, stop: asyncio.Event, seconds: float) -> None:
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def run(self, stop: Optional[asyncio.Event] = None) -> None:
+        """Refreshes due entries until `stop` is set, then finishes the refreshes in flight."""
+        stop = stop or asyncio.Event()
+        slots = asyncio.Semaphore(self.concurrency)
+        in_flight: Set[asyncio.Task] = set()
+        logger.info("Watchlist scheduler started", extra={"concurrency": self.concurrency})
+
+        while not stop.is_set():
+            if time.monotonic() - self._lag_updated >= self.poll_interval:
+                await asyncio.to_thread(self._update_lag_metrics)
+                self._lag_updated = time.monotonic()
+            await slots.acquire()
+            wait = self._backpressure_wait() or await asyncio.to_thread(self._reserve_refresh)
+            if wait > 0:
+                slots.release()
+                await self._sleep(stop, min(wait, self.poll_interval))
+                continue
+            claimed = await asyncio.to_thread(self.store.claim_due, 1, self.lease_seconds)
+            if not claimed:
+                await asyncio.to_thread(self._return_refresh)
+                slots.release()
+                await self._sleep(stop, self.poll_interval)
+                continue
+            running = asyncio.create_task(self.refresh(claimed[0]))
+            in_flight.add(running)
+            running.add_done_callback(lambda done: (in_flight.discard(done), slots.release()))
+
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+        logger.info("Watchlist scheduler stopped")
+
+    async def refresh(self, entry: WatchlistEntry) -> str:
+        """
+        Refreshes one claimed entry and schedules its next refresh.
+
+        Returns:
+            The outcome: "analyzed", "unchanged" or "failed"
+        """
+        WATCHLIST_SCHEDULE_LAG.observe(max(0.0, time.time() - entry.due_at))
+        next_in = jittered(entry.interval_seconds)
+        tweet_id = None
+        error = None
+        try:
+            tweet_id = await newest_tweet_id(entry.username)
+            if tweet_id is not None and tweet_id == entry.last_tweet_id:
+                outcome = UNCHANGED
+            else:
+                await analyze_profile_service(
+                    username=entry.username,
+                    tweet_count=entry.tweet_count,
+                    priority=PRIORITY,
+                    refresh=True
+                )
+                outcome = ANALYZED
+        except HTTPException as e:
+            outcome, error = FAILED, str(e.detail)
+            # A missing account is checked again at its normal interval, anything else sooner
+            if e.status_code != 404:
+                next_in = jittered(min(entry.interval_seconds, WATCHLIST_RETRY_SECONDS))
+        except Exception as e:
+            logger.exception("Watchlist refresh of %s raised: %s - %s", entry.username, type(e).__name__, e)
+            outcome, error = FAILED, f"{type(e).__name__}: {e}"
+            next_in = jittered(min(entry.interval_seconds, WATCHLIST_RETRY_SECONDS))
+
+        await asyncio.to_thread(
+            self.store.finish, entry, outcome, next_in, tweet_id if outcome != FAILED else None, error
+        )
+        WATCHLIST_REFRESHES.inc(outcome)
+        logger.info("Watchlist refresh of %s: %s", entry.username, outcome, extra={"next_in_seconds": round(next_in)})
+        return outcome
\ No newline at end of file
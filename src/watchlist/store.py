@@ -0,0 +1,205 @@
+"""
+Watchlist of accounts that are re-analyzed periodically, in a SQLite database (WAL mode).
+
+Each entry has its own refresh interval and the time it is next due. Schedulers claim due
+entries in a write transaction and hold a lease on them while they refresh, so several
+schedulers (API workers, `python -m src.watchlist`) can share one watchlist without
+refreshing an account twice; a claim whose scheduler died comes back once its lease ends.
+
+Due times are jittered: new entries fall due at a random point within their first
+interval, and every refresh schedules the next one `interval +- WATCHLIST_JITTER`. A bulk
+import of thousands of accounts is therefore spread over the interval instead of falling
+due at once, and entries that were refreshed together drift apart.
+"""
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from src.pipeline.constants import WATCHLIST_JITTER, WATCHLIST_PATH
+from src.shared.connections import ThreadLocalConnections
+
+ANALYZED, UNCHANGED, FAILED = "analyzed", "unchanged", "failed"
+
+
+class WatchlistEntry(NamedTuple):
+    """An account on the watchlist and the outcome of its last refresh."""
+    username: str
+    interval_seconds: float
+    tweet_count: int
+    due_at: float  # Unix time the next refresh is due
+    added_at: float
+    last_checked_at: Optional[float]
+    last_analyzed_at: Optional[float]
+    last_tweet_id: Optional[str]  # Newest tweet seen by the last refresh
+    last_status: Optional[str]  # analyzed, unchanged or failed
+    last_error: Optional[str]
+
+
+def jittered(seconds: float, jitter: float = WATCHLIST_JITTER) -> float:
+    """Returns `seconds` varied by up to +-`jitter` of itself."""
+    return seconds * random.uniform(1 - jitter, 1 + jitter)
+
+
+_COLUMNS = (
+    "username, interval_seconds, tweet_count, due_at, added_at, last_checked_at, last_analyzed_at, "
+    "last_tweet_id, last_status, last_error"
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watchlist (
+    key TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    interval_seconds REAL NOT NULL,
+    tweet_count INTEGER NOT NULL,
+    due_at REAL NOT NULL,
+    leased_until REAL,
+    added_at REAL NOT NULL,
+    last_checked_at REAL,
+    last_analyzed_at REAL,
+    last_tweet_id TEXT,
+    last_status TEXT,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS watchlist_due ON watchlist (due_at);
+"""
+
+
+class WatchlistStore:
+    """
+    Watchlist entries with leased claiming of the due ones.
+
+    Args:
+        path: Database file (created if missing)
+        busy_timeout_ms: How long a write waits for another process's write to finish
+    """
+
+    def __init__(self, path: str | Path, busy_timeout_ms: int = 5000):
+        self.path = Path(path)
+        self.busy_timeout_ms = busy_timeout_ms
+        self._connections = ThreadLocalConnections(self.path, busy_timeout_ms)
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        return self._connections.get()
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM watchlist").fetchone()[0]
+
+    def add(self, usernames: Iterable[str], interval_seconds: float, tweet_count: int = 10) -> int:
+        """
+        Adds accounts, or updates the interval and tweet count of ones already listed. A
+        shorter interval brings the next refresh forward; a longer one takes effect after it.
+
+        Returns:
+            The number of new entries
+        """
+        now = time.time()
+        rows = [
+            (username.lower(), username, interval_seconds, tweet_count, now + random.uniform(0, interval_seconds), now,
+             now + interval_seconds)
+            for username in dict.fromkeys(usernames)
+        ]
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            before = connection.execute("SELECT COUNT(*) FROM watchlist").fetchone()[0]
+            connection.executemany(
+                "INSERT INTO watchlist (key, username, interval_seconds, tweet_count, due_at, added_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET "
+                "interval_seconds = excluded.interval_seconds, tweet_count = excluded.tweet_count, due_at = MIN(due_at, ?)",
+                rows
+            )
+            added = connection.execute("SELECT COUNT(*) FROM watchlist").fetchone()[0] - before
+            connection.execute("COMMIT")
+            return added
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def remove(self, username: str) -> bool:
+        """Removes an account. Returns False if it was not listed."""
+        return self._connection().execute("DELETE FROM watchlist WHERE key = ?", (username.lower(),)).rowcount == 1
+
+    def get(self, username: str) -> Optional[WatchlistEntry]:
+        row = self._connection().execute(f"SELECT {_COLUMNS} FROM watchlist WHERE key = ?", (username.lower(),)).fetchone()
+        return WatchlistEntry(*row) if row else None
+
+    def entries(self, offset: int = 0, limit: int = 100) -> List[WatchlistEntry]:
+        """Returns entries in the order they fall due."""
+        rows = self._connection().execute(
+            f"SELECT {_COLUMNS} FROM watchlist ORDER BY due_at, key LIMIT ? OFFSET ?", (limit, offset)
+        ).fetchall()
+        return [WatchlistEntry(*row) for row in rows]
+
+    def claim_due(self, limit: int, lease_seconds: float) -> List[WatchlistEntry]:
+        """
+        Leases up to `limit` due entries, most overdue first, for `lease_seconds`.
+
+        Returns:
+            The claimed entries; their `due_at` is the time they fell due
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            rows = connection.execute(
+                f"SELECT {_COLUMNS} FROM watchlist WHERE due_at <= ? AND (leased_until IS NULL OR leased_until <= ?) "
+                "ORDER BY due_at LIMIT ?",
+                (now, now, limit)
+            ).fetchall()
+            connection.executemany(
+                "UPDATE watchlist SET leased_until = ? WHERE key = ?",
+                [(now + lease_seconds, row[0].lower()) for row in rows]
+            )
+            connection.execute("COMMIT")
+            return [WatchlistEntry(*row) for row in rows]
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def finish(
+        self,
+        entry: WatchlistEntry,
+        status: str,
+        next_in: float,
+        tweet_id: Optional[str] = None,
+        error: Optional[str] = None
+    ) -> None:
+        """
+        Records the outcome of a refresh, releases the lease and schedules the next refresh
+        `next_in` seconds from now.
+        """
+        now = time.time()
+        self._connection().execute(
+            "UPDATE watchlist SET due_at = ?, leased_until = NULL, last_checked_at = ?, "
+            "last_analyzed_at = CASE WHEN ? THEN ? ELSE last_analyzed_at END, "
+            "last_tweet_id = COALESCE(?, last_tweet_id), last_status = ?, last_error = ? WHERE key = ?",
+            (now + next_in, now, status == ANALYZED, now, tweet_id, status, error, entry.username.lower())
+        )
+
+    def lag(self) -> Tuple[int, float]:
+        """Returns the number of due entries not being refreshed and the largest lag in seconds."""
+        now = time.time()
+        count, oldest = self._connection().execute(
+            "SELECT COUNT(*), MIN(due_at) FROM watchlist WHERE due_at <= ? AND (leased_until IS NULL OR leased_until <= ?)",
+            (now, now)
+        ).fetchone()
+        return count, (now - oldest) if oldest is not None else 0.0
+
+
+_store: Optional[WatchlistStore] = None
+_store_lock = threading.Lock()
+
+
+def get_watchlist_store() -> Optional[WatchlistStore]:
+    """Returns the process-wide watchlist at WATCHLIST_PATH, or None when it is not set."""
+    global _store
+    if not WATCHLIST_PATH:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = WatchlistStore(WATCHLIST_PATH)
+        return _store
\ No newline at end of file
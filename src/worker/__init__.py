@@ -0,0 +1,6 @@
+"""
+Worker mode: analyses submitted to a durable task queue and run by separate worker
+processes (see `queue` and `worker`).
+"""
+from .queue import RedisTaskQueue, SQLiteTaskQueue, Task, TaskQueue, create_task_queue, get_task_queue
+from .worker import AnalysisWorker
\ No newline at end of file
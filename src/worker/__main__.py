@@ -0,0 +1,29 @@
+"""
+Command line entry point for the analysis worker.
+
+    python -m src.worker                      # queue from TASK_QUEUE_URL
+    python -m src.worker --concurrency 16
+    TASK_QUEUE_URL=redis://queue-host:6379/0 python -m src.worker
+
+Run as many workers, on as many hosts, as fetch and LLM capacity allow; the API only
+enqueues tasks and reads results.
+"""
+import argparse
+
+from src.api.runtime import run_service
+from src.pipeline.constants import TASK_QUEUE_URL, WORKER_CONCURRENCY
+from .queue import create_task_queue
+from .worker import AnalysisWorker
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run analyses from the task queue.")
+    parser.add_argument("--queue-url", default=TASK_QUEUE_URL)
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY)
+    args = parser.parse_args()
+
+    run_service(lambda stop: AnalysisWorker(create_task_queue(args.queue_url), concurrency=args.concurrency).run(stop))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+"""
+Durable task queues for analysis tasks, with visibility timeouts and at-least-once delivery.
+
+A worker that dequeues a task holds a lease on it for the visibility timeout. The worker
+then does one of three things:
+
+- acks the task with its result,
+- hands it back for a retry (with a delay), or
+- fails it for good.
+
+If the worker dies instead, the lease expires and the task becomes visible to the other
+workers again. Each delivery counts as an attempt. After TASK_MAX_ATTEMPTS the task is
+marked failed instead of being handed out again, so a task that crashes its worker
+cannot loop forever. A lease that expired while its worker was merely slow is detected
+on ack: the ack reports the lease lost and the newer delivery's result wins.
+
+Two backends implement the same `TaskQueue` interface:
+
+- `SQLiteTaskQueue`: one database file, for workers on one host or a shared volume.
+- `RedisTaskQueue`: any Redis-protocol server, for workers spread over several nodes.
+"""
+import abc
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+from urllib.parse import urlparse
+
+from src.pipeline.constants import TASK_MAX_ATTEMPTS, TASK_QUEUE_URL, TASK_RESULT_TTL_SECONDS
+from src.shared.connections import ThreadLocalConnections
+from .resp import RespClient
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class Task(NamedTuple):
+    """A delivered task and the lease its worker holds on it."""
+    id: str
+    payload: Dict[str, Any]
+    attempts: int  # Deliveries so far, including this one
+    receipt: str  # Lease token; acks and retries with a stale receipt are ignored
+
+
+class TaskQueue(abc.ABC):
+    """
+    Interface of the analysis task queues.
+
+    Args:
+        max_attempts: Deliveries before a task is failed instead of handed out again
+    """
+
+    def __init__(self, max_attempts: int = TASK_MAX_ATTEMPTS):
+        self.max_attempts = max_attempts
+
+    @abc.abstractmethod
+    def enqueue(self, payload: Dict[str, Any]) -> str:
+        """Adds a task and returns its id."""
+
+    @abc.abstractmethod
+    def dequeue(self, visibility_timeout: float) -> Optional[Task]:
+        """Leases the oldest visible task for `visibility_timeout` seconds, or returns None if there is none."""
+
+    @abc.abstractmethod
+    def extend(self, task: Task, visibility_timeout: float) -> bool:
+        """Renews a lease for another `visibility_timeout` seconds. Returns False if the lease was lost."""
+
+    @abc.abstractmethod
+    def ack(self, task: Task, result: Dict[str, Any]) -> bool:
+        """Completes a task with its result. Returns False if the lease was lost."""
+
+    @abc.abstractmethod
+    def retry(self, task: Task, error: str, delay: float) -> None:
+        """Hands a task back to be retried after `delay` seconds, or fails it if it is out of attempts."""
+
+    @abc.abstractmethod
+    def fail(self, task: Task, error: str, status_code: int = 500) -> None:
+        """Fails a task for good (e.g. the profile does not exist)."""
+
+    @abc.abstractmethod
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns a task's status, or None if it is unknown.
+
+        The status has the keys task_id, status, attempts, result, error and status_code.
+        """
+
+    def purge_finished(self, older_than: float = TASK_RESULT_TTL_SECONDS) -> int:
+        """
+        Deletes done and failed tasks last updated more than `older_than` seconds ago.
+        Returns the number deleted. Backends whose server expires finished tasks do nothing.
+        """
+        return 0
+
+
+def _new_id() -> str:
+    return uuid.uuid4().hex
+
+
+# --- SQLite ---
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    visible_at REAL NOT NULL,
+    receipt TEXT,
+    result TEXT,
+    error TEXT,
+    status_code INTEGER,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_visible ON tasks (status, visible_at);
+"""
+
+
+class SQLiteTaskQueue(TaskQueue):
+    """
+    Task queue in a SQLite database (WAL mode). Leasing runs in a write transaction, so
+    a task is never leased to two workers at once.
+
+    Args:
+        path: Database file (created if missing)
+        max_attempts: Deliveries before a task is failed
+        busy_timeout_ms: How long a write waits for another process's write to finish
+    """
+
+    def __init__(self, path: str | Path, max_attempts: int = TASK_MAX_ATTEMPTS, busy_timeout_ms: int = 5000):
+        super().__init__(max_attempts)
+        self.path = Path(path)
+        self.busy_timeout_ms = busy_timeout_ms
+        self._connections = ThreadLocalConnections(self.path, busy_timeout_ms)
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        return self._connections.get()
+
+    def _write(self, sql: str, parameters: tuple) -> int:
+        return self._connection().execute(sql, parameters).rowcount
+
+    def enqueue(self, payload: Dict[str, Any]) -> str:
+        task_id = _new_id()
+        now = time.time()
+        self._write(
+            "INSERT INTO tasks (id, payload, status, visible_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (task_id, json.dumps(payload), QUEUED, now, now, now)
+        )
+        return task_id
+
+    def dequeue(self, visibility_timeout: float) -> Optional[Task]:
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            while True:
+                now = time.time()
+                # Running tasks whose lease expired are visible again
+                row = connection.execute(
+                    "SELECT id, payload, attempts FROM tasks WHERE status IN (?, ?) AND visible_at <= ? "
+                    "ORDER BY visible_at LIMIT 1",
+                    (QUEUED, RUNNING, now)
+                ).fetchone()
+                if row is None:
+                    connection.execute("COMMIT")
+                    return None
+                task_id, payload, attempts = row
+                if attempts >= self.max_attempts:
+                    connection.execute(
+                        "UPDATE tasks SET status = ?, receipt = NULL, error = COALESCE(error, ?), status_code = 500, "
+                        "updated_at = ? WHERE id = ?",
+                        (FAILED, f"Lease expired after {attempts} attempts", now, task_id)
+                    )
+                    continue
+                receipt = _new_id()
+                connection.execute(
+                    "UPDATE tasks SET status = ?, attempts = attempts + 1, visible_at = ?, receipt = ?, updated_at = ? WHERE id = ?",
+                    (RUNNING, now + visibility_timeout, receipt, now, task_id)
+                )
+                connection.execute("COMMIT")
+                return Task(task_id, json.loads(payload), attempts + 1, receipt)
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def extend(self, task: Task, visibility_timeout: float) -> bool:
+        now = time.time()
+        return self._write(
+            "UPDATE tasks SET visible_at = ?, updated_at = ? WHERE id = ? AND receipt = ? AND status = ?",
+            (now + visibility_timeout, now, task.id, task.receipt, RUNNING)
+        ) == 1
+
+    def ack(self, task: Task, result: Dict[str, Any]) -> bool:
+        return self._write(
+            "UPDATE tasks SET status = ?, result = ?, error = NULL, status_code = 200, receipt = NULL, updated_at = ? "
+            "WHERE id = ? AND receipt = ?",
+            (DONE, json.dumps(result), time.time(), task.id, task.receipt)
+        ) == 1
+
+    def retry(self, task: Task, error: str, delay: float) -> None:
+        if task.attempts >= self.max_attempts:
+            self.fail(task, error)
+            return
+        now = time.time()
+        self._write(
+            "UPDATE tasks SET status = ?, visible_at = ?, error = ?, receipt = NULL, updated_at = ? WHERE id = ? AND receipt = ?",
+            (QUEUED, now + delay, error, now, task.id, task.receipt)
+        )
+
+    def fail(self, task: Task, error: str, status_code: int = 500) -> None:
+        self._write(
+            "UPDATE tasks SET status = ?, error = ?, status_code = ?, receipt = NULL, updated_at = ? WHERE id = ? AND receipt = ?",
+            (FAILED, error, status_code, time.time(), task.id, task.receipt)
+        )
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            "SELECT status, attempts, result, error, status_code FROM tasks WHERE id = ?", (task_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        status, attempts, result, error, status_code = row
+        return {
+            "task_id": task_id,
+            "status": status,
+            "attempts": attempts,
+            "result": json.loads(result) if result else None,
+            "error": error,
+            "status_code": status_code
+        }
+
+    def purge_finished(self, older_than: float = TASK_RESULT_TTL_SECONDS) -> int:
+        """Deletes done and failed tasks last updated more than `older_than` seconds ago."""
+        return self._write(
+            "DELETE FROM tasks WHERE status IN (?, ?) AND updated_at <= ?",
+            (DONE, FAILED, time.time() - older_than)
+        )
+
+
+# --- Redis protocol ---
+class RedisTaskQueue(TaskQueue):
+    """
+    Task queue on a Redis-protocol server, using only basic commands (no scripting).
+
+    Keys, under `prefix`:
+
+    - `{prefix}:queue`: sorted set of unfinished task ids, scored by when they become visible
+    - `{prefix}:task:{id}`: hash with the payload, status, attempts, result and error
+    - `{prefix}:lease:{id}`: the current receipt, set with NX and expiring with the visibility timeout
+
+    A lease is claimed with `SET NX PX`, which is atomic, so concurrent workers never lease the
+    same task. A worker that dies between claiming and bumping the queue score leaves the
+    lease to expire, after which the task is visible again.
+
+    Args:
+        client: Connection to the server
+        prefix: Key prefix, so several queues can share a server
+        max_attempts: Deliveries before a task is failed
+        result_ttl: Seconds finished tasks are kept
+    """
+
+    def __init__(
+        self,
+        client: RespClient,
+        prefix: str = "analysis",
+        max_attempts: int = TASK_MAX_ATTEMPTS,
+        result_ttl: float = TASK_RESULT_TTL_SECONDS
+    ):
+        super().__init__(max_attempts)
+        self.client = client
+        self.prefix = prefix
+        self.result_ttl = result_ttl
+
+    def _key(self, *parts: str) -> str:
+        return ":".join((self.prefix, *parts))
+
+    def enqueue(self, payload: Dict[str, Any]) -> str:
+        task_id = _new_id()
+        now = time.time()
+        self.client.execute(
+            "HSET", self._key("task", task_id),
+            "payload", json.dumps(payload), "status", QUEUED, "attempts", 0, "created_at", now
+        )
+        self.client.execute("ZADD", self._key("queue"), now, task_id)
+        return task_id
+
+    def dequeue(self, visibility_timeout: float) -> Optional[Task]:
+        now = time.time()
+        candidates: List[str] = self.client.execute("ZRANGEBYSCORE", self._key("queue"), "-inf", now, "LIMIT", 0, 16)
+        for task_id in candidates:
+            receipt = _new_id()
+            claimed = self.client.execute(
+                "SET", self._key("lease", task_id), receipt, "NX", "PX", int(visibility_timeout * 1000)
+            )
+            if claimed != "OK":
+                continue  # Leased by another worker
+            task_key = self._key("task", task_id)
+            attempts = self.client.execute("HINCRBY", task_key, "attempts", 1)
+            if attempts > self.max_attempts:
+                self.client.execute("HSET", task_key, "status", FAILED, "status_code", 500,
+                                    "error", f"Lease expired after {attempts - 1} attempts")
+                self._finish(task_id)
+                continue
+            self.client.execute("ZADD", self._key("queue"), now + visibility_timeout, task_id)
+            self.client.execute("HSET", task_key, "status", RUNNING)
+            payload = self.client.execute("HGET", task_key, "payload")
+            if payload is None:  # Expired or deleted underneath us
+                self._finish(task_id)
+                continue
+            return Task(task_id, json.loads(payload), attempts, receipt)
+        return None
+
+    def _holds_lease(self, task: Task) -> bool:
+        return self.client.execute("GET", self._key("lease", task.id)) == task.receipt
+
+    def _finish(self, task_id: str) -> None:
+        self.client.execute("ZREM", self._key("queue"), task_id)
+        self.client.execute("DEL", self._key("lease", task_id))
+        self.client.execute("EXPIRE", self._key("task", task_id), int(self.result_ttl))
+
+    def extend(self, task: Task, visibility_timeout: float) -> bool:
+        if not self._holds_lease(task):
+            return False
+        self.client.execute("SET", self._key("lease", task.id), task.receipt, "XX", "PX", int(visibility_timeout * 1000))
+        self.client.execute("ZADD", self._key("queue"), time.time() + visibility_timeout, task.id)
+        return True
+
+    def ack(self, task: Task, result: Dict[str, Any]) -> bool:
+        if not self._holds_lease(task):
+            return False
+        self.client.execute("HSET", self._key("task", task.id), "status", DONE, "result", json.dumps(result),
+                            "status_code", 200, "error", "")
+        self._finish(task.id)
+        return True
+
+    def retry(self, task: Task, error: str, delay: float) -> None:
+        if task.attempts >= self.max_attempts:
+            self.fail(task, error)
+            return
+        if not self._holds_lease(task):
+            return
+        self.client.execute("HSET", self._key("task", task.id), "status", QUEUED, "error", error)
+        self.client.execute("ZADD", self._key("queue"), time.time() + delay, task.id)
+        self.client.execute("DEL", self._key("lease", task.id))
+
+    def fail(self, task: Task, error: str, status_code: int = 500) -> None:
+        if not self._holds_lease(task):
+            return
+        self.client.execute("HSET", self._key("task", task.id), "status", FAILED, "error", error, "status_code", status_code)
+        self._finish(task.id)
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        fields = self.client.execute("HGETALL", self._key("task", task_id))
+        if not fields:
+            return None
+        values = dict(zip(fields[::2], fields[1::2]))
+        return {
+            "task_id": task_id,
+            "status": values.get("status"),
+            "attempts": int(values.get("attempts", 0)),
+            "result": json.loads(values["result"]) if values.get("result") else None,
+            "error": values.get("error") or None,
+            "status_code": int(values["status_code"]) if values.get("status_code") else None
+        }
+
+
+def create_task_queue(url: str = TASK_QUEUE_URL) -> TaskQueue:
+    """
+    Opens the queue a URL points to: `sqlite:///relative/path.sqlite3`,
+    `sqlite:////absolute/path.sqlite3` or `redis://[:password@]host:port/db`.
+
+    Raises:
+        ValueError: If the scheme is not supported
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == "sqlite":
+        return SQLiteTaskQueue(url[len("sqlite:///"):])
+    if parsed.scheme == "redis":
+        return RedisTaskQueue(RespClient.from_url(url))
+    raise ValueError(f"Unsupported task queue URL: {url}")
+
+
+_queue: Optional[TaskQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_task_queue() -> TaskQueue:
+    """Returns the process-wide queue at TASK_QUEUE_URL."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = create_task_queue()
+        return _queue
@@ -0,0 +1,122 @@
+"""
+Minimal synchronous client for the Redis serialization protocol (RESP2).
+
+The task queue needs a handful of commands, so a small socket client is used instead of a
+Redis library. It works against Redis, Valkey, KeyDB and the like. Replies are decoded as
+UTF-8 strings.
+"""
+import socket
+import threading
+from typing import Any, List, Optional
+from urllib.parse import urlparse
+
+
+class RespError(Exception):
+    """An error reply from the server."""
+
+
+class RespClient:
+    """
+    One connection to a Redis-protocol server. Commands are serialized by a lock, so the
+    client can be shared between threads. A broken connection is re-opened once per command.
+
+    Args:
+        host: Server host
+        port: Server port
+        db: Database index to SELECT
+        password: Password to AUTH with
+        timeout: Socket timeout in seconds
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 6379, db: int = 0,
+                 password: Optional[str] = None, timeout: float = 5.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._socket: Optional[socket.socket] = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_url(cls, url: str) -> "RespClient":
+        """Builds a client from `redis://[:password@]host[:port][/db]`."""
+        parsed = urlparse(url)
+        db = int(parsed.path.lstrip("/") or 0)
+        return cls(parsed.hostname or "127.0.0.1", parsed.port or 6379, db, parsed.password)
+
+    def _connect(self) -> None:
+        self._socket = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._reader = self._socket.makefile("rb")
+        if self.password:
+            self._roundtrip(("AUTH", self.password))
+        if self.db:
+            self._roundtrip(("SELECT", self.db))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._socket is not None:
+                self._reader.close()
+                self._socket.close()
+            self._socket = None
+            self._reader = None
+
+    def execute(self, *args: Any) -> Any:
+        """
+        Sends a command and returns its reply: str, int, None, or a list of those.
+
+        Raises:
+            RespError: If the server replies with an error
+            OSError: If the server cannot be reached
+        """
+        with self._lock:
+            try:
+                if self._socket is None:
+                    self._connect()
+                return self._roundtrip(args)
+            except (ConnectionError, socket.timeout, OSError):
+                # The server may have closed an idle connection; reconnect once
+                self._socket = None
+                self._connect()
+                return self._roundtrip(args)
+
+    def _roundtrip(self, args) -> Any:
+        self._socket.sendall(encode_command(args))
+        return read_reply(self._reader)
+
+
+def encode_command(args) -> bytes:
+    """Encodes a command as a RESP array of bulk strings."""
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+def read_reply(reader) -> Any:
+    """Reads one RESP reply from a binary file-like object."""
+    line = reader.readline()
+    if not line:
+        raise ConnectionError("Connection closed by server")
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return body.decode()
+    if kind == b"-":
+        raise RespError(body.decode())
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        length = int(body)
+        if length == -1:
+            return None
+        data = reader.read(length + 2)
+        return data[:-2].decode()
+    if kind == b"*":
+        length = int(body)
+        if length == -1:
+            return None
+        items: List[Any] = [read_reply(reader) for _ in range(length)]
+        return items
+    raise RespError(f"Unexpected reply: {line!r}")
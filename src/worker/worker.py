@@ -0,0 +1,155 @@
+"""
+Worker that runs analyses taken from the task queue.
+
+Each worker runs up to `concurrency` analyses at once through the same service path as
+`/analyze` (the compiled graph with deadlines, priority scheduling, rate limiting and the
+shared cache), and writes the outcome back to the queue:
+
+- a completed analysis is acked with its final state,
+- a missing profile (404) fails the task for good,
+- any other error hands the task back for a retry with exponential backoff, until the
+  queue's attempt limit fails it.
+
+While an analysis runs, its lease is renewed every third of the visibility timeout. A
+task is therefore only redelivered when its worker stops renewing, i.e. when it died.
+
+Every `purge_interval` the worker also deletes finished tasks older than
+TASK_RESULT_TTL_SECONDS from queues that do not expire them themselves (SQLite).
+"""
+import asyncio
+import time
+from typing import Optional, Set
+
+from fastapi import HTTPException
+
+from src.api.services import analyze_profile_service
+from src.observability.log import get_logger
+from src.observability.metrics import WORKER_TASK_DURATION, WORKER_TASKS
+from src.pipeline.constants import (
+    TASK_POLL_INTERVAL_SECONDS,
+    TASK_PURGE_INTERVAL_SECONDS,
+    TASK_RETRY_DELAY_SECONDS,
+    TASK_VISIBILITY_TIMEOUT_SECONDS,
+    WORKER_CONCURRENCY
+)
+from .queue import Task, TaskQueue
+
+logger = get_logger(__name__)
+
+
+class AnalysisWorker:
+    """
+    Consumes analysis tasks from a queue.
+
+    Args:
+        queue: The task queue
+        concurrency: Analyses run at once
+        visibility_timeout: Lease length in seconds
+        poll_interval: Seconds to wait before polling an empty queue again
+        retry_delay: Delay before the first retry; doubles with each attempt
+        purge_interval: Seconds between deletions of expired finished tasks
+    """
+
+    def __init__(
+        self,
+        queue: TaskQueue,
+        concurrency: int = WORKER_CONCURRENCY,
+        visibility_timeout: float = TASK_VISIBILITY_TIMEOUT_SECONDS,
+        poll_interval: float = TASK_POLL_INTERVAL_SECONDS,
+        retry_delay: float = TASK_RETRY_DELAY_SECONDS,
+        purge_interval: float = TASK_PURGE_INTERVAL_SECONDS
+    ):
+        self.queue = queue
+        self.concurrency = concurrency
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.purge_interval = purge_interval
+        self._purged_at: Optional[float] = None
+
+    async def _purge_if_due(self) -> None:
+        now = time.monotonic()
+        if self._purged_at is not None and now - self._purged_at < self.purge_interval:
+            return
+        self._purged_at = now
+        try:
+            purged = await asyncio.to_thread(self.queue.purge_finished)
+        except Exception as e:
+            logger.warning("Purging finished tasks failed: %s - %s", type(e).__name__, e)
+            return
+        if purged:
+            logger.info("Purged %d finished tasks", purged)
+
+    async def run(self, stop: Optional[asyncio.Event] = None) -> None:
+        """Processes tasks until `stop` is set, then finishes the analyses in flight."""
+        stop = stop or asyncio.Event()
+        slots = asyncio.Semaphore(self.concurrency)
+        in_flight: Set[asyncio.Task] = set()
+        logger.info("Worker started", extra={"concurrency": self.concurrency})
+
+        while not stop.is_set():
+            await self._purge_if_due()
+            await slots.acquire()
+            task = await asyncio.to_thread(self.queue.dequeue, self.visibility_timeout)
+            if task is None:
+                slots.release()
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            running = asyncio.create_task(self.process(task))
+            in_flight.add(running)
+            running.add_done_callback(lambda done: (in_flight.discard(done), slots.release()))
+
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+        logger.info("Worker stopped")
+
+    async def _keep_leased(self, task: Task) -> None:
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 3)
+            if not await asyncio.to_thread(self.queue.extend, task, self.visibility_timeout):
+                logger.warning("Lost the lease of task %s", task.id)
+                return
+
+    async def process(self, task: Task) -> str:
+        """
+        Runs one task and records its outcome in the queue.
+
+        Returns:
+            The outcome: "done", "retried", "failed" or "lease_lost"
+        """
+        payload = task.payload
+        started = time.perf_counter()
+        heartbeat = asyncio.create_task(self._keep_leased(task))
+        logger.info("Processing task %s", task.id, extra={"username": payload.get("username"), "attempt": task.attempts})
+        try:
+            final_state = await analyze_profile_service(
+                username=payload["username"],
+                tweet_count=payload.get("tweet_count", 10),
+                priority=payload.get("priority", "batch")
+            )
+        except HTTPException as e:
+            if e.status_code == 404:
+                await asyncio.to_thread(self.queue.fail, task, str(e.detail), e.status_code)
+                outcome = "failed"
+            else:
+                delay = self.retry_delay * 2 ** (task.attempts - 1)
+                await asyncio.to_thread(self.queue.retry, task, str(e.detail), delay)
+                outcome = "retried"
+        except Exception as e:
+            logger.exception("Task %s raised: %s - %s", task.id, type(e).__name__, e)
+            delay = self.retry_delay * 2 ** (task.attempts - 1)
+            await asyncio.to_thread(self.queue.retry, task, f"{type(e).__name__}: {e}", delay)
+            outcome = "retried"
+        else:
+            acked = await asyncio.to_thread(self.queue.ack, task, final_state)
+            outcome = "done" if acked else "lease_lost"
+        finally:
+            heartbeat.cancel()
+
+        WORKER_TASKS.inc(outcome)
+        WORKER_TASK_DURATION.observe(time.perf_counter() - started)
+        logger.info("Task %s %s", task.id, outcome, extra={"duration_seconds": round(time.perf_counter() - started, 3)})
+        return outcome
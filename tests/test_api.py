@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 from unittest.mock import Mock, patch, AsyncMock
 from fastapi import HTTPException
@@ -7,6 +9,8 @@ import httpx
 from src.api.models import AnalyzeRequest, AnalysisResponse
 from src.api.services import initialize_graph, get_graph_app, analyze_profile_service
 from src.api.main import app
+from src.api.scheduler import PriorityScheduler, SchedulerTimeout
+from src.api.images import ThumbnailCache, render_thumbnail, source_url
 
 
 class TestAPIModels:
@@ -114,19 +118,22 @@ class TestAPIServices:
         mock_graph_app = Mock()
         mock_graph_app.ainvoke = AsyncMock(return_value=mock_final_state)
         
+        mock_handler = Mock()
         with patch('src.api.services.get_graph_app', return_value=mock_graph_app), \
-             patch.dict('os.environ', {
-                 'LANGFUSE_PUBLIC_KEY': 'test_key',
-                 'LANGFUSE_SECRET_KEY': 'test_secret'
-             }), \
-             patch('src.api.services.CallbackHandler') as mock_handler:
+             patch('src.api.services.get_trace_callbacks', return_value=[mock_handler]) as mock_get_callbacks:
             
             result = await analyze_profile_service("testuser", 10)
             
             assert result["username"] == "testuser"
             assert result["user_bio"] == "Test bio"
             assert result["error"] is None
+            assert result["usage"]["total"]["llm_calls"] == 0
             mock_graph_app.ainvoke.assert_called_once()
+            assert mock_get_callbacks.call_args.kwargs["session_id"] == "profile-analysis-testuser"
+            assert mock_handler in mock_graph_app.ainvoke.call_args.kwargs["config"]["callbacks"]
+            configurable = mock_graph_app.ainvoke.call_args.kwargs["config"]["configurable"]
+            assert configurable["priority"] == "interactive"
+            assert configurable["scheduler"] is not None
     
     @pytest.mark.asyncio
     async def test_analyze_profile_service_no_graph(self):
@@ -174,6 +181,23 @@ class TestAPIServices:
             assert exc_info.value.status_code == 500
             assert "Analysis pipeline error" in str(exc_info.value.detail)
     
+    @pytest.mark.asyncio
+    async def test_analyze_profile_service_deadline_exceeded(self):
+        """Test runs that hit their deadline map to 504 and the deadline is passed to the graph."""
+        mock_graph_app = Mock()
+        mock_graph_app.ainvoke = AsyncMock(return_value={
+            "username": "testuser",
+            "error": "LLM call failed: Request deadline exceeded before the LLM call completed"
+        })
+        
+        with patch('src.api.services.get_graph_app', return_value=mock_graph_app):
+            with pytest.raises(HTTPException) as exc_info:
+                await analyze_profile_service("testuser", 10, deadline_seconds=5)
+            
+            assert exc_info.value.status_code == 504
+            config = mock_graph_app.ainvoke.call_args.kwargs["config"]
+            assert "deadline" in config["configurable"]
+    
     @pytest.mark.asyncio
     async def test_analyze_profile_service_unexpected_error(self):
         """Test profile analysis with unexpected error."""
@@ -225,6 +249,10 @@ class TestAPIRoutes:
             "mbti_result": {"mbti_code": "INTJ", "mbti_name": "Architect"},
             "top_keywords": ["AI"],
             "sentiment_scaled_score": 75.5,
+            "usage": {
+                "total": {"llm_calls": 1, "prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120},
+                "nodes": {"category_scorer": {"llm_calls": 1, "prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120}}
+            },
             "error": None
         }
         
@@ -242,6 +270,7 @@ class TestAPIRoutes:
                 assert data["username"] == "testuser"
                 assert data["user_bio"] == "Test bio"
                 assert data["sentiment_scaled_score"] == 75.5
+                assert data["usage"]["nodes"]["category_scorer"]["prompt_tokens"] == 100
     
     @pytest.mark.asyncio
     async def test_analyze_profile_endpoint_validation_error(self):
@@ -279,8 +308,291 @@ class TestAPIRoutes:
             
             assert response.status_code == 422  # Validation error
     
+    @pytest.mark.asyncio
+    async def test_analyze_profile_endpoint_priority(self):
+        """Test the priority class is validated and passed to the service."""
+        with patch('src.api.routes.analyze_profile_service', new_callable=AsyncMock) as mock_service:
+            mock_service.return_value = {"username": "testuser"}
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                response = await client.post("/analyze", json={"username": "testuser", "priority": "batch"})
+                assert response.status_code == 200
+                assert mock_service.call_args.kwargs["priority"] == "batch"
+                
+                response = await client.post("/analyze", json={"username": "testuser", "priority": "urgent"})
+                assert response.status_code == 422
+    
+    @pytest.mark.asyncio
+    async def test_metrics_endpoint(self):
+        """Test the metrics endpoint exposes request metrics in Prometheus format."""
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            await client.post("/analyze", json={"tweet_count": 10})
+            response = await client.get("/metrics")
+            
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/plain")
+            assert 'http_requests_total{method="POST",path="/analyze",status="422"}' in response.text
+            assert "http_requests_in_flight" in response.text
+    
+    @pytest.mark.asyncio
+    async def test_request_id_header(self):
+        """Test incoming request ids are echoed back and missing ones are generated."""
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get("/metrics", headers={"X-Request-ID": "abc-123"})
+            assert response.headers["x-request-id"] == "abc-123"
+            
+            response = await client.get("/metrics")
+            assert len(response.headers["x-request-id"]) == 32
+    
+    @pytest.mark.asyncio
+    async def test_profiling_is_opt_in(self, tmp_path):
+        """Test profiling is only requested when enabled and the profile can be downloaded."""
+        (tmp_path / ("a" * 32 + ".json")).write_text('{"timeline": []}')
+        
+        with patch('src.api.routes.analyze_profile_service', new_callable=AsyncMock) as mock_service, \
+             patch.dict("os.environ", {"PROFILE_DIR": str(tmp_path), "ENABLE_REQUEST_PROFILING": "false"}):
+            mock_service.return_value = {"username": "testuser", "profile_id": None}
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                await client.post("/analyze?profile=true", json={"username": "testuser"})
+                assert mock_service.call_args.kwargs["profile"] is False
+                assert (await client.get(f"/debug/profiles/{'a' * 32}")).status_code == 404
+        
+        with patch('src.api.routes.analyze_profile_service', new_callable=AsyncMock) as mock_service, \
+             patch.dict("os.environ", {"PROFILE_DIR": str(tmp_path), "ENABLE_REQUEST_PROFILING": "true"}):
+            mock_service.return_value = {"username": "testuser", "profile_id": "a" * 32}
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                response = await client.post("/analyze", json={"username": "testuser"}, headers={"X-Profile": "1"})
+                assert mock_service.call_args.kwargs["profile"] is True
+                assert response.headers["x-profile-id"] == "a" * 32
+                
+                response = await client.get(f"/debug/profiles/{'a' * 32}")
+                assert response.json() == {"timeline": []}
+    
+    @pytest.mark.asyncio
+    async def test_analyze_profile_endpoint_fields(self):
+        """Test the fields selector trims the response and rejects unknown fields."""
+        with patch('src.api.routes.analyze_profile_service', new_callable=AsyncMock) as mock_service:
+            mock_service.return_value = {"username": "testuser", "recent_tweets": ["tweet1"], "top_keywords": ["AI"]}
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                response = await client.post("/analyze?fields=top_keywords", json={"username": "testuser"})
+                assert response.json() == {"username": "testuser", "top_keywords": ["AI"]}
+
+                response = await client.post("/analyze?fields=top_keywords,secrets", json={"username": "testuser"})
+                assert response.status_code == 422
+
+    @pytest.mark.asyncio
+    async def test_analyze_profile_endpoint_msgpack_and_compression(self):
+        """Test msgpack is negotiated via Accept and large bodies are gzip-compressed."""
+        ormsgpack = pytest.importorskip("ormsgpack")
+
+        tweets = [f"tweet number {i} about something" for i in range(100)]
+        with patch('src.api.routes.analyze_profile_service', new_callable=AsyncMock) as mock_service:
+            mock_service.return_value = {"username": "testuser", "recent_tweets": tweets}
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                response = await client.post(
+                    "/analyze", json={"username": "testuser"},
+                    headers={"Accept": "application/msgpack", "Accept-Encoding": "identity"}
+                )
+                assert response.headers["content-type"] == "application/msgpack"
+                assert "content-encoding" not in response.headers
+                assert ormsgpack.unpackb(response.content)["recent_tweets"] == tweets
+
+                response = await client.post("/analyze", json={"username": "testuser"}, headers={"Accept-Encoding": "gzip"})
+                assert response.headers["content-encoding"] == "gzip"
+                assert int(response.headers["content-length"]) < len(response.content)
+                assert response.json()["recent_tweets"] == tweets
+
+                response = await client.post("/analyze?fields=top_keywords", json={"username": "testuser"}, headers={"Accept-Encoding": "gzip"})
+                assert "content-encoding" not in response.headers  # Below the size threshold
+
+    @pytest.mark.asyncio
+    async def test_msgpack_without_ormsgpack(self):
+        """Test msgpack-only clients get 406 when ormsgpack is missing, and others fall back to JSON."""
+        with patch('src.api.encoding.ormsgpack', new=None), \
+             patch('src.api.routes.analyze_profile_service', new_callable=AsyncMock) as mock_service:
+            mock_service.return_value = {"username": "testuser", "top_keywords": ["AI"]}
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                rejected = await client.post("/analyze", json={"username": "testuser"}, headers={"Accept": "application/msgpack"})
+                fallback = await client.post(
+                    "/analyze", json={"username": "testuser"},
+                    headers={"Accept": "application/msgpack, application/json;q=0.5"}
+                )
+
+        assert rejected.status_code == 406
+        mock_service.assert_awaited_once()
+        assert fallback.headers["content-type"] == "application/json"
+        assert fallback.json()["top_keywords"] == ["AI"]
+
     def test_health_check_endpoint(self):
         """Test that the app starts successfully."""
         # This is a basic test to ensure the FastAPI app can be created
         # In a real scenario, you might have a health check endpoint
-        assert app is not None 
\ No newline at end of file
+        assert app is not None 
+
+
+class TestImageProxy:
+    """Test the profile image proxy and its thumbnail cache."""
+
+    @staticmethod
+    def _png(width, height):
+        import io
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new("RGBA", (width, height), (200, 30, 30, 255)).save(buffer, "PNG")
+        return buffer.getvalue()
+
+    def test_render_thumbnail_crops_and_resizes(self):
+        """Test images become square JPEGs of the requested size."""
+        import io
+        from PIL import Image
+        with Image.open(io.BytesIO(render_thumbnail(self._png(300, 200), 80))) as thumbnail:
+            assert thumbnail.format == "JPEG" and thumbnail.size == (80, 80)
+
+    def test_source_url_picks_the_smallest_covering_variant(self):
+        base = "https://pbs.twimg.com/profile_images/1/avatar"
+        assert source_url(f"{base}_normal.jpg", 40) == f"{base}_normal.jpg"
+        assert source_url(f"{base}_normal.jpg", 80) == f"{base}_200x200.jpg"
+        assert source_url(f"{base}_normal.png", 400) == f"{base}_400x400.png"
+        assert source_url("https://abs.twimg.com/sticky/default_normal.png", 80) == "https://abs.twimg.com/sticky/default_normal.png"
+
+    def test_cache_evicts_least_recently_used(self, tmp_path):
+        """Test the cache stays under its limit by dropping the least recently read thumbnails."""
+        import os
+        cache = ThumbnailCache(tmp_path, max_bytes=3500)
+        for i, key in enumerate(["a1", "b2", "c3"]):
+            cache.put(key, b"x" * 1000)
+            os.utime(cache._path(key), (i, i))
+        assert cache.get("a1") is not None  # Refreshes a1, so b2 is now the oldest
+
+        cache.put("d4", b"x" * 1000)
+        assert cache.get("b2") is None
+        assert all(cache.get(key) is not None for key in ("a1", "c3", "d4"))
+
+    @pytest.mark.asyncio
+    async def test_avatar_endpoint(self, tmp_path):
+        """Test avatars are fetched once, served with cache headers and revalidated by ETag."""
+        url = "https://pbs.twimg.com/profile_images/1/avatar_normal.jpg"
+        with patch('src.api.images.get_thumbnail_cache', return_value=ThumbnailCache(tmp_path)), \
+             patch('src.api.images.fetch_image', new_callable=AsyncMock) as mock_fetch:
+            mock_fetch.return_value = self._png(400, 400)
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                responses = await asyncio.gather(*[
+                    client.get("/images/avatar", params={"url": url, "size": 80}) for _ in range(3)
+                ])
+                assert all(r.status_code == 200 and r.headers["content-type"] == "image/jpeg" for r in responses)
+                assert "immutable" in responses[0].headers["cache-control"]
+                assert mock_fetch.await_count == 1
+                mock_fetch.assert_awaited_with("https://pbs.twimg.com/profile_images/1/avatar_200x200.jpg")
+
+                cached = await client.get("/images/avatar", params={"url": url, "size": 80})
+                assert cached.content == responses[0].content and mock_fetch.await_count == 1
+
+                revalidated = await client.get(
+                    "/images/avatar", params={"url": url, "size": 80}, headers={"If-None-Match": cached.headers["etag"]}
+                )
+                assert revalidated.status_code == 304
+
+                blocked = await client.get("/images/avatar", params={"url": "https://169.254.169.254/latest/meta-data"})
+                assert blocked.status_code == 400
+
+                mock_fetch.side_effect = httpx.ConnectError("unreachable")
+                fallback = await client.get("/images/avatar", params={"url": url, "size": 48})
+                assert fallback.status_code == 200 and "immutable" not in fallback.headers["cache-control"]
+
+                # A few bytes declaring huge dimensions must not be decoded
+                mock_fetch.side_effect = None
+                mock_fetch.return_value = self._png_header(100_000, 100_000)
+                bomb = await client.get("/images/avatar", params={"url": url, "size": 64})
+                assert bomb.status_code == 200 and "immutable" not in bomb.headers["cache-control"]
+
+    @staticmethod
+    def _png_header(width, height):
+        import struct
+        import zlib
+
+        def chunk(kind, data):
+            return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+        header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+        return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", b"") + chunk(b"IEND", b"")
+
+    def test_render_thumbnail_refuses_oversized_images(self):
+        """Test images with more pixels than IMAGE_MAX_SOURCE_PIXELS are refused before decoding."""
+        from PIL import Image
+        from src.pipeline.constants import IMAGE_MAX_SOURCE_PIXELS
+        # Just above the limit, where Pillow itself would only warn, and far above it
+        for edge in (int(IMAGE_MAX_SOURCE_PIXELS ** 0.5) + 1, 100_000):
+            with pytest.raises(Image.DecompressionBombError):
+                render_thumbnail(self._png_header(edge, edge), 64)
+
+
+class TestPriorityScheduler:
+    """Test weighted fair queuing of the shared resources."""
+    
+    def _scheduler(self, capacity=1, caps=None):
+        return PriorityScheduler(
+            {"llm": capacity},
+            weights={"interactive": 3, "batch": 1, "background": 1},
+            caps=caps or {"interactive": 1.0, "batch": 1.0, "background": 1.0}
+        )
+    
+    @pytest.mark.asyncio
+    async def test_contended_slots_follow_weights(self):
+        """Test waiting classes are served in proportion to their weights."""
+        scheduler = self._scheduler()
+        order = []
+        
+        async def job(priority):
+            async with scheduler.slot_async("llm", priority):
+                order.append(priority)
+                await asyncio.sleep(0)
+        
+        async with scheduler.slot_async("llm", "batch"):
+            tasks = [asyncio.create_task(job("batch")) for _ in range(4)]
+            tasks += [asyncio.create_task(job("interactive")) for _ in range(6)]
+            await asyncio.sleep(0.01)
+            assert scheduler.resource("llm").queued("interactive") == 6
+        await asyncio.gather(*tasks)
+        
+        # Interactive gets three grants for every batch grant (counting the one holding
+        # the slot) while both are waiting
+        assert order[:5].count("interactive") == 4
+        assert order[:7].count("interactive") == 6
+    
+    @pytest.mark.asyncio
+    async def test_idle_class_gets_no_saved_up_credit(self):
+        """Test a class returning from idle competes from the current virtual time."""
+        scheduler = self._scheduler()
+        for _ in range(20):
+            async with scheduler.slot_async("llm", "interactive"):
+                pass
+        
+        order = []
+        
+        async def job(priority):
+            async with scheduler.slot_async("llm", priority):
+                order.append(priority)
+                await asyncio.sleep(0)
+        
+        async with scheduler.slot_async("llm", "interactive"):
+            tasks = [asyncio.create_task(job(p)) for p in ["interactive"] * 4 + ["batch"] * 2]
+            await asyncio.sleep(0.01)
+        await asyncio.gather(*tasks)
+        
+        assert "batch" in order[:4]
+    
+    def test_class_cap_limits_share(self):
+        """Test a class cannot hold more than its cap, and waits time out cleanly."""
+        scheduler = self._scheduler(capacity=4, caps={"interactive": 1.0, "batch": 0.5, "background": 0.25})
+        resource = scheduler.resource("llm")
+        
+        with scheduler.slot("llm", "batch"), scheduler.slot("llm", "batch"):
+            with pytest.raises(SchedulerTimeout):
+                with scheduler.slot("llm", "batch", timeout=0.05):
+                    pass
+            assert resource.queued("batch") == 0
+            
+            # Interactive requests still get the free slots
+            with scheduler.slot("llm", "interactive", timeout=0.05):
+                assert resource.active("interactive") == 1
+        
+        assert resource.active("batch") == 0
\ No newline at end of file
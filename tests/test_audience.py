@@ -0,0 +1,132 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from benchmarks.fake_twscrape import FakeTwscrapeAPI, FakeTwscrapeConfig
+from src.api.main import app
+from src.audience import AudienceAggregate, sample_followers, stream_audience
+from src.data_fetcher.fetcher import fetch_followers
+
+
+def _result(scores, mbti_code="INTJ", sentiment=50.0):
+    return {
+        "category_scores": {category: {"score": score, "evidence": []} for category, score in scores.items()},
+        "mbti_result": {"mbti_code": mbti_code},
+        "sentiment_scaled_score": sentiment,
+        "error": None
+    }
+
+
+class TestAudienceAggregate:
+    """Test the audience estimates and their confidence intervals."""
+
+    def test_distributions(self):
+        aggregate = AudienceAggregate(population=1000, sample_size=4)
+        aggregate.add(_result({"tech": 80, "food": 40}, sentiment=90))
+        aggregate.add(_result({"tech": 60}, mbti_code="ENFP", sentiment=75))
+        aggregate.add(_result({}, mbti_code="ENFP", sentiment=5))
+        aggregate.add_failure()
+        snapshot = aggregate.snapshot()
+
+        assert (snapshot["analyzed"], snapshot["failed"]) == (3, 1)
+        assert list(snapshot["categories"]) == ["tech", "food"]
+        tech = snapshot["categories"]["tech"]
+        assert tech["mean_score"] == pytest.approx(140 / 3, abs=0.01)
+        assert tech["prevalence"]["share"] == pytest.approx(2 / 3, abs=1e-4)
+        assert 0 <= tech["prevalence"]["ci"][0] < 2 / 3 < tech["prevalence"]["ci"][1] <= 1
+        assert tech["mean_score_ci"][0] < tech["mean_score"] < tech["mean_score_ci"][1]
+        assert snapshot["mbti"]["counts"] == {"ENFP": 2, "INTJ": 1}
+        assert snapshot["sentiment"]["histogram"] == [1, 0, 0, 0, 0, 0, 0, 1, 0, 1]
+
+    def test_intervals_shrink_with_the_finite_population(self):
+        """Test a sample covering most followers gets narrower intervals, and a census none."""
+        widths = []
+        for population in (10_000, 12, 10):
+            aggregate = AudienceAggregate(population=population, sample_size=10)
+            for i in range(10):
+                aggregate.add(_result({"tech": 10 * i} if i % 2 else {}, sentiment=10 * i))
+            low, high = aggregate.snapshot()["sentiment"]["mean_ci"]
+            widths.append(high - low)
+
+        assert widths[0] > widths[1] > widths[2] == 0
+
+    def test_empty_aggregate(self):
+        snapshot = AudienceAggregate(population=5, sample_size=5).snapshot()
+        assert snapshot["categories"] == {} and snapshot["sentiment"] is None
+        assert snapshot["mbti"]["counts"] == {}
+
+
+class TestAudienceRunner:
+    """Test follower sampling and the streamed analyses."""
+
+    @pytest.mark.asyncio
+    async def test_fetch_and_sample_followers(self):
+        api = FakeTwscrapeAPI(FakeTwscrapeConfig(latency_ms=0, jitter_ms=0, per_tweet_ms=0))
+        with patch('src.data_fetcher.fetcher.get_api_client', new=AsyncMock(return_value=api)):
+            followers = await fetch_followers("alice", limit=30)
+            population, sample = await sample_followers("alice", 10, max_followers=30, seed=1)
+            _, same_sample = await sample_followers("alice", 10, max_followers=30, seed=1)
+
+        assert len(followers) == population == 30
+        assert len(set(sample)) == 10 and set(sample) <= set(followers)
+        assert sample == same_sample
+
+    @pytest.mark.asyncio
+    async def test_no_followers(self):
+        with patch('src.audience.runner.fetch_followers', new=AsyncMock(return_value=None)):
+            assert await sample_followers("nobody", 10) is None
+
+    @pytest.mark.asyncio
+    async def test_stream_bounds_concurrency(self):
+        """Test analyses run at most `concurrency` at a time and failures are counted."""
+        running = peak = 0
+
+        async def analyze(username, tweet_count, priority):
+            nonlocal running, peak
+            assert priority == "batch"
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            if username == "protected":
+                raise HTTPException(status_code=404, detail="Data fetching failed")
+            return _result({"tech": 50})
+
+        sample = [f"user{i}" for i in range(7)] + ["protected"]
+        with patch('src.audience.runner.analyze_profile_service', side_effect=analyze):
+            events = [event async for event in stream_audience(sample, population=100, concurrency=3)]
+
+        assert peak == 3
+        assert [event["event"] for event in events] == ["result"] * 8 + ["done"]
+        assert [event["aggregate"]["analyzed"] + event["aggregate"]["failed"] for event in events[:-1]] == list(range(1, 9))
+        assert events[-1]["aggregate"]["failed"] == 1
+        assert events[-1]["aggregate"]["categories"]["tech"]["mean_score"] == 50
+
+
+class TestAudienceRoute:
+    """Test the streaming audience endpoint."""
+
+    @pytest.mark.asyncio
+    async def test_streams_ndjson_events(self):
+        with patch('src.api.routes.sample_followers', new=AsyncMock(return_value=(40, ["bob", "carol"]))), \
+             patch('src.audience.runner.analyze_profile_service', new=AsyncMock(return_value=_result({"tech": 70}))):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                response = await client.post("/audience", json={"username": "alice", "sample_size": 2})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        events = [json.loads(line) for line in response.text.splitlines()]
+        assert [event["event"] for event in events] == ["sample", "result", "result", "done"]
+        assert events[0]["population"] == 40
+        assert events[-1]["aggregate"]["analyzed"] == 2
+
+    @pytest.mark.asyncio
+    async def test_unknown_account(self):
+        with patch('src.api.routes.sample_followers', new=AsyncMock(return_value=None)):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                assert (await client.post("/audience", json={"username": "nobody"})).status_code == 404
+                assert (await client.post("/audience", json={"username": "alice", "sample_size": 0})).status_code == 422
\ No newline at end of file
@@ -0,0 +1,234 @@
+import json
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+
+from benchmarks.fake_openai import FakeLLMConfig, create_fake_openai_app
+from src.batch.client import BatchClient
+from src.batch.packing import plan_packs, render_pack_request, unpack_result
+from src.batch.render import BATCH_NODES, apply_result, render_profile_requests, split_custom_id
+from src.batch.runner import (
+    MANIFEST_FILE,
+    RESULTS_FILE,
+    assemble_results,
+    collect_bulk_analysis,
+    run_bulk_analysis,
+    write_batch_inputs
+)
+from src.pipeline import llm as llm_module
+
+
+@pytest.fixture
+def llm_clients():
+    """Builds real (unused) LLM clients with a dummy key, so request bodies can be rendered."""
+    getters = [batch_node.get_llm for batch_node in BATCH_NODES]
+    for getter in getters:
+        getter.cache_clear()
+    with patch.object(llm_module, "OPENAI_API_KEY", "test-key"):
+        yield
+    for getter in getters:
+        getter.cache_clear()
+
+
+def _state(username, bio="Engineer and runner", tweets=None, error=None):
+    return {
+        "username": username,
+        "user_bio": bio,
+        "recent_tweets": tweets or [],
+        "prompt_tweets": tweets or [],
+        "error": error
+    }
+
+
+class TestBatchRendering:
+    """Test rendering node prompts into batch input lines."""
+
+    def test_each_profile_gets_one_request_per_llm_node(self, llm_clients):
+        """Test request lines carry the same body a synchronous call would send."""
+        lines = render_profile_requests(_state("alice", tweets=["Shipped a new release today"]))
+
+        assert [split_custom_id(line["custom_id"]) for line in lines] == [("alice", n.name) for n in BATCH_NODES]
+        body = lines[0]["body"]
+        assert body["tools"][0]["function"]["name"] == "CategoryScoresWithEvidenceIndices"
+        assert "[1] Shipped a new release today" in body["messages"][-1]["content"]
+        assert "stream" not in body
+
+    def test_profiles_without_text_are_not_submitted(self, llm_clients):
+        """Test failed fetches and empty profiles produce no requests."""
+        assert render_profile_requests(_state("bob", bio=None)) == []
+        assert render_profile_requests(_state("carol", error="Data fetching failed: boom")) == []
+
+    def test_batch_files_respect_request_limit(self, llm_clients, tmp_path):
+        """Test input files are split without splitting a profile's requests."""
+        states = [_state(f"user{i}") for i in range(5)]
+        paths = write_batch_inputs(states, tmp_path, max_requests=10)
+
+        counts = [len(path.read_text().splitlines()) for path in paths]
+        assert counts == [8, 8, 4]
+
+    def test_failed_requests_become_node_errors(self, llm_clients):
+        """Test an errored batch line sets the node's field to None with an error."""
+        result = {"custom_id": "alice::sentiment_analyzer", "response": {"status_code": 500, "body": {"error": {"message": "boom"}}}}
+        state = apply_result(_state("alice"), BATCH_NODES[3], result)
+        assert state["sentiment_scaled_score"] is None
+        assert "sentiment_analyzer batch request failed" in state["error"]
+
+
+class TestPacking:
+    """Test packing small profiles into shared calls."""
+
+    def test_packs_are_bounded_by_budget_and_size(self):
+        """Test small profiles are grouped within the token budget and large ones stay alone."""
+        states = [_state(f"user{i}") for i in range(5)] + [_state("verbose", bio="word " * 400)]
+        packs, singles = plan_packs(states, small_profile_tokens=100, token_budget=1000, max_profiles=2)
+        assert [[s["username"] for s in pack] for pack in packs] == [["user0", "user1"], ["user2", "user3"]]
+        assert sorted(s["username"] for s in singles) == ["user4", "verbose"]
+
+        packs, _ = plan_packs(states[:5], small_profile_tokens=100, token_budget=40, max_profiles=8)
+        assert all(len(pack) == 2 for pack in packs)
+
+    def test_profiles_missing_from_packed_output_get_errors(self, llm_clients):
+        """Test a profile the model left out is marked failed while the others are applied."""
+        body = {
+            "choices": [{"index": 0, "finish_reason": "tool_calls", "message": {"role": "assistant", "content": None, "tool_calls": [{
+                "id": "call_1", "type": "function",
+                "function": {"name": "PackedTopKeywords", "arguments": json.dumps({"results": [{"profile_id": "1", "keywords": ["ai"]}]})}
+            }]}}]
+        }
+        result = {"custom_id": "pack-000000::keywords_extractor", "response": {"status_code": 200, "body": body}}
+        alice, bob = unpack_result([_state("alice"), _state("bob")], BATCH_NODES[2], result)
+        assert alice["top_keywords"] == ["ai"]
+        assert bob["top_keywords"] is None
+        assert "missing from packed result" in bob["error"]
+
+    def test_profiles_are_keyed_by_position(self, llm_clients):
+        """Test a username listed twice in a pack gets a result per position."""
+        pack = [_state("alice"), _state("alice")]
+        request = render_pack_request(0, pack, BATCH_NODES[2])
+        prompt = request["body"]["messages"][-1]["content"]
+        assert "profile_id: 1 ===" in prompt and "profile_id: 2 ===" in prompt
+        assert request["body"]["tools"][0]["function"]["name"] == "PackedTopKeywords"
+
+        results = [{"profile_id": "2", "keywords": ["ml"]}, {"profile_id": "1", "keywords": ["ai"]}]
+        body = {"choices": [{"index": 0, "finish_reason": "tool_calls", "message": {"role": "assistant", "content": None, "tool_calls": [{
+            "id": "call_1", "type": "function",
+            "function": {"name": "PackedTopKeywords", "arguments": json.dumps({"results": results})}
+        }]}}]}
+        result = {"custom_id": "pack-000000::keywords_extractor", "response": {"status_code": 200, "body": body}}
+        assert [state["top_keywords"] for state in unpack_result(pack, BATCH_NODES[2], result)] == [["ai"], ["ml"]]
+
+
+class TestBulkAnalysis:
+    """Test a bulk run end to end against the fake batch API."""
+
+    @pytest.mark.asyncio
+    async def test_bulk_run_reassembles_responses(self, llm_clients, tmp_path):
+        """Test profiles are fetched, submitted, collected and reassembled."""
+        from openai import AsyncOpenAI
+
+        fake = create_fake_openai_app(FakeLLMConfig(batch_delay_ms=10, seed=1))
+        http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake))
+        client = BatchClient(AsyncOpenAI(api_key="test-key", base_url="http://fake/v1", http_client=http_client))
+
+        async def fetch_user_details(username):
+            return None if username == "ghost" else {"bio": f"{username} writes about tech", "display_name": username}
+
+        async def fetch_recent_tweets(username, n=10):
+            return [] if username == "ghost" else ["Building things"]
+
+        with patch('src.pipeline.nodes.fetch_user_details', side_effect=fetch_user_details), \
+             patch('src.pipeline.nodes.fetch_recent_tweets', side_effect=fetch_recent_tweets):
+            responses = await run_bulk_analysis(["alice", "bob", "ghost", "alice"], 5, tmp_path, client, poll_interval=0.01)
+        await http_client.aclose()
+
+        assert [response.username for response in responses] == ["alice", "bob", "ghost"]
+        alice = responses[0]
+        assert alice.error is None
+        assert alice.mbti_result["mbti_code"] == "INTJ"
+        assert alice.category_scores["tech"]["score"] == 72.0
+        assert alice.usage.total.llm_calls == 4
+        assert alice.usage.nodes["sentiment_analyzer"].cost_usd > 0
+        # No bio and no tweets: the nodes report it without an LLM call
+        assert responses[2].error and responses[2].usage.total.llm_calls == 0
+        assert len((tmp_path / RESULTS_FILE).read_text().splitlines()) == 3
+        assert fake.state.requests_served == 8
+
+    @pytest.mark.asyncio
+    async def test_run_interrupted_during_submission_resumes(self, llm_clients, tmp_path):
+        """Test batches submitted before an interruption are recorded and not submitted again."""
+        import functools
+        from openai import AsyncOpenAI
+
+        fake = create_fake_openai_app(FakeLLMConfig(batch_delay_ms=10, seed=1))
+        http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake))
+        client = BatchClient(AsyncOpenAI(api_key="test-key", base_url="http://fake/v1", http_client=http_client))
+        submitted = []
+
+        async def submit_once(path, metadata=None):
+            if submitted:
+                raise ConnectionError("interrupted")
+            submitted.append(await BatchClient.submit(client, path, metadata))
+            return submitted[-1]
+
+        async def fetch_user_details(username):
+            return {"bio": f"{username} writes about tech", "display_name": username}
+
+        with patch('src.pipeline.nodes.fetch_user_details', side_effect=fetch_user_details), \
+             patch('src.pipeline.nodes.fetch_recent_tweets', new=AsyncMock(return_value=["Building things"])), \
+             patch('src.batch.runner.write_batch_inputs', functools.partial(write_batch_inputs, max_requests=4)), \
+             patch.object(client, "submit", side_effect=submit_once):
+            with pytest.raises(ConnectionError):
+                await run_bulk_analysis(["alice", "bob"], 5, tmp_path, client, poll_interval=0.01)
+
+        manifest = json.loads((tmp_path / MANIFEST_FILE).read_text())
+        assert len(manifest["input_files"]) == 2 and manifest["batch_ids"] == submitted
+        responses = await collect_bulk_analysis(tmp_path, client, poll_interval=0.01)
+        await http_client.aclose()
+
+        assert [response.error for response in responses] == [None, None]
+        assert fake.state.requests_served == 8
+        assert json.loads((tmp_path / MANIFEST_FILE).read_text())["batch_ids"][0] == submitted[0]
+
+    def test_batch_discount_is_applied(self, llm_clients):
+        """Test usage costs are scaled by the batch price multiplier."""
+        usage = {"prompt_tokens": 1000, "completion_tokens": 100, "total_tokens": 1100}
+        lines = [
+            {"custom_id": f"alice::{n.name}", "response": {"status_code": 200, "body": {
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": json.dumps({"keywords": ["ai"]})}, "finish_reason": "stop"}],
+                "usage": usage
+            }}}
+            for n in BATCH_NODES
+        ]
+        full = assemble_results([_state("alice")], lines, cost_multiplier=1.0)[0]
+        half = assemble_results([_state("alice")], lines, cost_multiplier=0.5)[0]
+        assert half.usage.total.cost_usd == pytest.approx(full.usage.total.cost_usd / 2)
+
+    @pytest.mark.asyncio
+    async def test_packed_run_amortizes_calls(self, llm_clients, tmp_path):
+        """Test a packed run needs fewer calls and tokens for the same per-profile results."""
+        from openai import AsyncOpenAI
+
+        async def fetch_user_details(username):
+            return {"bio": f"{username} likes tech", "display_name": username}
+
+        async def fetch_recent_tweets(username, n=10):
+            return ["Trying a new framework"]
+
+        usernames = [f"user{i}" for i in range(6)]
+        runs = {}
+        for pack in (False, True):
+            fake = create_fake_openai_app(FakeLLMConfig(batch_delay_ms=10, seed=1))
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=fake)) as http_client:
+                client = BatchClient(AsyncOpenAI(api_key="test-key", base_url="http://fake/v1", http_client=http_client))
+                with patch('src.pipeline.nodes.fetch_user_details', side_effect=fetch_user_details), \
+                     patch('src.pipeline.nodes.fetch_recent_tweets', side_effect=fetch_recent_tweets):
+                    responses = await run_bulk_analysis(usernames, 5, tmp_path / str(pack), client, poll_interval=0.01, pack=pack)
+            runs[pack] = (fake.state.requests_served, responses)
+
+        assert runs[False][0] == 24 and runs[True][0] == 4
+        packed = runs[True][1]
+        assert all(response.error is None and response.mbti_result["mbti_code"] == "INTJ" for response in packed)
+        unpacked_tokens = sum(r.usage.total.prompt_tokens for r in runs[False][1])
+        packed_tokens = sum(r.usage.total.prompt_tokens for r in packed)
+        assert packed_tokens < unpacked_tokens / 3
\ No newline at end of file
@@ -0,0 +1,121 @@
+import pytest
+import httpx
+
+from benchmarks.fake_openai import FakeLLMConfig, build_chat_completion, create_fake_openai_app, example_from_schema
+from benchmarks.load_test import _format_counter, percentile, parse_node_metrics
+from benchmarks.compare import compare_results
+from benchmarks.evidence_tokens import run_evidence_benchmark
+from benchmarks.payload import run_payload_benchmark
+
+
+class TestFakeOpenAI:
+    """Test the fake OpenAI-compatible backend."""
+    
+    def test_example_from_schema_resolves_refs(self):
+        """Test generated examples follow nested schemas and $refs."""
+        schema = {
+            "type": "object",
+            "properties": {"scores": {"type": "array", "items": {"$ref": "#/$defs/Score"}}},
+            "$defs": {"Score": {"type": "object", "properties": {"category": {"type": "string"}, "score": {"type": "number"}}}}
+        }
+        example = example_from_schema(schema)
+        
+        assert example["scores"][0] == {"category": "tech", "score": 72.0}
+    
+    @pytest.mark.asyncio
+    async def test_chat_completion_with_tools(self):
+        """Test tool-calling requests get schema-conforming arguments and usage."""
+        app = create_fake_openai_app(FakeLLMConfig(latency_ms=0, jitter_ms=0))
+        body = {
+            "model": "gpt-4.1",
+            "messages": [{"role": "user", "content": "hi"}],
+            "tools": [{"type": "function", "function": {
+                "name": "TopKeywords",
+                "parameters": {"type": "object", "properties": {"keywords": {"type": "array", "items": {"type": "string"}}}}
+            }}]
+        }
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://fake") as client:
+            response = await client.post("/v1/chat/completions", json=body)
+        
+        data = response.json()
+        assert data["choices"][0]["message"]["tool_calls"][0]["function"]["name"] == "TopKeywords"
+        assert data["usage"]["total_tokens"] > 0
+    
+    def test_repeated_prefix_reports_cached_tokens(self):
+        """Test requests repeating a long enough static prefix report cached tokens."""
+        body = {
+            "messages": [{"role": "system", "content": "x" * 6000}, {"role": "user", "content": "first"}]
+        }
+        seen = set()
+        
+        first = build_chat_completion(body, seen, cache_min_tokens=1024)
+        body["messages"][1]["content"] = "second"
+        second = build_chat_completion(body, seen, cache_min_tokens=1024)
+        
+        assert first["usage"]["prompt_tokens_details"]["cached_tokens"] == 0
+        assert second["usage"]["prompt_tokens_details"]["cached_tokens"] == 1408
+    
+    @pytest.mark.asyncio
+    async def test_injected_errors(self):
+        """Test the configured error rate produces error responses."""
+        app = create_fake_openai_app(FakeLLMConfig(latency_ms=0, jitter_ms=0, error_rate=1.0, error_status=429))
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://fake") as client:
+            response = await client.post("/v1/chat/completions", json={"messages": []})
+        
+        assert response.status_code == 429
+
+
+class TestBenchmarkReporting:
+    """Test result computation and comparison."""
+    
+    def test_percentile(self):
+        """Test interpolated percentiles."""
+        values = list(range(1, 101))
+        assert percentile(values, 50) == pytest.approx(50.5)
+        assert percentile(values, 99) == pytest.approx(99.01)
+        assert percentile([], 95) == 0.0
+    
+    def test_parse_node_metrics(self):
+        """Test per-node sums and counts are read from a metrics scrape."""
+        text = 'graph_node_duration_seconds_sum{node="category_scorer"} 1.5\ngraph_node_duration_seconds_count{node="category_scorer"} 3\n'
+        assert parse_node_metrics(text) == {"category_scorer": {"sum": 1.5, "count": 3.0}}
+    
+    def test_format_counter_keeps_cost_decimals(self):
+        """Test counts print as integers while a fractional USD cost keeps its decimals."""
+        assert _format_counter(12.0) == "12"
+        assert _format_counter(0.085) == "0.0850"
+    
+    def test_compare_flags_regressions(self):
+        """Test latency growth beyond the threshold is reported as a regression."""
+        old = {"latency_ms": {"p50": 100, "p95": 200, "p99": 300, "mean": 120}, "throughput_rps": 10}
+        new = {"latency_ms": {"p50": 100, "p95": 260, "p99": 300, "mean": 120}, "throughput_rps": 10}
+        
+        _, regressed = compare_results(old, new, threshold=10)
+        assert regressed
+        _, regressed = compare_results(old, old, threshold=10)
+        assert not regressed
+    
+    def test_payload_benchmark(self):
+        """Test the payload benchmark shows field selection and compression shrinking the body."""
+        sizes = {name: row["bytes"] for name, row in run_payload_benchmark(repeat=1, tweet_counts=(50,))["profiles"]["50"].items()}
+        assert sizes["orjson_fields"] < sizes["orjson"] <= sizes["default_json"]
+        assert sizes["orjson_gzip"] < sizes["orjson"] / 4
+    def test_evidence_benchmark(self):
+        """Test citing tweets by number cuts the scorer's output tokens."""
+        for profile in run_evidence_benchmark()["profiles"]:
+            assert profile["output_tokens"]["indices"] < profile["output_tokens"]["quotes"] / 2
+
+    def test_export_benchmark(self):
+        """Test the Parquet export is smaller and faster to scan than JSON lines."""
+        pytest.importorskip("pyarrow")
+        from benchmarks.export import run_export_benchmark
+
+        result = run_export_benchmark(rows=300)
+        assert result["bytes"]["parquet"] < result["bytes"]["jsonl"]
+
+    def test_similarity_benchmark(self):
+        """Test the similarity benchmark fills the index and times searches."""
+        from benchmarks.similarity import run_similarity_benchmark
+
+        result = run_similarity_benchmark(profiles=2000, queries=5)
+        assert result["profiles"] == 2000 and result["search_ms"]["p50"] > 0
@@ -0,0 +1,122 @@
+import io
+import time
+from datetime import date, datetime, timezone
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.parquet as pq
+
+from src.api.main import app
+from src.export.reader import export_range, scan_results
+from src.export.writer import ResultExporter
+
+
+def _result(username, tech=None, error=None):
+    return {
+        "username": username,
+        "user_display_name": username.title(),
+        "recent_tweets": ["one", "two"],
+        "category_scores": {"tech": {"score": tech, "evidence": ["one"]}} if tech is not None else {},
+        "mbti_result": {"mbti_code": "INTJ", "mbti_name": "Architect"},
+        "top_keywords": ["ai", "python"],
+        "sentiment_scaled_score": 61.5,
+        "usage": {"total": {"cost_usd": 0.01}},
+        "error": error
+    }
+
+
+DAY_ONE = datetime(2026, 3, 1, 12, tzinfo=timezone.utc)
+DAY_TWO = datetime(2026, 3, 2, 12, tzinfo=timezone.utc)
+
+
+class TestResultExporter:
+    """Test results are streamed into date-partitioned Parquet files."""
+
+    def test_rows_are_flushed_in_row_groups_and_partitioned_by_date(self, tmp_path):
+        exporter = ResultExporter(tmp_path, flush_rows=2, file_rows=4)
+        for i in range(5):
+            exporter.append([_result(f"user{i}", tech=10.0 * i)], analyzed_at=DAY_ONE)
+        exporter.append([_result("failed", error="Data fetching failed")], analyzed_at=DAY_ONE)
+        exporter.append([_result("later", tech=99.0)], analyzed_at=DAY_TWO)
+
+        # The first file filled up and was finished; the rest is still buffered or hidden
+        finished = list(tmp_path.glob("date=2026-03-01/*.parquet"))
+        assert len(finished) == 1
+        assert pq.ParquetFile(finished[0]).metadata.num_row_groups == 2
+
+        exporter.close()
+        table = pq.read_table(tmp_path / "date=2026-03-01")
+        assert sorted(table.column("username").to_pylist()) == [f"user{i}" for i in range(5)]
+        assert sorted(table.column("score_tech").to_pylist()) == [0.0, 10.0, 20.0, 30.0, 40.0]
+        assert set(table.column("score_sports").to_pylist()) == {None}
+        assert table.column("top_keywords").to_pylist()[0] == ["ai", "python"]
+        assert pq.read_table(tmp_path / "date=2026-03-02").column("username").to_pylist() == ["later"]
+        assert not list(tmp_path.glob("*/.part-*"))
+
+    def test_open_files_roll_without_new_results(self, tmp_path):
+        exporter = ResultExporter(tmp_path, roll_seconds=0.05)
+        exporter.append([_result("alice", tech=80.0)], analyzed_at=DAY_ONE)
+        for _ in range(100):
+            if list(tmp_path.glob("date=2026-03-01/part-*.parquet")):
+                break
+            time.sleep(0.01)
+
+        assert pq.read_table(tmp_path / "date=2026-03-01").column("username").to_pylist() == ["alice"]
+        exporter.close()
+
+    def test_date_range_scan_and_export(self, tmp_path):
+        exporter = ResultExporter(tmp_path / "results")
+        exporter.append([_result("alice", tech=80.0)], analyzed_at=DAY_ONE)
+        exporter.append([_result("bob", tech=20.0)], analyzed_at=DAY_TWO)
+        exporter.close()
+
+        batches = list(scan_results(tmp_path / "results", date(2026, 3, 2), date(2026, 3, 31), columns=["username", "date"]))
+        assert pa.Table.from_batches(batches).to_pylist() == [{"username": "bob", "date": date(2026, 3, 2)}]
+
+        destination = tmp_path / "march.parquet"
+        assert export_range(tmp_path / "results", date(2026, 3, 1), date(2026, 3, 31), destination) == 2
+        assert pq.read_table(destination).num_rows == 2
+        assert list(scan_results(tmp_path / "missing", date(2026, 1, 1), date(2026, 1, 2))) == []
+
+
+class TestExportRoute:
+    """Test the date range export endpoint."""
+
+    @pytest.mark.asyncio
+    async def test_export_formats(self, tmp_path):
+        exporter = ResultExporter(tmp_path)
+        exporter.append([_result("alice", tech=80.0), _result("bob", tech=20.0)], analyzed_at=DAY_ONE)
+        exporter.close()
+
+        with patch('src.api.routes.EXPORT_DIR', str(tmp_path)):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                params = {"start": "2026-03-01", "end": "2026-03-01"}
+                response = await client.get("/export/results", params=params)
+                assert response.status_code == 200
+                assert pq.read_table(io.BytesIO(response.content)).num_rows == 2
+
+                response = await client.get("/export/results", params={**params, "format": "arrow", "columns": "username,score_tech"})
+                table = pa.ipc.open_stream(response.content).read_all()
+                assert table.column_names == ["username", "score_tech"] and table.num_rows == 2
+
+                assert (await client.get("/export/results", params={**params, "columns": "nope"})).status_code == 422
+                assert (await client.get("/export/results", params={"start": "2026-03-02", "end": "2026-03-01"})).status_code == 422
+
+        with patch('src.api.routes.EXPORT_DIR', ""):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                assert (await client.get("/export/results", params=params)).status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_failed_export_removes_its_temporary_file(self, tmp_path):
+        scratch = tmp_path / "scratch"
+        scratch.mkdir()
+        with patch('src.api.routes.EXPORT_DIR', str(tmp_path)), \
+             patch('src.api.routes.tempfile.tempdir', str(scratch)), \
+             patch('src.api.routes.export_reader.export_range', side_effect=OSError("disk full")):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                with pytest.raises(OSError):
+                    await client.get("/export/results", params={"start": "2026-03-01", "end": "2026-03-01"})
+        assert list(scratch.iterdir()) == []
@@ -0,0 +1,254 @@
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import patch
+import pytest
+
+from src.observability import metrics
+from src.observability.log import JsonFormatter, RequestContextFilter, SamplingFilter, request_id_var
+from src.observability.metrics import Counter, Gauge, Histogram, CACHE_REQUESTS, render_metrics
+from src.observability.profiling import capture_profile, load_profile
+from src.observability.tracing import get_trace_callbacks, flush_tracing, shutdown_tracing
+from src.pipeline.graph import _instrument_node
+from src.observability.metrics import GRAPH_NODE_DURATION
+
+
+class TestMetrics:
+    """Test the in-process metrics primitives."""
+    
+    @pytest.fixture(autouse=True)
+    def isolated_registry(self):
+        """Unregisters the metrics a test creates and drops its cache samples, so later /metrics scrapes do not see them."""
+        registered = list(metrics._registry)
+        cache_samples = dict(CACHE_REQUESTS._values)
+        yield
+        metrics._registry[:] = registered
+        CACHE_REQUESTS._values = cache_samples
+    
+    def test_counter_and_gauge(self):
+        """Test counters accumulate per label set and gauges go up and down."""
+        counter = Counter("test_events_total", "Test events.", ["kind"])
+        counter.inc("a")
+        counter.inc("a", amount=2)
+        counter.inc("b")
+        gauge = Gauge("test_in_flight", "Test gauge.")
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        
+        assert counter.value("a") == 3
+        assert counter.value("b") == 1
+        assert gauge.value() == 1
+        
+        with pytest.raises(ValueError):
+            counter.inc()
+    
+    def test_histogram_rendering(self):
+        """Test histograms render cumulative buckets, sum and count."""
+        histogram = Histogram("test_latency_seconds", "Test latency.", ["stage"], buckets=(0.1, 1.0))
+        histogram.observe(0.05, "x")
+        histogram.observe(0.5, "x")
+        histogram.observe(5.0, "x")
+        
+        output = render_metrics()
+        
+        assert "# TYPE test_latency_seconds histogram" in output
+        assert 'test_latency_seconds_bucket{stage="x",le="0.1"} 1' in output
+        assert 'test_latency_seconds_bucket{stage="x",le="1"} 2' in output
+        assert 'test_latency_seconds_bucket{stage="x",le="+Inf"} 3' in output
+        assert 'test_latency_seconds_count{stage="x"} 3' in output
+    
+    def test_cache_hit_ratio(self):
+        """Test the derived cache hit ratio gauge."""
+        CACHE_REQUESTS.inc("test_cache", "hit")
+        CACHE_REQUESTS.inc("test_cache", "hit")
+        CACHE_REQUESTS.inc("test_cache", "hit")
+        CACHE_REQUESTS.inc("test_cache", "miss")
+        
+        assert 'cache_hit_ratio{cache="test_cache"} 0.75' in render_metrics()
+
+
+class TestNodeInstrumentation:
+    """Test graph node latency instrumentation."""
+    
+    def test_sync_node_is_timed(self):
+        """Test sync nodes are timed and keep their return value."""
+        before = GRAPH_NODE_DURATION.count("test_sync")
+        node = _instrument_node("test_sync", lambda state: {**state, "done": True})
+        
+        assert node({"x": 1}) == {"x": 1, "done": True}
+        assert GRAPH_NODE_DURATION.count("test_sync") == before + 1
+    
+    @pytest.mark.asyncio
+    async def test_async_node_is_timed(self):
+        """Test async nodes stay awaitable and are timed."""
+        async def async_node(state):
+            return {**state, "done": True}
+        
+        before = GRAPH_NODE_DURATION.count("test_async")
+        node = _instrument_node("test_async", async_node)
+        
+        assert await node({"x": 1}) == {"x": 1, "done": True}
+        assert GRAPH_NODE_DURATION.count("test_async") == before + 1
+
+
+class TestRequestProfiling:
+    """Test opt-in per-request profiling."""
+    
+    @pytest.mark.asyncio
+    async def test_profile_captures_timeline_and_stacks(self, tmp_path):
+        """Test a profiled run records node spans and sampled stacks, and is saved to disk."""
+        import time
+        
+        def slow_node(state):
+            deadline = time.perf_counter() + 0.05
+            while time.perf_counter() < deadline:
+                pass
+            return state
+        
+        node = _instrument_node("test_profiled", slow_node)
+        with patch.dict("os.environ", {"PROFILE_DIR": str(tmp_path), "PROFILE_SAMPLE_INTERVAL_MS": "1"}):
+            async with capture_profile("req-9") as profile:
+                node({})
+            document = json.loads(load_profile(profile.profile_id))
+            collapsed = load_profile(profile.profile_id, "collapsed")
+        
+        assert document["request_id"] == "req-9"
+        assert [entry["node"] for entry in document["timeline"]] == ["test_profiled"]
+        assert document["timeline"][0]["duration_ms"] >= 50
+        assert document["timeline"][0]["cpu_ms"] > 0
+        assert document["samples"] > 0
+        assert collapsed.startswith("test_profiled;") and "slow_node" in collapsed
+    
+    @pytest.mark.asyncio
+    async def test_async_nodes_are_not_sampled(self, tmp_path):
+        """Test async nodes appear in the timeline but the shared event loop thread is never sampled."""
+        import time
+        
+        async def busy_async_node(state):
+            deadline = time.perf_counter() + 0.03
+            while time.perf_counter() < deadline:
+                pass
+            return state
+        
+        node = _instrument_node("test_profiled_async", busy_async_node)
+        with patch.dict("os.environ", {"PROFILE_DIR": str(tmp_path), "PROFILE_SAMPLE_INTERVAL_MS": "1"}):
+            async with capture_profile("req-10") as profile:
+                await node({})
+            document = json.loads(load_profile(profile.profile_id))
+        
+        assert [entry["node"] for entry in document["timeline"]] == ["test_profiled_async"]
+        assert document["timeline"][0]["cpu_ms"] is None
+        assert document["samples"] == 0
+    
+    def test_unprofiled_nodes_record_nothing(self, tmp_path):
+        """Test nodes run outside a profile leave no trace and bad ids are rejected."""
+        node = _instrument_node("test_unprofiled", lambda state: state)
+        with patch.dict("os.environ", {"PROFILE_DIR": str(tmp_path)}):
+            node({})
+            
+            assert list(tmp_path.iterdir()) == []
+            assert load_profile("../../etc/passwd") is None
+
+
+class TestStructuredLogging:
+    """Test the structured logging layer."""
+    
+    def _make_record(self, level=logging.INFO, **extra):
+        record = logging.LogRecord("src.test", level, __file__, 1, "Fetched %d tweets", (3,), None)
+        record.__dict__.update(extra)
+        return record
+    
+    def test_json_formatter_includes_request_id_and_extra(self):
+        """Test records are rendered as JSON with the request id and extra fields."""
+        token = request_id_var.set("req-123")
+        try:
+            record = self._make_record(username="testuser")
+            RequestContextFilter().filter(record)
+        finally:
+            request_id_var.reset(token)
+        
+        payload = json.loads(JsonFormatter().format(record))
+        
+        assert payload["message"] == "Fetched 3 tweets"
+        assert payload["level"] == "INFO"
+        assert payload["request_id"] == "req-123"
+        assert payload["username"] == "testuser"
+    
+    def test_sampling_filter_always_keeps_warnings(self):
+        """Test sampling drops low-level records but never warnings or errors."""
+        sampler = SamplingFilter(sample_rate=0.0)
+        
+        assert sampler.filter(self._make_record(logging.INFO)) is False
+        assert sampler.filter(self._make_record(logging.WARNING)) is True
+        assert sampler.filter(self._make_record(logging.ERROR)) is True
+
+
+class _CollectorHandler(BaseHTTPRequestHandler):
+    """Stand-in Langfuse collector that records ingestion batches."""
+    batches = []
+    
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.startswith("/api/public/ingestion"):
+            type(self).batches.append(json.loads(body))
+        self.send_response(207)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(b'{"successes": [], "errors": []}')
+    
+    def log_message(self, *args):
+        pass
+
+
+class TestTracing:
+    """Test sampled Langfuse tracing."""
+    
+    @pytest.fixture
+    def collector(self):
+        _CollectorHandler.batches = []
+        server = HTTPServer(("127.0.0.1", 0), _CollectorHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield f"http://127.0.0.1:{server.server_port}"
+        shutdown_tracing()
+        server.shutdown()
+    
+    def test_no_callbacks_without_credentials(self):
+        """Test tracing is disabled when Langfuse keys are not set."""
+        with patch.dict("os.environ", {}, clear=True):
+            assert get_trace_callbacks(session_id="s") == []
+    
+    def test_no_callbacks_when_not_sampled(self):
+        """Test unsampled requests get no tracing callbacks."""
+        with patch.dict("os.environ", {
+            "LANGFUSE_PUBLIC_KEY": "pk", "LANGFUSE_SECRET_KEY": "sk", "TRACE_SAMPLE_RATE": "0"
+        }):
+            assert get_trace_callbacks(session_id="s") == []
+    
+    def test_traces_are_batched_to_collector(self, collector):
+        """Test trace events are buffered and flushed in batches to the configured host."""
+        from langchain_core.language_models.fake_chat_models import FakeListChatModel
+        
+        with patch.dict("os.environ", {
+            "LANGFUSE_PUBLIC_KEY": "pk",
+            "LANGFUSE_SECRET_KEY": "sk",
+            "LANGFUSE_HOST": collector,
+            "TRACE_SAMPLE_RATE": "1",
+            "TRACE_FLUSH_INTERVAL": "0.1"
+        }):
+            first = get_trace_callbacks(session_id="profile-analysis-a", request_id="req-1")
+            second = get_trace_callbacks(session_id="profile-analysis-b", request_id="req-2")
+            llm = FakeListChatModel(responses=["ok", "ok"])
+            llm.invoke("hello", config={"callbacks": first})
+            llm.invoke("hello", config={"callbacks": second})
+            flush_tracing()
+        
+        events = [event for batch in _CollectorHandler.batches for event in batch["batch"]]
+        trace_events = [e for e in events if e["type"] == "trace-create"]
+        
+        assert len(first) == 1 and len(second) == 1
+        assert first[0].langfuse is second[0].langfuse  # One shared client
+        assert {e["body"].get("sessionId") for e in trace_events} >= {"profile-analysis-a", "profile-analysis-b"}
+        assert any(e["type"] == "generation-create" for e in events)
@@ -1,18 +1,43 @@
 import pytest
 import asyncio
-from unittest.mock import Mock, patch, AsyncMock
+import threading
+from unittest.mock import MagicMock, Mock, patch, AsyncMock
 from typing import Dict, Any
 
 # Import pipeline components
-from src.pipeline.graph import create_profiling_graph
+from src.pipeline import create_profiling_graph, validate_config
 from src.pipeline.models import ProfileAnalysisState, CategoryScoreWithEvidence, CategoryScores, TopKeywords, MBTIResult
+from src.pipeline.preprocessing import normalize_tweet, preprocess_tweets
+from src.pipeline.sampling import sample_tweets
+from src.pipeline.usage import UsageTracker, get_usage_totals
+from src.pipeline.constants import CATEGORIES, MBTI_TYPES_JSON_STR
+from src.pipeline.resilience import DeadlineExceeded, LatencyWindow, invoke_llm, is_transient_error
+from src.pipeline.rate_limit import (
+    AdaptiveRateLimiter,
+    RateLimitFeedback,
+    RateLimitTimeout,
+    estimate_request_tokens,
+    parse_reset_duration
+)
+from src.observability.metrics import LLM_HEDGES, LLM_RETRIES
+from src.pipeline.prompts import (
+    CATEGORY_SCORING_PROMPT_TEMPLATE,
+    MBTI_CLASSIFICATION_PROMPT_TEMPLATE,
+    KEYWORD_EXTRACTION_PROMPT_TEMPLATE,
+    SENTIMENT_ANALYSIS_PROMPT_TEMPLATE
+)
 from src.pipeline.nodes import (
     data_fetcher_node,
+    tweet_preprocessor_node,
+    tweet_sampler_node,
     category_scorer_node,
     mbti_classifier_node,
     keywords_extractor_node,
-    sentiment_analyzer_node
+    sentiment_analyzer_node,
+    tweet_sentiment_node
 )
+from src.pipeline.sentiment import batch_scores, numbered_tweets_text, sentiment_timeseries, tweet_batches
+from src.pipeline.utils import _prepare_prompt_inputs, resolve_evidence
 
 
 class TestPipelineModels:
@@ -61,6 +86,394 @@ class TestPipelineModels:
         assert "strategic" in mbti.rationale
 
 
+class TestTweetPreprocessing:
+    """Test tweet normalization and deduplication."""
+    
+    def test_normalize_tweet_shortens_urls_and_whitespace(self):
+        """Test URLs are reduced to their domain and whitespace is collapsed."""
+        text = "RT @someone:  Read   this https://www.example.com/a/very/long/path?x=1 \n and https://t.co/abc123"
+        assert normalize_tweet(text) == "Read this [link:example.com] and [link]"
+    
+    def test_normalize_tweet_truncates_emoji_runs(self):
+        """Test long emoji runs and repeated punctuation are truncated."""
+        assert normalize_tweet("So good \U0001F602\U0001F602\U0001F602\U0001F602\U0001F602!!!!!!") == "So good \U0001F602\U0001F602\U0001F602!!!"
+    
+    def test_preprocess_tweets_drops_duplicates(self):
+        """Test exact and near-duplicate tweets are dropped, keeping the first occurrence."""
+        tweets = [
+            "Huge sale on all our premium widgets this weekend only, grab yours now!",
+            "Huge sale on all our premium widgets this weekend only, grab yours now!!",
+            "huge sale on all our premium widgets this weekend only, grab yours now!",
+            "Just finished reading a great book about distributed systems.",
+            "   "
+        ]
+        kept, stats = preprocess_tweets(tweets)
+        
+        assert kept == [tweets[0], tweets[3]]
+        assert stats["exact_duplicates"] == 1
+        assert stats["near_duplicates"] == 1
+        assert stats["empty_tweets"] == 1
+        assert stats["tokens_saved"] > 0
+    
+    def test_preprocess_tweets_keeps_distinct_tweets(self):
+        """Test unrelated tweets are all kept."""
+        tweets = ["Love working with AI!", "Just deployed a new model", "Coffee first, then code."]
+        kept, stats = preprocess_tweets(tweets)
+        
+        assert kept == tweets
+        assert stats["output_tweets"] == 3
+    
+    def test_preprocess_tweets_none(self):
+        """Test preprocessing handles missing tweets."""
+        kept, stats = preprocess_tweets(None)
+        assert kept == []
+        assert stats["input_tweets"] == 0
+
+
+class TestTweetSampling:
+    """Test representative tweet sampling under a token budget."""
+    
+    def test_sample_tweets_under_budget_keeps_all(self):
+        """Test all tweets are kept when they fit the budget."""
+        tweets = ["short one", "short two"]
+        selected, stats = sample_tweets(tweets, token_budget=100)
+        
+        assert selected == tweets
+        assert stats["selected_tweets"] == 2
+    
+    def test_sample_tweets_respects_budget_and_recency(self):
+        """Test sampling stays within budget, keeps the newest tweets and preserves order."""
+        topics = ["football match tonight", "new python release", "baking sourdough bread", "mountain hiking trip"]
+        tweets = [f"Thoughts on {topics[i % 4]} number {i}, really enjoying it" for i in range(40)]
+        
+        selected, stats = sample_tweets(tweets, token_budget=100, recent_keep=2)
+        
+        assert stats["tokens_after"] <= 100
+        assert selected[:2] == tweets[:2]
+        assert selected == [t for t in tweets if t in selected]
+        assert len(selected) < len(tweets)
+    
+    def test_sample_tweets_covers_distinct_topics(self):
+        """Test medoid selection picks tweets from each topic cluster."""
+        topics = ["football match tonight", "new python release", "baking sourdough bread", "mountain hiking trip"]
+        tweets = [f"{topics[i % 4]} {topics[i % 4]} post {i}" for i in range(40)]
+        
+        selected, _ = sample_tweets(tweets, token_budget=60, recent_keep=0)
+        
+        assert {t.split(" post")[0] for t in selected} == {f"{topic} {topic}" for topic in topics}
+
+
+class TestUsageTracking:
+    """Test per-node token usage accounting."""
+    
+    def test_usage_tracker_attributes_calls_to_nodes(self):
+        """Test LLM usage is attributed to the graph node that made the call."""
+        from uuid import uuid4
+        from langchain_core.messages import AIMessage
+        from langchain_core.outputs import ChatGeneration, LLMResult
+        
+        tracker = UsageTracker()
+        before = get_usage_totals().get("category_scorer", {}).get("prompt_tokens", 0)
+        
+        run_id = uuid4()
+        tracker.on_chat_model_start({}, [], run_id=run_id, metadata={"langgraph_node": "category_scorer"})
+        message = AIMessage(content="", usage_metadata={"input_tokens": 1000, "output_tokens": 200, "total_tokens": 1200})
+        tracker.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]), run_id=run_id)
+        
+        failed_run_id = uuid4()
+        tracker.on_chat_model_start({}, [], run_id=failed_run_id, metadata={"langgraph_node": "mbti_classifier"})
+        tracker.on_llm_error(Exception("boom"), run_id=failed_run_id)
+        
+        summary = tracker.summary()
+        
+        assert summary["nodes"]["category_scorer"]["prompt_tokens"] == 1000
+        assert summary["nodes"]["category_scorer"]["completion_tokens"] == 200
+        assert summary["nodes"]["category_scorer"]["cost_usd"] > 0
+        assert summary["nodes"]["mbti_classifier"]["llm_errors"] == 1
+        assert summary["total"]["llm_calls"] == 2
+        assert summary["total"]["total_tokens"] == 1200
+        assert get_usage_totals()["category_scorer"]["prompt_tokens"] == before + 1000
+    
+    def test_usage_tracker_reports_cached_prompt_tokens(self):
+        """Test prefix-cache hits are counted and billed at the cached input price."""
+        from uuid import uuid4
+        from langchain_core.messages import AIMessage
+        from langchain_core.outputs import ChatGeneration, LLMResult
+        
+        def record(cached_tokens):
+            tracker = UsageTracker()
+            run_id = uuid4()
+            tracker.on_chat_model_start({}, [], run_id=run_id, metadata={"langgraph_node": "mbti_classifier"})
+            message = AIMessage(content="", usage_metadata={
+                "input_tokens": 2000, "output_tokens": 100, "total_tokens": 2100,
+                "input_token_details": {"cache_read": cached_tokens}
+            })
+            tracker.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]), run_id=run_id)
+            return tracker.summary()["nodes"]["mbti_classifier"]
+        
+        uncached, cached = record(0), record(1536)
+        
+        assert cached["cached_prompt_tokens"] == 1536
+        assert cached["cost_usd"] < uncached["cost_usd"]
+
+
+class TestPrompts:
+    """Test the prompt layout used for provider-side prefix caching."""
+    
+    @pytest.mark.parametrize("template", [
+        CATEGORY_SCORING_PROMPT_TEMPLATE,
+        MBTI_CLASSIFICATION_PROMPT_TEMPLATE,
+        KEYWORD_EXTRACTION_PROMPT_TEMPLATE,
+        SENTIMENT_ANALYSIS_PROMPT_TEMPLATE
+    ])
+    def test_static_prefix_is_identical_across_requests(self, template):
+        """Test the system message does not change between users and the user text comes last."""
+        first = template.format_messages(bio="First bio {with braces}", tweets_text="- one")
+        second = template.format_messages(bio="Second bio", tweets_text="- two\n- three")
+        
+        assert first[0].type == "system"
+        assert first[0].content == second[0].content
+        assert "First bio {with braces}" not in first[0].content
+        assert first[-1].content.endswith("Tweets:\n- one")
+    
+    def test_static_content_is_rendered_once(self):
+        """Test the category list and MBTI catalog are baked into the system prompts."""
+        category_prompt = CATEGORY_SCORING_PROMPT_TEMPLATE.format_messages(bio="b", tweets_text="t")[0].content
+        mbti_prompt = MBTI_CLASSIFICATION_PROMPT_TEMPLATE.format_messages(bio="b", tweets_text="t")[0].content
+        
+        assert ", ".join(CATEGORIES) in category_prompt
+        assert MBTI_TYPES_JSON_STR in mbti_prompt
+        assert '{"mbti_code": "ISTJ", ...}' in mbti_prompt
+
+
+class _TransientError(Exception):
+    """Stand-in for an OpenAI HTTP error."""
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class TestResilience:
+    """Test deadline-aware retries and hedging of LLM calls."""
+    
+    def _config(self, seconds_left=None, node="category_scorer"):
+        import time
+        config = {"metadata": {"langgraph_node": node}, "configurable": {}}
+        if seconds_left is not None:
+            config["configurable"]["deadline"] = time.monotonic() + seconds_left
+        return config
+    
+    def test_transient_errors_are_retried(self):
+        """Test rate limits and server errors are retried with backoff."""
+        llm = Mock()
+        llm.invoke.side_effect = [_TransientError(429), _TransientError(503), "ok"]
+        before = LLM_RETRIES.value("category_scorer")
+        
+        with patch('src.pipeline.resilience.current_run_config', return_value=self._config()), \
+             patch('src.pipeline.resilience.time.sleep') as mock_sleep:
+            assert invoke_llm(llm, ["prompt"]) == "ok"
+        
+        assert llm.invoke.call_count == 3
+        assert mock_sleep.call_count == 2
+        assert LLM_RETRIES.value("category_scorer") == before + 2
+    
+    def test_permanent_errors_are_not_retried(self):
+        """Test client errors fail immediately."""
+        llm = Mock()
+        llm.invoke.side_effect = _TransientError(400)
+        
+        with patch('src.pipeline.resilience.current_run_config', return_value=self._config()):
+            with pytest.raises(_TransientError):
+                invoke_llm(llm, ["prompt"])
+        assert llm.invoke.call_count == 1
+    
+    def test_queue_timeouts_are_not_retried(self):
+        """Test running out of time in the slot or rate limit queue is not treated as transient."""
+        from src.api.scheduler import SchedulerTimeout
+        from src.pipeline.rate_limit import RateLimitTimeout
+
+        assert is_transient_error(TimeoutError())
+        assert not is_transient_error(SchedulerTimeout("no slot"))
+        assert not is_transient_error(RateLimitTimeout("no capacity"))
+        assert not is_transient_error(DeadlineExceeded("late"))
+
+    def test_latency_excludes_queueing(self):
+        """Test the hedge delay samples only the provider call, not the wait for capacity."""
+        import time
+        llm = Mock()
+        llm.invoke.return_value = "ok"
+        limiter = Mock()
+        limiter.acquire.side_effect = lambda tokens, timeout, priority: time.sleep(0.2) or 0.2
+        window = LatencyWindow()
+
+        with patch('src.pipeline.resilience.current_run_config', return_value=self._config()), \
+             patch('src.pipeline.resilience.get_rate_limiter', return_value=limiter), \
+             patch('src.pipeline.resilience._latencies', window):
+            invoke_llm(llm, ["prompt"])
+
+        assert window.quantile("category_scorer", 0.5, min_samples=1) < 0.1
+
+    def test_timeout_is_derived_from_deadline(self):
+        """Test each call's timeout is capped by the time left and expired deadlines fail fast."""
+        llm = Mock()
+        llm.invoke.return_value = "ok"
+        
+        with patch('src.pipeline.resilience.current_run_config', return_value=self._config(seconds_left=2.0)):
+            invoke_llm(llm, ["prompt"])
+        assert 0 < llm.invoke.call_args.kwargs["timeout"] <= 2.0
+        
+        with patch('src.pipeline.resilience.current_run_config', return_value=self._config(seconds_left=-1)):
+            with pytest.raises(DeadlineExceeded):
+                invoke_llm(llm, ["prompt"])
+        assert llm.invoke.call_count == 1
+    
+    def test_calls_hold_a_scheduler_slot(self):
+        """Test LLM calls wait for a slot of the run's scheduler at the run's priority."""
+        scheduler = MagicMock()
+        llm = Mock()
+        llm.invoke.return_value = "ok"
+        config = self._config(seconds_left=5.0)
+        config["configurable"].update({"scheduler": scheduler, "priority": "batch"})
+        
+        with patch('src.pipeline.resilience.current_run_config', return_value=config):
+            assert invoke_llm(llm, ["prompt"]) == "ok"
+        
+        resource, priority, timeout = scheduler.slot.call_args.args
+        assert (resource, priority) == ("llm", "batch")
+        assert 0 < timeout <= 5.0
+        scheduler.slot.return_value.__exit__.assert_called_once()
+    
+    def test_retry_is_skipped_when_backoff_exceeds_deadline(self):
+        """Test a retry that cannot finish before the deadline reports a deadline error."""
+        llm = Mock()
+        llm.invoke.side_effect = _TransientError(503)
+        
+        with patch('src.pipeline.resilience.current_run_config', return_value=self._config(seconds_left=0.5)), \
+             patch('src.pipeline.resilience.retry_delay', return_value=5.0):
+            with pytest.raises(DeadlineExceeded):
+                invoke_llm(llm, ["prompt"])
+        assert llm.invoke.call_count == 1
+    
+    def test_hedged_request_wins_over_slow_primary(self):
+        """Test a duplicate request is sent after the hedge delay and the first response is used."""
+        import threading
+        release = threading.Event()
+        calls = []
+        
+        def invoke(prompt, timeout):
+            calls.append(timeout)
+            if len(calls) == 1:
+                release.wait(5)  # Slow primary
+                return "slow"
+            return "fast"
+        
+        llm = Mock()
+        llm.invoke.side_effect = invoke
+        window = LatencyWindow()
+        for _ in range(20):
+            window.record("mbti_classifier", 0.05)
+        
+        with patch('src.pipeline.resilience.current_run_config', return_value=self._config(node="mbti_classifier")), \
+             patch('src.pipeline.resilience.LLM_HEDGE_ENABLED', True), \
+             patch('src.pipeline.resilience._latencies', window):
+            result = invoke_llm(llm, ["prompt"])
+        release.set()
+        
+        assert result == "fast"
+        assert len(calls) == 2
+        assert LLM_HEDGES.value("mbti_classifier", "won") >= 1
+
+
+class TestRateLimiter:
+    """Test the adaptive RPM/TPM limiter shared by the LLM nodes."""
+    
+    def test_parse_reset_duration(self):
+        """Test OpenAI reset durations are converted to seconds."""
+        assert parse_reset_duration("6m0s") == 360
+        assert parse_reset_duration("1.5s") == 1.5
+        assert parse_reset_duration("120ms") == pytest.approx(0.12)
+        assert parse_reset_duration(None) is None
+    
+    def test_waits_for_token_budget(self):
+        """Test callers queue until the token bucket refills instead of failing."""
+        import time
+        limiter = AdaptiveRateLimiter(rpm=0, tpm=6000)  # Refills 100 tokens per second
+        
+        assert limiter.acquire(6000) < 0.05
+        started = time.monotonic()
+        limiter.acquire(20)
+        
+        assert 0.1 < time.monotonic() - started < 1.0
+        with pytest.raises(RateLimitTimeout):
+            limiter.acquire(5000, timeout=0.1)
+    
+    def test_adopts_reported_limits(self):
+        """Test rate limit headers replace the configured limits and remaining budget."""
+        limiter = AdaptiveRateLimiter(rpm=10, tpm=1000)
+        limiter.update_from_headers({
+            "x-ratelimit-limit-requests": "600",
+            "x-ratelimit-limit-tokens": "60000",
+            "x-ratelimit-remaining-requests": "599",
+            "x-ratelimit-remaining-tokens": "50000"
+        })
+        
+        assert limiter.acquire(40000, timeout=0.1) < 0.1
+    
+    def test_429_pauses_all_callers(self):
+        """Test a 429 seen by the feedback callback pauses the limiter for Retry-After."""
+        from uuid import uuid4
+        limiter = AdaptiveRateLimiter(rpm=600, tpm=60000)
+        error = _TransientError(429)
+        error.response = Mock(headers={"retry-after": "2"})
+        
+        RateLimitFeedback(limiter).on_llm_error(error, run_id=uuid4())
+        
+        with pytest.raises(RateLimitTimeout):
+            limiter.acquire(10, timeout=0.5)
+    
+    def test_feedback_reconciles_actual_usage(self):
+        """Test over-estimated reservations are returned once the real usage is known."""
+        from uuid import uuid4
+        from langchain_core.messages import AIMessage, HumanMessage
+        from langchain_core.outputs import ChatGeneration, LLMResult
+        limiter = AdaptiveRateLimiter(rpm=0, tpm=6000)
+        feedback = RateLimitFeedback(limiter)
+        messages = [HumanMessage(content="x" * 400)]
+        estimate = estimate_request_tokens(messages)
+        
+        limiter.acquire(6000 - estimate)
+        limiter.acquire(estimate)
+        run_id = uuid4()
+        feedback.on_chat_model_start({}, [messages], run_id=run_id)
+        message = AIMessage(content="", usage_metadata={"input_tokens": 100, "output_tokens": 20, "total_tokens": 120})
+        feedback.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]), run_id=run_id)
+        
+        assert limiter.acquire(estimate - 120, timeout=0.05) < 0.05
+
+    def test_interactive_calls_skip_the_batch_backlog(self):
+        """Test an interactive call is served ahead of queued batch and background calls."""
+        import time
+        limiter = AdaptiveRateLimiter(rpm=3000, tpm=0)  # One request every 20ms once drained
+        limiter._requests.level = 0
+        served = []
+
+        def call(priority):
+            limiter.acquire(0, timeout=5, priority=priority)
+            served.append(priority)
+
+        backlog = [threading.Thread(target=call, args=(priority,)) for priority in ["batch", "background"] * 10]
+        for thread in backlog:
+            thread.start()
+        while sum(len(queue) for queue in limiter._queues.values()) < len(backlog):
+            time.sleep(0.001)
+        call("interactive")
+        for thread in backlog:
+            thread.join()
+
+        assert served.index("interactive") <= 2
+        assert len(served) == 21
+
+
 class TestPipelineGraph:
     """Test pipeline graph creation and structure."""
     
@@ -79,11 +492,19 @@ class TestPipelineGraph:
     
     def test_create_profiling_graph_returns_state_graph(self):
         """Test that create_profiling_graph returns a StateGraph instance."""
-        with patch('src.pipeline.graph.OPENAI_API_KEY', 'test-key'):
-            graph = create_profiling_graph()
-            assert graph is not None
-            assert hasattr(graph, 'add_node')
-            assert hasattr(graph, 'add_edge')
+        graph = create_profiling_graph()
+        assert graph is not None
+        assert hasattr(graph, 'add_node')
+        assert hasattr(graph, 'add_edge')
+    
+    def test_validate_config_requires_api_key(self):
+        """Test the API key is checked at startup rather than on import."""
+        with patch('src.pipeline.constants.OPENAI_API_KEY', None):
+            with pytest.raises(ValueError, match="OPENAI_API_KEY"):
+                validate_config()
+        
+        with patch('src.pipeline.constants.OPENAI_API_KEY', 'test-key'):
+            validate_config()
 
 
 class TestPipelineNodes:
@@ -150,6 +571,25 @@ class TestPipelineNodes:
             assert "Data fetching failed" in result["error"]
             assert result["user_bio"] is None
     
+    def test_tweet_preprocessor_node(self, sample_state):
+        """Test the preprocessor stores cleaned tweets separately from the raw ones."""
+        sample_state["recent_tweets"] = ["Same tweet", "Same tweet", "Other tweet"]
+        
+        result = tweet_preprocessor_node(sample_state)
+        
+        assert result["recent_tweets"] == ["Same tweet", "Same tweet", "Other tweet"]
+        assert result["prompt_tweets"] == ["Same tweet", "Other tweet"]
+        assert result["preprocessing_stats"]["exact_duplicates"] == 1
+    
+    def test_tweet_sampler_node(self, sample_state):
+        """Test the sampler narrows prompt tweets and records stats."""
+        sample_state["prompt_tweets"] = ["Love working with AI!"]
+        
+        result = tweet_sampler_node(sample_state)
+        
+        assert result["prompt_tweets"] == ["Love working with AI!"]
+        assert result["sampling_stats"]["selected_tweets"] == 1
+    
     def test_category_scorer_node_success(self, sample_state):
         """Test successful category scoring."""
         mock_response = Mock()
@@ -170,7 +610,31 @@ class TestPipelineNodes:
             assert "tech" in result["category_scores"]
             assert result["category_scores"]["tech"]["score"] == 85.0
             assert result["error"] is None
-    
+
+    def test_category_scorer_node_resolves_evidence_indices(self, sample_state):
+        """Test evidence cited by number comes back as the bio and tweet texts."""
+        mock_response = Mock()
+        mock_response.scores = [Mock(category="tech", score=85.0, evidence=[2, 0, 2, 7])]
+
+        with patch('src.pipeline.nodes.get_category_scorer_llm') as mock_llm_getter:
+            mock_llm_getter.return_value.invoke.return_value = mock_response
+            result = category_scorer_node(sample_state)
+
+        assert result["category_scores"]["tech"]["evidence"] == ["Just deployed a new model", "AI enthusiast and developer"]
+
+    def test_resolve_evidence(self, sample_state):
+        """Test numbers index the prompt tweets, quotes are kept and duplicates dropped."""
+        state = {**sample_state, "prompt_tweets": ["Sampled tweet"]}
+        assert resolve_evidence([1, "quoted", 1, -1, 5, True], state) == ["Sampled tweet", "quoted"]
+        assert resolve_evidence([0], {**state, "user_bio": None}) == []
+
+    def test_prompt_numbers_tweets_for_evidence(self, sample_state):
+        """Test tweets are numbered from 1 so the scorer can cite them."""
+        with patch('src.pipeline.utils.EVIDENCE_MODE', "indices"):
+            assert _prepare_prompt_inputs(sample_state["user_bio"], sample_state["recent_tweets"])["tweets_text"].startswith("[1] Love working with AI!\n[2] ")
+        with patch('src.pipeline.utils.EVIDENCE_MODE', "quotes"):
+            assert "[1]" not in _prepare_prompt_inputs(sample_state["user_bio"], sample_state["recent_tweets"])["tweets_text"]
+
     def test_category_scorer_node_no_text(self):
         """Test category scorer with no text available."""
         state = {
@@ -269,4 +733,82 @@ class TestPipelineNodes:
             result = sentiment_analyzer_node(sample_state)
             
             assert result["sentiment_scaled_score"] == 100.0  # Should be capped
-            assert result["error"] is None 
\ No newline at end of file
+            assert result["error"] is None
+
+
+class TestTweetSentiment:
+    """Test per-tweet sentiment scoring and its time series."""
+
+    RECORDS = [
+        {"id": "3", "date": "2026-03-10T12:00:00+00:00", "text": "Shipped it!!!! https://example.com/post"},
+        {"id": "2", "date": "2026-03-04T12:00:00+00:00", "text": "Rough week."},
+        {"id": "1", "date": "2026-03-01T12:00:00+00:00", "text": "Okay day"},
+        {"id": "0", "date": None, "text": "No date"}
+    ]
+
+    @staticmethod
+    def _response(*scores):
+        return Mock(scores=[Mock(tweet=tweet, score=score) for tweet, score in scores])
+
+    def test_numbered_prompt_and_scores(self):
+        assert numbered_tweets_text(self.RECORDS[:2]) == "[1] Shipped it!!! [link:example.com]\n[2] Rough week."
+        scores = batch_scores(self._response((1, 120.0), (2, 40.0), (2, 90.0), (7, 10.0), (0, 10.0)), count=2)
+        assert scores == {0: 100.0, 1: 40.0}
+        assert batch_scores(None, count=2) == {}
+
+    def test_timeseries_and_rolling_windows(self):
+        """Test points are oldest first and each window covers the trailing days."""
+        series = sentiment_timeseries(self.RECORDS, {0: 90.0, 1: 20.0, 2: 50.0, 3: 60.0}, window_days=7)
+
+        assert [point["id"] for point in series["points"]] == ["1", "2", "3", "0"]
+        assert [(window["mean"], window["count"]) for window in series["rolling"]] == [(50.0, 1), (35.0, 2), (55.0, 2)]
+        assert (series["rolling"][1]["min"], series["rolling"][1]["max"]) == (20.0, 50.0)
+
+    def test_node_scores_tweets_in_batches(self):
+        """Test every batch is one LLM call and the scores map back to their tweets."""
+        state = {"username": "test", "user_bio": "Bio", "tweet_records": self.RECORDS}
+        responses = iter([self._response((1, 80.0), (2, 20.0)), self._response((1, 50.0), (2, 50.0))])
+        threads = []
+        llm = Mock()
+        llm.invoke.side_effect = lambda prompt, **kwargs: threads.append(threading.current_thread().name) or next(responses)
+
+        with patch('src.pipeline.nodes.tweet_batches', side_effect=lambda records: tweet_batches(records, 2)), \
+             patch('src.pipeline.nodes.get_tweet_sentiment_llm', return_value=llm):
+            result = tweet_sentiment_node(state)
+
+        assert llm.invoke.call_count == 2
+        assert all(name.startswith("llm-call") for name in threads)  # The shared pool, not one per run
+        assert result["error"] is None
+        assert result["sentiment_scaled_score"] == 50.0
+        scores = {point["id"]: point["score"] for point in result["sentiment_timeseries"]["points"]}
+        assert scores == {"3": 80.0, "2": 20.0, "1": 50.0, "0": 50.0}
+
+    def test_node_without_tweets_scores_the_bio(self):
+        with patch('src.pipeline.nodes.get_sentiment_analyzer_llm') as mock_llm_getter:
+            mock_llm_getter.return_value.invoke.return_value = Mock(scaled_sentiment_score=64.0)
+            result = tweet_sentiment_node({"username": "test", "user_bio": "Bio", "tweet_records": []})
+
+        assert result["sentiment_scaled_score"] == 64.0
+        assert result.get("sentiment_timeseries") is None
+
+    def test_node_reports_failed_calls(self):
+        llm = Mock()
+        llm.invoke.side_effect = ValueError("bad output")
+        with patch('src.pipeline.nodes.get_tweet_sentiment_llm', return_value=llm):
+            result = tweet_sentiment_node({"username": "test", "user_bio": None, "tweet_records": self.RECORDS})
+
+        assert result["sentiment_scaled_score"] is None
+        assert "Tweet sentiment LLM call failed" in result["error"]
+
+    @pytest.mark.asyncio
+    async def test_tweet_records_keep_ids_and_dates(self):
+        from benchmarks.fake_twscrape import FakeTwscrapeAPI, FakeTwscrapeConfig
+        from src.data_fetcher.fetcher import fetch_tweet_records
+
+        api = FakeTwscrapeAPI(FakeTwscrapeConfig(latency_ms=0, jitter_ms=0, per_tweet_ms=0))
+        with patch('src.data_fetcher.fetcher.get_api_client', new=AsyncMock(return_value=api)):
+            records = await fetch_tweet_records("alice", n=3)
+
+        assert len(records) == 3 and all(record["text"] for record in records)
+        assert all(record["id"].isdigit() for record in records)
+        assert records[0]["date"] > records[1]["date"] and records[0]["date"].endswith("+00:00")
\ No newline at end of file
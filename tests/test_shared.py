@@ -0,0 +1,184 @@
+import multiprocessing
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+
+from src.api.services import analyze_profile_service
+from src.data_fetcher.fetcher import fetch_recent_tweets, fetch_user_details
+from src.pipeline.rate_limit import AdaptiveRateLimiter, RateLimitTimeout
+from src.shared.store import SharedStore
+
+
+@pytest.fixture
+def shared_store_path(tmp_path, monkeypatch):
+    """Points SHARED_STORE_PATH at a fresh database for the test."""
+    path = tmp_path / "shared.sqlite3"
+    monkeypatch.setattr("src.pipeline.constants.SHARED_STORE_PATH", str(path))
+    return path
+
+
+def _take_requests(path, attempts, results):
+    store = SharedStore(path)
+    granted = sum(1 for _ in range(attempts) if store.take("test", {"requests": 1}, {"requests": 10}, 3600) == 0.0)
+    results.put(granted)
+
+
+class TestSharedStore:
+    """Test the SQLite-backed store shared between processes."""
+
+    def test_entries_are_visible_to_other_connections(self, tmp_path):
+        """Test a value written through one store is read through another on the same file."""
+        writer = SharedStore(tmp_path / "store.sqlite3")
+        reader = SharedStore(tmp_path / "store.sqlite3")
+        writer.set("user_id", "alice", 42, ttl=60)
+        writer.set("user_id", "bob", 7, ttl=0.01)
+
+        assert reader.get("user_id", "alice") == 42
+        time.sleep(0.02)
+        assert reader.get("user_id", "bob") is None
+        assert writer.purge_expired() == 1
+
+    def test_set_purges_expired_entries(self, tmp_path):
+        """Test expired entries are deleted by later writes instead of piling up."""
+        store = SharedStore(tmp_path / "store.sqlite3", purge_interval=0)
+        store.set("analysis", "alice:10", {"username": "alice"}, ttl=0.01)
+        time.sleep(0.02)
+        store.set("analysis", "bob:10", {"username": "bob"}, ttl=60)
+
+        rows = store._connection().execute("SELECT key FROM entries").fetchall()
+        assert rows == [("bob:10",)]
+
+    def test_take_is_all_or_nothing(self, tmp_path):
+        """Test a reservation that exceeds any limit reserves nothing and reports the wait."""
+        store = SharedStore(tmp_path / "store.sqlite3")
+        limits = {"requests": 2, "tokens": 100}
+        assert store.take("llm", {"requests": 1, "tokens": 80}, limits, 60) == 0.0
+
+        wait = store.take("llm", {"requests": 1, "tokens": 80}, limits, 60)
+        assert 0 < wait <= 60
+        assert store.counter("llm", "requests", 60) == 1
+        store.adjust("llm", {"tokens": -50}, 60)
+        assert store.take("llm", {"requests": 1, "tokens": 60}, limits, 60) == 0.0
+
+    def test_counters_hold_across_processes(self, tmp_path):
+        """Test concurrent processes never grant more than the shared limit."""
+        path = tmp_path / "store.sqlite3"
+        SharedStore(path)
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        processes = [context.Process(target=_take_requests, args=(path, 5, results)) for _ in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(timeout=30)
+
+        assert sum(results.get(timeout=5) for _ in processes) == 10
+
+
+class TestSharedState:
+    """Test the caches and limits that use the shared store."""
+
+    @pytest.mark.asyncio
+    async def test_analysis_is_served_from_the_shared_cache(self, shared_store_path):
+        """Test a second request for the same profile reuses the stored result."""
+        mock_graph_app = Mock()
+        mock_graph_app.ainvoke = AsyncMock(return_value={"username": "alice", "user_bio": "Bio", "error": None})
+
+        with patch('src.api.services.get_graph_app', return_value=mock_graph_app):
+            first = await analyze_profile_service("alice", 10)
+            second = await analyze_profile_service("Alice", 10)
+            await analyze_profile_service("alice", 20)
+
+        assert second == first
+        assert second["user_bio"] == "Bio"
+        assert mock_graph_app.ainvoke.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_cache_hits_report_no_usage(self, shared_store_path):
+        """Test a cached result does not repeat the LLM calls and cost of the run that produced it."""
+        usage = {"total": {"llm_calls": 4, "cost_usd": 0.02}, "nodes": {}}
+        SharedStore(shared_store_path).set("analysis", "alice:10", {"username": "alice", "usage": usage, "error": None})
+
+        with patch('src.api.services.get_graph_app', return_value=Mock()):
+            cached = await analyze_profile_service("alice", 10)
+
+        assert cached["usage"]["total"]["llm_calls"] == 0
+        assert cached["usage"]["total"]["cost_usd"] == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_analyses_are_not_cached(self, shared_store_path):
+        """Test errors are recomputed rather than served from the cache."""
+        mock_graph_app = Mock()
+        mock_graph_app.ainvoke = AsyncMock(return_value={"username": "alice", "error": "LLM error"})
+
+        with patch('src.api.services.get_graph_app', return_value=mock_graph_app):
+            for _ in range(2):
+                with pytest.raises(Exception):
+                    await analyze_profile_service("alice", 10)
+
+        assert mock_graph_app.ainvoke.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_user_id_is_resolved_once(self, shared_store_path):
+        """Test the tweets fetch reuses the user id resolved by the details fetch."""
+        async def user_tweets(user_id, limit):
+            yield SimpleNamespace(rawContent=f"tweet by {user_id}")
+
+        api = Mock()
+        api.user_by_login = AsyncMock(return_value=SimpleNamespace(id=42, rawDescription="Bio", profileImageUrl=None, displayname="Alice"))
+        api.user_tweets = user_tweets
+
+        with patch('src.data_fetcher.fetcher.get_api_client', new=AsyncMock(return_value=api)):
+            await fetch_user_details("alice")
+            tweets = await fetch_recent_tweets("alice", n=1)
+
+        assert tweets == ["tweet by 42"]
+        api.user_by_login.assert_called_once()
+
+    def test_rate_limit_is_shared_between_limiters(self, tmp_path):
+        """Test limiters in different workers draw from one requests-per-minute budget."""
+        store = SharedStore(tmp_path / "store.sqlite3")
+        workers = [AdaptiveRateLimiter(rpm=2, tpm=0, shared=store) for _ in range(2)]
+        workers[0].acquire(0)
+        workers[1].acquire(0)
+
+        with pytest.raises(RateLimitTimeout):
+            workers[0].acquire(0, timeout=0.05)
+
+    def test_429_pauses_every_limiter(self, tmp_path):
+        """Test a 429 seen by one worker pauses the others."""
+        store = SharedStore(tmp_path / "store.sqlite3")
+        first, second = (AdaptiveRateLimiter(rpm=100, tpm=0, shared=store) for _ in range(2))
+        first.penalize(5.0)
+
+        with pytest.raises(RateLimitTimeout):
+            second.acquire(0, timeout=0.05)
+
+
+    def test_shared_reservation_does_not_hold_the_lock(self, tmp_path):
+        """Test other threads can use the limiter while the shared counters are being reserved."""
+        store = SharedStore(tmp_path / "store.sqlite3")
+        limiter = AdaptiveRateLimiter(rpm=100, tpm=0, shared=store)
+        reserving, proceed = threading.Event(), threading.Event()
+        take = store.take
+
+        def slow_take(*args):
+            reserving.set()
+            proceed.wait(5)
+            return take(*args)
+
+        with patch.object(store, 'take', side_effect=slow_take):
+            caller = threading.Thread(target=limiter.acquire, args=(0,))
+            caller.start()
+            assert reserving.wait(5)
+            released = threading.Thread(target=limiter.release, args=(0,))
+            released.start()
+            released.join(1)
+            assert not released.is_alive()
+            proceed.set()
+            caller.join(5)
+
+        assert not caller.is_alive()
\ No newline at end of file
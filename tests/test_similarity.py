@@ -0,0 +1,83 @@
+from unittest.mock import patch
+
+import httpx
+import numpy as np
+import pytest
+
+from src.api.main import app
+from src.similarity.index import SimilarityIndex, index_profiles, profile_vector
+
+
+def _result(username, scores, mbti_code="INTJ", sentiment=50.0):
+    return {
+        "username": username,
+        "category_scores": {category: {"score": score, "evidence": []} for category, score in scores.items()},
+        "mbti_result": {"mbti_code": mbti_code},
+        "sentiment_scaled_score": sentiment,
+        "error": None
+    }
+
+
+TECHIE = _result("techie", {"tech": 90, "startups": 80})
+BUILDER = _result("Builder", {"tech": 85, "startups": 70, "finance": 20})
+CHEF = _result("chef", {"food": 95, "travel": 60}, mbti_code="ESFP")
+
+
+class TestSimilarityIndex:
+    """Test the memory-mapped similarity index."""
+
+    def test_profile_vector(self):
+        vector = profile_vector(TECHIE)
+        assert vector.dtype == np.float32 and len(vector) % 8 == 0
+        assert np.isclose(np.linalg.norm(vector), 1.0)
+        assert profile_vector({"username": "empty", "category_scores": {}}) is None
+
+    def test_top_k_search(self, tmp_path):
+        """Test results are ranked by cosine similarity and exclude the profile itself."""
+        index = SimilarityIndex(tmp_path)
+        assert index.add((r["username"], profile_vector(r)) for r in (TECHIE, BUILDER, CHEF)) == 3
+
+        matches = index.search("techie", k=5)
+        assert [username for username, _ in matches] == ["Builder", "chef"]
+        assert matches[0][1] > 0.9 > matches[1][1]
+        assert index.search("BUILDER", k=1)[0][0] == "techie"
+        assert index.search("nobody") is None
+
+    def test_updates_persist_and_are_shared(self, tmp_path):
+        """Test re-analyzed profiles replace their row and other instances see new rows."""
+        writer = SimilarityIndex(tmp_path)
+        reader = SimilarityIndex(tmp_path)
+        writer.add([("techie", profile_vector(TECHIE)), ("chef", profile_vector(CHEF))])
+        writer.add([("TECHIE", profile_vector(_result("techie", {"food": 90})))])
+
+        assert len(reader) == 2
+        assert reader.search("chef", k=1)[0][0] == "techie"
+        assert SimilarityIndex(tmp_path).search("chef", k=1)[0][0] == "techie"
+
+    def test_grows_beyond_initial_capacity(self, tmp_path):
+        index = SimilarityIndex(tmp_path)
+        rng = np.random.default_rng(0)
+        vectors = rng.random((3000, len(profile_vector(TECHIE))), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        index.add((f"user{i}", vector) for i, vector in enumerate(vectors))
+
+        assert len(index) == 3000
+        best = int(np.argsort(vectors[1:] @ vectors[0])[-1]) + 1
+        assert index.search("user0", k=1)[0][0] == f"user{best}"
+
+
+class TestSimilarProfilesRoute:
+    """Test the similar-profile endpoint."""
+
+    @pytest.mark.asyncio
+    async def test_similar_profiles(self, tmp_path):
+        index = SimilarityIndex(tmp_path)
+        with patch('src.similarity.index.get_similarity_index', return_value=index), \
+             patch('src.api.routes.get_similarity_index', return_value=index):
+            index_profiles([TECHIE, BUILDER, CHEF, {**CHEF, "username": "failed", "error": "boom"}])
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                response = await client.get("/profiles/techie/similar", params={"k": 1})
+                assert response.status_code == 200
+                assert response.json()["similar"][0]["username"] == "Builder"
+                assert (await client.get("/profiles/failed/similar")).status_code == 404
+                assert (await client.get("/profiles/techie/similar", params={"k": 0})).status_code == 422
\ No newline at end of file
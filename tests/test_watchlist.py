@@ -0,0 +1,225 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from src.api.main import app
+from src.observability.metrics import WATCHLIST_REFRESHES
+from src.shared.store import SharedStore
+from src.watchlist import WatchlistScheduler, WatchlistStore
+
+
+def _due_now(store, username):
+    """Makes an entry due immediately."""
+    store.finish(store.get(username), "unchanged", next_in=-1)
+    return store.get(username)
+
+
+class TestWatchlistStore:
+    """Test watchlist entries, their due times and leased claiming."""
+
+    def test_new_entries_are_spread_over_the_interval(self, tmp_path):
+        store = WatchlistStore(tmp_path / "watchlist.db")
+        now = time.time()
+        assert store.add([f"user{i}" for i in range(200)], interval_seconds=3600) == 200
+
+        due = [entry.due_at - now for entry in store.entries(limit=200)]
+        assert len(store) == 200
+        assert due == sorted(due)
+        assert 0 <= min(due) < 600 and 3000 < max(due) <= 3601
+
+    def test_add_updates_listed_accounts(self, tmp_path):
+        store = WatchlistStore(tmp_path / "watchlist.db")
+        store.add(["Alice"], interval_seconds=86400, tweet_count=10)
+        due_at = store.get("alice").due_at
+
+        assert store.add(["alice", "bob"], interval_seconds=600, tweet_count=20) == 1
+        entry = store.get("ALICE")
+        assert (entry.username, entry.interval_seconds, entry.tweet_count) == ("Alice", 600, 20)
+        assert entry.due_at <= min(due_at, time.time() + 600)
+        assert store.remove("alice") and not store.remove("alice")
+        assert store.get("alice") is None and len(store) == 1
+
+    def test_claims_are_leased(self, tmp_path):
+        path = tmp_path / "watchlist.db"
+        store, other = WatchlistStore(path), WatchlistStore(path)
+        store.add(["alice", "bob", "carol"], interval_seconds=3600)
+        for username in ("alice", "bob"):
+            _due_now(store, username)
+
+        assert store.lag()[0] == 2
+        claimed = store.claim_due(limit=1, lease_seconds=60)
+        assert len(claimed) == 1
+        assert [entry.username for entry in other.claim_due(limit=10, lease_seconds=60)] == \
+            [name for name in ("alice", "bob") if name != claimed[0].username]
+        assert other.claim_due(limit=10, lease_seconds=60) == []
+        assert store.lag()[0] == 0
+
+    def test_expired_lease_is_claimed_again(self, tmp_path):
+        store = WatchlistStore(tmp_path / "watchlist.db")
+        store.add(["alice"], interval_seconds=3600)
+        _due_now(store, "alice")
+
+        assert store.claim_due(limit=1, lease_seconds=-1)
+        assert store.claim_due(limit=1, lease_seconds=60)
+
+    def test_finish_records_the_outcome(self, tmp_path):
+        store = WatchlistStore(tmp_path / "watchlist.db")
+        store.add(["alice"], interval_seconds=3600)
+        entry = _due_now(store, "alice")
+
+        store.finish(entry, "analyzed", next_in=3600, tweet_id="42")
+        store.finish(store.get("alice"), "failed", next_in=900, error="Data fetching failed")
+        entry = store.get("alice")
+        assert (entry.last_status, entry.last_tweet_id, entry.last_error) == ("failed", "42", "Data fetching failed")
+        assert entry.last_analyzed_at <= entry.last_checked_at
+        assert entry.due_at == pytest.approx(time.time() + 900, abs=5)
+        assert store.lag() == (0, 0.0)
+
+
+class TestWatchlistScheduler:
+    """Test refreshes: the new-tweet check, failures and backpressure."""
+
+    @pytest.mark.asyncio
+    async def test_unchanged_account_is_not_analyzed(self, tmp_path):
+        store = WatchlistStore(tmp_path / "watchlist.db")
+        store.add(["alice"], interval_seconds=3600)
+        records = [{"id": "7"}, {"id": "12"}, {"id": "9"}]
+        analyze = AsyncMock(return_value={})
+        scheduler = WatchlistScheduler(store)
+
+        with patch('src.watchlist.scheduler.fetch_tweet_records', new=AsyncMock(return_value=records)), \
+             patch('src.watchlist.scheduler.analyze_profile_service', new=analyze):
+            assert await scheduler.refresh(_due_now(store, "alice")) == "analyzed"
+            assert store.get("alice").last_tweet_id == "12"
+            assert await scheduler.refresh(_due_now(store, "alice")) == "unchanged"
+
+        analyze.assert_awaited_once_with(username="alice", tweet_count=10, priority="background", refresh=True)
+        entry = store.get("alice")
+        assert entry.last_status == "unchanged" and entry.last_analyzed_at is not None
+        assert 3200 < entry.due_at - time.time() <= 3960
+
+    @pytest.mark.asyncio
+    async def test_failures_are_retried_sooner(self, tmp_path):
+        store = WatchlistStore(tmp_path / "watchlist.db")
+        store.add(["alice", "ghost"], interval_seconds=86400)
+        scheduler = WatchlistScheduler(store)
+
+        async def analyze(username, **kwargs):
+            raise HTTPException(status_code=404 if username == "ghost" else 500, detail="Data fetching failed")
+
+        failed = WATCHLIST_REFRESHES.value("failed")
+        with patch('src.watchlist.scheduler.fetch_tweet_records', new=AsyncMock(return_value=[])), \
+             patch('src.watchlist.scheduler.analyze_profile_service', side_effect=analyze):
+            assert await scheduler.refresh(_due_now(store, "alice")) == "failed"
+            assert await scheduler.refresh(_due_now(store, "ghost")) == "failed"
+
+        assert WATCHLIST_REFRESHES.value("failed") == failed + 2
+        assert store.get("alice").due_at - time.time() < 1000
+        assert store.get("ghost").due_at - time.time() > 70000
+        assert store.get("alice").last_error == "Data fetching failed"
+
+    @pytest.mark.asyncio
+    async def test_run_refreshes_due_entries(self, tmp_path):
+        store = WatchlistStore(tmp_path / "watchlist.db")
+        store.add([f"user{i}" for i in range(6)], interval_seconds=3600)
+        for i in range(6):
+            _due_now(store, f"user{i}")
+        running = peak = 0
+
+        async def analyze(**kwargs):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return {}
+
+        stop = asyncio.Event()
+        scheduler = WatchlistScheduler(store, concurrency=2, max_per_minute=0, poll_interval=0.01)
+        with patch('src.watchlist.scheduler.fetch_tweet_records', new=AsyncMock(return_value=[{"id": "1"}])), \
+             patch('src.watchlist.scheduler.analyze_profile_service', side_effect=analyze):
+            task = asyncio.create_task(scheduler.run(stop))
+            for _ in range(200):
+                if all(entry.last_status == "analyzed" for entry in store.entries()):
+                    break
+                await asyncio.sleep(0.01)
+            stop.set()
+            await task
+
+        assert peak == 2
+        assert [entry.last_status for entry in store.entries()] == ["analyzed"] * 6
+
+    @pytest.mark.asyncio
+    async def test_holds_off_while_llm_calls_are_queued(self, tmp_path):
+        store = WatchlistStore(tmp_path / "watchlist.db")
+        store.add(["alice"], interval_seconds=3600)
+        _due_now(store, "alice")
+        queue = MagicMock()
+        queue.value.return_value = 3
+
+        stop = asyncio.Event()
+        scheduler = WatchlistScheduler(store, max_per_minute=0, poll_interval=0.01)
+        with patch('src.watchlist.scheduler.LLM_RATE_LIMIT_QUEUE', new=queue):
+            task = asyncio.create_task(scheduler.run(stop))
+            await asyncio.sleep(0.05)
+            stop.set()
+            await task
+
+        assert store.get("alice").last_status == "unchanged"  # Not refreshed since _due_now
+        assert store.lag()[0] == 1
+
+    def test_rate_budget(self, tmp_path):
+        scheduler = WatchlistScheduler(WatchlistStore(tmp_path / "watchlist.db"), max_per_minute=2)
+        assert scheduler._reserve_refresh() == 0 and scheduler._reserve_refresh() == 0
+        assert 0 < scheduler._reserve_refresh() <= 30
+        scheduler._return_refresh()
+        assert scheduler._reserve_refresh() == 0
+
+    def test_rate_budget_is_shared_between_processes(self, tmp_path):
+        """Test schedulers sharing a store draw from one per-minute budget."""
+        store = WatchlistStore(tmp_path / "watchlist.db")
+        shared = SharedStore(tmp_path / "shared.sqlite3")
+        first, second = (WatchlistScheduler(store, max_per_minute=2, shared=shared) for _ in range(2))
+
+        assert first._reserve_refresh() == 0 and second._reserve_refresh() == 0
+        assert first._reserve_refresh() > 0 and second._reserve_refresh() > 0
+        second._return_refresh()
+        assert first._reserve_refresh() == 0
+
+
+class TestWatchlistRoutes:
+    """Test the watchlist endpoints."""
+
+    @pytest.mark.asyncio
+    async def test_add_list_and_remove(self, tmp_path):
+        store = WatchlistStore(tmp_path / "watchlist.db")
+        with patch('src.api.routes.get_watchlist_store', return_value=store):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                created = await client.put("/watchlist/alice", json={"interval_seconds": 3600})
+                updated = await client.put("/watchlist/alice", json={"interval_seconds": 7200, "tweet_count": 20})
+                await client.put("/watchlist/bob", json={})
+                listed = await client.get("/watchlist", params={"limit": 1})
+                entry = await client.get("/watchlist/alice")
+                deleted = await client.delete("/watchlist/alice")
+                missing = await client.get("/watchlist/alice")
+                too_often = await client.put("/watchlist/carol", json={"interval_seconds": 10})
+
+        assert created.status_code == 201 and updated.status_code == 200
+        assert updated.json()["interval_seconds"] == 7200 and updated.json()["tweet_count"] == 20
+        assert listed.json()["total"] == 2 and len(listed.json()["entries"]) == 1
+        assert entry.json()["username"] == "alice" and entry.json()["last_status"] is None
+        assert deleted.status_code == 204 and missing.status_code == 404
+        assert too_often.status_code == 422
+
+    @pytest.mark.asyncio
+    async def test_disabled(self):
+        with patch('src.api.routes.get_watchlist_store', return_value=None):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                response = await client.get("/watchlist")
+
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Watchlist is disabled."
\ No newline at end of file
@@ -0,0 +1,185 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from benchmarks.fake_redis import FakeRedisServer
+from src.api.main import app
+from src.worker.queue import RedisTaskQueue, SQLiteTaskQueue, TaskQueue, create_task_queue
+from src.worker.resp import RespClient, RespError
+from src.worker.worker import AnalysisWorker
+
+
+@pytest.fixture(scope="module")
+def fake_redis():
+    server = FakeRedisServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def task_queue(request, tmp_path, fake_redis):
+    """Each queue test runs against both backends."""
+    if request.param == "sqlite":
+        return SQLiteTaskQueue(tmp_path / "queue.sqlite3", max_attempts=2)
+    return RedisTaskQueue(RespClient.from_url(fake_redis.url), prefix=f"test-{time.time_ns()}", max_attempts=2)
+
+
+class TestTaskQueue:
+    """Test the queue semantics shared by the SQLite and Redis backends."""
+
+    def test_tasks_are_leased_once_and_acked(self, task_queue):
+        """Test a leased task is invisible to other workers until it is acked."""
+        task_id = task_queue.enqueue({"username": "alice", "tweet_count": 5})
+        task = task_queue.dequeue(visibility_timeout=30)
+
+        assert task.id == task_id and task.payload["username"] == "alice" and task.attempts == 1
+        assert task_queue.dequeue(visibility_timeout=30) is None
+        assert task_queue.get(task_id)["status"] == "running"
+        assert task_queue.ack(task, {"username": "alice", "error": None})
+
+        status = task_queue.get(task_id)
+        assert status["status"] == "done" and status["result"] == {"username": "alice", "error": None}
+        assert task_queue.dequeue(visibility_timeout=30) is None
+
+    def test_expired_leases_are_redelivered(self, task_queue):
+        """Test a task whose worker stopped renewing its lease goes to another worker."""
+        task_id = task_queue.enqueue({"username": "alice"})
+        stale = task_queue.dequeue(visibility_timeout=0.05)
+        time.sleep(0.1)
+
+        fresh = task_queue.dequeue(visibility_timeout=30)
+        assert fresh.id == task_id and fresh.attempts == 2
+        # The first worker finishing late does not overwrite the redelivery
+        assert not task_queue.ack(stale, {"username": "stale"})
+        assert task_queue.ack(fresh, {"username": "alice"})
+        assert task_queue.get(task_id)["result"] == {"username": "alice"}
+
+    def test_leases_can_be_extended(self, task_queue):
+        """Test renewing a lease keeps the task from being redelivered."""
+        task_queue.enqueue({"username": "alice"})
+        task = task_queue.dequeue(visibility_timeout=0.05)
+        assert task_queue.extend(task, visibility_timeout=30)
+        time.sleep(0.1)
+        assert task_queue.dequeue(visibility_timeout=30) is None
+
+    def test_retries_stop_at_max_attempts(self, task_queue):
+        """Test a task that keeps failing is retried, then failed with its last error."""
+        task_id = task_queue.enqueue({"username": "alice"})
+        task_queue.retry(task_queue.dequeue(visibility_timeout=30), "boom", delay=0)
+        assert task_queue.get(task_id)["status"] == "queued"
+
+        task_queue.retry(task_queue.dequeue(visibility_timeout=30), "boom again", delay=0)
+        status = task_queue.get(task_id)
+        assert status["status"] == "failed" and status["error"] == "boom again" and status["attempts"] == 2
+        assert task_queue.dequeue(visibility_timeout=30) is None
+
+    def test_unknown_tasks(self, task_queue):
+        assert task_queue.get("missing") is None
+
+
+class TestRespClient:
+    """Test the RESP client against the stand-in server."""
+
+    def test_commands_and_errors(self, fake_redis):
+        client = RespClient.from_url(fake_redis.url)
+        assert client.execute("PING") == "PONG"
+        assert client.execute("SET", "key", "value", "NX") == "OK"
+        assert client.execute("SET", "key", "other", "NX") is None
+        assert client.execute("GET", "key") == "value"
+        with pytest.raises(RespError):
+            client.execute("NOSUCHCOMMAND")
+
+    def test_queue_urls(self, tmp_path, fake_redis):
+        assert isinstance(create_task_queue(f"sqlite:///{tmp_path}/queue.sqlite3"), SQLiteTaskQueue)
+        assert isinstance(create_task_queue(fake_redis.url), RedisTaskQueue)
+        with pytest.raises(ValueError):
+            create_task_queue("kafka://broker")
+
+    def test_incomplete_backend_cannot_be_created(self):
+        class EnqueueOnly(TaskQueue):
+            def enqueue(self, payload):
+                return "id"
+
+        with pytest.raises(TypeError):
+            EnqueueOnly()
+
+
+class TestAnalysisWorker:
+    """Test the worker loop on top of the analysis service."""
+
+    @pytest.mark.asyncio
+    async def test_worker_processes_tasks(self, tmp_path):
+        """Test queued analyses are run, retried on server errors and failed on missing profiles."""
+        queue = SQLiteTaskQueue(tmp_path / "queue.sqlite3", max_attempts=3)
+        ok_id = queue.enqueue({"username": "alice", "tweet_count": 5, "priority": "batch"})
+        flaky_id = queue.enqueue({"username": "flaky", "tweet_count": 5})
+        ghost_id = queue.enqueue({"username": "ghost", "tweet_count": 5})
+        calls = []
+
+        async def analyze(username, tweet_count, priority):
+            calls.append(username)
+            if username == "ghost":
+                raise HTTPException(status_code=404, detail="Could not retrieve data for user ghost")
+            if username == "flaky" and calls.count("flaky") == 1:
+                raise HTTPException(status_code=504, detail="Analysis did not finish in time")
+            return {"username": username, "mbti_result": {"mbti_code": "INTJ"}, "error": None}
+
+        worker = AnalysisWorker(queue, concurrency=2, visibility_timeout=30, poll_interval=0.01, retry_delay=0)
+        stop = asyncio.Event()
+        with patch('src.worker.worker.analyze_profile_service', side_effect=analyze):
+            runner = asyncio.create_task(worker.run(stop))
+            for _ in range(200):
+                if all(queue.get(task_id)["status"] in ("done", "failed") for task_id in (ok_id, flaky_id, ghost_id)):
+                    break
+                await asyncio.sleep(0.01)
+            stop.set()
+            await runner
+
+        assert queue.get(ok_id)["result"]["mbti_result"] == {"mbti_code": "INTJ"}
+        assert queue.get(flaky_id)["status"] == "done" and queue.get(flaky_id)["attempts"] == 2
+        ghost = queue.get(ghost_id)
+        assert ghost["status"] == "failed" and ghost["status_code"] == 404 and ghost["attempts"] == 1
+
+    @pytest.mark.asyncio
+    async def test_worker_purges_expired_results(self, tmp_path):
+        """Test finished tasks older than the result TTL are deleted by a running worker."""
+        queue = SQLiteTaskQueue(tmp_path / "queue.sqlite3")
+        old_id, recent_id = queue.enqueue({"username": "old"}), queue.enqueue({"username": "recent"})
+        for _ in range(2):
+            task = queue.dequeue(visibility_timeout=30)
+            queue.ack(task, {"username": task.payload["username"], "recent_tweets": ["tweet"] * 50})
+        queue._connection().execute("UPDATE tasks SET updated_at = ? WHERE id = ?", (time.time() - 2 * 86400, old_id))
+
+        stop = asyncio.Event()
+        runner = asyncio.create_task(AnalysisWorker(queue, poll_interval=0.01).run(stop))
+        await asyncio.sleep(0.05)
+        stop.set()
+        await runner
+
+        assert queue.get(old_id) is None
+        assert queue.get(recent_id)["status"] == "done"
+
+    @pytest.mark.asyncio
+    async def test_submit_and_poll_routes(self, tmp_path):
+        """Test the API queues analyses and serves their results."""
+        queue = SQLiteTaskQueue(tmp_path / "queue.sqlite3")
+        with patch('src.api.routes.get_task_queue', return_value=queue):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                submitted = await client.post("/analyze/tasks", json={"username": "alice", "priority": "batch"})
+                assert submitted.status_code == 202
+                task_id = submitted.json()["task_id"]
+                assert (await client.get(f"/analyze/tasks/{task_id}")).json()["status"] == "queued"
+
+                task = queue.dequeue(visibility_timeout=30)
+                assert task.payload == {"username": "alice", "tweet_count": 10, "priority": "batch"}
+                queue.ack(task, {"username": "alice", "top_keywords": ["ai"], "error": None})
+                body = (await client.get(f"/analyze/tasks/{task_id}")).json()
+                assert body["status"] == "done" and body["result"]["top_keywords"] == ["ai"]
+                assert (await client.get("/analyze/tasks/missing")).status_code == 404
+
+                await client.post("/analyze/tasks", json={"username": "bob"})
+                assert queue.dequeue(visibility_timeout=30).payload["priority"] == "batch"